@@ -0,0 +1,431 @@
+"""
+Agent load benchmark: plays the Node bridge for one Python agent under load
+
+Spawns an agent's main.py the way BaseAgent.js does and keeps --concurrency
+requests outstanding (closed loop) for --duration seconds, drawn from a
+weighted mix of request kinds:
+- task: execute_task with 2 concurrent tool calls and one LLM call
+- tool: execute_task with 8 concurrent project_read_file round trips, no LLM
+- large: execute_task carrying --payload-kb of text, reading a file of that
+  size and returning a result of that size
+- chat: handle_chat (project_get tool call plus a streamed LLM response)
+- message: handle_message carrying an AgentProtocol work request
+Tool calls (tool_call and tool_call_batch) are answered after --tool-latency-ms.
+
+By default the target is bench_agent.py, whose handlers do exactly the above,
+so results track base_agent.py, AgentProtocol and LLMManager rather than skill
+logic; --agent takes any main.py instead. The LLM is the mock provider
+(--llm-latency sets LLM_MOCK_LATENCY).
+
+Reports per-kind throughput and p50/p90/p99 latency, the agent's RSS, thread
+count and CPU time, and the agent's own get_metrics snapshot. Save a run with
+--json and compare a later one against it with --compare:
+
+    python benchmarks/agent_load_bench.py --json before.json
+    git checkout my-branch
+    python benchmarks/agent_load_bench.py --compare before.json
+
+Usage:
+    python benchmarks/agent_load_bench.py [--agent path/to/main.py] [--mix task=2,tool=2,chat=1,message=1,large=1]
+        [--concurrency 8] [--duration 20] [--warmup 2] [--tool-latency-ms 2] [--payload-kb 256]
+        [--llm-latency fixed:20] [--framing json|msgpack] [--runtime threaded|async]
+        [--json results.json] [--compare baseline.json]
+"""
+
+import os
+import sys
+import json
+import time
+import heapq
+import random
+import argparse
+import platform
+import tempfile
+import itertools
+import threading
+import subprocess
+from collections import Counter
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT, 'src', 'agents', 'core'))
+
+import bridge_framing
+from AgentProtocol import AgentProtocol
+
+BENCH_AGENT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_agent.py')
+KINDS = ('task', 'tool', 'large', 'chat', 'message')
+DEFAULT_MIX = 'task=2,tool=2,chat=1,message=1,large=1'
+REQUEST_TIMEOUT = 120.0
+SMALL_FILE = 'const value = 42;\n' * 57  # ~1 KB
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        kind = kind.strip()
+        if kind not in KINDS:
+            sys.exit(f"Unknown request kind {kind!r} (expected one of {', '.join(KINDS)})")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def proc_stats(pid):
+    """RSS (MB), thread count and CPU seconds of a process from /proc (None where unavailable)"""
+    stats = {'rss_mb': None, 'threads': None, 'cpu_seconds': None}
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    stats['rss_mb'] = round(int(line.split()[1]) / 1024, 1)
+                elif line.startswith('Threads:'):
+                    stats['threads'] = int(line.split()[1])
+        with open(f'/proc/{pid}/stat') as f:
+            # Fields after the parenthesized command name; utime and stime are the 14th and 15th
+            fields = f.read().rsplit(')', 1)[1].split()
+        stats['cpu_seconds'] = round((int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK'), 2)
+    except (OSError, ValueError, IndexError):
+        pass
+    return stats
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return revision + ('-dirty' if dirty else '') if revision else None
+    except OSError:
+        return None
+
+
+class Bridge:
+    """The Node side: sends requests, answers tool calls, matches responses to requests"""
+
+    def __init__(self, agent_path, env, tool_latency, payload_kb):
+        self.process = subprocess.Popen(
+            [sys.executable, agent_path], cwd=ROOT, env=env,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        self.framing = bridge_framing.JSON
+        self.tool_latency = tool_latency
+        self.large_file = 'x' * (payload_kb * 1024)
+        self.ready = threading.Event()
+        self.closed = False
+        self.write_lock = threading.Lock()
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.received = Counter()
+        self.tool_calls = 0
+        self.bytes_sent = 0
+
+        self.scheduled = []
+        self.scheduled_cond = threading.Condition()
+        threading.Thread(target=self._read, name='bench-reader', daemon=True).start()
+        threading.Thread(target=self._answer_tools, name='bench-tools', daemon=True).start()
+
+    def send(self, message):
+        data = bridge_framing.encode(message, self.framing)
+        with self.write_lock:
+            self.process.stdin.write(data)
+            self.process.stdin.flush()
+            self.bytes_sent += len(data)
+
+    def request(self, message, timeout=REQUEST_TIMEOUT):
+        """Send a request and wait for its response: (response message or None on timeout)"""
+        done = threading.Event()
+        slot = {'done': done, 'response': None}
+        with self.pending_lock:
+            self.pending[message['requestId']] = slot
+        self.send(message)
+        done.wait(timeout)
+        with self.pending_lock:
+            self.pending.pop(message['requestId'], None)
+        return slot['response']
+
+    def _complete(self, request_id, message):
+        with self.pending_lock:
+            slot = self.pending.get(request_id)
+        if slot:
+            slot['response'] = message
+            slot['done'].set()
+
+    def _read(self):
+        for message in bridge_framing.read_messages(self.process.stdout):
+            msg_type = message.get('type')
+            self.received[msg_type] += 1
+            if msg_type == 'bridge_hello':
+                self.framing = message.get('framing') or bridge_framing.JSON
+                self.ready.set()
+            elif msg_type == 'tool_call':
+                self._schedule(message)
+            elif msg_type == 'tool_call_batch':
+                for call in message.get('calls') or []:
+                    self._schedule(call)
+            elif msg_type in ('response', 'queue_full'):
+                self._complete(message.get('requestId'), message)
+        # The agent exited: fail whatever is still waiting
+        self.closed = True
+        with self.pending_lock:
+            slots = list(self.pending.values())
+        for slot in slots:
+            slot['done'].set()
+
+    def _schedule(self, call):
+        self.tool_calls += 1
+        with self.scheduled_cond:
+            heapq.heappush(self.scheduled, (time.monotonic() + self.tool_latency, self.tool_calls, call))
+            self.scheduled_cond.notify()
+
+    def _tool_result(self, call):
+        args = call.get('args') or {}
+        if call.get('toolName') == 'project_get':
+            return {'success': True, 'project': {'id': args.get('projectId'), 'name': 'Bench project', 'tasks': []}}
+        path = str(args.get('filePath') or args.get('dirPath') or '')
+        content = self.large_file if '/large-' in path else SMALL_FILE
+        return {'success': True, 'content': content, 'path': path}
+
+    def _answer_tools(self):
+        while not self.closed:
+            with self.scheduled_cond:
+                while not self.scheduled:
+                    self.scheduled_cond.wait(0.5)
+                    if self.closed:
+                        return
+                due, _, call = self.scheduled[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self.scheduled_cond.wait(delay)
+                    continue
+                heapq.heappop(self.scheduled)
+            try:
+                self.send({'type': 'tool_response', 'requestId': call.get('requestId'), 'result': self._tool_result(call)})
+            except (BrokenPipeError, ValueError):
+                return
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+            self.process.wait(5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+
+
+def build_request(kind, request_id, payload_kb):
+    task_id = f"{kind}-{request_id}"
+    if kind == 'task':
+        return {'type': 'execute_task', 'requestId': request_id,
+                'task': {'id': task_id, 'type': 'bench', 'description': 'Bench task', 'bench': {'tools': 2, 'llm': True}}}
+    if kind == 'tool':
+        return {'type': 'execute_task', 'requestId': request_id,
+                'task': {'id': task_id, 'type': 'bench', 'description': 'Bench tool calls', 'bench': {'tools': 8}}}
+    if kind == 'large':
+        return {'type': 'execute_task', 'requestId': request_id,
+                'task': {'id': task_id, 'type': 'bench', 'description': 'y' * (payload_kb * 1024),
+                         'bench': {'tools': 1, 'echoKb': payload_kb}}}
+    if kind == 'chat':
+        return {'type': 'handle_chat', 'requestId': request_id, 'message': f'Status of the project? ({request_id})',
+                'projectId': 'bench-project', 'history': []}
+    message = AgentProtocol.request_work('bench-client', 'bench', {'description': f'Bench work {request_id}'})
+    return {'type': 'handle_message', 'requestId': request_id, 'message': message}
+
+
+def run(args):
+    mix = parse_mix(args.mix)
+    agent_path = os.path.abspath(args.agent) if args.agent else BENCH_AGENT
+    rate_limit_db = os.path.join(tempfile.gettempdir(), f'agent-load-bench-{os.getpid()}.db')
+    env = dict(
+        os.environ, PYTHONUTF8='1', BRIDGE_FRAMING=args.framing, AGENT_RUNTIME=args.runtime,
+        LLM_PRIORITY='mock', LLM_MOCK_LATENCY=args.llm_latency, LLM_CACHE_ENABLED='0',
+        LLM_RATE_LIMIT_DB=rate_limit_db
+    )
+
+    bridge = Bridge(agent_path, env, args.tool_latency_ms / 1000.0, args.payload_kb)
+    if not bridge.ready.wait(30):
+        bridge.close()
+        sys.exit(f"{agent_path} did not send bridge_hello")
+    pid = bridge.process.pid
+    process_start = proc_stats(pid)
+
+    ids = itertools.count(1)
+    results = {kind: {'latencies': [], 'errors': 0, 'rejected': 0, 'timeouts': 0} for kind in mix}
+    results_lock = threading.Lock()
+    started = time.monotonic()
+    measure_from = started + args.warmup
+    stop_at = measure_from + args.duration
+    kinds, weights = list(mix), list(mix.values())
+
+    def worker(seed):
+        rng = random.Random(seed)
+        while time.monotonic() < stop_at and not bridge.closed:
+            kind = rng.choices(kinds, weights)[0]
+            sent = time.monotonic()
+            response = bridge.request(build_request(kind, next(ids), args.payload_kb))
+            finished = time.monotonic()
+            if sent < measure_from:
+                continue
+            with results_lock:
+                entry = results[kind]
+                if response is None:
+                    entry['timeouts'] += 1
+                elif response.get('type') == 'queue_full':
+                    entry['rejected'] += 1
+                elif 'error' in response:
+                    entry['errors'] += 1
+                else:
+                    entry['latencies'].append(finished - sent)
+
+    samples = []
+
+    def sample_process():
+        while time.monotonic() < stop_at and not bridge.closed:
+            samples.append(proc_stats(pid))
+            time.sleep(0.5)
+
+    threads = [threading.Thread(target=worker, args=(args.seed + i,), daemon=True) for i in range(args.concurrency)]
+    threads.append(threading.Thread(target=sample_process, daemon=True))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = min(time.monotonic(), stop_at) - measure_from
+
+    process_end = proc_stats(pid)
+    metrics_response = bridge.request({'type': 'get_metrics', 'requestId': next(ids)}, timeout=10) if not bridge.closed else None
+    bridge.close()
+    for suffix in ('', '-wal', '-shm'):
+        try:
+            os.remove(rate_limit_db + suffix)
+        except OSError:
+            pass
+
+    kind_rows = {}
+    total = 0
+    for kind, entry in results.items():
+        latencies = sorted(entry['latencies'])
+        total += len(latencies)
+        ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+        kind_rows[kind] = {
+            'completed': len(latencies),
+            'errors': entry['errors'],
+            'rejected': entry['rejected'],
+            'timeouts': entry['timeouts'],
+            'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+            'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+            'p50_ms': ms(percentile(latencies, 50)),
+            'p90_ms': ms(percentile(latencies, 90)),
+            'p99_ms': ms(percentile(latencies, 99)),
+            'max_ms': ms(latencies[-1]) if latencies else None
+        }
+
+    rss = [s['rss_mb'] for s in samples if s['rss_mb'] is not None]
+    thread_counts = [s['threads'] for s in samples if s['threads'] is not None]
+    cpu = None
+    if process_start['cpu_seconds'] is not None and process_end['cpu_seconds'] is not None:
+        cpu = round(process_end['cpu_seconds'] - process_start['cpu_seconds'], 2)
+    return {
+        'benchmark': 'agent_load',
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'config': {
+            'agent': os.path.relpath(agent_path, ROOT), 'mix': mix, 'concurrency': args.concurrency,
+            'duration': args.duration, 'warmup': args.warmup, 'tool_latency_ms': args.tool_latency_ms,
+            'payload_kb': args.payload_kb, 'llm_latency': args.llm_latency, 'framing': bridge.framing,
+            'runtime': args.runtime, 'seed': args.seed
+        },
+        'summary': {
+            'elapsed_s': round(elapsed, 2),
+            'completed': total,
+            'throughput_rps': round(total / elapsed, 2) if elapsed > 0 else None,
+            'tool_calls': bridge.tool_calls,
+            'mb_sent': round(bridge.bytes_sent / 1048576, 2),
+            'agent_exited': bridge.closed and bridge.process.returncode not in (None, 0)
+        },
+        'kinds': kind_rows,
+        'process': {
+            'rss_mb_start': process_start['rss_mb'],
+            'rss_mb_peak': max(rss) if rss else None,
+            'rss_mb_end': process_end['rss_mb'],
+            'threads_start': process_start['threads'],
+            'threads_peak': max(thread_counts) if thread_counts else None,
+            'cpu_seconds': cpu,
+            'cpu_percent': round(cpu / elapsed * 100, 1) if cpu is not None and elapsed > 0 else None
+        },
+        'bridge_messages': dict(bridge.received),
+        'agent_metrics': (metrics_response or {}).get('result')
+    }
+
+
+def print_results(results):
+    summary, process = results['summary'], results['process']
+    print(f"\n{results['config']['agent']} @ {results['revision']}: {summary['completed']} requests in {summary['elapsed_s']} s, "
+          f"{summary['throughput_rps']} req/s, {summary['tool_calls']} tool calls")
+    header = f"{'kind':<8} {'done':>6} {'err':>4} {'rej':>4} {'req/s':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+    print(header)
+    print('-' * len(header))
+    for kind, row in results['kinds'].items():
+        print(f"{kind:<8} {row['completed']:>6} {row['errors'] + row['timeouts']:>4} {row['rejected']:>4} {row['throughput_rps']:>7} "
+              f"{row['p50_ms']!s:>8} {row['p90_ms']!s:>8} {row['p99_ms']!s:>8} {row['max_ms']!s:>8}")
+    print(f"RSS {process['rss_mb_start']} -> peak {process['rss_mb_peak']} MB, threads {process['threads_start']} -> "
+          f"peak {process['threads_peak']}, CPU {process['cpu_seconds']} s ({process['cpu_percent']}%)")
+
+
+def print_comparison(results, baseline):
+    """Relative change of throughput and latency against an earlier --json run"""
+    def change(new, old):
+        if new is None or not old:
+            return 'n/a'
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    print(f"\nvs {baseline.get('revision')}:")
+    print(f"{'kind':<8} {'req/s':>9} {'p50':>9} {'p99':>9}")
+    for kind, row in results['kinds'].items():
+        old = baseline.get('kinds', {}).get(kind)
+        if not old:
+            print(f"{kind:<8} {'(not in baseline)':>29}")
+            continue
+        print(f"{kind:<8} {change(row['throughput_rps'], old['throughput_rps']):>9} "
+              f"{change(row['p50_ms'], old['p50_ms']):>9} {change(row['p99_ms'], old['p99_ms']):>9}")
+    print(f"{'total':<8} {change(results['summary']['throughput_rps'], baseline['summary']['throughput_rps']):>9}")
+    print(f"RSS peak {change(results['process']['rss_mb_peak'], baseline['process']['rss_mb_peak'])}, "
+          f"CPU {change(results['process']['cpu_percent'], baseline['process']['cpu_percent'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--agent', help='main.py of the agent to load (default: benchmarks/bench_agent.py)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"weighted request kinds ({', '.join(KINDS)})")
+    parser.add_argument('--concurrency', type=int, default=8, help='requests kept outstanding')
+    parser.add_argument('--duration', type=float, default=20.0, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=2.0, help='seconds of load before measuring')
+    parser.add_argument('--tool-latency-ms', type=float, default=2.0, help='delay before each tool call is answered')
+    parser.add_argument('--payload-kb', type=int, default=256, help='payload size of large requests')
+    parser.add_argument('--llm-latency', default='fixed:20', help='LLM_MOCK_LATENCY for the mock provider')
+    parser.add_argument('--framing', default='json', choices=(bridge_framing.JSON, bridge_framing.MSGPACK))
+    parser.add_argument('--runtime', default='threaded', choices=('threaded', 'async'), help='AGENT_RUNTIME')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', dest='json_path', help='write results to this file')
+    parser.add_argument('--compare', help='earlier --json results to compare against')
+    args = parser.parse_args()
+
+    results = run(args)
+    print_results(results)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(results, json.load(f))
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+"""
+Agent startup benchmark: time to the first ready message per agent
+
+Starts every agent listed in config/agents.json the way the Node bridge does
+and measures how long each takes to send its bridge_hello (the ready signal
+BaseAgent waits for). Launch modes:
+- spawn: a fresh `python main.py` per agent (the default bridge behaviour)
+- zygote: forked from agent_zygote.py (AGENT_LAUNCHER=zygote)
+- host: loaded into one agent_host.py process (AGENT_HOST_MODE=shared)
+
+Also reports what LLMManager() costs in this interpreter and how long each
+configured provider SDK takes to import and build on first use.
+
+Usage:
+    python benchmarks/agent_startup_bench.py [--mode spawn,zygote,host] [--agents pm,strategy]
+                                             [--repeat 3] [--timeout 20] [--json results.json]
+
+Set LLM_PRIORITY=mock (and no API keys) to measure without provider SDKs.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+CORE = os.path.join(ROOT, 'src', 'agents', 'core')
+sys.path.append(CORE)
+
+import bridge_framing
+
+MODES = ('spawn', 'zygote', 'host')
+
+
+def to_pascal_case(name: str) -> str:
+    # Same folder naming as server.js initializeAgents()
+    words = re.sub(r'[^a-zA-Z0-9 ]', '', name or '').split(' ')
+    return ''.join(word[:1].upper() + word[1:] for word in words)
+
+
+def load_agents(selected=None):
+    with open(os.path.join(ROOT, 'config', 'agents.json'), encoding='utf-8') as f:
+        config = json.load(f)
+    agents = []
+    for entry in config:
+        if selected and entry['id'] not in selected:
+            continue
+        if entry.get('customPath'):
+            path = os.path.join(ROOT, entry['customPath'])
+        else:
+            path = os.path.join(ROOT, 'src', 'agents', 'implementations', to_pascal_case(entry['name']), 'main.py')
+        agents.append({'id': entry['id'], 'name': entry['name'], 'path': path})
+    return agents
+
+
+def _wait_ready(messages, deadline):
+    """Consume messages until bridge_hello (True), a launch error or the deadline (False)"""
+    for message in messages:
+        if message.get('type') == 'bridge_hello':
+            return True
+        if message.get('type') in ('zygote_error', 'host_error'):
+            return False
+        if time.perf_counter() > deadline:
+            return False
+    return False
+
+
+def _child_env():
+    return dict(os.environ, PYTHONUTF8='1', BRIDGE_FRAMING='json')
+
+
+def start_spawn(agent, timeout):
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, agent['path']], cwd=ROOT, env=_child_env(),
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    # An agent that never prints would block the read: killing it ends the stream
+    timer = threading.Timer(timeout, process.kill)
+    timer.start()
+    try:
+        ready = _wait_ready(bridge_framing.read_messages(process.stdout), started + timeout)
+        return (time.perf_counter() - started) if ready else None
+    finally:
+        timer.cancel()
+        process.kill()
+        process.wait()
+
+
+class Zygote:
+    def __init__(self):
+        self.socket_path = os.path.join(tempfile.gettempdir(), f'agent-startup-bench-{os.getpid()}.sock')
+        started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(CORE, 'agent_zygote.py')], cwd=ROOT,
+            env=dict(_child_env(), AGENT_ZYGOTE_SOCKET=self.socket_path),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        ready = json.loads(self.process.stdout.readline())
+        self.startup = time.perf_counter() - started
+        self.preloaded = ready.get('preloaded', {})
+
+    def start(self, agent, timeout):
+        started = time.perf_counter()
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.connect(self.socket_path)
+        conn.settimeout(timeout)
+        conn.sendall((json.dumps({'type': 'spawn', 'agentPath': agent['path'], 'cwd': ROOT, 'env': {}}) + '\n').encode())
+        stream = conn.makefile('rb', buffering=0)
+        pid = None
+        try:
+            messages = bridge_framing.read_messages(stream)
+            first = next(messages, {})
+            pid = first.get('pid') if first.get('type') == 'zygote_spawned' else None
+            ready = pid is not None and _wait_ready(messages, started + timeout)
+            return (time.perf_counter() - started) if ready else None
+        except socket.timeout:
+            return None
+        finally:
+            if pid:
+                try:
+                    os.kill(pid, 9)
+                except OSError:
+                    pass
+            conn.close()
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait(10)
+
+
+class Host:
+    def __init__(self):
+        started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(CORE, 'agent_host.py')], cwd=ROOT, env=_child_env(),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        self.messages = bridge_framing.read_messages(self.process.stdout)
+        next(self.messages)
+        self.startup = time.perf_counter() - started
+        self.loads = 0
+
+    def start(self, agent, timeout):
+        # A fresh id per load: each measurement imports the agent's own modules again
+        self.loads += 1
+        agent_id = f"{agent['id']}-{self.loads}"
+        started = time.perf_counter()
+        self.process.stdin.write(bridge_framing.encode({'type': 'host_load', 'agentId': agent_id, 'pythonPath': agent['path']}))
+        self.process.stdin.flush()
+        for message in self.messages:
+            if message.get('agentId') != agent_id:
+                continue
+            if message.get('type') == 'bridge_hello':
+                elapsed = time.perf_counter() - started
+                break
+            if message.get('type') == 'host_error' or time.perf_counter() > started + timeout:
+                elapsed = None
+                break
+        else:
+            elapsed = None
+        self.process.stdin.write(bridge_framing.encode({'type': 'host_unload', 'agentId': agent_id}))
+        self.process.stdin.flush()
+        return elapsed
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait(10)
+
+
+def measure_llm_manager():
+    """Constructor cost and first-use SDK import/client times in this interpreter"""
+    started = time.perf_counter()
+    from llm_manager import LLMManager
+    imported = time.perf_counter()
+    manager = LLMManager(agent_id='startup-bench')
+    constructed = time.perf_counter()
+    for provider in list(manager.providers):
+        try:
+            manager.providers[provider]
+        except Exception as e:
+            print(f"  {provider.value}: client creation failed ({e})")
+    stats = manager.get_startup_stats()
+    stats['module_import_ms'] = round((imported - started) * 1000, 1)
+    stats['constructor_ms'] = round((constructed - imported) * 1000, 1)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', default='spawn', help=f"comma separated launch modes ({', '.join(MODES)})")
+    parser.add_argument('--agents', help='comma separated agent ids from config/agents.json (default: all)')
+    parser.add_argument('--repeat', type=int, default=1, help='starts per agent (the median is reported)')
+    parser.add_argument('--timeout', type=float, default=20.0, help='seconds to wait for each ready message')
+    parser.add_argument('--json', dest='json_path', help='write results to this file')
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.mode.split(',')]
+    for mode in modes:
+        if mode not in MODES:
+            sys.exit(f"Unknown mode {mode!r} (expected one of {', '.join(MODES)})")
+    agents = load_agents(set(args.agents.split(',')) if args.agents else None)
+
+    llm = measure_llm_manager()
+    print(f"LLMManager: module import {llm['module_import_ms']} ms, constructor {llm['constructor_ms']} ms, "
+          f"providers {', '.join(llm['configured']) or 'none'}")
+    for name, seconds in llm['import_seconds'].items():
+        print(f"  first use imports {name}: {seconds * 1000:.0f} ms")
+    for name, seconds in llm['client_seconds'].items():
+        print(f"  first use builds {name} client: {seconds * 1000:.0f} ms")
+
+    results = {'benchmark': 'agent_startup', 'llm_manager': llm, 'modes': {}}
+    for mode in modes:
+        launcher = {'zygote': Zygote, 'host': Host}.get(mode)
+        launcher = launcher() if launcher else None
+        start = launcher.start if launcher else start_spawn
+        print(f"\n{mode}" + (f" (launcher ready in {launcher.startup * 1000:.0f} ms)" if launcher else ''))
+        print(f"{'agent':<16} {'ready ms':>9}")
+
+        rows = []
+        try:
+            for agent in agents:
+                if not os.path.exists(agent['path']):
+                    rows.append({'id': agent['id'], 'ready_ms': None, 'error': 'main.py not found'})
+                    print(f"{agent['id']:<16} {'missing':>9}")
+                    continue
+                times = [start(agent, args.timeout) for _ in range(args.repeat)]
+                ok = [t for t in times if t is not None]
+                ready_ms = round(statistics.median(ok) * 1000, 1) if ok else None
+                rows.append({'id': agent['id'], 'ready_ms': ready_ms, 'samples_ms': [round(t * 1000, 1) for t in ok]})
+                print(f"{agent['id']:<16} {ready_ms if ready_ms is not None else 'no ready':>9}")
+        finally:
+            if launcher:
+                launcher.close()
+
+        ready = [r['ready_ms'] for r in rows if r['ready_ms'] is not None]
+        summary = {
+            'agents': len(rows),
+            'ready': len(ready),
+            'p50_ms': round(statistics.median(ready), 1) if ready else None,
+            'max_ms': max(ready) if ready else None,
+            'total_ms': round(sum(ready), 1),
+            'launcher_ms': round(launcher.startup * 1000, 1) if launcher else None
+        }
+        print(f"{len(ready)}/{len(rows)} ready, p50 {summary['p50_ms']} ms, max {summary['max_ms']} ms, sum {summary['total_ms']} ms")
+        results['modes'][mode] = {'summary': summary, 'agents': rows}
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
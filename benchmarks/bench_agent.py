@@ -0,0 +1,65 @@
+"""
+Benchmark agent for agent_load_bench.py
+
+A PythonBaseAgent whose handlers do exactly what the load generator asks, so
+a run measures the runtime (bridge, worker pool, tool calls, AgentProtocol,
+LLMManager) rather than some agent's skill logic. execute_task reads
+task['bench']:
+- tools: number of project_read_file calls (sent concurrently when parallel)
+- llm: generate one LLM response (use the mock provider)
+- echoKb: size of the payload returned in the result
+handle_message answers AgentProtocol work requests with submit_work;
+handle_chat is PythonBaseAgent.handleChatMessage unchanged.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'agents', 'core')))
+
+from base_agent import PythonBaseAgent
+from AgentProtocol import AgentProtocol
+
+
+class BenchAgent(PythonBaseAgent):
+    def __init__(self):
+        super().__init__('bench', 'Bench Agent')
+
+    def execute_task(self, task):
+        bench = task.get('bench') or {}
+        paths = [f"bench/{task.get('id')}/file_{i}.txt" for i in range(int(bench.get('tools', 0)))]
+
+        if bench.get('parallel', True):
+            files = self.call_mcp_tools([(None, 'project_read_file', {'filePath': path}) for path in paths])
+        else:
+            files = [self.read_project_file(path) for path in paths]
+        read_bytes = sum(len(f.get('content') or '') for f in files if isinstance(f, dict))
+
+        text = None
+        if bench.get('llm') and self.llm_manager:
+            text = self.llm_manager.generate_response(
+                f"Summarize task {task.get('id')}: {task.get('description', '')}",
+                system_context=self._get_system_context(),
+                use_cache=False
+            )
+
+        return {
+            'success': True,
+            'toolCalls': len(paths),
+            'readBytes': read_bytes,
+            'llmChars': len(text or ''),
+            'payload': 'x' * (int(bench.get('echoKb', 0)) * 1024)
+        }
+
+    def handle_message(self, message):
+        request = message.get('data') if isinstance(message.get('data'), dict) else message
+        return AgentProtocol.submit_work(
+            from_agent_id=self.agent_id,
+            to_agent_id=request.get('from', 'bench-client'),
+            request_id=request.get('request_id', ''),
+            deliverable={'received': request.get('type'), 'task': request.get('task')}
+        )
+
+
+if __name__ == '__main__':
+    BenchAgent().run()
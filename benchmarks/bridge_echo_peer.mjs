@@ -0,0 +1,23 @@
+/**
+ * Echo peer for bridge_framing_bench.py: plays the Node side of the agent bridge.
+ * Decodes every message from stdin with BridgeFraming.js and sends it straight back,
+ * in the framing given as the first argument. A {"type": "stats"} message is answered
+ * with the CPU time this process has spent.
+ */
+
+import { BridgeDecoder, encodeMessage } from '../src/agents/core/BridgeFraming.js';
+
+const framing = process.argv[2] || 'json';
+const started = process.cpuUsage();
+
+const decoder = new BridgeDecoder((message) => {
+    if (message.type === 'stats') {
+        const cpu = process.cpuUsage(started);
+        process.stdout.write(encodeMessage({ type: 'stats', cpuSeconds: (cpu.user + cpu.system) / 1e6 }, framing));
+        return;
+    }
+    process.stdout.write(encodeMessage(message, framing));
+});
+
+process.stdin.on('data', (chunk) => decoder.push(chunk));
+process.stdin.on('end', () => process.exit(0));
@@ -0,0 +1,150 @@
+"""
+Bridge framing benchmark: JSON lines vs msgpack frames
+
+Sends tool_response-shaped messages carrying multi-megabyte file contents
+through a real Node process (bridge_echo_peer.mjs, which uses the same
+BridgeFraming.js decoder/encoder as BaseAgent.js) and back, once per framing.
+Reports round-trip latency and the CPU each side spends per message.
+
+Usage:
+    python benchmarks/bridge_framing_bench.py [--sizes 1,4,16] [--iterations 10] [--json results.json]
+
+Requires node on PATH and the msgpack Python package.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import subprocess
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/agents/core')))
+
+import bridge_framing
+
+PEER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bridge_echo_peer.mjs')
+
+# Source-like text: quotes, backslashes, newlines and non-ASCII that JSON has to escape
+SNIPPETS = [
+    'const message = "Olá, mundo!";\n',
+    '    if (path.includes("\\\\")) { return path.split("\\\\"); }\n',
+    'def handler(event):\n\treturn {"status": 200, "body": json.dumps(event)}\n',
+    '# Configuração do serviço — não alterar\n',
+    'SELECT * FROM "tasks" WHERE status = \'in_progress\';\n',
+]
+
+
+def make_content(megabytes: float, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    target = int(megabytes * 1024 * 1024)
+    parts, size = [], 0
+    while size < target:
+        snippet = rng.choice(SNIPPETS)
+        parts.append(snippet)
+        size += len(snippet.encode('utf-8'))
+    return ''.join(parts)
+
+
+class Peer:
+    def __init__(self, framing: str):
+        self.framing = framing
+        self.process = subprocess.Popen(['node', PEER, framing], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.messages = bridge_framing.read_messages(self.process.stdout)
+
+    def send(self, message):
+        self.process.stdin.write(bridge_framing.encode(message, self.framing))
+        self.process.stdin.flush()
+
+    def receive(self):
+        return next(self.messages)
+
+    def node_cpu(self) -> float:
+        self.send({'type': 'stats'})
+        return self.receive()['cpuSeconds']
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait(10)
+
+
+def run_case(framing: str, megabytes: float, iterations: int):
+    content = make_content(megabytes)
+    peer = Peer(framing)
+    try:
+        # Warm-up (JIT on the Node side, allocator on ours)
+        peer.send({'type': 'tool_response', 'requestId': -1, 'result': {'success': True, 'content': content}})
+        peer.receive()
+
+        latencies, encode_cpu, decode_cpu = [], 0.0, 0.0
+        wire_bytes = 0
+        node_before = peer.node_cpu()
+        for i in range(iterations):
+            message = {'type': 'tool_response', 'requestId': i, 'result': {'success': True, 'content': content}}
+            start = time.perf_counter()
+
+            cpu = time.process_time()
+            data = bridge_framing.encode(message, framing)
+            encode_cpu += time.process_time() - cpu
+            wire_bytes = len(data)
+
+            peer.process.stdin.write(data)
+            peer.process.stdin.flush()
+
+            cpu = time.process_time()
+            reply = peer.receive()
+            decode_cpu += time.process_time() - cpu
+            latencies.append(time.perf_counter() - start)
+
+            assert reply['result']['content'] == content, "payload corrupted in transit"
+        node_cpu = peer.node_cpu() - node_before
+    finally:
+        peer.close()
+
+    return {
+        'framing': framing,
+        'payload_mb': megabytes,
+        'wire_bytes': wire_bytes,
+        'iterations': iterations,
+        'latency_ms_p50': round(statistics.median(latencies) * 1000, 2),
+        'latency_ms_mean': round(statistics.mean(latencies) * 1000, 2),
+        'python_encode_ms': round(encode_cpu / iterations * 1000, 2),
+        'python_decode_ms': round(decode_cpu / iterations * 1000, 2),
+        'node_cpu_ms': round(node_cpu / iterations * 1000, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1,4,16', help='payload sizes in MB (comma separated)')
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--json', dest='json_path', help='write results to this file')
+    args = parser.parse_args()
+
+    if bridge_framing.msgpack is None:
+        sys.exit("msgpack is not installed (pip install msgpack)")
+
+    results = []
+    header = f"{'size':>6} {'framing':>8} {'wire MB':>8} {'p50 ms':>8} {'mean ms':>8} {'py enc':>7} {'py dec':>7} {'node ms':>8}"
+    print(header)
+    print('-' * len(header))
+    for size in [float(s) for s in args.sizes.split(',')]:
+        for framing in (bridge_framing.JSON, bridge_framing.MSGPACK):
+            r = run_case(framing, size, args.iterations)
+            results.append(r)
+            print(f"{size:>5}M {framing:>8} {r['wire_bytes'] / 1048576:>8.2f} {r['latency_ms_p50']:>8} {r['latency_ms_mean']:>8} "
+                  f"{r['python_encode_ms']:>7} {r['python_decode_ms']:>7} {r['node_cpu_ms']:>8}")
+        json_r, msgpack_r = results[-2], results[-1]
+        saved = json_r['latency_ms_p50'] - msgpack_r['latency_ms_p50']
+        print(f"{'':>6} msgpack saves {saved:.2f} ms p50 ({saved / json_r['latency_ms_p50'] * 100:.0f}%) per round trip")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'benchmark': 'bridge_framing', 'results': results}, f, indent=2)
+        print(f"Results written to {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
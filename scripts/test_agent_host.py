@@ -0,0 +1,117 @@
+"""
+Agent Host Test
+
+Several agents share one process and one LLMManager (agent_host.py). Checks:
+- each agent's view of the shared manager reports only its own calls, while
+  clients, limiter, router and event loop stay shared
+- a hosted agent knows its bridge id while its __init__ runs
+- agents with the same package names each import their own modules, also
+  lazily after loading, without replacing builtins.__import__
+Uses the mock provider (no API keys or network needed).
+
+Run with `python scripts/test_agent_host.py` (or pytest).
+"""
+
+import os
+import sys
+import builtins
+import tempfile
+import textwrap
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/agents/core')))
+
+os.environ.setdefault('LLM_PRIORITY', 'mock')
+os.environ.setdefault('LLM_CACHE_ENABLED', '0')
+os.environ.setdefault('LLM_MOCK_LATENCY', 'fixed:1')
+
+from llm_manager import LLMManager
+from agent_host import AgentHost
+from base_agent import PythonBaseAgent
+
+AGENT_MAIN = """
+from core.logic import Agent
+"""
+
+AGENT_LOGIC = """
+from base_agent import PythonBaseAgent
+
+class Agent(PythonBaseAgent):
+    def __init__(self):
+        super().__init__('{name}', '{name}')
+        # What a message sent while starting up would carry
+        self.id_at_init = self.bridge_agent_id
+
+    def execute_task(self, task):
+        # Imported lazily, after the host has finished loading this agent
+        from features.helper import VALUE
+        return VALUE
+
+    def handle_message(self, message):
+        return None
+"""
+
+
+def _agent_folder(root, name):
+    folder = os.path.join(root, name)
+    os.makedirs(os.path.join(folder, 'core'))
+    # A namespace package, like some agents' features folder
+    os.makedirs(os.path.join(folder, 'features'))
+    with open(os.path.join(folder, 'features', 'helper.py'), 'w') as f:
+        f.write(f"VALUE = {name!r}\n")
+    with open(os.path.join(folder, 'main.py'), 'w') as f:
+        f.write(textwrap.dedent(AGENT_MAIN))
+    with open(os.path.join(folder, 'core', '__init__.py'), 'w') as f:
+        f.write('')
+    with open(os.path.join(folder, 'core', 'logic.py'), 'w') as f:
+        f.write(textwrap.dedent(AGENT_LOGIC.format(name=name)))
+    return os.path.join(folder, 'main.py')
+
+
+def _calls(manager):
+    return sum(manager.get_metrics()['counters'].get('llm_calls', {}).values())
+
+
+def test_shared_manager_keeps_per_agent_stats():
+    shared = LLMManager(agent_id='host')
+    first, second = shared.for_agent('first'), shared.for_agent('second')
+
+    first.generate_response('one')
+    first.generate_response('two')
+    second.generate_response('three')
+
+    assert first.get_metrics()['agentId'] == 'first'
+    assert second.get_prompt_cache_stats()['agent_id'] == 'second'
+    assert (_calls(first), _calls(second)) == (2, 1)
+    assert first.get_token_stats()['providers']['mock']['calls'] == 2
+    assert second.get_token_stats()['providers']['mock']['calls'] == 1
+
+    # The expensive parts are still shared
+    assert first.providers is second.providers is shared.providers
+    assert first.rate_limiter is second.rate_limiter
+    assert first.response_cache is second.response_cache
+    assert first._get_loop() is second._get_loop() is shared._get_loop()
+    assert first.router.get_state() == shared.router.get_state()
+
+
+def test_hosted_agent_knows_its_id_during_init():
+    original_import = builtins.__import__
+    host = AgentHost()
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            first = host.load_agent('agent-1', _agent_folder(root, 'first'))
+            second = host.load_agent('agent-2', _agent_folder(root, 'second'))
+            assert builtins.__import__ is original_import
+            # Same package names in both folders, each agent gets its own modules
+            assert (second.execute_task(None), first.execute_task(None)) == ('second', 'first')
+    finally:
+        PythonBaseAgent.shared_llm_manager = None
+    assert (first.id_at_init, second.id_at_init) == ('agent-1', 'agent-2')
+    assert (first.agent_id, second.agent_id) == ('first', 'second')
+    assert first.llm_manager.agent_id == 'first'
+
+
+if __name__ == '__main__':
+    test_shared_manager_keeps_per_agent_stats()
+    print("✅ Agents sharing one LLMManager keep their own metrics and stats")
+    test_hosted_agent_knows_its_id_during_init()
+    print("✅ Hosted agents know their bridge id and import their own modules, also lazily")
@@ -0,0 +1,105 @@
+"""
+Agent Memory (SQLite) Test
+
+Checks the shared SQLite backend of AgentMemory, in a temporary directory:
+- a legacy .agent_memory_<id>.json is imported once and renamed to .json.migrated
+- similar_to and search_history rank matches with full-text search, across agents
+- when the database cannot be opened, AgentMemory falls back to the segment log
+  instead of raising
+
+Run with `python scripts/test_agent_memory.py` (or pytest).
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/agents/core')))
+
+from AgentMemory import AgentMemory
+from memory_sqlite import ALL_AGENTS
+
+LEGACY = {
+    'successes': [
+        {'timestamp': '2024-01-01T00:00:00', 'task_type': 'api_endpoint', 'description': 'Add login endpoint with JWT',
+         'approach': 'express router', 'outcome': {}, 'duration': 2.0},
+        {'timestamp': '2024-01-02T00:00:00', 'task_type': 'api_endpoint', 'description': 'Paginate the orders listing',
+         'approach': 'cursor pagination', 'outcome': {}, 'duration': 4.0}
+    ],
+    'failures': [
+        {'timestamp': '2024-01-03T00:00:00', 'task_type': 'api_endpoint', 'description': 'Upload endpoint',
+         'approach': 'buffer in memory', 'error': 'out of memory', 'lessons_learned': 'stream it'}
+    ],
+    'best_practices': [],
+    'performance_stats': {'total_tasks': 3, 'successful_tasks': 2, 'failed_tasks': 1, 'average_duration': 3.0}
+}
+
+
+def _memory(root, agent_id, **kwargs):
+    return AgentMemory(
+        agent_id,
+        memory_file=os.path.join(root, f'.agent_memory_{agent_id}.json'),
+        memory_dir=os.path.join(root, f'.agent_memory_{agent_id}'),
+        backend='sqlite',
+        **kwargs
+    )
+
+
+def test_legacy_json_is_migrated_once():
+    with tempfile.TemporaryDirectory() as root:
+        legacy_file = os.path.join(root, '.agent_memory_backend.json')
+        with open(legacy_file, 'w', encoding='utf-8') as f:
+            json.dump(LEGACY, f)
+        db_path = os.path.join(root, 'memory.db')
+
+        memory = _memory(root, 'backend', db_path=db_path)
+        assert not os.path.exists(legacy_file) and os.path.exists(legacy_file + '.migrated')
+        assert memory.memory['successes'] == LEGACY['successes']
+        assert memory.get_stats()['total_tasks'] == 3
+        memory.close()
+
+        # Reopening does not import again
+        memory = _memory(root, 'backend', db_path=db_path)
+        assert len(memory.get_failures_to_avoid('api_endpoint')) == 1
+        memory.close()
+
+
+def test_full_text_search_across_agents():
+    with tempfile.TemporaryDirectory() as root:
+        db_path = os.path.join(root, 'memory.db')
+        backend = _memory(root, 'backend', db_path=db_path)
+        frontend = _memory(root, 'frontend', db_path=db_path)
+        backend.record_success('api_endpoint', 'Add login endpoint with JWT', 'express router', {})
+        backend.record_success('api_endpoint', 'Paginate the orders listing', 'cursor pagination', {})
+        frontend.record_success('react_component', 'Login form with validation', 'formik', {})
+
+        # Not the most recent success: the one whose description matches
+        best = backend.get_best_approach('api_endpoint', similar_to='jwt login')
+        assert best['approach'] == 'express router'
+
+        hits = frontend.search_history('login', agent_id=ALL_AGENTS)
+        assert {hit['approach'] for hit in hits} == {'express router', 'formik'}
+        assert all('score' in hit for hit in hits)
+        assert frontend.get_best_approach('api_endpoint', agent_id='backend')['approach'] == 'cursor pagination'
+        backend.close()
+        frontend.close()
+
+
+def test_unavailable_database_falls_back_to_segment_log():
+    with tempfile.TemporaryDirectory() as root:
+        memory = _memory(root, 'backend', db_path=os.path.join(root, 'missing', 'memory.db'))
+        assert memory.backend == 'log'
+        memory.record_success('api_endpoint', 'Add login endpoint', 'express router', {}, duration=1.0)
+        assert memory.get_best_approach('api_endpoint')['approach'] == 'express router'
+        assert memory.get_stats()['successful_tasks'] == 1
+        memory.close()
+
+
+if __name__ == '__main__':
+    test_legacy_json_is_migrated_once()
+    print("✅ Legacy JSON memory imported once and renamed to .json.migrated")
+    test_full_text_search_across_agents()
+    print("✅ similar_to and search_history rank full-text matches across agents")
+    test_unavailable_database_falls_back_to_segment_log()
+    print("✅ Unopenable database: AgentMemory falls back to the segment log")
@@ -0,0 +1,82 @@
+"""
+Bridge Framing Test
+
+Round trip between the two bridge codecs: Python writes a stream mixing
+msgpack frames and JSON lines (bridge_framing.py), Node decodes it with
+BridgeFraming.js in small chunks and sends every message back as a msgpack
+frame, which Python must decode to exactly what it sent. Needs node and the
+msgpack package.
+
+Run with `python scripts/test_bridge_framing.py` (or pytest).
+"""
+
+import io
+import os
+import sys
+import shutil
+import subprocess
+
+CORE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/agents/core'))
+sys.path.append(CORE_DIR)
+
+import bridge_framing
+
+# Decodes stdin in 1000-byte pieces and echoes each message as a msgpack frame
+ECHO_SCRIPT = """
+import { BridgeDecoder, encodeMessage, FRAMING_MSGPACK } from %r;
+const out = [];
+const decoder = new BridgeDecoder(
+    (message) => out.push(encodeMessage(message, FRAMING_MSGPACK)),
+    (text) => { process.stderr.write(`text: ${text}\\n`); process.exitCode = 1; }
+);
+process.stdin.on('data', (chunk) => {
+    for (let i = 0; i < chunk.length; i += 1000) decoder.push(chunk.subarray(i, i + 1000));
+});
+process.stdin.on('end', () => process.stdout.write(Buffer.concat(out)));
+"""
+
+MESSAGES = [
+    {'type': 'bridge_hello', 'framing': 'msgpack', 'pid': 1234},
+    {'type': 'response', 'requestId': 7, 'result': {'ok': True, 'value': None, 'items': [1, -1, 2 ** 40, -2 ** 40, 0.5]}},
+    {'type': 'log', 'content': 'Unicode: naïve café ✅ 日本語'},
+    {'type': 'tool_response', 'requestId': 8, 'result': {'content': 'x' * 200000, 'empty': '', 'nested': [[{}], []]}},
+    {'type': 'binary', 'data': bytes(range(256))},
+]
+
+
+def _encode_stream():
+    # Both framings in one stream, as around the hello (the binary message is a frame: JSON has no bytes)
+    return b''.join(
+        bridge_framing.encode(message, bridge_framing.MSGPACK if i % 2 == 0 else bridge_framing.JSON)
+        for i, message in enumerate(MESSAGES)
+    )
+
+
+def test_round_trip_through_node():
+    node = shutil.which('node')
+    if node is None or bridge_framing.msgpack is None:
+        print("node or msgpack not available, skipping")
+        return
+    script = ECHO_SCRIPT % os.path.join(CORE_DIR, 'BridgeFraming.js')
+    result = subprocess.run(
+        [node, '--input-type=module', '-e', script],
+        input=_encode_stream(), capture_output=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr.decode()
+    echoed = list(bridge_framing.read_messages(io.BytesIO(result.stdout)))
+    assert echoed == MESSAGES
+
+
+def test_python_reads_mixed_stream():
+    if bridge_framing.msgpack is None:
+        print("msgpack not available, skipping")
+        return
+    stream = io.BytesIO(b'stray print output\n' + _encode_stream())
+    assert list(bridge_framing.read_messages(stream)) == MESSAGES
+
+
+if __name__ == '__main__':
+    test_python_reads_mixed_stream()
+    print("✅ Python reads a stream mixing msgpack frames and JSON lines")
+    test_round_trip_through_node()
+    print("✅ Messages survive a round trip through BridgeFraming.js")
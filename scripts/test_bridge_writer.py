@@ -0,0 +1,138 @@
+"""
+Bridge Writer Test
+
+Checks the coalescing bridge writer with an in-memory output stream:
+- concurrent senders never interleave messages and each keeps its order
+- while a write is stalled, queued status_update messages collapse to the
+  latest one per agent
+- above the high-water mark logs are sampled, and a full queue blocks other
+  messages until the writer catches up
+
+Run with `python scripts/test_bridge_writer.py` (or pytest).
+"""
+
+import io
+import os
+import sys
+import json
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/agents/core')))
+
+import bridge_framing
+from bridge_writer import BridgeWriter
+
+
+class StalledStream:
+    """stdout stand-in whose next write waits until resume() (the Node side not reading)"""
+
+    def __init__(self):
+        self.buffer = self
+        self.data = io.BytesIO()
+        self.writes = 0
+        self._open = threading.Event()
+        self._open.set()
+        self.stalled = threading.Event()
+
+    def stall(self):
+        self._open.clear()
+
+    def resume(self):
+        self._open.set()
+
+    def write(self, data):
+        if not self._open.is_set():
+            self.stalled.set()
+            self._open.wait(5)
+        self.writes += 1
+        self.data.write(data)
+
+    def flush(self):
+        pass
+
+    def messages(self):
+        return list(bridge_framing.read_messages(io.BytesIO(self.data.getvalue())))
+
+
+def _stalled_writer(stream, **kwargs):
+    """Writer whose thread is stuck writing a first message"""
+    writer = BridgeWriter(stream, **kwargs)
+    stream.stall()
+    writer.send({'type': 'bridge_hello'})
+    assert stream.stalled.wait(5)
+    return writer
+
+
+def test_concurrent_senders_do_not_interleave():
+    stream = StalledStream()
+    writer = BridgeWriter(stream)
+
+    def sender(thread_id):
+        for seq in range(200):
+            framing = bridge_framing.MSGPACK if bridge_framing.msgpack and seq % 2 else bridge_framing.JSON
+            writer.send({'type': 'response', 'thread': thread_id, 'seq': seq, 'body': 'x' * 5000}, framing)
+
+    threads = [threading.Thread(target=sender, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert writer.flush(10)
+
+    messages = stream.messages()
+    assert len(messages) == 8 * 200
+    for thread_id in range(8):
+        assert [m['seq'] for m in messages if m['thread'] == thread_id] == list(range(200))
+    # Batched: far fewer writes than messages
+    assert stream.writes < len(messages)
+
+
+def test_status_updates_collapse_while_stalled():
+    stream = StalledStream()
+    writer = _stalled_writer(stream)
+    for progress in range(50):
+        writer.send({'type': 'status_update', 'agentId': 'a', 'progress': progress})
+        writer.send({'type': 'status_update', 'agentId': 'b', 'progress': progress})
+    writer.send({'type': 'response', 'requestId': 1})
+    stream.resume()
+    assert writer.flush(5)
+
+    messages = stream.messages()
+    assert [(m['type'], m.get('agentId'), m.get('progress')) for m in messages] == [
+        ('bridge_hello', None, None), ('status_update', 'a', 49), ('status_update', 'b', 49), ('response', None, None)
+    ]
+    assert writer.get_stats()['collapsed'] == 98
+
+
+def test_logs_sampled_and_full_queue_blocks():
+    stream = StalledStream()
+    writer = _stalled_writer(stream, max_queue=20, high_water=10, log_sample=5)
+    for i in range(10):
+        assert writer.send({'type': 'response', 'requestId': i})
+    kept = [writer.send({'type': 'log', 'content': str(i)}) for i in range(20)]
+    assert kept.count(True) == 4
+
+    # 14 queued: six more fit, the seventh waits for the writer
+    for i in range(6):
+        writer.send({'type': 'response', 'requestId': 100 + i})
+    sent = threading.Event()
+    blocked = threading.Thread(target=lambda: (writer.send({'type': 'response', 'requestId': 'last'}), sent.set()))
+    blocked.start()
+    assert not sent.wait(0.2)
+    stream.resume()
+    assert sent.wait(5)
+    blocked.join()
+    assert writer.flush(5)
+
+    stats = writer.get_stats()
+    assert stats['sampled_out'] == 16 and stats['blocked'] == 1
+    assert stream.messages()[-1]['requestId'] == 'last'
+
+
+if __name__ == '__main__':
+    test_concurrent_senders_do_not_interleave()
+    print("✅ Concurrent senders: whole messages, per-sender order kept, batched writes")
+    test_status_updates_collapse_while_stalled()
+    print("✅ Queued status updates collapse to the latest per agent")
+    test_logs_sampled_and_full_queue_blocks()
+    print("✅ Logs sampled above the high-water mark; a full queue blocks other messages")
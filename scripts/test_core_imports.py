@@ -0,0 +1,53 @@
+"""
+Core Package Import Test
+
+Agents import the runtime both flat (sys.path = src/agents/core, e.g.
+`from base_agent import PythonBaseAgent`) and as the core package
+(sys.path = src/agents, e.g. DesignAgent's `from core.base_agent import
+PythonBaseAgent`). Each module is imported in a fresh interpreter, from an
+unrelated directory, with only the package root on sys.path.
+
+Run with `python scripts/test_core_imports.py` (or pytest).
+"""
+
+import os
+import sys
+import subprocess
+import tempfile
+
+AGENTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'agents'))
+
+PACKAGE_IMPORTS = [
+    'from core.base_agent import PythonBaseAgent',
+    'from core.async_base_agent import AsyncPythonBaseAgent',
+    'from core.AgentMemory import AgentMemory',
+]
+
+
+def _import_in_fresh_interpreter(statement):
+    code = f"import sys; sys.path.insert(0, {AGENTS_DIR!r}); {statement}"
+    return subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=tempfile.gettempdir(),
+        capture_output=True,
+        text=True,
+        timeout=60
+    )
+
+
+def test_core_package_imports():
+    for statement in PACKAGE_IMPORTS:
+        result = _import_in_fresh_interpreter(statement)
+        assert result.returncode == 0, f"{statement} failed:\n{result.stderr}"
+
+
+if __name__ == '__main__':
+    failed = False
+    for statement in PACKAGE_IMPORTS:
+        result = _import_in_fresh_interpreter(statement)
+        if result.returncode == 0:
+            print(f"✅ {statement}")
+        else:
+            failed = True
+            print(f"❌ {statement}\n{result.stderr}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,90 @@
+"""
+Gemini Prompt Cache Test
+
+Checks when LLMManager creates Gemini cached contents for the system prompt,
+with a fake client (no API key or network needed):
+- with the default prompt budget, gemini-1.5 prompts can never reach the
+  32768-token minimum, so nothing is created
+- with LLM_GEMINI_PROMPT_BUDGET=40000 a large system prompt is cached, and
+  concurrent misses for the same prompt create it only once
+
+Run with `python scripts/test_gemini_prompt_cache.py` (or pytest).
+"""
+
+import os
+import sys
+import time
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/agents/core')))
+
+os.environ.setdefault('LLM_PRIORITY', 'mock')
+os.environ.setdefault('LLM_CACHE_ENABLED', '0')
+
+from llm_manager import LLMManager
+
+
+class FakeCaches:
+    def __init__(self):
+        self.created = []
+        self._lock = threading.Lock()
+
+    def create(self, model, config):
+        time.sleep(0.2)  # a slow server call, so concurrent misses overlap
+        with self._lock:
+            self.created.append(model)
+            return type('CachedContent', (), {'name': f"cachedContents/{len(self.created)}"})()
+
+
+class FakeGeminiClient:
+    def __init__(self):
+        self.caches = FakeCaches()
+
+
+def _manager(prompt_budget=None):
+    if prompt_budget is None:
+        os.environ.pop('LLM_GEMINI_PROMPT_BUDGET', None)
+    else:
+        os.environ['LLM_GEMINI_PROMPT_BUDGET'] = str(prompt_budget)
+    manager = LLMManager('prompt-cache-test')
+    client = FakeGeminiClient()
+    manager._gemini_client = lambda model_name: client
+    return manager, client
+
+
+def _system_prompt(tokens, manager):
+    text = "Follow the project conventions for every file you touch. " * (tokens // 10)
+    while manager.budgeter.counter.count(text, 'gemini') < tokens:
+        text += text
+    return text
+
+
+def test_default_budget_never_caches_gemini_15():
+    manager, client = _manager()
+    packed = manager.budgeter.pack('gemini', _system_prompt(40000, manager), 'hi')
+    request = manager._gemini_request('gemini-1.5-flash', packed)
+    assert 'config' not in request
+    assert client.caches.created == []
+
+
+def test_large_budget_caches_once_under_concurrency():
+    manager, client = _manager(prompt_budget=40000)
+    packed = manager.budgeter.pack('gemini', _system_prompt(5000, manager), 'hi')
+    requests = []
+    threads = [
+        threading.Thread(target=lambda: requests.append(manager._gemini_request('gemini-2.0-flash-exp', packed)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.caches.created == ['gemini-2.0-flash-exp']
+    assert {r['config']['cached_content'] for r in requests} == {'cachedContents/1'}
+
+
+if __name__ == '__main__':
+    test_default_budget_never_caches_gemini_15()
+    print("✅ Default budget: gemini-1.5 system prompts are not cached")
+    test_large_budget_caches_once_under_concurrency()
+    print("✅ LLM_GEMINI_PROMPT_BUDGET=40000: one cached content for 8 concurrent misses")
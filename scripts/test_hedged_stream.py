@@ -0,0 +1,63 @@
+"""
+Hedged Stream Test
+
+When a hedged stream picks its winner, the losing provider's stream must be
+stopped right away, not after the winner's whole response has been read.
+Uses fake provider streams (no API keys or network needed).
+
+Run with `python scripts/test_hedged_stream.py` (or pytest).
+"""
+
+import os
+import sys
+import time
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/agents/core')))
+
+os.environ.setdefault('LLM_PRIORITY', 'mock')
+os.environ.setdefault('LLM_CACHE_ENABLED', '0')
+
+from llm_manager import LLMManager
+
+
+def test_loser_stops_when_winner_is_chosen():
+    manager = LLMManager('hedge-test')
+    manager.hedge_min_delay = manager.hedge_default_delay = 0.05
+    loser_chunks = []
+    loser_closed = threading.Event()
+
+    def fake_attempt(provider_name, provider_enum, *args):
+        try:
+            if provider_name == 'slow':
+                # Keeps producing until closed
+                time.sleep(0.3)
+                while True:
+                    loser_chunks.append('x')
+                    yield 'slow '
+                    time.sleep(0.01)
+            else:
+                for i in range(30):
+                    yield f'fast{i} '
+                    time.sleep(0.02)
+        finally:
+            if provider_name == 'slow':
+                loser_closed.set()
+        return True
+
+    manager._stream_attempt = fake_attempt
+    candidates = iter([('slow', None), ('fast', None)])
+    stream = manager._hedged_stream(candidates, ('prompt', '', None, False))
+
+    first = next(stream)
+    assert first.startswith('fast0')
+    # The slow stream starts producing only after the fast one won: it must be closed promptly
+    assert loser_closed.wait(1.0), "losing stream kept running"
+    rest = list(stream)
+    assert len(rest) == 29
+    assert len(loser_chunks) <= 2
+
+
+if __name__ == '__main__':
+    test_loser_stops_when_winner_is_chosen()
+    print("✅ Hedged stream stops the losing provider as soon as the winner is chosen")
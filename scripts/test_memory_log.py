@@ -0,0 +1,106 @@
+"""
+Memory Segment Log Test
+
+Checks the append-only segment log behind AgentMemory (AGENT_MEMORY_BACKEND=log),
+in a temporary directory:
+- records survive reopening, across sealed segments, in recording order
+- a torn last line (crash mid-write) is truncated away on open
+- clear_before hides old records at once and compaction removes them from disk
+- a legacy .agent_memory_<id>.json is imported once into the log
+
+Run with `python scripts/test_memory_log.py` (or pytest).
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/agents/core')))
+
+from memory_log import SegmentLog, MANIFEST
+from AgentMemory import AgentMemory
+
+
+def _success(i, task_type='api_endpoint'):
+    return {'timestamp': f'2024-01-{i + 1:02d}T00:00:00', 'task_type': task_type,
+            'description': f'task {i}', 'approach': f'approach {i}', 'outcome': {}, 'duration': 1.0}
+
+
+def test_records_survive_reopen_across_segments():
+    with tempfile.TemporaryDirectory() as root:
+        log = SegmentLog(root, segment_records=3)
+        for i in range(8):
+            log.append('success', record=_success(i, 'api_endpoint' if i % 2 else 'ui'))
+        log.close()
+
+        log = SegmentLog(root, segment_records=3)
+        assert log.get_info()['sealedSegments'] == 2
+        assert [r['description'] for r in log.scan('success')] == [f'task {i}' for i in range(8)]
+        assert [r['description'] for r in log.scan('success', 'ui', newest_first=True)] == ['task 6', 'task 4', 'task 2', 'task 0']
+        assert log.get_stats()['successful_tasks'] == 8
+        log.close()
+
+
+def test_torn_tail_is_truncated():
+    with tempfile.TemporaryDirectory() as root:
+        log = SegmentLog(root)
+        log.append('success', record=_success(0))
+        log.append('success', record=_success(1))
+        log.close()
+        with open(os.path.join(root, 'segment-00000001.jsonl'), 'ab') as f:
+            f.write(b'12345 {"op": "succ')
+
+        log = SegmentLog(root)
+        assert [r['description'] for r in log.scan('success')] == ['task 0', 'task 1']
+        log.append('success', record=_success(2))
+        log.close()
+        log = SegmentLog(root)
+        assert len(list(log.scan('success'))) == 3
+        log.close()
+
+
+def test_clear_before_hides_then_compacts():
+    with tempfile.TemporaryDirectory() as root:
+        log = SegmentLog(root, segment_records=2)
+        for i in range(6):
+            log.append('success', record=_success(i))
+        log.append('practice', record={'timestamp': '2024-01-01T00:00:00', 'category': 'api', 'practice': 'keep me'})
+        log.clear_before('2024-01-04T00:00:00')
+        # Hidden right away, whatever the compaction is doing
+        assert [r['description'] for r in log.scan('success')] == ['task 4', 'task 5']
+        log.close()
+
+        segments = sorted(name for name in os.listdir(root) if name.startswith('segment-'))
+        with open(os.path.join(root, MANIFEST), encoding='utf-8') as f:
+            sealed = json.load(f)['sealed']
+        # Tasks 0-3 filled the first two segments: both deleted without rewriting anything
+        assert [s['id'] for s in sealed] == [3] and len(segments) == 2
+        log = SegmentLog(root, segment_records=2)
+        assert [r['description'] for r in log.scan('success')] == ['task 4', 'task 5']
+        assert [r['practice'] for r in log.scan('practice')] == ['keep me']
+        log.close()
+
+
+def test_legacy_json_is_imported_into_the_log():
+    with tempfile.TemporaryDirectory() as root:
+        legacy_file = os.path.join(root, '.agent_memory_qa.json')
+        with open(legacy_file, 'w', encoding='utf-8') as f:
+            json.dump({'successes': [_success(0), _success(1)], 'failures': [], 'best_practices': [],
+                       'performance_stats': {'total_tasks': 2, 'successful_tasks': 2, 'failed_tasks': 0, 'average_duration': 1.0}}, f)
+        memory = AgentMemory('qa', memory_file=legacy_file, memory_dir=os.path.join(root, '.agent_memory_qa'), backend='log')
+        assert os.path.exists(legacy_file + '.migrated') and not os.path.exists(legacy_file)
+        assert memory.get_best_approach('api_endpoint')['description'] == 'task 1'
+        assert memory.get_stats()['successful_tasks'] == 2
+        memory.close()
+
+
+if __name__ == '__main__':
+    test_records_survive_reopen_across_segments()
+    print("✅ Records survive reopening across sealed segments")
+    test_torn_tail_is_truncated()
+    print("✅ A torn last line is truncated away on open")
+    test_clear_before_hides_then_compacts()
+    print("✅ clear_before hides old records at once and compaction removes them")
+    test_legacy_json_is_imported_into_the_log()
+    print("✅ Legacy JSON memory imported into the segment log")
@@ -0,0 +1,92 @@
+"""
+Provider Router Test
+
+Checks the circuit breakers of the adaptive provider router:
+- consecutive failures open an endpoint's breaker
+- after the open period, exactly one probe is let through (half-open)
+- a successful probe closes the breaker, a failed one re-opens it with a
+  doubled open period; a released probe lets the next caller probe
+- healthy endpoints are ranked fastest first
+
+Run with `python scripts/test_provider_router.py` (or pytest).
+"""
+
+import os
+import sys
+import time
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/agents/core')))
+
+from provider_router import ProviderRouter, CLOSED, OPEN, HALF_OPEN
+
+
+def _router():
+    return ProviderRouter(adaptive=True, failure_threshold=2, open_seconds=0.1, max_open_seconds=1.0)
+
+
+def _open(router, key):
+    for _ in range(2):
+        router.record_failure(key, latency=0.01)
+    assert router._health(key).state == OPEN
+
+
+def test_half_open_allows_exactly_one_probe():
+    router = _router()
+    _open(router, 'anthropic')
+    assert router.claim('anthropic') is None
+    time.sleep(0.15)
+
+    claims = []
+    threads = [threading.Thread(target=lambda: claims.append(router.claim('anthropic'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len([c for c in claims if c is not None]) == 1
+    assert router._health('anthropic').state == HALF_OPEN
+
+    router.record_success('anthropic', 0.05)
+    assert router._health('anthropic').state == CLOSED
+    assert router.claim('anthropic') is not None
+
+
+def test_failed_probe_reopens_with_backoff():
+    router = _router()
+    _open(router, 'gemini/gemini-1.5-flash')
+    time.sleep(0.15)
+    assert router.allow('gemini/gemini-1.5-flash')
+    router.record_failure('gemini/gemini-1.5-flash', latency=0.01)
+    health = router._health('gemini/gemini-1.5-flash')
+    assert health.state == OPEN and health.open_seconds == 0.2
+
+
+def test_released_probe_can_be_retaken():
+    router = _router()
+    _open(router, 'openai')
+    time.sleep(0.15)
+    claim = router.claim('openai')
+    assert claim is not None and router.claim('openai') is None
+    # The probe was cancelled before it reported an outcome
+    router.release('openai', claim)
+    assert router.claim('openai') is not None
+
+
+def test_rank_prefers_faster_endpoints():
+    router = _router()
+    for _ in range(3):
+        router.record_success('anthropic', 2.0)
+        router.record_success('openai', 0.5)
+    _open(router, 'gemini')
+    assert router.rank(['anthropic', 'openai', 'gemini']) == ['openai', 'anthropic']
+
+
+if __name__ == '__main__':
+    test_half_open_allows_exactly_one_probe()
+    print("✅ A half-open breaker lets exactly one probe through")
+    test_failed_probe_reopens_with_backoff()
+    print("✅ A failed probe re-opens the breaker with a doubled open period")
+    test_released_probe_can_be_retaken()
+    print("✅ A released probe lets the next caller probe")
+    test_rank_prefers_faster_endpoints()
+    print("✅ Healthy endpoints are ranked fastest first")
@@ -0,0 +1,78 @@
+"""
+Rate Limiter Test
+
+Checks the cross-process LLM rate limiter on a temporary database:
+- max_concurrency caps in-flight leases until one is released
+- release(actual_tokens) refunds the unused part of the TPM estimate
+- leases held by a process that has exited are reclaimed at capacity
+
+Run with `python scripts/test_rate_limiter.py` (or pytest).
+"""
+
+import os
+import sys
+import tempfile
+import subprocess
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/agents/core')))
+
+from rate_limiter import RateLimiter, ProviderLimits
+
+
+def _limiter(root, **limits):
+    return RateLimiter(os.path.join(root, 'limits.db'), {'test': ProviderLimits(**limits)})
+
+
+def _token_bucket(limiter):
+    return limiter.get_state()['test']['token_tokens']
+
+
+def test_concurrency_cap():
+    with tempfile.TemporaryDirectory() as root:
+        limiter = _limiter(root, max_concurrency=2)
+        first, _ = limiter.try_acquire('test')
+        second, _ = limiter.try_acquire('test')
+        third, wait = limiter.try_acquire('test')
+        assert first and second and third is None and wait > 0
+        assert limiter.get_state()['test']['in_flight'] == 2
+
+        first.release()
+        third, _ = limiter.try_acquire('test')
+        assert third is not None
+        # A second process sees the same leases
+        assert _limiter(root, max_concurrency=2).try_acquire('test')[0] is None
+
+
+def test_release_refunds_unused_tokens():
+    with tempfile.TemporaryDirectory() as root:
+        limiter = _limiter(root, tpm=1000)
+        lease, _ = limiter.try_acquire('test', tokens=600)
+        assert _token_bucket(limiter) <= 400.1
+        # Estimate was 600, the call used 100: 500 go back to the bucket
+        lease.release(actual_tokens=100)
+        assert 899.9 <= _token_bucket(limiter) <= 900.5
+
+        lease, wait = limiter.try_acquire('test', tokens=950)
+        assert lease is None and wait > 0
+
+
+def test_dead_process_leases_are_reclaimed():
+    with tempfile.TemporaryDirectory() as root:
+        limiter = _limiter(root, max_concurrency=1)
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+        limiter._conn().execute(
+            'INSERT INTO leases (lease_id, provider, pid, tokens, expires_at) VALUES (?, ?, ?, ?, ?)',
+            ('crashed', 'test', exited.pid, 1, 4102444800)
+        )
+        lease, _ = limiter.try_acquire('test')
+        assert lease is not None
+
+
+if __name__ == '__main__':
+    test_concurrency_cap()
+    print("✅ max_concurrency caps in-flight leases across limiter instances")
+    test_release_refunds_unused_tokens()
+    print("✅ release(actual_tokens) refunds the unused TPM estimate")
+    test_dead_process_leases_are_reclaimed()
+    print("✅ Leases of exited processes are reclaimed")
@@ -0,0 +1,66 @@
+"""
+Response Cache Test
+
+Checks the persistent LLM response cache on a temporary database:
+- entries expire after the TTL
+- beyond max_entries, the least recently used entry is evicted (a hit counts as use)
+- entries written by one cache instance are hits for another (another process)
+
+Run with `python scripts/test_response_cache.py` (or pytest).
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/agents/core')))
+
+from response_cache import ResponseCache
+
+
+def _cache(root, **kwargs):
+    return ResponseCache(os.path.join(root, 'responses.db'), enabled=True, **kwargs)
+
+
+def test_entries_expire_after_ttl():
+    with tempfile.TemporaryDirectory() as root:
+        cache = _cache(root, ttl=0.2)
+        cache.put('key', 'mock', 'mock', 'response')
+        assert cache.get('key') == 'response'
+        time.sleep(0.3)
+        assert cache.get('key') is None
+        assert cache.get_stats()['shared']['expirations'] == 1
+
+
+def test_least_recently_used_is_evicted():
+    with tempfile.TemporaryDirectory() as root:
+        cache = _cache(root, max_entries=2)
+        cache.put('a', 'mock', 'mock', 'A')
+        time.sleep(0.01)
+        cache.put('b', 'mock', 'mock', 'B')
+        time.sleep(0.01)
+        # Reading a makes b the least recently used
+        assert cache.get('a') == 'A'
+        time.sleep(0.01)
+        cache.put('c', 'mock', 'mock', 'C')
+        assert (cache.get('a'), cache.get('b'), cache.get('c')) == ('A', None, 'C')
+        assert cache.get_stats()['shared']['evictions'] == 1
+
+
+def test_entries_are_shared_between_instances():
+    with tempfile.TemporaryDirectory() as root:
+        key = ResponseCache.make_key('mock', 'mock', 'system', [], 'prompt')
+        _cache(root).put(key, 'mock', 'mock', 'shared response')
+        other = _cache(root)
+        assert other.get(key) == 'shared response'
+        assert other.get_stats()['process']['bytes_saved'] == len('shared response')
+
+
+if __name__ == '__main__':
+    test_entries_expire_after_ttl()
+    print("✅ Entries expire after the TTL")
+    test_least_recently_used_is_evicted()
+    print("✅ The least recently used entry is evicted beyond max_entries")
+    test_entries_are_shared_between_instances()
+    print("✅ Entries are shared between cache instances")
@@ -0,0 +1,125 @@
+"""
+Tool Cache Test
+
+Checks the cache of read-only MCP tool results, through PythonBaseAgent's
+call_mcp_tool against an in-memory project (standing in for Node):
+- repeated reads are served without a bridge round trip
+- project_write_file drops the file's read and the listings above it, and
+  project_update drops project_get
+- a cache_invalidate message from Node (another agent wrote) drops the entry
+- a read answered after a write was sent is not stored
+
+Run with `python scripts/test_tool_cache.py` (or pytest).
+"""
+
+import os
+import sys
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/agents/core')))
+
+os.environ.setdefault('LLM_PRIORITY', 'mock')
+os.environ.setdefault('LLM_CACHE_ENABLED', '0')
+
+from base_agent import PythonBaseAgent
+from tool_cache import ToolResultCache, MISS
+
+
+class ProjectAgent(PythonBaseAgent):
+    """Agent whose tool calls are answered from a dict of files"""
+
+    def __init__(self):
+        super().__init__('cache-test', 'Cache Test')
+        self.files = {'src/app.js': 'v1'}
+        self.project = {'id': 'p1', 'name': 'Demo'}
+        self.bridge_calls = []
+
+    def send_to_bridge(self, message):
+        if message.get('type') != 'tool_call':
+            return
+        self.bridge_calls.append(message['toolName'])
+        threading.Thread(target=self._answer, args=(message,)).start()
+
+    def _answer(self, call):
+        tool, args = call['toolName'], call['args']
+        if tool == 'project_read_file':
+            result = {'success': True, 'content': self.files[args['filePath']]}
+        elif tool == 'project_list_files':
+            result = {'success': True, 'files': sorted(self.files)}
+        elif tool == 'project_write_file':
+            self.files[os.path.normpath(args['filePath'])] = args['content']
+            result = {'success': True}
+        elif tool == 'project_get':
+            result = {'success': True, 'project': dict(self.project)}
+        else:
+            result = {'success': True}
+        self._handle_bridge_message({'type': 'tool_response', 'requestId': call['requestId'], 'result': result})
+
+    def execute_task(self, task):
+        return None
+
+    def handle_message(self, message):
+        return None
+
+    def read(self, path):
+        return self.call_mcp_tool('project', 'project_read_file', {'filePath': path})['content']
+
+    def listing(self, path):
+        return self.call_mcp_tool('project', 'project_list_files', {'dirPath': path})['files']
+
+
+def test_reads_are_cached_and_writes_invalidate():
+    agent = ProjectAgent()
+    assert agent.read('src/app.js') == 'v1'
+    assert agent.read('src/app.js') == 'v1'
+    assert agent.listing('src') == ['src/app.js']
+    assert agent.listing('src') == ['src/app.js']
+    assert agent.bridge_calls == ['project_read_file', 'project_list_files']
+
+    agent.call_mcp_tool('project', 'project_write_file', {'filePath': 'src/lib/util.js', 'content': 'u'})
+    agent.call_mcp_tool('project', 'project_write_file', {'filePath': './src/app.js', 'content': 'v2'})
+    # Both entries were made stale by the writes
+    assert agent.read('src/app.js') == 'v2'
+    assert agent.listing('src') == ['src/app.js', 'src/lib/util.js']
+    assert agent.bridge_calls.count('project_read_file') == 2
+    assert agent.bridge_calls.count('project_list_files') == 2
+
+
+def test_project_update_and_cache_invalidate_message():
+    agent = ProjectAgent()
+    get = lambda: agent.call_mcp_tool('project', 'project_get', {'projectId': 'p1'})['project']['name']
+    assert get() == 'Demo'
+    agent.project['name'] = 'Renamed'
+    agent.call_mcp_tool('project', 'project_update', {'projectId': 'p1', 'name': 'Renamed'})
+    assert get() == 'Renamed'
+
+    agent.read('src/app.js')
+    # Another agent wrote the file: Node tells every agent
+    agent.files['src/app.js'] = 'theirs'
+    agent._handle_bridge_message({'type': 'cache_invalidate', 'toolName': 'project_write_file', 'args': {'filePath': 'src/app.js'}})
+    assert agent.read('src/app.js') == 'theirs'
+    assert agent.bridge_calls.count('project_get') == 2
+
+
+def test_read_answered_after_a_write_is_not_stored():
+    cache = ToolResultCache(enabled=True)
+    args = {'filePath': 'src/app.js'}
+    token = cache.begin('project_read_file', args)
+    # The write is sent while the read is in flight; the read's answer may predate it
+    cache.begin('project_write_file', {'filePath': 'src/app.js', 'content': 'v2'})
+    cache.complete('project_read_file', args, token, {'success': True, 'content': 'v1'})
+    assert cache.get('project_read_file', args) is MISS
+
+    # Failed reads are not cached either
+    token = cache.begin('project_read_file', args)
+    cache.complete('project_read_file', args, token, {'success': False, 'error': 'not found'})
+    assert cache.get('project_read_file', args) is MISS
+
+
+if __name__ == '__main__':
+    test_reads_are_cached_and_writes_invalidate()
+    print("✅ Reads are cached; writes drop the file and the listings above it")
+    test_project_update_and_cache_invalidate_message()
+    print("✅ project_update and cache_invalidate drop stale entries")
+    test_read_answered_after_a_write_is_not_stored()
+    print("✅ A read answered after a write was sent is not stored")
@@ -0,0 +1,134 @@
+"""
+Worker Pool Test
+
+Checks the bounded, prioritized dispatch of bridge requests:
+- each message type runs at most its worker limit at once
+- queued chat runs before queued tasks, urgent before low
+- at capacity a new item is rejected, unless it outranks the worst queued
+  item, which is evicted instead
+- a PythonBaseAgent answers a rejected request with queue_full
+
+Run with `python scripts/test_worker_pool.py` (or pytest).
+"""
+
+import os
+import sys
+import time
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/agents/core')))
+
+os.environ.setdefault('LLM_PRIORITY', 'mock')
+os.environ.setdefault('LLM_CACHE_ENABLED', '0')
+
+from worker_pool import PriorityWorkerPool, CHAT, TASK
+from base_agent import PythonBaseAgent
+
+
+class RecordingAgent(PythonBaseAgent):
+    """Agent whose bridge output is kept in a list"""
+
+    def __init__(self):
+        super().__init__('pool-test', 'Pool Test')
+        self.sent = []
+        self.release = threading.Event()
+
+    def send_to_bridge(self, message):
+        self.sent.append(message)
+
+    def execute_task(self, task):
+        self.release.wait(5)
+        return {'done': task.get('id')}
+
+    def handle_message(self, message):
+        return None
+
+
+def _blocked_pool(max_queue):
+    """One task worker, kept busy until the returned event is set"""
+    pool = PriorityWorkerPool(workers={CHAT: 1, TASK: 1}, max_queue=max_queue, name='pool-test')
+    release, started = threading.Event(), threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    pool.submit(TASK, blocker)
+    assert started.wait(5)
+    return pool, release
+
+
+def test_priority_order_and_worker_limit():
+    pool, release = _blocked_pool(max_queue=10)
+    order, lock = [], threading.Lock()
+    finished = threading.Semaphore(0)
+
+    def record(name):
+        with lock:
+            order.append(name)
+        finished.release()
+
+    pool.submit(TASK, record, 'task-low', priority='low')
+    pool.submit(TASK, record, 'task-urgent', priority='urgent')
+    assert pool.get_state()['running'][TASK] == 1 and pool.get_state()['queued'][TASK] == 2
+    pool.submit(CHAT, record, 'chat')
+    # Chat has its own worker: it does not wait for the blocked task
+    assert finished.acquire(timeout=5)
+    assert order == ['chat']
+
+    release.set()
+    for _ in range(2):
+        assert finished.acquire(timeout=5)
+    assert order == ['chat', 'task-urgent', 'task-low']
+    pool.shutdown(wait=True)
+
+
+def test_queue_full_rejects_or_evicts():
+    pool, release = _blocked_pool(max_queue=2)
+    rejected = []
+    noop = lambda: None
+
+    def on_reject(name):
+        return lambda state: rejected.append((name, state['queueDepth'], state['maxQueue']))
+
+    assert pool.submit(TASK, noop, priority='medium', on_reject=on_reject('medium'))
+    assert pool.submit(TASK, noop, priority='low', on_reject=on_reject('low'))
+    # Full: an equal or lower priority item is turned away
+    assert not pool.submit(TASK, noop, priority='low', on_reject=on_reject('late-low'))
+    # Full: a higher priority item takes the place of the worst queued one
+    assert pool.submit(TASK, noop, priority='urgent', on_reject=on_reject('urgent'))
+    assert rejected == [('late-low', 2, 2), ('low', 2, 2)]
+    assert pool.stats['rejected'] == 1 and pool.stats['evicted'] == 1
+
+    release.set()
+    pool.shutdown(wait=True)
+
+
+def test_agent_answers_queue_full():
+    agent = RecordingAgent()
+    agent._worker_pool = PriorityWorkerPool(
+        workers={TASK: 1}, max_queue=1, on_depth_change=agent._report_queue_depth, name='pool-test'
+    )
+    agent._handle_bridge_message({'type': 'execute_task', 'requestId': 0, 'task': {'id': 0}})
+    # Request 0 holds the only task worker, request 1 fills the queue
+    while agent._worker_pool.get_state()['running'][TASK] == 0:
+        time.sleep(0.01)
+    for request_id in (1, 2):
+        agent._handle_bridge_message({'type': 'execute_task', 'requestId': request_id, 'task': {'id': request_id}})
+
+    full = [m for m in agent.sent if m['type'] == 'queue_full']
+    assert full == [{
+        'type': 'queue_full', 'requestId': 2, 'messageType': TASK, 'priority': 'medium', 'queueDepth': 1, 'maxQueue': 1
+    }]
+    assert any(m['type'] == 'queue_depth' for m in agent.sent)
+    agent.release.set()
+    agent._worker_pool.shutdown(wait=True)
+
+
+if __name__ == '__main__':
+    test_priority_order_and_worker_limit()
+    print("✅ Per-type worker limits; chat before tasks, urgent before low")
+    test_queue_full_rejects_or_evicts()
+    print("✅ A full queue rejects new work or evicts lower-priority work")
+    test_agent_answers_queue_full()
+    print("✅ Rejected requests are answered with queue_full")
@@ -1,5 +1,6 @@
 import { PrismaClient } from '@prisma/client';
 import logger from '../../utils/logger.js';
+import { broadcastToolCacheInvalidation } from '../core/BaseAgent.js';
 
 const prisma = new PrismaClient();
 
@@ -47,6 +48,8 @@ export class AnalysisOrchestrator {
                 }
             });
 
+            await broadcastToolCacheInvalidation('project_update', { projectId });
+
             if (this.io) {
                 this.io.emit('project:analysis-updated', updatedProject);
                 this.io.emit('project:updated', updatedProject);
@@ -0,0 +1,222 @@
+/**
+ * AgentHost - Shared Python processes for BaseAgent (AGENT_HOST_MODE=shared)
+ *
+ * Instead of one interpreter per agent, agents are loaded into agent_host.py
+ * processes that multiplex them over a single stdin/stdout stream:
+ * - every frame carries an agentId; output is demultiplexed to the owning
+ *   BaseAgent's handlePythonMessage, input is stamped by send()
+ * - the host shares one LLMManager (provider clients, rate limiter, caches)
+ *   across the agents it holds
+ * - AGENT_HOST_SIZE caps the agents per host process (0 = all in one)
+ *
+ * Agents the host cannot load (host_error) are started in their own process by
+ * BaseAgent, so a broken or asyncio-only agent never takes the swarm down.
+ */
+
+import { EventEmitter } from 'events';
+import { spawn } from 'child_process';
+import path from 'path';
+import fs from 'fs/promises';
+import logger from '../../utils/logger.js';
+import { BridgeDecoder, encodeMessage, FRAMING_JSON, FRAMING_MSGPACK } from './BridgeFraming.js';
+
+const HOST_SCRIPT = path.join(process.cwd(), 'src', 'agents', 'core', 'agent_host.py');
+// Loading imports the agent's modules; slow agents still get their messages (the host buffers them)
+const LOAD_TIMEOUT_MS = parseInt(process.env.AGENT_HOST_LOAD_TIMEOUT_MS || '15000', 10);
+
+export function isAgentHostEnabled() {
+    return (process.env.AGENT_HOST_MODE || 'off').toLowerCase() === 'shared';
+}
+
+export class AgentHostProcess extends EventEmitter {
+    constructor(index = 0) {
+        super();
+        this.index = index;
+        this.name = `Agent host ${index}`;
+        this.process = null;
+        this.starting = null;
+        this.bridgeFraming = FRAMING_JSON;
+        this.agents = new Map();
+        // agentId -> { resolve, reject, timer } while host_load is in flight
+        this.loading = new Map();
+    }
+
+    /**
+     * Spawn the host process (once) and wait for its bridge_hello
+     */
+    start() {
+        if (this.starting) return this.starting;
+
+        this.starting = (async () => {
+            const venvPython = path.join(process.cwd(), 'venv', 'bin', 'python');
+            const pythonCmd = await fs.access(venvPython).then(() => venvPython).catch(() => 'python');
+
+            logger.info(`${this.name}: Starting shared Python host`);
+            this.bridgeFraming = FRAMING_JSON;
+            const child = spawn(pythonCmd, [HOST_SCRIPT], {
+                stdio: ['pipe', 'pipe', 'pipe'],
+                env: { ...process.env, PYTHONUTF8: '1', BRIDGE_FRAMING: process.env.BRIDGE_FRAMING || FRAMING_MSGPACK }
+            });
+            this.process = child;
+
+            const decoder = new BridgeDecoder(
+                (message) => this.handleHostMessage(message),
+                (line) => logger.debug(`${this.name} Python Output: ${line}`)
+            );
+            child.stdout.on('data', (data) => decoder.push(data));
+            child.stderr.on('data', (data) => {
+                logger.error(`${this.name} Python Error: ${data.toString()}`);
+            });
+            child.on('exit', (code) => this.handleExit(child, code));
+
+            await new Promise((resolve) => {
+                const timer = setTimeout(resolve, 5000);
+                this.once('host:ready', () => {
+                    clearTimeout(timer);
+                    resolve();
+                });
+            });
+        })();
+        return this.starting;
+    }
+
+    handleExit(child, code) {
+        if (this.process !== child) return;
+        logger.warn(`${this.name}: Python host exited with code ${code} (${this.agents.size} agents)`);
+        this.process = null;
+        this.starting = null;
+
+        for (const [agentId, load] of this.loading) {
+            clearTimeout(load.timer);
+            load.reject(new Error(`${this.name} exited while loading ${agentId}`));
+        }
+        this.loading.clear();
+
+        // Same state a crashed standalone agent ends up in; AgentHealthMonitor restarts each one
+        for (const agent of this.agents.values()) {
+            agent.status = 'error';
+        }
+        this.agents.clear();
+        this.emit('host:exit', { index: this.index, code });
+    }
+
+    /**
+     * Route a message from the host: agent traffic by agentId, the rest is the host's own
+     */
+    handleHostMessage(message) {
+        const agentId = message.agentId;
+        if (agentId === undefined || agentId === null) {
+            if (message.type === 'bridge_hello') {
+                this.bridgeFraming = message.framing === FRAMING_MSGPACK ? FRAMING_MSGPACK : FRAMING_JSON;
+                logger.info(`${this.name}: Python host ready (pid ${message.pid}, ${this.bridgeFraming} framing)`);
+                this.emit('host:ready');
+            } else if (message.type === 'log') {
+                logger.info(`${this.name} (Python): ${message.content}`);
+            }
+            return;
+        }
+
+        const load = this.loading.get(agentId);
+        if (message.type === 'host_error') {
+            if (load) {
+                clearTimeout(load.timer);
+                this.loading.delete(agentId);
+                load.reject(new Error(message.error));
+            }
+            this.agents.delete(agentId);
+            return;
+        }
+
+        const agent = this.agents.get(agentId);
+        if (!agent) {
+            logger.warn(`${this.name}: Message ${message.type} for unknown agent ${agentId}`);
+            return;
+        }
+        agent.handlePythonMessage(message).catch(error => {
+            logger.error(`${agent.name}: Failed to handle ${message.type}: ${error.message}`);
+        });
+
+        if (message.type === 'bridge_hello' && load) {
+            clearTimeout(load.timer);
+            this.loading.delete(agentId);
+            load.resolve();
+        }
+    }
+
+    /**
+     * Load an agent into this host; rejects if the host cannot run it
+     */
+    async attach(agent) {
+        await this.start();
+        if (!this.isWritable()) {
+            throw new Error(`${this.name} is not running`);
+        }
+
+        this.agents.set(agent.id, agent);
+        const loaded = new Promise((resolve, reject) => {
+            // Resolve rather than fail on timeout, like a standalone agent without a hello
+            const timer = setTimeout(() => {
+                this.loading.delete(agent.id);
+                resolve();
+            }, LOAD_TIMEOUT_MS);
+            this.loading.set(agent.id, { resolve, reject, timer });
+        });
+
+        this.send(agent.id, { type: 'host_load', name: agent.name, pythonPath: agent.agentPath });
+        try {
+            await loaded;
+        } catch (error) {
+            this.agents.delete(agent.id);
+            throw error;
+        }
+        return this.process;
+    }
+
+    detach(agentId) {
+        if (this.agents.delete(agentId) && this.isWritable()) {
+            this.send(agentId, { type: 'host_unload' });
+        }
+    }
+
+    /**
+     * Send a message to one of the hosted agents
+     */
+    send(agentId, message) {
+        if (!this.isWritable()) {
+            logger.error(`${this.name}: Cannot send to Python for ${agentId}, process not writable`);
+            return;
+        }
+        this.process.stdin.write(encodeMessage({ ...message, agentId }, this.bridgeFraming));
+    }
+
+    isWritable() {
+        return !!(this.process && this.process.stdin.writable);
+    }
+
+    shutdown() {
+        if (this.process) {
+            this.process.kill();
+        }
+    }
+}
+
+const hosts = [];
+
+/**
+ * Host process for the next agent: the first one with room (AGENT_HOST_SIZE agents each)
+ */
+export function getAgentHost() {
+    const size = parseInt(process.env.AGENT_HOST_SIZE || '0', 10);
+    let host = hosts.find(h => size <= 0 || h.agents.size < size);
+    if (!host) {
+        host = new AgentHostProcess(hosts.length);
+        hosts.push(host);
+    }
+    return host;
+}
+
+export function getAgentHosts() {
+    return hosts;
+}
+
+export default getAgentHost;
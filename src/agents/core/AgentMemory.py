@@ -3,15 +3,36 @@ AgentMemory - Learning and improvement system for agents
 
 Stores successes and failures, enabling agents to learn from experience
 and improve their approaches over time.
+
+History lives in a SQLite database shared by all agents (.agent_memory.db,
+see memory_sqlite.py): queries are index lookups, similar_to is a full-text
+BM25 search, and queries take an agent_id so the PM can learn from other
+agents' histories. AGENT_MEMORY_BACKEND=log keeps each agent's history in
+its own append-only segment log instead (.agent_memory_<id>/, see
+memory_log.py), which only answers this agent's queries.
+
+An agent's existing segment log, or else a legacy .agent_memory_<id>.json
+(renamed to .json.migrated), is imported the first time it uses the database.
 """
 
 import os
 import sys
 import json
+import shutil
+import logging
 from datetime import datetime
 from typing import Dict, List, Optional
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from memory_log import SegmentLog, KINDS
+from memory_sqlite import SqliteMemoryStore, ALL_AGENTS
+
+logger = logging.getLogger(__name__)
+
+# Legacy JSON list -> log record kind
+LEGACY_KINDS = (('successes', 'success'), ('failures', 'failure'), ('best_practices', 'practice'))
 
 
 class AgentMemory:
@@ -25,39 +46,106 @@ class AgentMemory:
     - Best practices discovered
     """
     
-    def __init__(self, agent_id: str, memory_file: str = None):
+    def __init__(
+        self,
+        agent_id: str,
+        memory_file: str = None,
+        memory_dir: str = None,
+        backend: str = None,
+        db_path: str = None
+    ):
         self.agent_id = agent_id
+        # Legacy single-file memory and per-agent segment log, imported once
         self.memory_file = memory_file or f".agent_memory_{agent_id}.json"
-        self.memory = self._load_memory()
-    
-    def _load_memory(self) -> Dict:
-        """Load memory from file"""
-        if os.path.exists(self.memory_file):
+        self.memory_dir = memory_dir or f".agent_memory_{agent_id}"
+        self.backend = (backend or os.getenv('AGENT_MEMORY_BACKEND', 'sqlite')).lower()
+
+        if self.backend != 'log':
             try:
-                with open(self.memory_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                self.store = SqliteMemoryStore(agent_id, db_path)
+                if self.store.is_empty():
+                    self._import_into_database()
+                return
             except Exception as e:
-                print(f"Failed to load memory: {e}", file=sys.stderr)
-        
-        return {
-            'successes': [],
-            'failures': [],
-            'best_practices': [],
-            'performance_stats': {
-                'total_tasks': 0,
-                'successful_tasks': 0,
-                'failed_tasks': 0,
-                'average_duration': 0
-            }
-        }
-    
-    def _save_memory(self):
-        """Save memory to file"""
+                # Unopenable database or SQLite without FTS5: recording memory must not break tasks
+                logger.error(f"Memory database unavailable, using the segment log: {e}")
+                self.backend = 'log'
+
+        if not os.path.isdir(self.memory_dir) and os.path.exists(self.memory_file):
+            self._import_legacy()
+        self.store = SegmentLog(self.memory_dir)
+
+    def _read_legacy(self) -> Dict:
+        with open(self.memory_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _import_legacy(self):
+        """Import an old .agent_memory_<id>.json (built aside and renamed into place, so a crash just retries)"""
+        staging = self.memory_dir + '.import'
         try:
-            with open(self.memory_file, 'w', encoding='utf-8') as f:
-                json.dump(self.memory, f, indent=2)
+            legacy = self._read_legacy()
+            shutil.rmtree(staging, ignore_errors=True)
+            log = SegmentLog(staging)
+            for key, kind in LEGACY_KINDS:
+                for record in legacy.get(key, []):
+                    log.append(kind, record=record)
+            if legacy.get('performance_stats'):
+                # Kept as recorded: counts include entries clear_old_entries removed
+                log.append('stats', stats=legacy['performance_stats'])
+            log.close()
+            os.replace(staging, self.memory_dir)
+            os.replace(self.memory_file, self.memory_file + '.migrated')
+            logger.info(f"Imported {self.memory_file} into {self.memory_dir}")
         except Exception as e:
-            print(f"Failed to save memory: {e}", file=sys.stderr)
+            print(f"Failed to import memory: {e}", file=sys.stderr)
+
+    def _import_into_database(self):
+        """Import this agent's segment log or legacy JSON (one transaction, so a crash just retries)"""
+        try:
+            if os.path.isdir(self.memory_dir):
+                source = self.memory_dir
+                log = SegmentLog(self.memory_dir)
+                entries = [(kind, record) for kind in KINDS for record in log.scan(kind)]
+                stats = log.get_stats()
+                log.close()
+            elif os.path.exists(self.memory_file):
+                source = self.memory_file
+                legacy = self._read_legacy()
+                entries = [(kind, record) for key, kind in LEGACY_KINDS for record in legacy.get(key, [])]
+                stats = legacy.get('performance_stats')
+            else:
+                return
+
+            self.store.import_history(entries, stats)
+            if source == self.memory_file:
+                os.replace(self.memory_file, self.memory_file + '.migrated')
+            logger.info(f"Imported {source} into {self.store.db_path}")
+        except Exception as e:
+            print(f"Failed to import memory: {e}", file=sys.stderr)
+
+    def _agent_scope(self, agent_id: Optional[str]) -> Optional[str]:
+        """agent_id for the store; only the shared database can answer for other agents"""
+        if agent_id in (None, self.agent_id):
+            return None
+        if self.backend == 'log':
+            raise ValueError("Querying other agents' memory requires AGENT_MEMORY_BACKEND=sqlite")
+        return agent_id
+
+    def _scan(self, kind: str, key: Optional[str], agent_id: Optional[str], newest_first: bool = False):
+        scope = self._agent_scope(agent_id)
+        if scope is None:
+            return self.store.scan(kind, key, newest_first=newest_first)
+        return self.store.scan(kind, key, newest_first=newest_first, agent_id=scope)
+
+    @property
+    def memory(self) -> Dict:
+        """Whole history in the old JSON layout (reads every segment)"""
+        return {
+            'successes': list(self.store.scan('success')),
+            'failures': list(self.store.scan('failure')),
+            'best_practices': list(self.store.scan('practice')),
+            'performance_stats': self.store.get_stats()
+        }
     
     def record_success(
         self,
@@ -86,20 +174,8 @@ class AgentMemory:
             'duration': duration
         }
         
-        self.memory['successes'].append(success_record)
-        
-        # Update stats
-        stats = self.memory['performance_stats']
-        stats['total_tasks'] += 1
-        stats['successful_tasks'] += 1
-        
-        if duration:
-            n = stats['successful_tasks']
-            stats['average_duration'] = (
-                (stats['average_duration'] * (n - 1) + duration) / n
-            )
-        
-        self._save_memory()
+        # The log updates the performance stats as it appends
+        self.store.append('success', record=success_record)
     
     def record_failure(
         self,
@@ -128,14 +204,7 @@ class AgentMemory:
             'lessons_learned': lessons_learned
         }
         
-        self.memory['failures'].append(failure_record)
-        
-        # Update stats
-        stats = self.memory['performance_stats']
-        stats['total_tasks'] += 1
-        stats['failed_tasks'] += 1
-        
-        self._save_memory()
+        self.store.append('failure', record=failure_record)
     
     def add_best_practice(self, category: str, practice: str, context: str = None):
         """
@@ -153,87 +222,110 @@ class AgentMemory:
             'context': context
         }
         
-        self.memory['best_practices'].append(best_practice)
-        self._save_memory()
+        self.store.append('practice', record=best_practice)
     
-    def get_best_approach(self, task_type: str, similar_to: str = None) -> Optional[Dict]:
+    def get_best_approach(self, task_type: str, similar_to: str = None, agent_id: str = None) -> Optional[Dict]:
         """
         Retrieve the best approach for a similar task
         
         Args:
             task_type: Type of task
             similar_to: Optional description to find similar tasks
+            agent_id: Whose history to search (default this agent, ALL_AGENTS for everyone)
         
         Returns:
             Best approach found, or None
         """
-        # Filter successes by task type
-        relevant_successes = [
-            s for s in self.memory['successes']
-            if s['task_type'] == task_type
-        ]
+        # Newest first: only the rows (or log segments) of this task type are read
+        relevant_successes = self._scan('success', task_type, agent_id, newest_first=True)
+        most_recent = next(relevant_successes, None)
         
-        if not relevant_successes:
+        if most_recent is None:
             return None
         
         # If similarity search requested
-        if similar_to:
+        if similar_to and self.backend != 'log':
+            # Full-text search ranked by BM25, falling back to the most recent
+            matches = self.store.search('success', similar_to, task_type, agent_id=self._agent_scope(agent_id), limit=1)
+            if matches:
+                matches[0].pop('score', None)
+                return matches[0]
+        elif similar_to:
             # Simple keyword matching (could be enhanced with embeddings)
-            similar_to_lower = similar_to.lower()
-            scored = []
-            for success in relevant_successes:
+            words = similar_to.lower().split()
+            best_score, best = 0, None
+            for success in [most_recent, *relevant_successes]:
                 desc_lower = success['description'].lower()
                 # Count matching words
-                score = sum(
-                    1 for word in similar_to_lower.split()
-                    if word in desc_lower
-                )
-                if score > 0:
-                    scored.append((score, success))
+                score = sum(1 for word in words if word in desc_lower)
+                # On a tie the oldest match wins, as before
+                if score > 0 and score >= best_score:
+                    best_score, best = score, success
             
-            if scored:
+            if best is not None:
                 # Return highest scoring
-                scored.sort(reverse=True, key=lambda x: x[0])
-                return scored[0][1]
+                return best
         
         # Return most recent success
-        return relevant_successes[-1]
+        return most_recent
     
-    def get_failures_to_avoid(self, task_type: str) -> List[Dict]:
+    def get_failures_to_avoid(self, task_type: str, agent_id: str = None) -> List[Dict]:
         """
         Get failed approaches to avoid for a task type
         
         Args:
             task_type: Type of task
+            agent_id: Whose history to search (default this agent, ALL_AGENTS for everyone)
         
         Returns:
             List of failures to learn from
         """
-        return [
-            f for f in self.memory['failures']
-            if f['task_type'] == task_type
-        ]
+        return list(self._scan('failure', task_type, agent_id))
     
-    def get_best_practices(self, category: str = None) -> List[Dict]:
+    def get_best_practices(self, category: str = None, agent_id: str = None) -> List[Dict]:
         """
         Get best practices, optionally filtered by category
         
         Args:
             category: Optional category filter
+            agent_id: Whose practices to return (default this agent, ALL_AGENTS for everyone)
         
         Returns:
             List of best practices
         """
-        if category:
-            return [
-                bp for bp in self.memory['best_practices']
-                if bp['category'] == category
-            ]
-        return self.memory['best_practices']
+        return list(self._scan('practice', category or None, agent_id))
+
+    def search_history(
+        self,
+        text: str,
+        task_type: str = None,
+        kind: str = 'success',
+        agent_id: str = ALL_AGENTS,
+        limit: int = 10
+    ) -> List[Dict]:
+        """
+        Full-text search of recorded work, best match first
+        
+        Args:
+            text: Words to look for in descriptions (practice text for best practices)
+            task_type: Optional task type (category for best practices)
+            kind: 'success', 'failure' or 'practice'
+            agent_id: Whose history to search (default everyone's)
+            limit: Maximum number of results
+        
+        Returns:
+            Matching records with their BM25 'score' (and 'agent_id' for other agents)
+        """
+        if self.backend == 'log':
+            raise ValueError("search_history requires AGENT_MEMORY_BACKEND=sqlite")
+        if kind not in KINDS:
+            raise ValueError(f"Unknown memory kind: {kind}")
+        return self.store.search(kind, text, task_type, agent_id=self._agent_scope(agent_id), limit=limit)
     
-    def get_stats(self) -> Dict:
-        """Get performance statistics"""
-        stats = self.memory['performance_stats'].copy()
+    def get_stats(self, agent_id: str = None) -> Dict:
+        """Get performance statistics (of this agent by default, ALL_AGENTS for the team)"""
+        scope = self._agent_scope(agent_id)
+        stats = self.store.get_stats() if scope is None else self.store.get_stats(agent_id=scope)
         
         if stats['total_tasks'] > 0:
             stats['success_rate'] = (
@@ -255,14 +347,9 @@ class AgentMemory:
         cutoff = datetime.utcnow() - timedelta(days=days)
         cutoff_iso = cutoff.isoformat()
         
-        self.memory['successes'] = [
-            s for s in self.memory['successes']
-            if s['timestamp'] > cutoff_iso
-        ]
-        
-        self.memory['failures'] = [
-            f for f in self.memory['failures']
-            if f['timestamp'] > cutoff_iso
-        ]
-        
-        self._save_memory()
+        # Hidden at once; the segments are compacted in the background
+        self.store.clear_before(cutoff_iso)
+
+    def close(self):
+        """Close the database connection or the active segment (waits for a running compaction)"""
+        self.store.close()
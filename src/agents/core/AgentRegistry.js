@@ -185,8 +185,14 @@ class AgentRegistry extends EventEmitter {
             return null;
         }
 
-        // Sort by load (ascending) - least loaded first
-        candidates.sort((a, b) => a.currentLoad - b.currentLoad);
+        // Agents whose Python work queue is full would reject the task outright
+        const unsaturated = candidates.filter(a => !(a.isSaturated && a.isSaturated()));
+        if (unsaturated.length > 0) {
+            candidates = unsaturated;
+        }
+
+        // Sort by load (ascending) - least loaded first, then by queued work
+        candidates.sort((a, b) => (a.currentLoad - b.currentLoad) || ((a.queueDepth || 0) - (b.queueDepth || 0)));
 
         return candidates[0];
     }
@@ -0,0 +1,186 @@
+/**
+ * AgentZygote - Pre-forking launcher for Python agents (AGENT_LAUNCHER=zygote)
+ *
+ * agent_zygote.py imports base_agent, llm_manager and the provider SDKs once and
+ * forks a child per agent, so (re)starting an agent costs a fork instead of a
+ * cold interpreter start. Each agent gets its own unix socket connection to the
+ * zygote: the spawn request goes first, then the connection carries the normal
+ * bridge stream. ZygoteChild makes the forked agent look like a ChildProcess to
+ * BaseAgent and AgentHealthMonitor (pid, exitCode, killed, stdin, kill()).
+ */
+
+import { EventEmitter } from 'events';
+import { spawn } from 'child_process';
+import net from 'net';
+import os from 'os';
+import path from 'path';
+import fs from 'fs/promises';
+import logger from '../../utils/logger.js';
+import { BridgeDecoder } from './BridgeFraming.js';
+
+const ZYGOTE_SCRIPT = path.join(process.cwd(), 'src', 'agents', 'core', 'agent_zygote.py');
+// Preloading the SDKs is the slow part the zygote exists to pay once
+const READY_TIMEOUT_MS = parseInt(process.env.AGENT_ZYGOTE_READY_TIMEOUT_MS || '30000', 10);
+const SPAWN_TIMEOUT_MS = 5000;
+
+export function isZygoteEnabled() {
+    return process.platform !== 'win32' && (process.env.AGENT_LAUNCHER || 'spawn').toLowerCase() === 'zygote';
+}
+
+/**
+ * A forked agent, driven over its zygote connection
+ */
+export class ZygoteChild extends EventEmitter {
+    constructor(socket, onMessage, onText) {
+        super();
+        this.socket = socket;
+        this.stdin = socket;
+        this.pid = null;
+        this.exitCode = null;
+        this.signalCode = null;
+        this.killed = false;
+
+        const decoder = new BridgeDecoder((message) => {
+            if (message.type === 'zygote_spawned') {
+                this.pid = message.pid;
+                this.emit('spawn');
+            } else if (message.type === 'zygote_exit') {
+                this.exitCode = message.code;
+                this.signalCode = message.signal;
+            } else if (message.type === 'zygote_error') {
+                this.emit('error', new Error(message.error));
+            } else {
+                onMessage(message);
+            }
+        }, onText);
+        socket.on('data', (data) => decoder.push(data));
+        socket.on('error', (error) => logger.warn(`Zygote child ${this.pid}: ${error.message}`));
+        socket.on('close', () => {
+            if (this.exitCode === null && this.signalCode === null) {
+                // The zygote went away before reporting: the stream is gone either way
+                this.exitCode = -1;
+            }
+            this.emit('exit', this.exitCode, this.signalCode);
+        });
+    }
+
+    kill(signal = 'SIGTERM') {
+        if (!this.pid || this.exitCode !== null || this.signalCode !== null) return false;
+        try {
+            process.kill(this.pid, signal);
+            this.killed = true;
+            return true;
+        } catch (error) {
+            logger.warn(`Failed to signal zygote child ${this.pid}: ${error.message}`);
+            return false;
+        }
+    }
+}
+
+export class AgentZygote extends EventEmitter {
+    constructor() {
+        super();
+        this.process = null;
+        this.starting = null;
+        this.socketPath = path.join(os.tmpdir(), `agent-zygote-${process.pid}.sock`);
+        this.preloaded = {};
+    }
+
+    /**
+     * Spawn the zygote (once) and wait until it listens
+     */
+    start() {
+        if (this.starting) return this.starting;
+
+        this.starting = (async () => {
+            const venvPython = path.join(process.cwd(), 'venv', 'bin', 'python');
+            const pythonCmd = await fs.access(venvPython).then(() => venvPython).catch(() => 'python');
+
+            logger.info('Agent zygote: starting and preloading Python modules');
+            const child = spawn(pythonCmd, [ZYGOTE_SCRIPT], {
+                stdio: ['pipe', 'pipe', 'pipe'],
+                env: { ...process.env, PYTHONUTF8: '1', AGENT_ZYGOTE_SOCKET: this.socketPath }
+            });
+            this.process = child;
+
+            // Forked agents inherit this stderr; their log lines carry the agent folder
+            child.stderr.on('data', (data) => {
+                logger.error(`Agent zygote Python Error: ${data.toString()}`);
+            });
+
+            await new Promise((resolve, reject) => {
+                const timer = setTimeout(() => reject(new Error('Agent zygote did not become ready')), READY_TIMEOUT_MS);
+                const decoder = new BridgeDecoder((message) => {
+                    if (message.type === 'zygote_ready') {
+                        clearTimeout(timer);
+                        this.preloaded = message.preloaded || {};
+                        logger.info(`Agent zygote ready (pid ${message.pid}, ${Object.keys(this.preloaded).length} modules preloaded)`);
+                        resolve();
+                    }
+                }, (line) => logger.debug(`Agent zygote Output: ${line}`));
+                child.stdout.on('data', (data) => decoder.push(data));
+                child.on('exit', (code) => {
+                    clearTimeout(timer);
+                    logger.warn(`Agent zygote exited with code ${code}`);
+                    if (this.process === child) {
+                        this.process = null;
+                        this.starting = null;
+                    }
+                    reject(new Error(`Agent zygote exited with code ${code}`));
+                });
+            });
+        })();
+
+        this.starting.catch(() => {
+            this.starting = null;
+        });
+        return this.starting;
+    }
+
+    /**
+     * Fork an agent from the zygote; resolves once the child is running
+     */
+    async launch(agentPath, env, onMessage, onText) {
+        await this.start();
+
+        return new Promise((resolve, reject) => {
+            const socket = net.createConnection(this.socketPath);
+            const child = new ZygoteChild(socket, onMessage, onText);
+            const fail = (error) => {
+                clearTimeout(timer);
+                socket.destroy();
+                reject(error);
+            };
+            const timer = setTimeout(() => fail(new Error('Zygote spawn timed out')), SPAWN_TIMEOUT_MS);
+
+            socket.once('error', fail);
+            child.once('error', fail);
+            child.once('spawn', () => {
+                clearTimeout(timer);
+                socket.removeListener('error', fail);
+                child.removeListener('error', fail);
+                resolve(child);
+            });
+            socket.on('connect', () => {
+                socket.write(JSON.stringify({ type: 'spawn', agentPath, cwd: process.cwd(), env }) + '\n');
+            });
+        });
+    }
+
+    shutdown() {
+        if (this.process) {
+            this.process.kill();
+        }
+    }
+}
+
+let zygote = null;
+
+export function getAgentZygote() {
+    if (!zygote) {
+        zygote = new AgentZygote();
+    }
+    return zygote;
+}
+
+export default getAgentZygote;
@@ -17,9 +17,37 @@ import fs from 'fs/promises';
 import logger from '../../utils/logger.js';
 import messenger from '../../services/Messenger.js';
 import prisma from '../../database/client.js';
+import { BridgeDecoder, encodeMessage, FRAMING_JSON, FRAMING_MSGPACK } from './BridgeFraming.js';
+import { getAgentHost, isAgentHostEnabled } from './AgentHost.js';
+import { getAgentZygote, isZygoteEnabled } from './AgentZygote.js';
 
 const execAsync = promisify(exec);
 
+// Time a task may run in Python before Node gives up and sends cancel_task (task.timeoutMs overrides)
+const TASK_TIMEOUT_MS = parseInt(process.env.AGENT_TASK_TIMEOUT_MS || '300000', 10);
+const CHAT_TIMEOUT_MS = 60000;
+// get_metrics is answered on the bridge reader thread, without queueing behind work
+const METRICS_TIMEOUT_MS = 5000;
+// Time a profile may take beyond its window (stack collapsing, tracemalloc snapshots)
+const PROFILE_GRACE_MS = 30000;
+
+// Writes that make read-only tool results cached by Python agents stale (see tool_cache.py)
+const CACHE_INVALIDATING_TOOLS = new Set(['project_update', 'project_write_file']);
+
+/**
+ * Push a write to every Python agent's tool cache (except the writer, which invalidated its own)
+ * toolName: project_update ({ projectId }) or project_write_file ({ filePath })
+ */
+export async function broadcastToolCacheInvalidation(toolName, args, sourceAgentId = null) {
+    const AgentRegistry = (await import('./AgentRegistry.js')).default;
+    const target = toolName === 'project_update' ? { projectId: args.projectId } : { filePath: args.filePath };
+    for (const agent of AgentRegistry.getAllAgents()) {
+        if (agent.id !== sourceAgentId && typeof agent.invalidateToolCache === 'function') {
+            agent.invalidateToolCache(toolName, target);
+        }
+    }
+}
+
 export class BaseAgent extends EventEmitter {
     constructor(id, name, config = {}) {
         super();
@@ -36,12 +64,24 @@ export class BaseAgent extends EventEmitter {
 
         // Python Process Management
         this.pythonProcess = null;
+        // Shared agent_host.py process this agent is loaded into (AGENT_HOST_MODE=shared)
+        this.host = null;
         // Default path: src/agents/implementations/<AgentName>/main.py
         const agentFolderName = config.folderName || this.name.replace(/\s+/g, '');
         this.agentPath = config.pythonPath || path.join(process.cwd(), 'src', 'agents', 'implementations', agentFolderName, 'main.py');
 
         this.pendingPythonRequests = new Map();
         this.requestId = 0;
+        // taskId -> Python requestId of tasks currently executing (for cancelTask)
+        this.runningTasks = new Map();
+        // Python tool call requestId -> AbortController, until the call is answered
+        this.toolCallControllers = new Map();
+        // JSON lines until the Python side announces msgpack frames in its bridge_hello
+        this.bridgeFraming = FRAMING_JSON;
+
+        // Backpressure reported by the Python worker pool (queue_depth / queue_full)
+        this.queueDepth = 0;
+        this.maxQueue = null;
 
         // Statistics
         this.stats = {
@@ -59,61 +99,171 @@ export class BaseAgent extends EventEmitter {
      * Start the Python agent process
      */
     async startPythonAgent() {
+        if (isAgentHostEnabled()) {
+            try {
+                await this.startInAgentHost();
+                return;
+            } catch (error) {
+                logger.warn(`${this.name}: Agent host could not load it (${error.message}), starting a dedicated process`);
+            }
+        }
+
         logger.info(`${this.name}: Starting Python agent at ${this.agentPath}`);
+        this.host = null;
+        this.bridgeFraming = FRAMING_JSON;
+        // Offer binary frames; the agent falls back to JSON lines without the msgpack package
+        const bridgeEnv = { PYTHONUTF8: '1', BRIDGE_FRAMING: process.env.BRIDGE_FRAMING || FRAMING_MSGPACK };
+        const onMessage = (message) => this.handlePythonMessage(message);
+        const onText = (line) => logger.debug(`${this.name} Python Output: ${line}`);
+
+        if (isZygoteEnabled()) {
+            try {
+                // Fork from the preloaded zygote: milliseconds instead of a cold interpreter start
+                const child = await getAgentZygote().launch(this.agentPath, bridgeEnv, onMessage, onText);
+                this.pythonProcess = child;
+                child.on('exit', (code, signal) => this.handlePythonExit(child, code ?? signal));
+                logger.info(`${this.name}: Forked Python agent from zygote (pid ${this.pythonProcess.pid})`);
+                return this.waitForBridgeReady();
+            } catch (error) {
+                logger.warn(`${this.name}: Zygote launch failed (${error.message}), spawning a Python process`);
+            }
+        }
 
         // Use virtual environment Python if available
         const venvPython = path.join(process.cwd(), 'venv', 'bin', 'python');
         const pythonCmd = await fs.access(venvPython).then(() => venvPython).catch(() => 'python');
 
-        this.pythonProcess = spawn(pythonCmd, [this.agentPath], {
+        const child = spawn(pythonCmd, [this.agentPath], {
             stdio: ['pipe', 'pipe', 'pipe'],
-            env: { ...process.env, PYTHONUTF8: '1' }
+            env: { ...process.env, ...bridgeEnv }
         });
+        this.pythonProcess = child;
 
-        // Handle StdOut (JSON messages or logs)
-        this.pythonProcess.stdout.on('data', (data) => {
-            const lines = data.toString().split('\n').filter(l => l.trim());
-            for (const line of lines) {
-                try {
-                    const message = JSON.parse(line);
-                    this.handlePythonMessage(message);
-                } catch (error) {
-                    // If not JSON, treat as raw log
-                    logger.debug(`${this.name} Python Output: ${line}`);
-                }
-            }
-        });
+        // Handle StdOut (JSON lines, msgpack frames or raw logs), buffered across chunks
+        const decoder = new BridgeDecoder(onMessage, onText);
+        this.pythonProcess.stdout.on('data', (data) => decoder.push(data));
 
         // Handle StdErr (Errors)
         this.pythonProcess.stderr.on('data', (data) => {
             logger.error(`${this.name} Python Error: ${data.toString()}`);
         });
 
-        this.pythonProcess.on('exit', (code) => {
-            logger.warn(`${this.name}: Python process exited with code ${code}`);
+        child.on('exit', (code) => this.handlePythonExit(child, code));
+
+        return this.waitForBridgeReady();
+    }
+
+    handlePythonExit(child, code) {
+        logger.warn(`${this.name}: Python process exited with code ${code}`);
+        // A process replaced by a restart exiting late must not flag the new one
+        if (this.pythonProcess === child) {
             this.status = 'error';
-        });
+        }
+    }
 
-        // Wait for ready signal (optional stabilization delay)
+    /**
+     * Wait for the bridge_hello ready signal (agents on older base classes never send one)
+     */
+    waitForBridgeReady() {
         return new Promise((resolve) => {
-            setTimeout(resolve, 1000);
+            const timer = setTimeout(resolve, 1000);
+            this.once('bridge:ready', () => {
+                clearTimeout(timer);
+                resolve();
+            });
         });
     }
 
+    /**
+     * Load the Python agent into a shared host process instead of spawning its own
+     */
+    async startInAgentHost() {
+        const host = getAgentHost();
+        logger.info(`${this.name}: Loading Python agent into ${host.name} from ${this.agentPath}`);
+        this.host = host;
+        try {
+            // Health checks see the shared process: if it dies, every agent in it is restarted
+            this.pythonProcess = await host.attach(this);
+        } catch (error) {
+            this.host = null;
+            throw error;
+        }
+    }
+
     /**
      * Handle incoming messages from Python agent
      */
     async handlePythonMessage(message) {
-        if (message.type === 'tool_call') {
+        if (message.type === 'bridge_hello') {
+            // Python is ready and tells us the framing it sends; answer in kind from now on
+            this.bridgeFraming = message.framing === FRAMING_MSGPACK ? FRAMING_MSGPACK : FRAMING_JSON;
+            logger.info(`${this.name}: Python bridge ready (pid ${message.pid}, ${this.bridgeFraming} framing)`);
+            this.emit('bridge:ready', { agentId: this.id, framing: this.bridgeFraming });
+        } else if (message.type === 'tool_call') {
             // Handle tool calls from Python
             await this.handleToolCall(message);
+        } else if (message.type === 'tool_call_batch') {
+            // Several tool calls in one envelope: run them concurrently, each answers as it completes
+            await Promise.all((message.calls || []).map(call => this.handleToolCall(call)));
+        } else if (message.type === 'tool_cancel') {
+            // Python stopped waiting (timeout, deadline or cancelled request): abort what can be aborted
+            for (const requestId of message.requestIds || []) {
+                const controller = this.toolCallControllers.get(requestId);
+                if (controller) {
+                    controller.abort();
+                }
+            }
         } else if (message.type === 'response') {
             // Python responded to a request from Node
             const pending = this.pendingPythonRequests.get(message.requestId);
             if (pending) {
-                pending.resolve(message.result);
+                if (message.error && pending.rejectOnError) {
+                    pending.reject(new Error(message.error));
+                } else {
+                    pending.resolve(message.result);
+                }
                 this.pendingPythonRequests.delete(message.requestId);
             }
+        } else if (message.type === 'partial_response') {
+            // Incremental chat output streamed while the LLM is still generating
+            const pending = this.pendingPythonRequests.get(message.requestId);
+            if (pending && pending.onPartial) {
+                pending.onPartial(message.delta);
+            }
+            this.emit('chat:partial', {
+                agentId: this.id,
+                requestId: message.requestId,
+                delta: message.delta
+            });
+        } else if (message.type === 'queue_full') {
+            // Python's work queue is saturated: fail fast so the caller can route the work elsewhere
+            this.queueDepth = message.queueDepth;
+            this.maxQueue = message.maxQueue;
+            const pending = this.pendingPythonRequests.get(message.requestId);
+            if (pending) {
+                const error = new Error(`${this.name} is overloaded (${message.queueDepth}/${message.maxQueue} queued)`);
+                error.code = 'QUEUE_FULL';
+                pending.reject(error);
+                this.pendingPythonRequests.delete(message.requestId);
+            }
+            logger.warn(`${this.name}: Rejected ${message.priority} ${message.messageType} request ${message.requestId}, queue full`);
+            this.emit('agent:backpressure', {
+                agentId: this.id,
+                requestId: message.requestId,
+                messageType: message.messageType,
+                queueDepth: message.queueDepth,
+                maxQueue: message.maxQueue
+            });
+        } else if (message.type === 'queue_depth') {
+            this.queueDepth = message.queueDepth;
+            this.maxQueue = message.maxQueue;
+            this.emit('agent:queue', {
+                agentId: this.id,
+                queueDepth: message.queueDepth,
+                maxQueue: message.maxQueue,
+                queued: message.queued,
+                running: message.running
+            });
         } else if (message.type === 'status_update') {
             this.status = message.status;
             this.updateLoad();
@@ -159,6 +309,9 @@ export class BaseAgent extends EventEmitter {
      */
     async handleToolCall(message) {
         const { toolName, args, requestId } = message;
+        const controller = new AbortController();
+        const { signal } = controller;
+        this.toolCallControllers.set(requestId, controller);
 
         try {
             let result;
@@ -187,7 +340,7 @@ export class BaseAgent extends EventEmitter {
                 try {
                     const projectRoot = process.cwd();
                     const filePath = path.resolve(projectRoot, args.filePath);
-                    const content = await fs.readFile(filePath, 'utf-8');
+                    const content = await fs.readFile(filePath, { encoding: 'utf-8', signal });
                     result = { success: true, content };
                     logger.info(`${this.name}: Read project file: ${args.filePath}`);
                 } catch (err) {
@@ -246,7 +399,8 @@ export class BaseAgent extends EventEmitter {
                 try {
                     const { stdout, stderr } = await execAsync(args.command, {
                         cwd: args.cwd || process.cwd(),
-                        timeout: 30000
+                        timeout: 30000,
+                        signal
                     });
                     result = { success: true, stdout: stdout.trim(), stderr: stderr.trim() };
                     logger.info(`${this.name}: Executed: ${args.command}`);
@@ -259,12 +413,25 @@ export class BaseAgent extends EventEmitter {
                 result = { success: false, error: `Unknown tool: ${toolName}` };
             }
 
+            if (signal.aborted) {
+                // Python has given up on this call; nobody is waiting for the answer
+                logger.info(`${this.name}: Dropped result of cancelled tool call ${toolName}`);
+                return;
+            }
+
             // Send response back to Python
             this.sendToPython({
                 type: 'tool_response',
                 requestId,
                 result
             });
+
+            if (CACHE_INVALIDATING_TOOLS.has(toolName) && result && result.success) {
+                // This agent's Python cache already dropped the entries; tell everyone else
+                broadcastToolCacheInvalidation(toolName, args, this.id).catch(error => {
+                    logger.warn(`${this.name}: Tool cache invalidation failed: ${error.message}`);
+                });
+            }
         } catch (error) {
             logger.error(`${this.name}: Tool call failed: ${error.message}`);
             this.sendToPython({
@@ -272,6 +439,8 @@ export class BaseAgent extends EventEmitter {
                 requestId,
                 error: error.message
             });
+        } finally {
+            this.toolCallControllers.delete(requestId);
         }
     }
 
@@ -324,6 +493,14 @@ export class BaseAgent extends EventEmitter {
             agent.executeTask(taskWithParent).then(result => {
                 logger.info(`Task ${task.id} completed by ${targetAgent}: ${JSON.stringify(result).substring(0, 50)}...`);
             }).catch(error => {
+                if (error.code === 'QUEUE_FULL') {
+                    // Target is saturated: hand the task to the least loaded agent of the same category
+                    const fallback = AgentRegistry.findBestAgent({ category: agent.category });
+                    if (fallback && fallback.id !== agent.id && !fallback.isSaturated()) {
+                        logger.warn(`Task ${task.id}: ${targetAgent} is overloaded, rerouting to ${fallback.id}`);
+                        return fallback.executeTask(taskWithParent);
+                    }
+                }
                 logger.error(`Task ${task.id} failed on ${targetAgent}:`, error);
             });
         } else {
@@ -353,12 +530,24 @@ export class BaseAgent extends EventEmitter {
         }
     }
 
+    /**
+     * Drop tool results the Python agent cached for a project or file that was just written
+     */
+    invalidateToolCache(toolName, args) {
+        const writable = this.host ? this.host.isWritable() : !!(this.pythonProcess && this.pythonProcess.stdin.writable);
+        if (writable) {
+            this.sendToPython({ type: 'cache_invalidate', toolName, args });
+        }
+    }
+
     /**
      * Send message to Python agent via StdIn
      */
     sendToPython(message) {
-        if (this.pythonProcess && this.pythonProcess.stdin.writable) {
-            this.pythonProcess.stdin.write(JSON.stringify(message) + '\n');
+        if (this.host) {
+            this.host.send(this.id, message);
+        } else if (this.pythonProcess && this.pythonProcess.stdin.writable) {
+            this.pythonProcess.stdin.write(encodeMessage(message, this.bridgeFraming));
         } else {
             logger.error(`${this.name}: Cannot send to Python, process not writable`);
         }
@@ -404,17 +593,26 @@ export class BaseAgent extends EventEmitter {
         logger.info(`[TASK ${taskId}] Delegating to Python bridge...`);
         this.emit('task:start', { agentId: this.id, taskId, task });
 
+        const requestId = ++this.requestId;
+        // Absolute deadline (epoch ms): Python cuts tool and LLM waits to what is left of it
+        const deadline = task.deadline ? new Date(task.deadline).getTime() : startTime + (task.timeoutMs || TASK_TIMEOUT_MS);
+        let deadlineTimer = null;
         try {
-            const requestId = ++this.requestId;
             const resultPromise = new Promise((resolve, reject) => {
                 this.pendingPythonRequests.set(requestId, { resolve, reject });
-                // Timeout after 5 minutes
-                setTimeout(() => reject(new Error('Python task timeout')), 300000);
+                deadlineTimer = setTimeout(() => {
+                    this.pendingPythonRequests.delete(requestId);
+                    // Stop the Python side too, or it keeps holding a worker, LLM slots and quota
+                    this.sendToPython({ type: 'cancel_task', requestId, taskId, reason: 'deadline exceeded' });
+                    reject(new Error('Python task timeout'));
+                }, Math.max(0, deadline - Date.now()));
             });
+            this.runningTasks.set(taskId, requestId);
 
             this.sendToPython({
                 type: 'execute_task',
                 requestId,
+                deadline,
                 task: { ...task, id: taskId }
             });
 
@@ -471,8 +669,93 @@ export class BaseAgent extends EventEmitter {
             logger.info(`[TASK ${taskId}] ========== EXECUTION COMPLETE ==========`);
             return result;
         } catch (error) {
+            if (error.code === 'QUEUE_FULL') {
+                // Never started here: reopen the task so it can be routed elsewhere
+                try {
+                    await prisma.task.update({ where: { id: taskId }, data: { status: 'todo' } });
+                } catch (e) {
+                    logger.error(`[TASK ${taskId}] Failed to reopen rejected task:`, e);
+                }
+                throw error;
+            }
             await this.failTask(taskId, error);
             throw error;
+        } finally {
+            clearTimeout(deadlineTimer);
+            if (this.runningTasks.get(taskId) === requestId) {
+                this.runningTasks.delete(taskId);
+            }
+        }
+    }
+
+    /**
+     * Cancel a task this agent is executing: Python aborts its tool and LLM calls
+     * and executeTask rejects with a CANCELLED error. Returns false if it is not running here.
+     */
+    cancelTask(taskId, reason = 'cancelled') {
+        const requestId = this.runningTasks.get(taskId);
+        if (requestId === undefined) return false;
+
+        logger.info(`${this.name}: Cancelling task ${taskId} (${reason})`);
+        this.sendToPython({ type: 'cancel_task', requestId, taskId, reason });
+        const pending = this.pendingPythonRequests.get(requestId);
+        if (pending) {
+            this.pendingPythonRequests.delete(requestId);
+            const error = new Error(`Task cancelled: ${reason}`);
+            error.code = 'CANCELLED';
+            pending.reject(error);
+        }
+        return true;
+    }
+
+    /**
+     * Latency histograms and counters of the Python agent (tasks, tool calls,
+     * LLM calls, queue wait, tokens), see metrics.py
+     */
+    async getMetrics(timeoutMs = METRICS_TIMEOUT_MS) {
+        const requestId = ++this.requestId;
+        let timer = null;
+        const resultPromise = new Promise((resolve, reject) => {
+            this.pendingPythonRequests.set(requestId, { resolve, reject });
+            timer = setTimeout(() => {
+                this.pendingPythonRequests.delete(requestId);
+                reject(new Error('Metrics request timeout'));
+            }, timeoutMs);
+        });
+
+        this.sendToPython({ type: 'get_metrics', requestId });
+
+        try {
+            return await resultPromise;
+        } finally {
+            clearTimeout(timer);
+        }
+    }
+
+    /**
+     * Profile the live Python process, see profiler.py. options:
+     * { profile: 'cpu', engine: 'sample' | 'cprofile', duration, interval, includeIdle, limit }
+     * { profile: 'memory', action: 'window' | 'start' | 'snapshot' | 'stop', duration, frames, limit }
+     * Resolves with collapsed stacks / function stats or the top allocation sites.
+     */
+    async profile(options = {}) {
+        const requestId = ++this.requestId;
+        const durationMs = (Number(options.duration) || 10) * 1000;
+        let timer = null;
+        const resultPromise = new Promise((resolve, reject) => {
+            this.pendingPythonRequests.set(requestId, { resolve, reject, rejectOnError: true });
+            timer = setTimeout(() => {
+                this.pendingPythonRequests.delete(requestId);
+                reject(new Error('Profile request timeout'));
+            }, durationMs + PROFILE_GRACE_MS);
+        });
+
+        this.sendToPython({ ...options, type: 'profile', requestId });
+
+        try {
+            return await resultPromise;
+        } finally {
+            clearTimeout(timer);
         }
     }
 
@@ -518,26 +801,38 @@ export class BaseAgent extends EventEmitter {
 
     /**
      * Handle chat message from user (delegates to Python's handleChatMessage)
+     * onPartial(delta) is invoked for each streamed chunk of the response text.
      */
-    async handleChatMessage(message, history = null, taskId = null, projectId = null) {
+    async handleChatMessage(message, history = null, taskId = null, projectId = null, onPartial = null) {
         if (taskId) this.currentTaskId = taskId;
         const requestId = ++this.requestId;
+        const deadline = Date.now() + CHAT_TIMEOUT_MS;
+        let deadlineTimer = null;
         const resultPromise = new Promise((resolve, reject) => {
-            this.pendingPythonRequests.set(requestId, { resolve, reject });
-            // Timeout after 60 seconds (allow for LLM retries)
-            setTimeout(() => reject(new Error('Chat message timeout')), 60000);
+            this.pendingPythonRequests.set(requestId, { resolve, reject, onPartial });
+            // Timeout after 60 seconds (allow for LLM retries); Python stops generating as well
+            deadlineTimer = setTimeout(() => {
+                this.pendingPythonRequests.delete(requestId);
+                this.sendToPython({ type: 'cancel_task', requestId, reason: 'deadline exceeded' });
+                reject(new Error('Chat message timeout'));
+            }, CHAT_TIMEOUT_MS);
         });
 
         this.sendToPython({
             type: 'handle_chat',
             requestId,
+            deadline,
             message,
             history,
             taskId: this.currentTaskId,
             projectId: projectId
         });
 
-        return await resultPromise;
+        try {
+            return await resultPromise;
+        } finally {
+            clearTimeout(deadlineTimer);
+        }
     }
 
     async completeTask(taskId, result, duration) {
@@ -611,6 +906,13 @@ export class BaseAgent extends EventEmitter {
         this.load = (this.status === 'busy' || this.status === 'thinking') ? 100 : 0;
     }
 
+    /**
+     * Whether the Python work queue is full (new requests would be rejected)
+     */
+    isSaturated() {
+        return this.maxQueue !== null && this.queueDepth >= this.maxQueue;
+    }
+
     updateStats(duration) {
         const n = this.stats.tasksCompleted;
         this.stats.averageResponseTime = (this.stats.averageResponseTime * (n - 1) + duration) / n;
@@ -626,6 +928,8 @@ export class BaseAgent extends EventEmitter {
             category: this.category,
             status: this.status,
             load: this.load,
+            queueDepth: this.queueDepth,
+            maxQueue: this.maxQueue,
             skills: this.skills,
             stats: this.stats,
             isReal: this.isReal
@@ -633,7 +937,11 @@ export class BaseAgent extends EventEmitter {
     }
 
     async shutdown() {
-        if (this.pythonProcess) {
+        if (this.host) {
+            // Other agents still run in the shared process
+            this.host.detach(this.id);
+            this.host = null;
+        } else if (this.pythonProcess) {
             this.pythonProcess.kill();
         }
         logger.info(`${this.name}: Bridge closed`);
@@ -0,0 +1,355 @@
+/**
+ * BridgeFraming - Wire format for the Node <-> Python agent bridge
+ *
+ * Two encodings share one stream, so either side can be upgraded independently:
+ * - JSON lines: one JSON document per '\n'-terminated line (the original format, always understood)
+ * - msgpack frames: 0xC1 marker, 4-byte big-endian payload length, msgpack payload
+ *
+ * 0xC1 is never used by msgpack and cannot start UTF-8 text, so the reader tells the two
+ * apart per message, and stray print() output from Python still arrives as text lines.
+ * The Python agent announces what it sends with a `bridge_hello` line (see bridge_framing.py);
+ * Node switches its own output to frames only after that.
+ *
+ * The msgpack codec covers the JSON data model plus binary (Buffer) values, which is all
+ * the bridge carries. No external dependency is required.
+ */
+
+export const FRAMING_JSON = 'json';
+export const FRAMING_MSGPACK = 'msgpack';
+export const FRAME_MARKER = 0xc1;
+const FRAME_HEADER_BYTES = 5;
+
+// ============================================
+// msgpack encoder
+// ============================================
+
+class Encoder {
+    constructor(initialSize = 1024) {
+        this.buffer = Buffer.allocUnsafe(initialSize);
+        this.pos = 0;
+    }
+
+    ensure(bytes) {
+        if (this.pos + bytes <= this.buffer.length) return;
+        let size = this.buffer.length * 2;
+        while (size < this.pos + bytes) size *= 2;
+        const grown = Buffer.allocUnsafe(size);
+        this.buffer.copy(grown, 0, 0, this.pos);
+        this.buffer = grown;
+    }
+
+    u8(value) {
+        this.ensure(1);
+        this.buffer[this.pos++] = value;
+    }
+
+    header(byte, length, width) {
+        this.ensure(1 + width);
+        this.buffer[this.pos++] = byte;
+        if (width === 1) this.buffer.writeUInt8(length, this.pos);
+        else if (width === 2) this.buffer.writeUInt16BE(length, this.pos);
+        else this.buffer.writeUInt32BE(length, this.pos);
+        this.pos += width;
+    }
+
+    encode(value) {
+        if (value === null || value === undefined) {
+            this.u8(0xc0);
+        } else if (typeof value === 'boolean') {
+            this.u8(value ? 0xc3 : 0xc2);
+        } else if (typeof value === 'number') {
+            this.number(value);
+        } else if (typeof value === 'string') {
+            this.string(value);
+        } else if (typeof value === 'bigint') {
+            this.ensure(9);
+            if (value >= 0n) {
+                this.buffer[this.pos++] = 0xcf;
+                this.buffer.writeBigUInt64BE(value, this.pos);
+            } else {
+                this.buffer[this.pos++] = 0xd3;
+                this.buffer.writeBigInt64BE(value, this.pos);
+            }
+            this.pos += 8;
+        } else if (Buffer.isBuffer(value) || value instanceof Uint8Array) {
+            const length = value.length;
+            if (length < 0x100) this.header(0xc4, length, 1);
+            else if (length < 0x10000) this.header(0xc5, length, 2);
+            else this.header(0xc6, length, 4);
+            this.ensure(length);
+            Buffer.from(value.buffer, value.byteOffset, length).copy(this.buffer, this.pos);
+            this.pos += length;
+        } else if (Array.isArray(value)) {
+            const length = value.length;
+            if (length < 16) this.u8(0x90 | length);
+            else if (length < 0x10000) this.header(0xdc, length, 2);
+            else this.header(0xdd, length, 4);
+            for (const item of value) this.encode(typeof item === 'function' ? null : item);
+        } else if (typeof value.toJSON === 'function') {
+            // Same conversion JSON.stringify applies (Dates become ISO strings)
+            this.encode(value.toJSON());
+        } else if (typeof value === 'object') {
+            // Like JSON, drop undefined and function members
+            const keys = Object.keys(value).filter(k => value[k] !== undefined && typeof value[k] !== 'function');
+            const length = keys.length;
+            if (length < 16) this.u8(0x80 | length);
+            else if (length < 0x10000) this.header(0xde, length, 2);
+            else this.header(0xdf, length, 4);
+            for (const key of keys) {
+                this.string(key);
+                this.encode(value[key]);
+            }
+        } else {
+            this.u8(0xc0);
+        }
+    }
+
+    number(value) {
+        if (Number.isInteger(value) && Number.isSafeInteger(value)) {
+            if (value >= 0) {
+                if (value < 0x80) return this.u8(value);
+                if (value < 0x100) return this.header(0xcc, value, 1);
+                if (value < 0x10000) return this.header(0xcd, value, 2);
+                if (value < 0x100000000) return this.header(0xce, value, 4);
+                this.ensure(9);
+                this.buffer[this.pos++] = 0xcf;
+                this.buffer.writeBigUInt64BE(BigInt(value), this.pos);
+                this.pos += 8;
+                return;
+            }
+            this.ensure(9);
+            if (value >= -32) {
+                this.buffer[this.pos++] = value & 0xff;
+            } else if (value >= -0x80) {
+                this.buffer[this.pos++] = 0xd0;
+                this.buffer.writeInt8(value, this.pos++);
+            } else if (value >= -0x8000) {
+                this.buffer[this.pos++] = 0xd1;
+                this.buffer.writeInt16BE(value, this.pos);
+                this.pos += 2;
+            } else if (value >= -0x80000000) {
+                this.buffer[this.pos++] = 0xd2;
+                this.buffer.writeInt32BE(value, this.pos);
+                this.pos += 4;
+            } else {
+                this.buffer[this.pos++] = 0xd3;
+                this.buffer.writeBigInt64BE(BigInt(value), this.pos);
+                this.pos += 8;
+            }
+            return;
+        }
+        this.ensure(9);
+        this.buffer[this.pos++] = 0xcb;
+        this.buffer.writeDoubleBE(value, this.pos);
+        this.pos += 8;
+    }
+
+    string(value) {
+        // Short strings: count bytes exactly; long ones: reserve the worst case and write once
+        if (value.length < 32) {
+            const length = Buffer.byteLength(value);
+            if (length < 32) {
+                this.ensure(1 + length);
+                this.buffer[this.pos++] = 0xa0 | length;
+                this.pos += this.buffer.write(value, this.pos, 'utf8');
+                return;
+            }
+        }
+        const maxBytes = value.length * 3;
+        const width = maxBytes < 0x100 ? 1 : maxBytes < 0x10000 ? 2 : 4;
+        this.ensure(1 + width + maxBytes);
+        const start = this.pos;
+        this.pos += 1 + width;
+        const length = this.buffer.write(value, this.pos, 'utf8');
+        this.pos = start;
+        this.header(width === 1 ? 0xd9 : width === 2 ? 0xda : 0xdb, length, width);
+        this.pos += length;
+    }
+}
+
+export function encodeMsgpack(value) {
+    const encoder = new Encoder();
+    encoder.encode(value);
+    return encoder.buffer.subarray(0, encoder.pos);
+}
+
+// ============================================
+// msgpack decoder
+// ============================================
+
+class Decoder {
+    constructor(buffer) {
+        this.buffer = buffer;
+        this.pos = 0;
+    }
+
+    decode() {
+        const buffer = this.buffer;
+        const byte = buffer[this.pos++];
+        if (byte === undefined) throw new Error('msgpack: unexpected end of data');
+
+        if (byte < 0x80) return byte;
+        if (byte < 0x90) return this.map(byte & 0x0f);
+        if (byte < 0xa0) return this.array(byte & 0x0f);
+        if (byte < 0xc0) return this.str(byte & 0x1f);
+        if (byte >= 0xe0) return byte - 0x100;
+
+        switch (byte) {
+            case 0xc0: return null;
+            case 0xc2: return false;
+            case 0xc3: return true;
+            case 0xc4: return this.bin(this.uint(1));
+            case 0xc5: return this.bin(this.uint(2));
+            case 0xc6: return this.bin(this.uint(4));
+            case 0xca: { const v = buffer.readFloatBE(this.pos); this.pos += 4; return v; }
+            case 0xcb: { const v = buffer.readDoubleBE(this.pos); this.pos += 8; return v; }
+            case 0xcc: return this.uint(1);
+            case 0xcd: return this.uint(2);
+            case 0xce: return this.uint(4);
+            case 0xcf: { const v = buffer.readBigUInt64BE(this.pos); this.pos += 8; return Number(v); }
+            case 0xd0: { const v = buffer.readInt8(this.pos); this.pos += 1; return v; }
+            case 0xd1: { const v = buffer.readInt16BE(this.pos); this.pos += 2; return v; }
+            case 0xd2: { const v = buffer.readInt32BE(this.pos); this.pos += 4; return v; }
+            case 0xd3: { const v = buffer.readBigInt64BE(this.pos); this.pos += 8; return Number(v); }
+            case 0xd9: return this.str(this.uint(1));
+            case 0xda: return this.str(this.uint(2));
+            case 0xdb: return this.str(this.uint(4));
+            case 0xdc: return this.array(this.uint(2));
+            case 0xdd: return this.array(this.uint(4));
+            case 0xde: return this.map(this.uint(2));
+            case 0xdf: return this.map(this.uint(4));
+            default:
+                throw new Error(`msgpack: unsupported type 0x${byte.toString(16)}`);
+        }
+    }
+
+    uint(width) {
+        const value = width === 1 ? this.buffer[this.pos] : width === 2 ? this.buffer.readUInt16BE(this.pos) : this.buffer.readUInt32BE(this.pos);
+        this.pos += width;
+        return value;
+    }
+
+    str(length) {
+        const value = this.buffer.toString('utf8', this.pos, this.pos + length);
+        this.pos += length;
+        return value;
+    }
+
+    bin(length) {
+        const value = Buffer.from(this.buffer.subarray(this.pos, this.pos + length));
+        this.pos += length;
+        return value;
+    }
+
+    array(length) {
+        const value = new Array(length);
+        for (let i = 0; i < length; i++) value[i] = this.decode();
+        return value;
+    }
+
+    map(length) {
+        const value = {};
+        for (let i = 0; i < length; i++) {
+            const key = this.decode();
+            value[key] = this.decode();
+        }
+        return value;
+    }
+}
+
+export function decodeMsgpack(buffer) {
+    const decoder = new Decoder(buffer);
+    const value = decoder.decode();
+    if (decoder.pos !== buffer.length) {
+        throw new Error(`msgpack: ${buffer.length - decoder.pos} trailing bytes`);
+    }
+    return value;
+}
+
+// ============================================
+// Framing
+// ============================================
+
+/**
+ * Serialize one bridge message in the given framing
+ */
+export function encodeMessage(message, framing = FRAMING_JSON) {
+    if (framing === FRAMING_MSGPACK) {
+        const payload = encodeMsgpack(message);
+        const frame = Buffer.allocUnsafe(FRAME_HEADER_BYTES + payload.length);
+        frame[0] = FRAME_MARKER;
+        frame.writeUInt32BE(payload.length, 1);
+        payload.copy(frame, FRAME_HEADER_BYTES);
+        return frame;
+    }
+    return JSON.stringify(message) + '\n';
+}
+
+/**
+ * Incremental reader for a stream mixing JSON lines, msgpack frames and raw text.
+ * onMessage(message) gets every decoded message; onText(line) gets lines that are not JSON.
+ */
+export class BridgeDecoder {
+    constructor(onMessage, onText = () => { }) {
+        this.onMessage = onMessage;
+        this.onText = onText;
+        this.chunks = [];
+        this.buffered = 0;
+        this.pendingFrame = 0;
+        this.pendingLine = false;
+    }
+
+    push(chunk) {
+        this.chunks.push(chunk);
+        this.buffered += chunk.length;
+        // Large messages arrive in 64 KiB pieces: only join them once the whole message is here
+        if (this.pendingFrame && this.buffered < this.pendingFrame) return;
+        if (this.pendingLine && chunk.indexOf(0x0a) === -1) return;
+
+        const buffer = this.chunks.length === 1 ? this.chunks[0] : Buffer.concat(this.chunks, this.buffered);
+        let offset = 0;
+        this.pendingFrame = 0;
+        this.pendingLine = false;
+
+        while (offset < buffer.length) {
+            if (buffer[offset] === FRAME_MARKER) {
+                if (buffer.length - offset < FRAME_HEADER_BYTES) break;
+                const length = buffer.readUInt32BE(offset + 1);
+                const end = offset + FRAME_HEADER_BYTES + length;
+                if (end > buffer.length) {
+                    this.pendingFrame = end - offset;
+                    break;
+                }
+                let message;
+                try {
+                    message = decodeMsgpack(buffer.subarray(offset + FRAME_HEADER_BYTES, end));
+                } catch (error) {
+                    this.onText(`[undecodable frame: ${error.message}]`);
+                }
+                offset = end;
+                if (message !== undefined) this.onMessage(message);
+            } else {
+                const newline = buffer.indexOf(0x0a, offset);
+                if (newline === -1) {
+                    this.pendingLine = true;
+                    break;
+                }
+                const line = buffer.toString('utf8', offset, newline).trim();
+                offset = newline + 1;
+                if (!line) continue;
+                let message;
+                try {
+                    message = JSON.parse(line);
+                } catch (error) {
+                    this.onText(line);
+                    continue;
+                }
+                this.onMessage(message);
+            }
+        }
+
+        const rest = buffer.subarray(offset);
+        this.chunks = rest.length ? [rest] : [];
+        this.buffered = rest.length;
+    }
+}
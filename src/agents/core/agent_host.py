@@ -0,0 +1,286 @@
+"""
+Multi-agent host: several PythonBaseAgent subclasses in one interpreter
+
+Instead of one Python process per agent (each importing the provider SDKs and
+building its own LLMManager), Node can start a single host and load agents
+into it (AGENT_HOST_MODE=shared, see AgentHost.js). All agents share:
+- one stdin/stdout stream: every frame carries an agentId field, the host
+  routes input to that agent and send_to_bridge stamps the agent's id on output
+- one LLMManager, so one set of provider clients, rate limiter and caches; each
+  agent calls it through its own view (LLMManager.for_agent), which keeps that
+  agent's metrics, prompt-cache and token stats and cassette attribution
+- one bridge writer thread and the already imported modules
+
+Protocol on top of the normal bridge messages:
+- host -> Node: bridge_hello without agentId once the host is up, then a
+  bridge_hello with agentId for each agent it has loaded (the same ready signal
+  a standalone agent sends) or host_error {agentId, error} if loading failed
+- Node -> host: host_load {agentId, name, pythonPath} and host_unload {agentId}
+
+Agent folders all use the same package names (core.logic, features, ...), so
+each agent is loaded under its own prefix (_hosted.<agentId>) and absolute
+imports made from its modules (at load time or later) are redirected to the
+agent's own packages; modules outside _hosted import as usual.
+Agents written for the asyncio runtime need their own process and are
+refused with host_error (Node then spawns them standalone).
+"""
+
+import os
+import re
+import sys
+import types
+import logging
+import builtins
+import threading
+import importlib.util
+import importlib.machinery
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import bridge_framing
+import bridge_writer
+from base_agent import PythonBaseAgent
+
+logger = logging.getLogger(__name__)
+
+HOSTED_PACKAGE = '_hosted'
+
+
+class _AgentImports:
+    """
+    Redirects absolute imports made by an agent's modules to its own folder.
+
+    Only hosted modules see the redirect: they run with their own __builtins__ whose
+    __import__ is _import (set as they are executed, by this finder's loaders), so the
+    interpreter-wide builtins.__import__ is left alone.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # package prefix -> top-level names that exist in that agent's folder
+        self._local_names: Dict[str, set] = {}
+        self._original_import = builtins.__import__
+        self.builtins = {**vars(builtins), '__import__': self._import}
+        sys.meta_path.insert(0, self)
+
+    def register(self, package: str, folder: str):
+        names = set()
+        for entry in os.listdir(folder):
+            path = os.path.join(folder, entry)
+            if os.path.isdir(path) and entry.isidentifier():
+                names.add(entry)
+            elif entry.endswith('.py'):
+                names.add(entry[:-3])
+        with self._lock:
+            self._local_names[package] = names
+
+    def find_spec(self, fullname, path, target=None):
+        """Meta path finder: agent modules are found as usual, then executed with the hosted builtins"""
+        if not fullname.startswith(HOSTED_PACKAGE + '.') or path is None:
+            return None
+        spec = importlib.machinery.PathFinder.find_spec(fullname, path, target)
+        if spec is not None and spec.loader is not None:
+            spec.loader = _HostedLoader(spec.loader, self.builtins)
+        return spec
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level == 0 and globals:
+            importer = globals.get('__name__') or ''
+            if importer.startswith(HOSTED_PACKAGE + '.'):
+                package = '.'.join(importer.split('.', 2)[:2])
+                top = name.split('.', 1)[0]
+                if top in self._local_names.get(package, ()):
+                    module = self._original_import(f'{package}.{name}', globals, locals, fromlist, 0)
+                    # "import core.logic" binds the agent's own top-level package
+                    return module if fromlist else sys.modules[f'{package}.{top}']
+        return self._original_import(name, globals, locals, fromlist, level)
+
+
+class _HostedLoader:
+    """Wraps an agent module's loader to execute it with the hosted builtins"""
+
+    def __init__(self, loader, hosted_builtins: Dict[str, Any]):
+        self._loader = loader
+        self._builtins = hosted_builtins
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        # exec() keeps a module's own __builtins__, and functions defined in it capture them
+        module.__builtins__ = self._builtins
+        self._loader.exec_module(module)
+
+
+class AgentHost:
+    """Loads agents on request and multiplexes them over this process's stdin/stdout"""
+
+    def __init__(self):
+        self.agents: Dict[str, PythonBaseAgent] = {}
+        self.bridge_framing = bridge_framing.JSON
+        self._imports = _AgentImports()
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()
+        # Messages for agents still loading, replayed once they are ready
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+
+        root = types.ModuleType(HOSTED_PACKAGE)
+        root.__path__ = []
+        sys.modules[HOSTED_PACKAGE] = root
+
+        # One manager for every hosted agent (PythonBaseAgent takes a per-agent view of it instead of building its own)
+        try:
+            from llm_manager import LLMManager
+            PythonBaseAgent.shared_llm_manager = LLMManager(agent_id='host')
+        except Exception as e:
+            logger.warning(f"Shared LLM manager initialization failed: {str(e)}")
+
+    def run(self):
+        """Read multiplexed messages until the bridge closes"""
+        framing = bridge_framing.negotiate()
+        self.send({**bridge_framing.hello(framing), 'agents': list(self.agents)})
+        self.bridge_framing = framing
+        logger.info(f"Agent host started (pid {os.getpid()}) and waiting for agents.")
+
+        for message in bridge_framing.read_messages(sys.stdin.buffer):
+            try:
+                self._on_message(message)
+            except Exception as e:
+                logger.error(f"Error processing message: {str(e)}")
+
+        for agent in list(self.agents.values()):
+            if agent._worker_pool is not None:
+                agent._worker_pool.shutdown()
+        bridge_writer.get_writer().flush(5.0)
+
+    def send(self, message: Dict[str, Any]):
+        bridge_writer.get_writer().send(message, self.bridge_framing)
+
+    def _on_message(self, message: Dict[str, Any]):
+        msg_type = message.get('type')
+        agent_id = message.get('agentId')
+
+        if msg_type == 'host_load':
+            with self._lock:
+                self._pending.setdefault(agent_id, [])
+            # Imports can take a while: keep routing messages for agents already loaded
+            threading.Thread(target=self._load, args=(message,), name=f'load-{agent_id}', daemon=True).start()
+        elif msg_type == 'host_unload':
+            self.unload_agent(agent_id)
+        else:
+            with self._lock:
+                agent = self.agents.get(agent_id)
+                if agent is None and agent_id in self._pending:
+                    self._pending[agent_id].append(message)
+                    return
+            if agent is None:
+                logger.warning(f"Message {msg_type} for unknown agent {agent_id}")
+                return
+            agent._handle_bridge_message(message)
+
+    def _load(self, message: Dict[str, Any]):
+        agent_id = message.get('agentId')
+        try:
+            agent = self.load_agent(agent_id, message['pythonPath'])
+        except Exception as e:
+            logger.error(f"Failed to load agent {agent_id}: {str(e)}")
+            with self._lock:
+                self._pending.pop(agent_id, None)
+            self.send({'type': 'host_error', 'agentId': agent_id, 'error': str(e)})
+            return
+
+        with self._lock:
+            previous = self.agents.get(agent_id)
+            self.agents[agent_id] = agent
+            pending = self._pending.pop(agent_id, [])
+        if previous is not None and previous._worker_pool is not None:
+            # Restarted by Node: the old instance finishes what it is running and stops
+            previous._worker_pool.shutdown()
+        agent._start_bridge()
+        logger.info(f"Agent host loaded {agent.name} as {agent_id}")
+        for queued in pending:
+            agent._handle_bridge_message(queued)
+
+    def load_agent(self, agent_id: str, python_path: str) -> PythonBaseAgent:
+        """Import an agent's main.py under its own package prefix and instantiate it"""
+        from async_base_agent import AsyncPythonBaseAgent
+
+        folder = os.path.dirname(os.path.abspath(python_path))
+        package = f"{HOSTED_PACKAGE}.{re.sub(r'[^0-9A-Za-z_]', '_', str(agent_id))}"
+
+        with self._load_lock:
+            for name in [n for n in sys.modules if n == package or n.startswith(package + '.')]:
+                # Reloading after a restart: start from fresh module objects
+                del sys.modules[name]
+            agent_package = types.ModuleType(package)
+            agent_package.__path__ = [folder]
+            sys.modules[package] = agent_package
+            self._imports.register(package, folder)
+
+            # Agents extend sys.path for standalone runs: shared folders (src/agents/core, ...) may
+            # stay, but the agent's own folder would expose its core/features to every other agent
+            saved_path = list(sys.path)
+            try:
+                spec = importlib.util.spec_from_file_location(f'{package}.main', python_path)
+                module = importlib.util.module_from_spec(spec)
+                module.__builtins__ = self._imports.builtins
+                sys.modules[spec.name] = module
+                spec.loader.exec_module(module)
+            finally:
+                added = [p for p in sys.path if p not in saved_path and not self._inside(p, folder)]
+                sys.path[:] = saved_path + added
+
+        agent_class = self._agent_class(module, package)
+        if issubclass(agent_class, AsyncPythonBaseAgent):
+            raise RuntimeError(f"{agent_class.__name__} runs on the asyncio runtime and needs its own process")
+
+        # Known from the first line of __init__: anything the agent sends while starting up is routed
+        PythonBaseAgent._hosting.agent_id = agent_id
+        try:
+            return agent_class()
+        finally:
+            PythonBaseAgent._hosting.agent_id = None
+
+    @staticmethod
+    def _inside(path: str, folder: str) -> bool:
+        path = os.path.abspath(path or '.')
+        return path == folder or path.startswith(folder + os.sep)
+
+    @staticmethod
+    def _agent_class(module, package: str) -> type:
+        candidates = [
+            value for value in vars(module).values()
+            if isinstance(value, type) and issubclass(value, PythonBaseAgent)
+            and value.__module__.startswith(package + '.')
+        ]
+        if not candidates:
+            raise RuntimeError(f"No PythonBaseAgent subclass found in {module.__file__}")
+        # main.py imports the agent from core.logic
+        candidates.sort(key=lambda cls: cls.__module__ != f'{package}.core.logic')
+        return candidates[0]
+
+    def unload_agent(self, agent_id: str):
+        with self._lock:
+            agent = self.agents.pop(agent_id, None)
+            self._pending.pop(agent_id, None)
+        if agent is None:
+            return
+        if agent._worker_pool is not None:
+            agent._worker_pool.shutdown()
+        logger.info(f"Agent host unloaded {agent_id}")
+
+    def get_state(self) -> Dict[str, Any]:
+        return {
+            'pid': os.getpid(),
+            'agents': sorted(self.agents),
+            'loading': sorted(self._pending),
+            'bridge': bridge_writer.get_writer().get_stats()
+        }
+
+
+if __name__ == "__main__":
+    AgentHost().run()
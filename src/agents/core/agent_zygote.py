@@ -0,0 +1,264 @@
+"""
+Pre-forking launcher (zygote) for Python agents
+
+A fresh agent process spends most of its startup importing the provider SDKs,
+dotenv and the bridge modules. The zygote imports all of that once, then
+forks a child per agent on request. The child starts with everything already
+imported, and pages the zygote never writes to are shared copy-on-write.
+
+Protocol (unix socket, AGENT_ZYGOTE_SOCKET, owner-only permissions):
+- Node connects and sends one JSON line: {type: 'spawn', agentPath, cwd, env}
+- the zygote forks; the child makes the connection its stdin/stdout, writes
+  {type: 'zygote_spawned', pid} and runs the agent's main.py as __main__, so
+  the connection then carries the normal bridge stream
+- when the child exits the zygote reaps it and writes {type: 'zygote_exit',
+  pid, code, signal} before closing the connection
+- requests it cannot serve get {type: 'zygote_error', error}
+
+The zygote prints {type: 'zygote_ready', ...} on its own stdout once it
+listens, and exits when its stdin closes (the Node server went away).
+Unix only: Node spawns agents directly where fork/AF_UNIX are unavailable.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import runpy
+import signal
+import socket
+import tempfile
+import logging
+import importlib
+import selectors
+import threading
+import traceback
+from typing import Any, Dict, List
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s', stream=sys.stderr)
+logger = logging.getLogger(__name__)
+
+# Imported before forking; anything missing is skipped
+PRELOAD_MODULES = [
+    'dotenv',
+    'msgpack',
+    'bridge_framing',
+    'bridge_writer',
+    'worker_pool',
+    'base_agent',
+    'async_base_agent',
+    'llm_manager',
+    'AgentProtocol',
+    'anthropic',
+    'openai',
+    'google.genai',
+    'tiktoken',
+]
+MAX_REQUEST_BYTES = 64 * 1024
+REQUEST_TIMEOUT = 5.0
+
+
+def preload(modules: List[str] = PRELOAD_MODULES) -> Dict[str, float]:
+    """Import modules once in the zygote; returns the seconds each took"""
+    timings = {}
+    for name in modules:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logger.debug(f"Zygote preload skipped {name}: {str(e)}")
+            continue
+        timings[name] = round(time.perf_counter() - started, 4)
+    return timings
+
+
+class AgentZygote:
+    """Accepts spawn requests on a unix socket and forks an agent for each"""
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self.children: Dict[int, socket.socket] = {}
+        self.selector = selectors.DefaultSelector()
+        self.listener = None
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self.preloaded: Dict[str, float] = {}
+
+    def serve(self):
+        self.preloaded = preload()
+        if threading.active_count() > 1:
+            # Only the forking thread survives in the children
+            logger.warning(f"Zygote has {threading.active_count()} threads after preloading; children only keep the main one")
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            self.listener.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        self.listener.listen(64)
+
+        # SIGCHLD wakes the selector so exits are reported immediately
+        self._wakeup_w.setblocking(False)
+        signal.set_wakeup_fd(self._wakeup_w.fileno())
+        signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+        self.selector.register(self.listener, selectors.EVENT_READ, 'accept')
+        self.selector.register(self._wakeup_r, selectors.EVENT_READ, 'reap')
+        self.selector.register(sys.stdin, selectors.EVENT_READ, 'stdin')
+
+        self._print({
+            'type': 'zygote_ready',
+            'pid': os.getpid(),
+            'socket': self.socket_path,
+            'preloaded': self.preloaded
+        })
+        logger.info(f"Agent zygote ready on {self.socket_path} ({len(self.preloaded)} modules preloaded)")
+
+        try:
+            self._loop()
+        finally:
+            self.listener.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def _loop(self):
+        while True:
+            for key, _ in self.selector.select():
+                if key.data == 'accept':
+                    conn, _ = self.listener.accept()
+                    self._handle_request(conn)
+                elif key.data == 'reap':
+                    try:
+                        self._wakeup_r.recv(4096)
+                    except BlockingIOError:
+                        pass
+                    self._reap()
+                elif key.data == 'stdin':
+                    if not os.read(sys.stdin.fileno(), 4096):
+                        logger.info("Agent zygote: bridge closed, stopping")
+                        return
+            # Signals can coalesce: collect every child that has exited
+            self._reap()
+
+    def _read_request(self, conn: socket.socket) -> Dict[str, Any]:
+        # One byte at a time: whatever follows the request line belongs to the child's stdin
+        conn.settimeout(REQUEST_TIMEOUT)
+        data = bytearray()
+        while not data.endswith(b'\n'):
+            chunk = conn.recv(1)
+            if not chunk:
+                raise ValueError("Connection closed before the spawn request")
+            data += chunk
+            if len(data) > MAX_REQUEST_BYTES:
+                raise ValueError("Spawn request too large")
+        conn.settimeout(None)
+        return json.loads(data)
+
+    def _handle_request(self, conn: socket.socket):
+        try:
+            request = self._read_request(conn)
+            if request.get('type') != 'spawn':
+                raise ValueError(f"Unknown zygote request: {request.get('type')}")
+            agent_path = os.path.abspath(os.path.join(request.get('cwd') or os.getcwd(), request['agentPath']))
+            if not os.path.isfile(agent_path):
+                raise FileNotFoundError(f"Agent not found: {agent_path}")
+        except Exception as e:
+            logger.error(f"Agent zygote: rejected spawn request: {str(e)}")
+            self._send_line(conn, {'type': 'zygote_error', 'error': str(e)})
+            conn.close()
+            return
+
+        pid = os.fork()
+        if pid == 0:
+            self._run_child(conn, agent_path, request)
+        # The child owns the stream now; the zygote keeps its copy only to report the exit
+        self.children[pid] = conn
+        logger.info(f"Agent zygote: forked {pid} for {agent_path}")
+
+    def _reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            conn = self.children.pop(pid, None)
+            if conn is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            self._send_line(conn, {
+                'type': 'zygote_exit',
+                'pid': pid,
+                'code': code if code >= 0 else None,
+                'signal': signal.Signals(-code).name if code < 0 else None
+            })
+            conn.close()
+
+    def _run_child(self, conn: socket.socket, agent_path: str, request: Dict[str, Any]):
+        """In the forked child: become the agent process (never returns)"""
+        code = 1
+        try:
+            signal.set_wakeup_fd(-1)
+            for signum in (signal.SIGCHLD, signal.SIGTERM):
+                signal.signal(signum, signal.SIG_DFL)
+            self.selector.close()
+            self.listener.close()
+            self._wakeup_r.close()
+            self._wakeup_w.close()
+            for other in self.children.values():
+                other.close()
+
+            # The connection becomes this process's bridge stream
+            os.dup2(conn.fileno(), 0)
+            os.dup2(conn.fileno(), 1)
+            conn.close()
+            sys.stdin = io.TextIOWrapper(io.BufferedReader(io.FileIO(0, 'rb', closefd=False)), encoding='utf-8')
+            sys.stdout = io.TextIOWrapper(io.BufferedWriter(io.FileIO(1, 'wb', closefd=False)), encoding='utf-8', line_buffering=True)
+
+            os.environ.update({k: str(v) for k, v in (request.get('env') or {}).items()})
+            if request.get('cwd'):
+                os.chdir(request['cwd'])
+            # Same view of the world as `python main.py`
+            sys.argv = [agent_path]
+            sys.path.insert(0, os.path.dirname(agent_path))
+            formatter = logging.Formatter(f'[{os.path.basename(os.path.dirname(agent_path))}] %(levelname)s: %(message)s')
+            for handler in logging.getLogger().handlers:
+                handler.setFormatter(formatter)
+
+            self._print({'type': 'zygote_spawned', 'pid': os.getpid()})
+            runpy.run_path(agent_path, run_name='__main__')
+            code = 0
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                os._exit(code)
+
+    @staticmethod
+    def _send_line(conn: socket.socket, message: Dict[str, Any]):
+        try:
+            conn.sendall((json.dumps(message) + '\n').encode('utf-8'))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _print(message: Dict[str, Any]):
+        sys.stdout.write(json.dumps(message) + '\n')
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    socket_path = os.getenv('AGENT_ZYGOTE_SOCKET') or os.path.join(tempfile.gettempdir(), f'agent-zygote-{os.getpid()}.sock')
+    AgentZygote(socket_path).serve()
@@ -0,0 +1,347 @@
+"""
+Asyncio runtime for Python agents
+
+AsyncBridgeRuntime drives an agent from a single event loop: it reads the
+bridge stream with asyncio, schedules requests on an AsyncWorkerPool (same
+priorities and backpressure as the threaded pool) and resolves MCP tool calls
+as futures instead of parking a thread on a Condition for each one.
+
+AsyncPythonBaseAgent is the base class for agents written as coroutines:
+
+    class MyAgent(AsyncPythonBaseAgent):
+        async def execute_task_async(self, task):
+            pkg, readme = await asyncio.gather(
+                self.call_mcp_tool_async(None, 'project_read_file', {'filePath': 'package.json'}),
+                self.call_mcp_tool_async(None, 'project_read_file', {'filePath': 'README.md'})
+            )
+            return {'summary': await self.llm_manager.agenerate_response(...)}
+
+Sync-compatible shim: any hook that is not overridden with a coroutine falls
+back to the regular sync method (execute_task, handle_message,
+handleChatMessage) on an executor thread, where call_mcp_tool blocks as usual.
+Existing PythonBaseAgent subclasses (ProjectManager, StrategyAgent, ...) run
+on this runtime unchanged with AGENT_RUNTIME=async.
+"""
+
+import os
+import sys
+import asyncio
+import logging
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+# Sibling modules in src/agents/core are imported flat, like base_agent does
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import bridge_framing
+import bridge_writer
+from base_agent import PythonBaseAgent, chat_request_id, TOOL_CALL_TIMEOUT
+from tool_cache import MISS
+from cancellation import current_scope, budget
+from worker_pool import AsyncWorkerPool, DEFAULT_WORKERS, ASYNC_DEFAULT_WORKERS, CHAT, TASK, MESSAGE
+
+logger = logging.getLogger(__name__)
+
+# JSON lines carry whole files (project_read_file results), well beyond asyncio's 64 KiB default
+MAX_LINE_BYTES = 64 * 1024 * 1024
+# Executor threads beyond the pool limits, for blocking helpers (stdin fallback, run_in_thread)
+EXTRA_THREADS = 4
+
+
+class AsyncBridgeRuntime:
+    """Event loop that reads bridge messages and runs an agent's handlers"""
+
+    def __init__(self, agent: PythonBaseAgent):
+        self.agent = agent
+        self.native = isinstance(agent, AsyncPythonBaseAgent)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.pool: Optional[AsyncWorkerPool] = None
+        self._tool_futures: Dict[int, asyncio.Future] = {}
+
+    def run(self):
+        asyncio.run(self._main())
+
+    def in_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    async def _main(self):
+        self.loop = asyncio.get_running_loop()
+        # Native agents hold coroutines, shimmed ones a thread per running request
+        self.pool = AsyncWorkerPool(
+            on_depth_change=self.agent._report_queue_depth,
+            defaults=ASYNC_DEFAULT_WORKERS if self.native else DEFAULT_WORKERS
+        )
+        workers = EXTRA_THREADS + (0 if self.native else sum(self.pool.limits.values()))
+        self.loop.set_default_executor(ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'{self.agent.agent_id}-shim'))
+        self.agent._runtime = self
+        logger.info(f"Python agent {self.agent.name} started on the asyncio runtime and waiting for commands.")
+
+        self.agent._start_bridge()
+        async for message in self._read_messages():
+            try:
+                self._on_message(message)
+            except Exception as e:
+                logger.error(f"Error processing message: {str(e)}")
+
+        # Bridge closed: let requests already accepted finish
+        await self.pool.drain()
+        bridge_writer.get_writer().flush(5.0)
+
+    async def _read_messages(self):
+        reader = asyncio.StreamReader(limit=MAX_LINE_BYTES)
+        try:
+            await self.loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        except (NotImplementedError, ValueError, OSError):
+            # Redirected files and Windows consoles are not pipes the loop can watch
+            messages = bridge_framing.read_messages(sys.stdin.buffer)
+            while True:
+                message = await self.loop.run_in_executor(None, next, messages, None)
+                if message is None:
+                    return
+                yield message
+        else:
+            async for message in bridge_framing.aread_messages(reader):
+                yield message
+
+    def _on_message(self, message: Dict[str, Any]):
+        if message.get('type') == 'tool_response':
+            future = self._tool_futures.pop(message.get('requestId'), None)
+            if future is None:
+                # A blocking call_mcp_tool from a shim thread
+                self.agent._on_tool_response(message.get('requestId'), message)
+            elif not future.done():
+                if 'error' in message:
+                    future.set_exception(Exception(message['error']))
+                else:
+                    future.set_result(message.get('result'))
+            return
+        self.agent._handle_bridge_message(message)
+
+    def submit(self, kind, handler, *args, priority=None, on_reject=None):
+        """Schedule a bridge handler; sync handlers run on executor threads"""
+        if asyncio.iscoroutinefunction(handler):
+            coro_fn = handler
+        else:
+            async def coro_fn(*handler_args):
+                await self.run_in_thread(handler, *handler_args)
+        self.pool.submit(kind, coro_fn, *args, priority=priority, on_reject=on_reject)
+
+    async def run_in_thread(self, fn, *args):
+        """Run a blocking function on the executor, keeping context variables (chat request id)"""
+        context = contextvars.copy_context()
+        return await self.loop.run_in_executor(None, functools.partial(context.run, fn, *args))
+
+    async def call_tool(self, mcp_name, tool_name, args=None, timeout: float = TOOL_CALL_TIMEOUT):
+        return (await self.call_tools([(mcp_name, tool_name, args)], timeout, batch=False))[0]
+
+    async def call_tools(self, calls, timeout: float = TOOL_CALL_TIMEOUT, batch: bool = True, return_exceptions: bool = False) -> List[Any]:
+        """Put every call on the wire at once and gather the results in order"""
+        scope = current_scope()
+        if scope is not None:
+            scope.check()
+        timeout = budget(timeout)
+        calls = [self.agent._normalize_tool_call(call) for call in calls]
+        cache = self.agent.tool_cache
+        envelopes = []
+        futures = []
+        for mcp_name, tool_name, args in calls:
+            future = self.loop.create_future()
+            futures.append(future)
+            cached = cache.get(tool_name, args)
+            if cached is not MISS:
+                self.agent.metrics.counter('tool_cache_hits', tool=tool_name).inc()
+                future.set_result(cached)
+                continue
+
+            request_id = self.agent._next_request_id()
+            token = cache.begin(tool_name, args)
+            future.add_done_callback(functools.partial(self._complete_cached, tool_name, args, token))
+            future.add_done_callback(self.agent._tool_metrics_callback(tool_name))
+            self._tool_futures[request_id] = future
+            envelopes.append({
+                'type': 'tool_call',
+                'requestId': request_id,
+                'mcpName': mcp_name,
+                'toolName': tool_name,
+                'args': args or {}
+            })
+        if batch and len(envelopes) > 1:
+            self.agent.send_to_bridge({'type': 'tool_call_batch', 'calls': envelopes})
+        else:
+            for envelope in envelopes:
+                self.agent.send_to_bridge(envelope)
+
+        if not envelopes:
+            # Everything came from the tool cache
+            return [future.result() for future in futures]
+        try:
+            await asyncio.wait(futures, timeout=timeout)
+        finally:
+            abandoned = [
+                envelope['requestId'] for envelope in envelopes
+                if self._tool_futures.pop(envelope['requestId'], None) is not None
+            ]
+            if abandoned:
+                # Timed out or the awaiting task was cancelled: Node can drop these
+                self.agent.send_to_bridge({'type': 'tool_cancel', 'requestIds': abandoned})
+
+        results = []
+        for (mcp_name, tool_name, _), future in zip(calls, futures):
+            if future.done():
+                error = future.exception()
+                result = future.result() if error is None else error
+            else:
+                future.cancel()
+                if scope is not None and scope.cancelled:
+                    error = result = scope.error()
+                else:
+                    error = result = TimeoutError(f"Tool call {mcp_name}.{tool_name} timed out")
+            if error is not None and not return_exceptions:
+                raise error
+            results.append(result)
+        return results
+
+    def _complete_cached(self, tool_name, args, token, future: asyncio.Future):
+        if not future.cancelled() and future.exception() is None:
+            self.agent.tool_cache.complete(tool_name, args, token, future.result())
+
+
+class AsyncPythonBaseAgent(PythonBaseAgent):
+    """
+    Base class for agents implemented with coroutines.
+    Override the *_async hooks; anything left alone runs the sync method on a thread.
+    """
+
+    def run(self):
+        """Main loop, always on the asyncio runtime"""
+        AsyncBridgeRuntime(self).run()
+
+    # Sync entry points are optional here; override these or their *_async versions
+
+    def execute_task(self, task):
+        raise NotImplementedError(f"{type(self).__name__} must implement execute_task_async or execute_task")
+
+    def handle_message(self, message):
+        raise NotImplementedError(f"{type(self).__name__} must implement handle_message_async or handle_message")
+
+    async def execute_task_async(self, task):
+        return await self.run_in_thread(self.execute_task, task)
+
+    async def handle_message_async(self, message):
+        return await self.run_in_thread(self.handle_message, message)
+
+    async def handle_chat_async(self, user_message: str, history=None, task_id: str = None, project_id: str = None) -> dict:
+        return await self.run_in_thread(self.handleChatMessage, user_message, history, task_id, project_id)
+
+    async def run_in_thread(self, fn, *args):
+        """Await a blocking function without stalling the event loop"""
+        return await self._runtime.run_in_thread(fn, *args)
+
+    def _handle_bridge_message(self, message):
+        msg_type = message.get('type')
+        request_id = message.get('requestId')
+
+        if msg_type in ('execute_task', 'handle_message', 'handle_chat'):
+            self._open_scope(message)
+
+        if msg_type == 'execute_task':
+            task = message.get('task') or {}
+            self._dispatch(TASK, request_id, task.get('priority'), self._aon_execute_task, request_id, task)
+        elif msg_type == 'handle_message':
+            agent_message = message.get('message')
+            self._dispatch(MESSAGE, request_id, self._message_priority(agent_message), self._aon_handle_message, request_id, agent_message)
+        elif msg_type == 'handle_chat':
+            self._dispatch(CHAT, request_id, message.get('priority'), self._aon_handle_chat, request_id, message, message.get('history'))
+        else:
+            # tool_response, cache_invalidate, ...
+            super()._handle_bridge_message(message)
+
+    async def _ascoped(self, request_id, metric, labels, coro_fn, *args):
+        """
+        Await a handler inside its request's CancelScope. The handler runs as its own
+        task, cancelled on cancel_task or once the deadline passes, so pending tool
+        calls and LLM requests are abandoned with it.
+        """
+        with self._request_scope(request_id, metric, **labels) as scope:
+            handler = asyncio.ensure_future(coro_fn(*args))
+            loop = asyncio.get_running_loop()
+            unregister = scope.on_cancel(lambda: loop.call_soon_threadsafe(handler.cancel))
+            try:
+                done, _ = await asyncio.wait({handler}, timeout=scope.remaining())
+            except asyncio.CancelledError:
+                handler.cancel()
+                raise
+            finally:
+                unregister()
+            if not done or handler.cancelled():
+                handler.cancel()
+                raise scope.error()
+            return handler.result()
+
+    async def _aon_execute_task(self, request_id, task):
+        try:
+            logger.info(f"Executing task: {task.get('description')}")
+            result = await self._ascoped(request_id, 'task_seconds', {'type': task.get('type') or 'unknown'}, self.execute_task_async, task)
+            self.send_to_bridge({'type': 'response', 'requestId': request_id, 'result': result})
+        except Exception as e:
+            logger.error(f"Task execution failed: {str(e)}")
+            self.send_to_bridge({'type': 'response', 'requestId': request_id, 'error': str(e)})
+
+    async def _aon_handle_message(self, request_id, message):
+        try:
+            result = await self._ascoped(request_id, 'message_seconds', {'type': self._message_type(message)}, self.handle_message_async, message)
+            self.send_to_bridge({'type': 'response', 'requestId': request_id, 'result': result})
+        except Exception as e:
+            self.send_to_bridge({'type': 'response', 'requestId': request_id, 'error': str(e)})
+
+    async def _aon_handle_chat(self, request_id, message_data, history):
+        try:
+            user_message, task_id, project_id = self._parse_chat(message_data)
+            token = chat_request_id.set(request_id)
+            try:
+                result = await self._ascoped(request_id, 'chat_seconds', {}, self.handle_chat_async, user_message, history, task_id, project_id)
+            finally:
+                chat_request_id.reset(token)
+            self.send_to_bridge({'type': 'response', 'requestId': request_id, 'result': result})
+        except Exception as e:
+            logger.error(f"[{self.name}] Chat handler error: {str(e)}")
+            self.send_to_bridge({'type': 'response', 'requestId': request_id, 'error': str(e)})
+
+    def call_mcp_tool(self, mcp_name, tool_name, args=None):
+        """
+        Call an MCP tool via the Node.js bridge. On the event loop this returns an
+        awaitable future (the request is sent immediately); from shim threads it
+        blocks like PythonBaseAgent.call_mcp_tool.
+        """
+        if self._runtime is not None and self._runtime.in_loop():
+            return asyncio.ensure_future(self.call_mcp_tool_async(mcp_name, tool_name, args))
+        return super().call_mcp_tool(mcp_name, tool_name, args)
+
+    async def call_mcp_tool_async(self, mcp_name, tool_name, args=None, timeout: float = TOOL_CALL_TIMEOUT):
+        """Await an MCP tool result without holding a thread"""
+        return await self._on_runtime(self._runtime_or_fail().call_tool(mcp_name, tool_name, args, timeout))
+
+    def call_mcp_tools(self, calls, timeout=TOOL_CALL_TIMEOUT, batch=True, return_exceptions=False):
+        """Concurrent tool calls: awaitable on the event loop, blocking from shim threads"""
+        if self._runtime is not None and self._runtime.in_loop():
+            return asyncio.ensure_future(self.call_mcp_tools_async(calls, timeout, batch, return_exceptions))
+        return super().call_mcp_tools(calls, timeout, batch, return_exceptions)
+
+    async def call_mcp_tools_async(self, calls, timeout: float = TOOL_CALL_TIMEOUT, batch: bool = True, return_exceptions: bool = False) -> List[Any]:
+        """Await several tool calls sent together (see PythonBaseAgent.call_mcp_tools)"""
+        return await self._on_runtime(self._runtime_or_fail().call_tools(calls, timeout, batch, return_exceptions))
+
+    def _runtime_or_fail(self) -> AsyncBridgeRuntime:
+        if self._runtime is None:
+            raise RuntimeError("Async tool calls require the asyncio runtime (call run() first)")
+        return self._runtime
+
+    async def _on_runtime(self, coro):
+        """Await a runtime coroutine, hopping onto its loop when called from another one"""
+        if self._runtime.in_loop():
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._runtime.loop))
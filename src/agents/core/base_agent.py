@@ -1,35 +1,87 @@
+import os
 import sys
+import re
 import json
+import time
+import inspect
 import logging
+import itertools
 import threading
+import functools
+import contextlib
+import contextvars
+from concurrent.futures import Future, wait, TimeoutError as FutureTimeoutError
 from typing import Dict, Any, Optional, List, Union
 from abc import ABC, abstractmethod
 
+# Sibling modules in src/agents/core are imported flat, also when this module is imported as core.base_agent
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import bridge_framing
+import bridge_writer
+from worker_pool import PriorityWorkerPool, CHAT, TASK, MESSAGE
+from tool_cache import ToolResultCache, MISS
+from cancellation import CancelScope, TaskCancelled, current_scope, budget
+from metrics import MetricsRegistry
+import profiler
+
 # Configure basic logging to stderr so it doesn't interfere with stdout JSON
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s', stream=sys.stderr)
 logger = logging.getLogger(__name__)
 
+TOOL_CALL_TIMEOUT = 60
+
+# Chat request being handled in the current thread or asyncio task (lets handleChatMessage stream partial responses)
+chat_request_id = contextvars.ContextVar('chat_request_id', default=None)
+
 class PythonBaseAgent(ABC):
     """
     Base class for Python-implemented agents.
     Handles JSON-RPC communication with the Node.js bridge via StdIn/StdOut.
     """
+    # Set by agent_host.py: every agent in the host process uses this manager instead of its own
+    shared_llm_manager = None
+    # agent_host.py sets agent_id here while it constructs an agent, so output sent from __init__ is routed
+    _hosting = threading.local()
+
     def __init__(self, agent_id, name):
         self.agent_id = agent_id
         self.name = name
         self.pending_tool_calls = {}
-        self.request_id_counter = 0
+        self._request_ids = itertools.count()
+
+        # Bounded, prioritized dispatch of bridge requests (see worker_pool.py), created on first use
+        self._worker_pool = None
+        self._worker_pool_lock = threading.Lock()
+        self._last_queue_report = (0, None)
+        self._queue_report_lock = threading.Lock()
+        # Set when an AsyncBridgeRuntime drives this agent (AGENT_RUNTIME=async)
+        self._runtime = None
+        # JSON lines until run() negotiates the bridge framing
+        self.bridge_framing = bridge_framing.JSON
+        # Bridge id stamped on outgoing messages when several agents share one process (agent_host.py)
+        self.bridge_agent_id = getattr(PythonBaseAgent._hosting, 'agent_id', None)
+        # Read-only project tool results (project_get, project_read_file, ...), see tool_cache.py
+        self.tool_cache = ToolResultCache()
+        # Latency histograms and counters returned by get_metrics (see metrics.py)
+        self.metrics = MetricsRegistry()
+        # Deadline / cancel state of requests received and not finished yet, by bridge requestId
+        self._scopes: Dict[Any, CancelScope] = {}
+        self._scopes_lock = threading.Lock()
         
         # Initialize LLM manager for intelligent responses
         self.llm_manager = None
+        if PythonBaseAgent.shared_llm_manager is not None:
+            # Shared clients and limits, this agent's own stats
+            self.llm_manager = PythonBaseAgent.shared_llm_manager.for_agent(agent_id)
+            return
         try:
             # Try absolute path first
             try:
                 from core.llm_manager import LLMManager
-                self.llm_manager = LLMManager()
+                self.llm_manager = LLMManager(agent_id=agent_id)
             except ImportError:
                 from llm_manager import LLMManager
-                self.llm_manager = LLMManager()
+                self.llm_manager = LLMManager(agent_id=agent_id)
                 
             if self.llm_manager and self.llm_manager.providers:
                 logger.info(f"[{self.name}] LLM manager initialized with providers: {list(self.llm_manager.providers.keys())}")
@@ -40,10 +92,16 @@ class PythonBaseAgent(ABC):
 
     def run(self):
         """Main loop to read from stdin and process commands"""
+        if os.getenv('AGENT_RUNTIME', 'threaded').lower() == 'async':
+            # Same agent on the asyncio runtime; its sync handlers run on executor threads
+            from async_base_agent import AsyncBridgeRuntime
+            AsyncBridgeRuntime(self).run()
+            return
+
+        self._start_bridge()
         logger.info(f"Python agent {self.name} started and waiting for commands.")
         
         # Start input listener in a separate thread to allow blocking tool calls
-        import threading
         self.input_thread = threading.Thread(target=self._input_listener, daemon=True)
         self.input_thread.start()
         
@@ -53,17 +111,19 @@ class PythonBaseAgent(ABC):
                 self.input_thread.join(1.0)
         except KeyboardInterrupt:
             logger.info("Agent stopping...")
+        bridge_writer.get_writer().flush(5.0)
+
+    def _start_bridge(self):
+        """Announce readiness and the framing this agent sends from now on"""
+        framing = bridge_framing.negotiate()
+        self.send_to_bridge(bridge_framing.hello(framing))
+        self.bridge_framing = framing
 
     def _input_listener(self):
-        """Reads stdin in a separate thread"""
-        for line in sys.stdin:
+        """Reads stdin in a separate thread (JSON lines and msgpack frames)"""
+        for message in bridge_framing.read_messages(sys.stdin.buffer):
             try:
-                line = line.strip()
-                if not line: continue
-                message = json.loads(line)
                 self._handle_bridge_message(message)
-            except json.JSONDecodeError:
-                logger.error(f"Failed to decode message: {line}")
             except Exception as e:
                 logger.error(f"Error processing message: {str(e)}")
 
@@ -71,40 +131,164 @@ class PythonBaseAgent(ABC):
         msg_type = message.get('type')
         request_id = message.get('requestId')
 
+        if msg_type in ('execute_task', 'handle_message', 'handle_chat'):
+            self._open_scope(message)
+
         if msg_type == 'execute_task':
-            task = message.get('task')
-            # Execute task in a thread to not block input
-            executor_thread = threading.Thread(
-                target=self._on_execute_task, 
-                args=(request_id, task)
-            )
-            executor_thread.start()
-            
+            task = message.get('task') or {}
+            self._dispatch(TASK, request_id, task.get('priority'), self._on_execute_task, request_id, task)
+
         elif msg_type == 'handle_message':
             agent_message = message.get('message')
-            executor_thread = threading.Thread(
-                target=self._on_handle_message, 
-                args=(request_id, agent_message)
-            )
-            executor_thread.start()
-            
+            self._dispatch(MESSAGE, request_id, self._message_priority(agent_message), self._on_handle_message, request_id, agent_message)
+
         elif msg_type == 'handle_chat':
             history = message.get('history')
-            executor_thread = threading.Thread(
-                target=self._on_handle_chat, 
-                args=(request_id, message, history)
-            )
-            executor_thread.start()
-            
+            self._dispatch(CHAT, request_id, message.get('priority'), self._on_handle_chat, request_id, message, history)
+
         elif msg_type == 'tool_response':
             self._on_tool_response(request_id, message)
+
+        elif msg_type == 'cache_invalidate':
+            # Another agent or the API wrote a project or file this agent may have cached
+            self.tool_cache.invalidate(message.get('toolName'), message.get('args'))
+
+        elif msg_type == 'cancel_task':
+            self.cancel_request(message.get('requestId'), message.get('taskId'), message.get('reason') or 'cancelled')
+
+        elif msg_type == 'get_metrics':
+            # Answered inline: it must work while the work queue is saturated
+            self.send_to_bridge({'type': 'response', 'requestId': request_id, 'result': self.get_metrics()})
+
+        elif msg_type == 'profile':
+            self._start_profile(request_id, message)
         else:
             logger.warning(f"Unknown message type from bridge: {msg_type}")
 
+    @property
+    def worker_pool(self) -> PriorityWorkerPool:
+        with self._worker_pool_lock:
+            if self._worker_pool is None:
+                self._worker_pool = PriorityWorkerPool(on_depth_change=self._report_queue_depth, name=str(self.agent_id))
+            return self._worker_pool
+
+    def _dispatch(self, kind, request_id, priority, handler, *args):
+        """Queue a request on the worker pool, answering queue_full if it is rejected"""
+        on_reject = self._queue_full_notifier(kind, request_id, priority)
+        handler = profiler.profiled(self._queue_timed(kind, handler))
+        if self._runtime is not None:
+            self._runtime.submit(kind, handler, *args, priority=priority, on_reject=on_reject)
+        else:
+            self.worker_pool.submit(kind, handler, *args, priority=priority, on_reject=on_reject)
+
+    def _queue_timed(self, kind, handler):
+        """Wrap a handler to record how long its request waited in the work queue"""
+        histogram = self.metrics.histogram('queue_wait_seconds', kind=kind)
+        enqueued = time.monotonic()
+        if inspect.iscoroutinefunction(handler):
+            async def timed(*args):
+                histogram.record(time.monotonic() - enqueued)
+                return await handler(*args)
+        else:
+            def timed(*args):
+                histogram.record(time.monotonic() - enqueued)
+                return handler(*args)
+        return timed
+
+    def _queue_full_notifier(self, kind, request_id, priority):
+        def on_reject(state):
+            with self._scopes_lock:
+                self._scopes.pop(request_id, None)
+            self.send_to_bridge({
+                'type': 'queue_full',
+                'requestId': request_id,
+                'messageType': kind,
+                'priority': priority or 'medium',
+                'queueDepth': state['queueDepth'],
+                'maxQueue': state['maxQueue']
+            })
+        return on_reject
+
+    @staticmethod
+    def _message_priority(message) -> Optional[str]:
+        """AgentProtocol priority of an agent message (top level or in its payload)"""
+        if not isinstance(message, dict):
+            return None
+        data = message.get('data') if isinstance(message.get('data'), dict) else {}
+        return message.get('priority') or data.get('priority')
+
+    @staticmethod
+    def _message_type(message) -> str:
+        return (message.get('type') if isinstance(message, dict) else None) or 'unknown'
+
+    def _report_queue_depth(self, state):
+        """Tell the bridge how backed up this agent is (only when it changes)"""
+        report = (state['queueDepth'], tuple(sorted(state['running'].items())))
+        with self._queue_report_lock:
+            last_version, last_report = self._last_queue_report
+            if state['version'] <= last_version or report == last_report:
+                return
+            self._last_queue_report = (state['version'], report)
+            self.send_to_bridge({
+                'type': 'queue_depth',
+                'queueDepth': state['queueDepth'],
+                'maxQueue': state['maxQueue'],
+                'queued': state['queued'],
+                'running': state['running'],
+                'limits': state['limits']
+            })
+
+    def _open_scope(self, message):
+        task = message.get('task') if isinstance(message.get('task'), dict) else None
+        scope = CancelScope.for_request(message, task)
+        with self._scopes_lock:
+            self._scopes[message.get('requestId')] = scope
+
+    @contextlib.contextmanager
+    def _request_scope(self, request_id, metric=None, **labels):
+        """
+        Run a request handler inside its CancelScope (dropped once the handler returns).
+        With metric, its duration is recorded in that histogram by labels and outcome.
+        """
+        with self._scopes_lock:
+            scope = self._scopes.get(request_id) or CancelScope(request_id=request_id)
+        started = time.monotonic()
+        outcome = 'ok'
+        try:
+            with scope:
+                # Cancelled or expired while it was queued: do not start it
+                scope.check()
+                yield scope
+        except TaskCancelled:
+            outcome = 'cancelled'
+            raise
+        except Exception:
+            outcome = 'error'
+            raise
+        finally:
+            with self._scopes_lock:
+                if self._scopes.get(request_id) is scope:
+                    del self._scopes[request_id]
+            if metric:
+                self.metrics.histogram(metric, outcome=outcome, **labels).record(time.monotonic() - started)
+
+    def cancel_request(self, request_id=None, task_id=None, reason='cancelled') -> int:
+        """Cancel running or queued requests by bridge requestId or task id; returns how many"""
+        with self._scopes_lock:
+            scopes = [
+                scope for key, scope in self._scopes.items()
+                if (request_id is not None and key == request_id) or (task_id is not None and scope.task_id == task_id)
+            ]
+        for scope in scopes:
+            logger.info(f"[{self.name}] Cancelling request {scope.request_id} (task {scope.task_id}): {reason}")
+            scope.cancel(reason)
+        return len(scopes)
+
     def _on_execute_task(self, request_id, task):
         try:
             logger.info(f"Executing task: {task.get('description')}")
-            result = self.execute_task(task)
+            with self._request_scope(request_id, 'task_seconds', type=task.get('type') or 'unknown'):
+                result = self.execute_task(task)
             self.send_to_bridge({
                 'type': 'response',
                 'requestId': request_id,
@@ -120,7 +304,8 @@ class PythonBaseAgent(ABC):
 
     def _on_handle_message(self, request_id, message):
         try:
-            result = self.handle_message(message)
+            with self._request_scope(request_id, 'message_seconds', type=self._message_type(message)):
+                result = self.handle_message(message)
             self.send_to_bridge({
                 'type': 'response',
                 'requestId': request_id,
@@ -133,18 +318,27 @@ class PythonBaseAgent(ABC):
                 'error': str(e)
             })
 
+    def _parse_chat(self, message_data):
+        """(user_message, task_id, project_id) of a handle_chat request"""
+        user_message = message_data.get('message', '') if isinstance(message_data, dict) else message_data
+        task_id = message_data.get('taskId') if isinstance(message_data, dict) else None
+        project_id = message_data.get('projectId') if isinstance(message_data, dict) else None
+        
+        # Keep track of the current project context
+        if project_id and project_id != 'all' and project_id != 'unassigned':
+            self.current_project_id = project_id
+        return user_message, task_id, project_id
+
     def _on_handle_chat(self, request_id, message_data, history):
         """Handle chat message from user"""
         try:
-            user_message = message_data.get('message', '') if isinstance(message_data, dict) else message_data
-            task_id = message_data.get('taskId') if isinstance(message_data, dict) else None
-            project_id = message_data.get('projectId') if isinstance(message_data, dict) else None
-            
-            # Keep track of the current project context
-            if project_id and project_id != 'all' and project_id != 'unassigned':
-                self.current_project_id = project_id
-            
-            result = self.handleChatMessage(user_message, history, task_id, project_id)
+            user_message, task_id, project_id = self._parse_chat(message_data)
+            token = chat_request_id.set(request_id)
+            try:
+                with self._request_scope(request_id, 'chat_seconds'):
+                    result = self.handleChatMessage(user_message, history, task_id, project_id)
+            finally:
+                chat_request_id.reset(token)
             self.send_to_bridge({
                 'type': 'response',
                 'requestId': request_id,
@@ -158,55 +352,202 @@ class PythonBaseAgent(ABC):
                 'error': str(e)
             })
 
+    def _next_request_id(self) -> int:
+        # itertools.count is atomic under the GIL, so concurrent workers never share an id
+        return next(self._request_ids)
+
     def call_mcp_tool(self, mcp_name, tool_name, args=None):
         """Call an MCP tool via the Node.js bridge (Synchronous from caller perspective)"""
-        request_id = self.request_id_counter
-        self.request_id_counter += 1
-        
-        # Create a condition variable to wait on
-        import threading
-        condition = threading.Condition()
-        future = {'ready': False, 'result': None, 'error': None, 'condition': condition}
-        
-        # Use a lock to safely modify pending_tool_calls
-        # (Assuming simple GIL protection is enough for dict ops, but explicit is better if complex)
-        self.pending_tool_calls[request_id] = future
-        
-        self.send_to_bridge({
-            'type': 'tool_call',
-            'requestId': request_id,
-            'mcpName': mcp_name,
-            'toolName': tool_name,
-            'args': args or {}
-        })
-        
-        # Wait for response
-        with condition:
-            # 60s timeout
-            if not condition.wait(60):
-                del self.pending_tool_calls[request_id]
-                raise TimeoutError(f"Tool call {mcp_name}.{tool_name} timed out")
-            
-        if future['error']:
-            raise Exception(future['error'])
-        return future['result']
+        future = self.call_mcp_tool_async(mcp_name, tool_name, args)
+        # Never wait past the request's deadline
+        return self._tool_result(future, mcp_name, tool_name, budget(TOOL_CALL_TIMEOUT))
+
+    def call_mcp_tool_async(self, mcp_name, tool_name, args=None) -> Future:
+        """Send an MCP tool call without waiting; the returned Future resolves with its result"""
+        return self._send_tool_calls([(mcp_name, tool_name, args)], batch=False)[0]
+
+    def call_mcp_tools(self, calls, timeout=TOOL_CALL_TIMEOUT, batch=True, return_exceptions=False) -> List[Any]:
+        """
+        Run several MCP tool calls concurrently and return their results in order.
+
+        calls: (mcp_name, tool_name, args) tuples or {'mcpName', 'toolName', 'args'} dicts.
+        All calls go on the wire at once (as one tool_call_batch envelope when batch
+        is set) and the bridge answers each as soon as it completes. timeout bounds
+        the whole set (and is cut to the request's remaining deadline). With
+        return_exceptions, failed calls yield their exception instead of raising
+        the first one.
+        """
+        calls = [self._normalize_tool_call(call) for call in calls]
+        futures = self._send_tool_calls(calls, batch=batch)
+        wait(futures, timeout=budget(timeout))
+
+        results = []
+        for (mcp_name, tool_name, _), future in zip(calls, futures):
+            try:
+                results.append(self._tool_result(future, mcp_name, tool_name, 0))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    @staticmethod
+    def _normalize_tool_call(call):
+        if isinstance(call, dict):
+            return call.get('mcpName'), call['toolName'], call.get('args')
+        mcp_name, tool_name, *rest = call
+        return mcp_name, tool_name, rest[0] if rest else None
+
+    def _send_tool_calls(self, calls, batch=True) -> List[Future]:
+        scope = current_scope()
+        if scope is not None:
+            scope.check()
+        envelopes = []
+        futures = []
+        for mcp_name, tool_name, args in calls:
+            cached = self.tool_cache.get(tool_name, args)
+            if cached is not MISS:
+                self.metrics.counter('tool_cache_hits', tool=tool_name).inc()
+                future = Future()
+                future.request_id = None
+                future.set_result(cached)
+                futures.append(future)
+                continue
+
+            request_id = self._next_request_id()
+            future = Future()
+            future.request_id = request_id
+            token = self.tool_cache.begin(tool_name, args)
+            future.add_done_callback(self._tool_cache_callback(tool_name, args, token))
+            future.add_done_callback(self._tool_metrics_callback(tool_name))
+            if scope is not None:
+                # Cancelling the request fails the call right away instead of after its timeout
+                unregister = scope.on_cancel(functools.partial(self._abandon_tool_call, future, scope.error))
+                future.add_done_callback(lambda _, unregister=unregister: unregister())
+            self.pending_tool_calls[request_id] = future
+            futures.append(future)
+            envelopes.append({
+                'type': 'tool_call',
+                'requestId': request_id,
+                'mcpName': mcp_name,
+                'toolName': tool_name,
+                'args': args or {}
+            })
+
+        if batch and len(envelopes) > 1:
+            # One bridge message; Node runs the calls concurrently and answers each separately
+            self.send_to_bridge({'type': 'tool_call_batch', 'calls': envelopes})
+        else:
+            for envelope in envelopes:
+                self.send_to_bridge(envelope)
+        return futures
+
+    def _tool_cache_callback(self, tool_name, args, token):
+        def on_done(future: Future):
+            if not future.cancelled() and future.exception() is None:
+                self.tool_cache.complete(tool_name, args, token, future.result())
+        return on_done
+
+    def _tool_metrics_callback(self, tool_name):
+        """Record a tool call's round trip (send to response) by tool and outcome"""
+        started = time.monotonic()
+
+        def on_done(future):
+            if future.cancelled():
+                outcome = 'abandoned'
+            elif future.exception() is not None:
+                outcome = 'cancelled' if isinstance(future.exception(), TaskCancelled) else 'error'
+            else:
+                outcome = 'ok'
+            self.metrics.histogram('tool_call_seconds', tool=tool_name, outcome=outcome).record(time.monotonic() - started)
+        return on_done
+
+    def _tool_result(self, future: Future, mcp_name, tool_name, timeout):
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            self._abandon_tool_call(future)
+            scope = current_scope()
+            if scope is not None and scope.cancelled:
+                raise scope.error() from None
+            raise TimeoutError(f"Tool call {mcp_name}.{tool_name} timed out")
+
+    def _abandon_tool_call(self, future: Future, error_factory=None):
+        """Stop waiting for a tool call and tell Node it can drop it (its response would be ignored)"""
+        if self.pending_tool_calls.pop(future.request_id, None) is not None:
+            self.send_to_bridge({'type': 'tool_cancel', 'requestIds': [future.request_id]})
+        if error_factory is None:
+            future.cancel()
+            return
+        try:
+            future.set_exception(error_factory())
+        except Exception:
+            # Resolved in the meantime
+            pass
         
     def _on_tool_response(self, request_id, message):
-        if request_id in self.pending_tool_calls:
-            future = self.pending_tool_calls.pop(request_id)
-            
-            with future['condition']:
-                if 'error' in message:
-                    future['error'] = message['error']
-                else:
-                    future['result'] = message['result']
-                future['ready'] = True
-                future['condition'].notify()
+        future = self.pending_tool_calls.pop(request_id, None)
+        if future is None or future.done():
+            return
+        if 'error' in message:
+            future.set_exception(Exception(message['error']))
+        else:
+            future.set_result(message.get('result'))
 
     def send_to_bridge(self, message):
-        """Send JSON message to Node.js bridge via stdout"""
-        sys.stdout.write(json.dumps(message) + '\n')
-        sys.stdout.flush()
+        """Queue a message for the Node.js bridge (written to stdout by the shared writer thread)"""
+        if self.bridge_agent_id is not None:
+            message = {**message, 'agentId': self.bridge_agent_id}
+        bridge_writer.get_writer().send(message, self.bridge_framing)
+
+    def get_bridge_stats(self):
+        """Output queue depth, bytes written and dropped/collapsed message counters"""
+        return bridge_writer.get_writer().get_stats()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Snapshot of where this agent spends its time: request, queue wait and tool
+        call histograms, the LLM manager's call/slot wait/token metrics, bridge
+        writer backpressure and the tool cache.
+        """
+        if self._runtime is not None and self._runtime.pool is not None:
+            queue = self._runtime.pool.get_state()
+        else:
+            queue = self._worker_pool.get_state() if self._worker_pool is not None else None
+        return {
+            'agentId': self.agent_id,
+            'pid': os.getpid(),
+            'uptimeSeconds': round(time.time() - self.metrics.started_at, 1),
+            'agent': self.metrics.snapshot(),
+            'llm': self.llm_manager.get_metrics() if self.llm_manager else None,
+            'queue': queue,
+            'bridge': self.get_bridge_stats(),
+            'toolCache': self.get_tool_cache_stats()
+        }
+
+    def _start_profile(self, request_id, message):
+        """Run a profile request (see profiler.py) on its own thread: it lasts a whole window and must not take a worker"""
+        def run():
+            try:
+                result = profiler.run(message)
+                logger.info(f"[{self.name}] Profile {result.get('profile')} finished")
+                self.send_to_bridge({
+                    'type': 'response',
+                    'requestId': request_id,
+                    'result': {'agentId': self.agent_id, 'pid': os.getpid(), **result}
+                })
+            except Exception as e:
+                logger.error(f"[{self.name}] Profile failed: {str(e)}")
+                self.send_to_bridge({
+                    'type': 'response',
+                    'requestId': request_id,
+                    'error': str(e)
+                })
+        threading.Thread(target=run, name=f'profile-{request_id}', daemon=True).start()
+
+    def get_tool_cache_stats(self):
+        """Hits, misses and invalidations of the read-only tool result cache"""
+        return self.tool_cache.get_stats()
 
     def log(self, content):
         """Send log message to Node.js logger"""
@@ -257,8 +598,6 @@ class PythonBaseAgent(ABC):
 
             # Get agent-specific system context
             system_role = self._get_system_context() if hasattr(self, '_get_system_context') else f"You are {self.name}, a helpful AI assistant."
-            if context_project:
-                system_role += context_project
             
             system_role += """
 IMPORTANT: Your goal is to move from planning to EXECUTION as fast as possible.
@@ -275,21 +614,34 @@ Rules:
 4. TECHNICAL NAMING: Always use English, ASCII characters, and brief PascalCase/camelCase for file names (e.g., ProjectManager, apiRoute). NEVER use spaces, accents, or special symbols in code-related names.
 5. If the user confirms a path, respond by explaining that you are now DELEGATING or EXECUTING immediately.
 """
+            # Project details go last so the static instructions above form a cacheable prompt prefix
+            if context_project:
+                system_role += context_project
             
             logger.info(f"[{self.name}] handleChatMessage (universal) called for: {user_message[:50]}...")
             
             # Try to use LLM for intelligent response
             if self.llm_manager:
-                response_raw = self.llm_manager.generate_response(
-                    prompt=user_message,
-                    system_context=system_role,
-                    history=history
-                )
+                stream_request_id = chat_request_id.get()
+                if stream_request_id is not None:
+                    response_raw = self._stream_chat_response(
+                        stream_request_id,
+                        prompt=user_message,
+                        system_context=system_role,
+                        history=history,
+                        hedge=True
+                    )
+                else:
+                    response_raw = self.llm_manager.generate_response(
+                        prompt=user_message,
+                        system_context=system_role,
+                        history=history,
+                        hedge=True
+                    )
                 
                 if response_raw:
                     try:
                         # Extract JSON from potential markdown/text wrap
-                        import re
                         json_match = re.search(r'\{.*\}', str(response_raw), re.DOTALL)
                         if json_match:
                             data = json.loads(json_match.group())
@@ -313,6 +665,8 @@ Rules:
                 'response': self._fallback_response(user_message)
             }
             
+        except TaskCancelled:
+            raise
         except Exception as e:
             logger.error(f"[{self.name}] handleChatMessage error: {str(e)}")
             return {
@@ -320,6 +674,61 @@ Rules:
                 'response': f"Erro ao processar mensagem: {str(e)}"
             }
 
+    def _stream_chat_response(self, request_id, **kwargs) -> Optional[str]:
+        """
+        Stream the LLM answer, forwarding the user-visible 'text' field to the bridge
+        as incremental partial_response messages. Returns the full raw response.
+        """
+        parts = []
+        sent = ""
+        for chunk in self.llm_manager.generate_response_stream(**kwargs):
+            parts.append(chunk)
+            visible = self._partial_chat_text("".join(parts))
+            if len(visible) > len(sent):
+                self.send_to_bridge({
+                    'type': 'partial_response',
+                    'requestId': request_id,
+                    'delta': visible[len(sent):]
+                })
+                sent = visible
+        return "".join(parts) or None
+
+    @staticmethod
+    def _partial_chat_text(buffer: str) -> str:
+        """Decoded prefix of the JSON 'text' field in a partially received response"""
+        stripped = buffer.lstrip()
+        if not stripped.startswith('{') and not stripped.startswith('`'):
+            # The model answered in plain text rather than the JSON envelope
+            return buffer
+        match = re.search(r'"text"\s*:\s*"', buffer)
+        if not match:
+            return ""
+        raw = []
+        i = match.end()
+        while i < len(buffer):
+            ch = buffer[i]
+            if ch == '"':
+                break
+            if ch == '\\':
+                # Only consume complete escape sequences
+                if i + 1 >= len(buffer):
+                    break
+                if buffer[i + 1] == 'u':
+                    if i + 6 > len(buffer):
+                        break
+                    raw.append(buffer[i:i + 6])
+                    i += 6
+                    continue
+                raw.append(buffer[i:i + 2])
+                i += 2
+                continue
+            raw.append(ch)
+            i += 1
+        try:
+            return json.loads('"' + "".join(raw) + '"')
+        except ValueError:
+            return ""
+
     def send_interactive_list(self, text: str, title: str, items: List[str], pre_selected: bool = True) -> dict:
         """
         Helper to return a structured response with a selectable list.
@@ -424,11 +833,11 @@ Rules:
             task_spec=task_spec,
             priority=priority
         )
-        # Send via bridge (will be routed to target agent)
+        # Send via bridge (will be routed to target agent); the priority orders its work queue there
         self.send_to_bridge({
             'type': 'assign_task',
             'targetAgent': agent_id,
-            'task': task_spec
+            'task': {**task_spec, 'priority': task_spec.get('priority', priority)}
         })
         return message
     
@@ -519,10 +928,19 @@ Rules:
         memory = self._get_memory()
         memory.add_best_practice(category, practice, context)
     
-    def recall_best_approach(self, task_type, similar_to=None):
-        """Retrieve the best known approach for a task"""
+    def recall_best_approach(self, task_type, similar_to=None, agent_id=None):
+        """Retrieve the best known approach for a task (from another agent's history with agent_id)"""
         memory = self._get_memory()
-        return memory.get_best_approach(task_type, similar_to)
+        return memory.get_best_approach(task_type, similar_to, agent_id=agent_id)
+    
+    def recall_team_experience(self, similar_to, task_type=None, limit=5):
+        """Search every agent's recorded successes for similar work, best match first"""
+        memory = self._get_memory()
+        try:
+            return memory.search_history(similar_to, task_type, limit=limit)
+        except ValueError as e:
+            self.log(f"Team memory unavailable: {e}")
+            return []
     
     def get_my_stats(self):
         """Get performance statistics"""
@@ -0,0 +1,127 @@
+"""
+Wire format for the Node <-> Python agent bridge
+
+Two encodings share one stream (see BridgeFraming.js for the Node side):
+- JSON lines: one JSON document per newline-terminated line (the original format)
+- msgpack frames: 0xC1 marker byte, 4-byte big-endian payload length, msgpack payload
+
+0xC1 is never used by msgpack and cannot start UTF-8 text, so readers tell the
+two apart per message and always accept both. Negotiation only decides what a
+side sends: Node offers a framing through BRIDGE_FRAMING, the agent answers
+with a bridge_hello JSON line naming the framing it will use, and each side
+switches its output once the hello has been exchanged. Without the msgpack
+package (or with BRIDGE_FRAMING=json) everything stays JSON lines.
+
+Frames avoid escaping and re-scanning multi-megabyte payloads (file contents
+from project_read_file, large task results) for newlines.
+"""
+
+import os
+import json
+import asyncio
+import struct
+import logging
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterator
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+JSON = 'json'
+MSGPACK = 'msgpack'
+FRAME_MARKER = 0xC1
+_FRAME_HEADER = struct.Struct('>BI')
+
+
+def negotiate(offer: str = None) -> str:
+    """Framing this process will send, given what the bridge offered"""
+    offer = (offer or os.getenv('BRIDGE_FRAMING', JSON)).lower()
+    if offer == MSGPACK:
+        if msgpack is not None:
+            return MSGPACK
+        logger.info("Bridge offered msgpack framing but the msgpack package is not installed, using JSON lines")
+    return JSON
+
+
+def hello(framing: str) -> Dict[str, Any]:
+    return {'type': 'bridge_hello', 'framing': framing, 'pid': os.getpid()}
+
+
+def encode(message: Dict[str, Any], framing: str = JSON) -> bytes:
+    if framing == MSGPACK:
+        try:
+            payload = msgpack.packb(message, use_bin_type=True)
+            return _FRAME_HEADER.pack(FRAME_MARKER, len(payload)) + payload
+        except (TypeError, ValueError, OverflowError):
+            # msgpack is stricter than JSON (e.g. ints beyond 64 bits): this one goes as a JSON line
+            pass
+    return (json.dumps(message) + '\n').encode('utf-8')
+
+
+def _decode_line(line: bytes):
+    text = line.strip()
+    if not text:
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        logger.error(f"Failed to decode message: {text[:200]!r}")
+        return None
+
+
+def _decode_frame(payload: bytes):
+    try:
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+    except Exception as e:
+        logger.error(f"Failed to decode frame ({len(payload)} bytes): {str(e)}")
+        return None
+
+
+def _read_exact(stream: BinaryIO, size: int) -> bytes:
+    data = stream.read(size)
+    while len(data) < size:
+        more = stream.read(size - len(data))
+        if not more:
+            raise EOFError("Bridge closed inside a frame")
+        data += more
+    return data
+
+
+def read_messages(stream: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """Decoded messages from a binary stream (e.g. sys.stdin.buffer) until EOF"""
+    while True:
+        first = stream.read(1)
+        if not first:
+            return
+        if first[0] == FRAME_MARKER and msgpack is not None:
+            try:
+                (length,) = struct.unpack('>I', _read_exact(stream, 4))
+                payload = _read_exact(stream, length)
+            except EOFError:
+                return
+            message = _decode_frame(payload)
+        else:
+            message = _decode_line(first + stream.readline())
+        if message is not None:
+            yield message
+
+
+async def aread_messages(reader) -> AsyncIterator[Dict[str, Any]]:
+    """Decoded messages from an asyncio.StreamReader until EOF"""
+    while True:
+        first = await reader.read(1)
+        if not first:
+            return
+        try:
+            if first[0] == FRAME_MARKER and msgpack is not None:
+                (length,) = struct.unpack('>I', await reader.readexactly(4))
+                message = _decode_frame(await reader.readexactly(length))
+            else:
+                message = _decode_line(first + await reader.readline())
+        except asyncio.IncompleteReadError:
+            return
+        if message is not None:
+            yield message
@@ -0,0 +1,200 @@
+"""
+Thread-safe, coalescing writer for bridge messages
+
+One writer thread per process owns stdout. send_to_bridge() only queues the
+message; the writer encodes whatever has accumulated and emits it with a single
+write, so a chatty agent costs one syscall per batch instead of one per log
+line, and concurrent large messages can never interleave.
+
+Under load:
+- status_update and queue_depth only describe the latest state, so a newer one
+  replaces a still-queued older one instead of queueing behind it
+- log and activity_log messages are sampled (1 in BRIDGE_LOG_SAMPLE kept) once
+  the queue passes its high-water mark, and dropped when it is full
+- everything else blocks the sender while the queue is full (backpressure)
+
+Configuration (environment):
+- BRIDGE_WRITER_QUEUE: queued messages before senders block (default 1000)
+- BRIDGE_WRITER_HIGH_WATER: queue depth where log sampling starts (default half the queue)
+- BRIDGE_LOG_SAMPLE: keep one in N low-priority logs above the high-water mark (default 10)
+"""
+
+import os
+import sys
+import atexit
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+import bridge_framing
+
+logger = logging.getLogger(__name__)
+
+# Messages that only carry the latest state: a newer one makes a queued older one useless
+SUPERSEDED_TYPES = {'status_update', 'queue_depth'}
+# Messages that may be sampled or dropped under pressure
+LOW_PRIORITY_TYPES = {'log', 'activity_log'}
+MAX_BATCH_MESSAGES = 256
+
+
+class _Entry:
+    __slots__ = ('msg_type', 'key', 'framing', 'message')
+
+    def __init__(self, msg_type, key, framing, message):
+        self.msg_type = msg_type
+        # Collapsing key: agents hosted in one process (agent_host.py) each keep their own latest state
+        self.key = key
+        self.framing = framing
+        self.message = message
+
+
+class BridgeWriter:
+    """Bounded queue drained by a dedicated thread that owns the output stream"""
+
+    def __init__(
+        self,
+        stream=None,
+        max_queue: Optional[int] = None,
+        high_water: Optional[int] = None,
+        log_sample: Optional[int] = None
+    ):
+        self.stream = stream or sys.stdout
+        self.max_queue = max(1, int(max_queue if max_queue is not None else os.getenv('BRIDGE_WRITER_QUEUE', '1000')))
+        default_high_water = os.getenv('BRIDGE_WRITER_HIGH_WATER', str(self.max_queue // 2))
+        self.high_water = int(high_water if high_water is not None else default_high_water)
+        self.log_sample = max(1, int(log_sample if log_sample is not None else os.getenv('BRIDGE_LOG_SAMPLE', '10')))
+
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._latest: Dict[Tuple[str, Optional[str]], _Entry] = {}
+        self._writing = False
+        self._closed = False
+        self._low_priority_seen = 0
+        self.stats = {
+            'messages': 0, 'writes': 0, 'bytes': 0, 'collapsed': 0,
+            'sampled_out': 0, 'dropped': 0, 'blocked': 0, 'blocked_seconds': 0.0, 'max_depth': 0, 'errors': 0
+        }
+        self._thread = threading.Thread(target=self._run, name='bridge-writer', daemon=True)
+        self._thread.start()
+
+    def send(self, message: Dict[str, Any], framing: str = bridge_framing.JSON) -> bool:
+        """Queue a message; returns False if it was sampled out or dropped"""
+        msg_type = message.get('type') if isinstance(message, dict) else None
+        key = (msg_type, message.get('agentId')) if msg_type in SUPERSEDED_TYPES else None
+        with self._cond:
+            if self._closed:
+                return False
+            depth = len(self._queue)
+
+            if msg_type in LOW_PRIORITY_TYPES:
+                if depth >= self.max_queue:
+                    self.stats['dropped'] += 1
+                    return False
+                if depth >= self.high_water:
+                    self._low_priority_seen += 1
+                    if self._low_priority_seen % self.log_sample:
+                        self.stats['sampled_out'] += 1
+                        return False
+
+            elif msg_type in SUPERSEDED_TYPES:
+                queued = self._latest.get(key)
+                if queued is not None:
+                    # Still waiting to be written: send the newer state in its place
+                    queued.message = message
+                    queued.framing = framing
+                    self.stats['collapsed'] += 1
+                    return True
+
+            if len(self._queue) >= self.max_queue:
+                self.stats['blocked'] += 1
+                blocked_at = time.monotonic()
+                while len(self._queue) >= self.max_queue and not self._closed:
+                    self._cond.wait()
+                self.stats['blocked_seconds'] += time.monotonic() - blocked_at
+
+            entry = _Entry(msg_type, key, framing, message)
+            self._queue.append(entry)
+            if key is not None:
+                self._latest[key] = entry
+            self.stats['max_depth'] = max(self.stats['max_depth'], len(self._queue))
+            self._cond.notify_all()
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                batch = [self._queue.popleft() for _ in range(min(len(self._queue), MAX_BATCH_MESSAGES))]
+                for entry in batch:
+                    if entry.key is not None and self._latest.get(entry.key) is entry:
+                        del self._latest[entry.key]
+                self._writing = True
+                # Room in the queue: wake blocked senders
+                self._cond.notify_all()
+
+            chunks = []
+            for entry in batch:
+                try:
+                    chunks.append(bridge_framing.encode(entry.message, entry.framing))
+                except Exception as e:
+                    logger.error(f"Failed to encode {entry.msg_type} message: {str(e)}")
+            data = b''.join(chunks)
+
+            error = None
+            try:
+                # Text printed by agent code goes out first so it never lands inside a frame
+                self.stream.flush()
+                self.stream.buffer.write(data)
+                self.stream.buffer.flush()
+            except Exception as e:
+                error = e
+
+            with self._cond:
+                self._writing = False
+                if error is None:
+                    self.stats['messages'] += len(chunks)
+                    self.stats['writes'] += 1
+                    self.stats['bytes'] += len(data)
+                else:
+                    self.stats['errors'] += 1
+                self._cond.notify_all()
+            if error is not None:
+                logger.error(f"Bridge write failed: {str(error)}")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far has been written"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._writing, timeout)
+
+    def close(self, timeout: Optional[float] = 5.0):
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self.stats)
+            stats['queue_depth'] = len(self._queue)
+        stats.update({'max_queue': self.max_queue, 'high_water': self.high_water, 'log_sample': self.log_sample})
+        return stats
+
+
+_writer: Optional[BridgeWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> BridgeWriter:
+    """The process-wide writer (agents sharing a process share stdout)"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BridgeWriter()
+            # Daemon thread: write out what is still queued when the interpreter exits
+            atexit.register(_writer.flush, 5.0)
+        return _writer
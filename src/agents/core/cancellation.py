@@ -0,0 +1,145 @@
+"""
+Deadlines and cancellation for bridge requests
+
+Node attaches a deadline (epoch milliseconds) to execute_task, handle_chat and
+handle_message requests and sends cancel_task {taskId | requestId, reason}
+when it gives up on one. Each request runs inside a CancelScope, held in a
+context variable so everything the handler calls can see it:
+- call_mcp_tool waits at most the remaining budget; cancelling fails the
+  pending tool calls at once and tells Node to drop them (tool_cancel)
+- LLMManager runs the provider call on its event loop and cancels it, which
+  aborts the HTTP request and frees the rate limiter slot
+- long-running handlers can call check_cancelled() between steps
+
+Cancellation surfaces as TaskCancelled (DeadlineExceeded once the deadline
+has passed), which the request handlers report back as an error response.
+"""
+
+import time
+import threading
+import contextvars
+from typing import Any, Callable, Dict, List, Optional
+
+
+class TaskCancelled(Exception):
+    """The request was cancelled (cancel_task from the bridge)"""
+
+
+class DeadlineExceeded(TaskCancelled):
+    """The request's deadline passed"""
+
+
+class CancelScope:
+    """Deadline plus cancel flag of one request; callbacks fire when it is cancelled"""
+
+    def __init__(self, deadline: Optional[float] = None, task_id: Optional[str] = None, request_id: Any = None):
+        # time.monotonic() based
+        self.deadline = deadline
+        self.task_id = task_id
+        self.request_id = request_id
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @classmethod
+    def for_request(cls, message: Dict[str, Any], task: Optional[Dict[str, Any]] = None) -> 'CancelScope':
+        """Scope for a bridge request: deadline (epoch ms) on the message or its task"""
+        task = task or {}
+        deadline = message.get('deadline') or task.get('deadline')
+        monotonic_deadline = None
+        if deadline:
+            try:
+                monotonic_deadline = time.monotonic() + (float(deadline) / 1000.0 - time.time())
+            except (TypeError, ValueError):
+                pass
+        return cls(monotonic_deadline, task_id=task.get('id') or message.get('taskId'), request_id=message.get('requestId'))
+
+    def cancel(self, reason: str = 'cancelled'):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set() or self.expired
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline (None without one)"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def timeout(self, default: Optional[float]) -> Optional[float]:
+        """default, shortened to the remaining budget"""
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        return remaining if default is None else min(default, remaining)
+
+    def error(self) -> TaskCancelled:
+        if self._event.is_set():
+            return TaskCancelled(f"Request cancelled: {self.reason}")
+        return DeadlineExceeded("Request deadline exceeded")
+
+    def check(self):
+        """Raise TaskCancelled / DeadlineExceeded if the request should stop"""
+        if self.cancelled:
+            raise self.error()
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Run callback on cancel (now if already cancelled); returns a function that unregisters it"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback):
+        with self._lock:
+            try:
+                self._callbacks.remove(callback)
+            except ValueError:
+                pass
+
+    def __enter__(self) -> 'CancelScope':
+        self._token = _current_scope.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _current_scope.reset(self._token)
+        return False
+
+
+_current_scope = contextvars.ContextVar('cancel_scope', default=None)
+
+
+def current_scope() -> Optional[CancelScope]:
+    """Scope of the request being handled in this thread or asyncio task, if any"""
+    return _current_scope.get()
+
+
+def check_cancelled():
+    """Raise if the current request was cancelled or ran out of time"""
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.check()
+
+
+def budget(default: Optional[float]) -> Optional[float]:
+    """default timeout, shortened to the current request's remaining budget"""
+    scope = _current_scope.get()
+    return default if scope is None else scope.timeout(default)
@@ -0,0 +1,184 @@
+"""
+Record/replay cassette for LLM calls
+
+In record mode every completed LLMManager call is appended to a compact JSONL
+file together with its latency. In replay mode responses are served from that
+file, matched on the request content (system context, history and prompt, not
+the provider), after sleeping for the recorded latency times a scale factor.
+Replaying a recorded day against new code therefore gives deterministic,
+network-free throughput and latency comparisons.
+
+File format (one JSON object per line, append-only, safe for several
+processes appending to the same file):
+    {"type": "system", "h": "<hash>", "text": "..."}           system context, written once
+    {"type": "call", "k": "<key>", "s": "<hash>", "h": [...], "q": "...",
+     "r": "...", "lat": 1.234, "ttft": 0.4, "a": "pm", "t": 1700000000.0}
+
+Configuration (environment):
+- LLM_CASSETTE_MODE: off (default), record or replay
+- LLM_CASSETTE_PATH: cassette file (default ./.llm_cassette.jsonl)
+- LLM_CASSETTE_LATENCY_SCALE: replay latency multiplier (default 1.0, 0 = no delay)
+- LLM_CASSETTE_ON_MISS: what replay does for unrecorded requests: "none" (default,
+  return no response) or "live" (call the real providers)
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+OFF = 'off'
+RECORD = 'record'
+REPLAY = 'replay'
+
+
+class Cassette:
+    """Append-only recorder and content-matched player for LLM responses"""
+
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        path: Optional[str] = None,
+        latency_scale: Optional[float] = None,
+        on_miss: Optional[str] = None
+    ):
+        self.mode = (mode or os.getenv('LLM_CASSETTE_MODE', OFF)).lower()
+        self.path = path or os.getenv('LLM_CASSETTE_PATH', os.path.join(os.getcwd(), '.llm_cassette.jsonl'))
+        self.latency_scale = float(latency_scale if latency_scale is not None else os.getenv('LLM_CASSETTE_LATENCY_SCALE', '1.0'))
+        self.on_miss = (on_miss or os.getenv('LLM_CASSETTE_ON_MISS', 'none')).lower()
+        if self.mode not in (OFF, RECORD, REPLAY):
+            logger.warning(f"Unknown LLM_CASSETTE_MODE={self.mode!r}, cassette disabled")
+            self.mode = OFF
+
+        self._lock = threading.Lock()
+        self._systems_written = set()
+        self._entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self.stats = {'recorded': 0, 'replayed': 0, 'misses': 0}
+
+        if self.mode == REPLAY:
+            self._load()
+        elif self.mode == RECORD:
+            logger.info(f"Recording LLM calls to {self.path}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != OFF
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    @property
+    def live_on_miss(self) -> bool:
+        return self.on_miss == 'live'
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+    @staticmethod
+    def normalize_history(history: Optional[List]) -> List[List[str]]:
+        """Compact [role, content] pairs (provider independent)"""
+        return [
+            ['user' if msg.get('fromId') == 'user' else 'assistant', str(msg.get('content', ''))]
+            for msg in history or []
+        ]
+
+    @classmethod
+    def key(cls, system_context: str, history: Optional[List], prompt: str) -> str:
+        payload = json.dumps(
+            [system_context or '', cls.normalize_history(history), prompt or ''],
+            ensure_ascii=False, separators=(',', ':')
+        )
+        return cls._hash(payload)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            logger.warning(f"Cassette {self.path} not found, every request will miss")
+            return
+        calls = 0
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from an interrupted recording
+                    continue
+                if record.get('type') == 'call':
+                    self._entries[record['k']].append(record)
+                    calls += 1
+        logger.info(f"Loaded {calls} recorded LLM calls ({len(self._entries)} distinct requests) from {self.path}")
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Next recorded response for the request (repeats cycle in recorded order)"""
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                self.stats['misses'] += 1
+                return None
+            entry = entries[self._cursor[key] % len(entries)]
+            self._cursor[key] += 1
+            self.stats['replayed'] += 1
+            return entry
+
+    def delay(self, entry: Dict[str, Any]) -> float:
+        return max(0.0, entry.get('lat', 0.0) * self.latency_scale)
+
+    def first_token_delay(self, entry: Dict[str, Any]) -> float:
+        return max(0.0, entry.get('ttft', entry.get('lat', 0.0)) * self.latency_scale)
+
+    def record(
+        self,
+        key: str,
+        system_context: str,
+        history: Optional[List],
+        prompt: str,
+        response: str,
+        latency: float,
+        agent_id: Optional[str] = None,
+        first_token: Optional[float] = None
+    ):
+        lines = []
+        system_hash = self._hash(system_context or '')
+        with self._lock:
+            if system_hash not in self._systems_written:
+                self._systems_written.add(system_hash)
+                lines.append({'type': 'system', 'h': system_hash, 'text': system_context or ''})
+            self.stats['recorded'] += 1
+
+        call = {
+            'type': 'call', 'k': key, 's': system_hash, 'h': self.normalize_history(history),
+            'q': prompt, 'r': response, 'lat': round(latency, 4), 'a': agent_id,
+            't': round(time.time(), 3)
+        }
+        if first_token is not None:
+            call['ttft'] = round(first_token, 4)
+        lines.append(call)
+
+        data = ''.join(json.dumps(line, ensure_ascii=False, separators=(',', ':')) + '\n' for line in lines)
+        try:
+            # One write on an O_APPEND descriptor keeps concurrent writers from interleaving lines
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data.encode('utf-8'))
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logger.warning(f"Failed to record LLM call: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        stats.update({'mode': self.mode, 'path': self.path, 'latency_scale': self.latency_scale})
+        return stats
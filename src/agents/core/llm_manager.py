@@ -1,19 +1,30 @@
 import os
+import sys
+import queue
+import hashlib
+import importlib
+import importlib.util
+import asyncio
 import logging
+import threading
 import time
-import random
-try:
-    import fcntl
-except ImportError:
-    fcntl = None
-try:
-    import msvcrt
-except ImportError:
-    msvcrt = None
-from typing import Optional, List, Dict, Any
+import copy
+import contextlib
+from concurrent.futures import CancelledError as FutureCancelledError, TimeoutError as FutureTimeoutError
+from typing import Optional, List, Dict, Any, Iterator
+from collections.abc import Mapping
 from enum import Enum
 from dotenv import load_dotenv
 
+# Sibling modules in src/agents/core are imported flat, like base_agent does
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from rate_limiter import RateLimiter, RateLimitTimeout
+from response_cache import ResponseCache
+from provider_router import ProviderRouter, CircuitOpenError
+from llm_cassette import Cassette
+from cancellation import current_scope
+from metrics import MetricsRegistry
+
 # Load .env file explicitly
 load_dotenv()
 
@@ -24,6 +35,294 @@ class LLMProvider(Enum):
     ANTHROPIC = "anthropic"
     OPENAI = "openai"
     GEMINI = "gemini"
+    MOCK = "mock"
+
+TRUNCATION_MARKER = "\n...[truncated]"
+TRUNCATION_MARKER_TOKENS = 6
+# Role/formatting overhead per chat message
+MESSAGE_OVERHEAD_TOKENS = 4
+# A partially kept history message must be at least this large to be worth sending
+MIN_PARTIAL_MESSAGE_TOKENS = 64
+
+
+class TokenCounter:
+    """
+    Per-provider token counts. Uses tiktoken's cl100k encoding when installed (scaled for
+    providers whose tokenizers run denser), otherwise a character estimator calibrated
+    per provider. The tokenizer is loaded on first use.
+    """
+    
+    # Average characters per token on mixed English prose and code
+    CHARS_PER_TOKEN = {'anthropic': 3.5, 'openai': 4.0, 'gemini': 4.0}
+    TIKTOKEN_SCALE = {'anthropic': 1.15, 'openai': 1.0, 'gemini': 1.0}
+    
+    def __init__(self):
+        self._encoding = None
+        self.backend = None
+    
+    def _load(self):
+        if self.backend is None:
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding('cl100k_base')
+                self.backend = 'tiktoken'
+            except Exception:
+                self.backend = 'estimate'
+    
+    def count(self, text: str, provider: Optional[str] = None) -> int:
+        if not text:
+            return 0
+        self._load()
+        if self._encoding is not None:
+            tokens = len(self._encoding.encode(text, disallowed_special=()))
+            return int(tokens * self.TIKTOKEN_SCALE.get(provider, 1.0) + 0.5)
+        # Accented and non-Latin characters split into far more tokens than ASCII
+        non_ascii = sum(1 for c in text if ord(c) > 127)
+        ascii_chars = len(text) - non_ascii
+        return max(1, int(ascii_chars / self.CHARS_PER_TOKEN.get(provider, 4.0) + non_ascii * 0.7 + 0.5))
+    
+    def truncate(self, text: str, max_tokens: int, provider: Optional[str] = None) -> str:
+        """Longest prefix of text within max_tokens, marked as truncated"""
+        if self.count(text, provider) <= max_tokens:
+            return text
+        budget = max(0, max_tokens - TRUNCATION_MARKER_TOKENS)
+        if self._encoding is not None:
+            keep = int(budget / self.TIKTOKEN_SCALE.get(provider, 1.0))
+            head = self._encoding.decode(self._encoding.encode(text, disallowed_special=())[:keep])
+        else:
+            head = text[:int(budget * self.CHARS_PER_TOKEN.get(provider, 4.0))]
+            while head and self.count(head, provider) > budget:
+                head = head[:int(len(head) * 0.9)]
+        return head + TRUNCATION_MARKER
+
+
+class PackedPrompt:
+    """System context, history and prompt fitted to a provider's token budget"""
+    
+    def __init__(self, system: str, messages: List[Dict[str, str]], prompt: str, tokens: int,
+                 dropped_messages: int = 0, truncated: Optional[List[str]] = None):
+        self.system = system
+        self.messages = messages
+        self.prompt = prompt
+        self.tokens = tokens
+        self.dropped_messages = dropped_messages
+        self.truncated = truncated or []
+
+
+class PromptBudgeter:
+    """
+    Packs a request into a token budget by priority:
+    
+    1. System context, truncated only if it would take more than its share of the budget
+       and the prompt needs the room
+    2. The prompt (payload), truncated to whatever the system context leaves
+    3. History, newest first; older messages are evicted once the budget is spent and the
+       oldest kept message may be cut down
+    
+    Configuration (environment):
+    - LLM_PROMPT_TOKEN_BUDGET: input tokens per request (default 8000)
+    - LLM_<PROVIDER>_PROMPT_BUDGET: per-provider override
+    - LLM_HISTORY_MAX_MESSAGES: most recent messages considered (default 10)
+    - LLM_SYSTEM_BUDGET_SHARE: share of the budget the system context may claim (default 0.5)
+    """
+    
+    def __init__(self, counter: Optional[TokenCounter] = None, budget: Optional[int] = None,
+                 max_history: Optional[int] = None, system_share: Optional[float] = None):
+        self.counter = counter or TokenCounter()
+        self.budget = int(budget if budget is not None else os.getenv('LLM_PROMPT_TOKEN_BUDGET', '8000'))
+        self.max_history = int(max_history if max_history is not None else os.getenv('LLM_HISTORY_MAX_MESSAGES', '10'))
+        self.system_share = float(system_share if system_share is not None else os.getenv('LLM_SYSTEM_BUDGET_SHARE', '0.5'))
+    
+    def budget_for(self, provider: Optional[str]) -> int:
+        override = os.getenv(f"LLM_{provider.upper()}_PROMPT_BUDGET") if provider else None
+        return int(override) if override else self.budget
+    
+    def pack(self, provider: Optional[str], system_context: str, prompt: str, history: Optional[List] = None) -> PackedPrompt:
+        budget = self.budget_for(provider)
+        count = lambda text: self.counter.count(text, provider)
+        truncated = []
+        
+        system = system_context or ""
+        prompt = prompt or ""
+        system_tokens = count(system)
+        prompt_tokens = count(prompt)
+        
+        # The system context may use more than its share when the prompt leaves room
+        system_cap = max(int(budget * self.system_share), budget - prompt_tokens)
+        if system_tokens > system_cap:
+            system = self.counter.truncate(system, system_cap, provider)
+            system_tokens = count(system)
+            truncated.append('system')
+        
+        prompt_cap = budget - system_tokens
+        if prompt_tokens > prompt_cap:
+            prompt = self.counter.truncate(prompt, prompt_cap, provider)
+            prompt_tokens = count(prompt)
+            truncated.append('prompt')
+        
+        remaining = budget - system_tokens - prompt_tokens
+        all_messages = self._normalize_history(history)
+        recent = all_messages[-self.max_history:] if self.max_history > 0 else []
+        dropped = len(all_messages) - len(recent)
+        
+        messages = []
+        history_tokens = 0
+        for index in range(len(recent) - 1, -1, -1):
+            msg = recent[index]
+            cost = count(msg['content']) + MESSAGE_OVERHEAD_TOKENS
+            if cost <= remaining:
+                messages.insert(0, msg)
+                remaining -= cost
+                history_tokens += cost
+                continue
+            if remaining >= MIN_PARTIAL_MESSAGE_TOKENS:
+                content = self.counter.truncate(msg['content'], remaining - MESSAGE_OVERHEAD_TOKENS, provider)
+                messages.insert(0, {"role": msg['role'], "content": content})
+                history_tokens += count(content) + MESSAGE_OVERHEAD_TOKENS
+                truncated.append('history')
+                index -= 1
+            dropped += index + 1
+            break
+        
+        return PackedPrompt(system, messages, prompt, system_tokens + prompt_tokens + history_tokens, dropped, truncated)
+    
+    def fit_documents(self, documents: Dict[str, str], budget: int, provider: Optional[str] = None) -> Dict[str, str]:
+        """
+        Share a token budget between named documents: small ones are kept whole and the
+        rest is split evenly between the larger ones, which are truncated to their share.
+        """
+        sizes = {name: self.counter.count(text, provider) for name, text in documents.items()}
+        fitted = {}
+        remaining = budget
+        pending = sorted(documents, key=lambda name: sizes[name])
+        while pending:
+            share = remaining // len(pending)
+            name = pending.pop(0)
+            if sizes[name] <= share:
+                fitted[name] = documents[name]
+                remaining -= sizes[name]
+            else:
+                fitted[name] = self.counter.truncate(documents[name], share, provider)
+                remaining -= share
+        return {name: fitted[name] for name in documents}
+    
+    @staticmethod
+    def _normalize_history(history: Optional[List]) -> List[Dict[str, str]]:
+        """Bridge history entries as role/content pairs"""
+        normalized = []
+        for msg in history or []:
+            role = "user" if msg.get('fromId') == 'user' else "assistant"
+            normalized.append({"role": role, "content": str(msg.get('content', ''))})
+        return normalized
+
+
+# Smallest system prompt (tokens) Gemini accepts as cached content, by model family
+# (context caching docs); LLM_GEMINI_CACHE_MIN_TOKENS overrides it for every model
+GEMINI_CACHE_MIN_TOKENS = {'gemini-1.5': 32768, 'gemini-2.0': 4096}
+GEMINI_CACHE_DEFAULT_MIN_TOKENS = 32768
+
+# Environment key, SDK module and pip package per remote provider
+PROVIDER_KEYS = {
+    LLMProvider.ANTHROPIC: 'ANTHROPIC_API_KEY',
+    LLMProvider.OPENAI: 'OPENAI_API_KEY',
+    LLMProvider.GEMINI: 'GEMINI_API_KEY'
+}
+PROVIDER_MODULES = {
+    LLMProvider.ANTHROPIC: 'anthropic',
+    LLMProvider.OPENAI: 'openai',
+    LLMProvider.GEMINI: 'google.genai'
+}
+PROVIDER_PACKAGES = {
+    LLMProvider.ANTHROPIC: 'anthropic',
+    LLMProvider.OPENAI: 'openai',
+    LLMProvider.GEMINI: 'google-genai'
+}
+
+# Seconds each SDK import took in this process (0 when it was already imported, e.g. by the agent zygote)
+IMPORT_TIMES: Dict[str, float] = {}
+_import_lock = threading.Lock()
+
+
+def _module_available(name: str) -> bool:
+    """Whether a module can be imported, without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ImportError:
+        return False
+
+
+def _import_provider(name: str):
+    with _import_lock:
+        if name in sys.modules:
+            IMPORT_TIMES.setdefault(name, 0.0)
+            return sys.modules[name]
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        IMPORT_TIMES[name] = round(time.perf_counter() - started, 4)
+        logger.info(f"Imported {name} in {IMPORT_TIMES[name] * 1000:.0f} ms")
+        return module
+
+
+class LazyProviders(Mapping):
+    """
+    Provider clients keyed by LLMProvider, each built by its factory on first access.
+    Membership, iteration and len() only reflect configuration, so checking which
+    providers exist never imports an SDK.
+    """
+    
+    def __init__(self):
+        self._factories = {}
+        self._clients = {}
+        self._lock = threading.Lock()
+        self.timings: Dict[LLMProvider, float] = {}
+    
+    def register(self, provider: LLMProvider, factory):
+        self._factories[provider] = factory
+    
+    def __contains__(self, provider) -> bool:
+        return provider in self._factories
+    
+    def __iter__(self):
+        return iter(self._factories)
+    
+    def __len__(self) -> int:
+        return len(self._factories)
+    
+    def __getitem__(self, provider: LLMProvider):
+        client = self._clients.get(provider)
+        if client is not None:
+            return client
+        factory = self._factories[provider]
+        with self._lock:
+            if provider not in self._clients:
+                started = time.perf_counter()
+                self._clients[provider] = factory()
+                self.timings[provider] = round(time.perf_counter() - started, 4)
+                logger.info(f"✓ {provider.value} client initialized in {self.timings[provider] * 1000:.0f} ms")
+            return self._clients[provider]
+    
+    def created(self) -> List[LLMProvider]:
+        return list(self._clients)
+
+
+class _AgentRouter:
+    """One agent's handle on a shared ProviderRouter: the shared health, plus this agent's call observer"""
+
+    def __init__(self, router: ProviderRouter, observer):
+        self._router = router
+        self._observer = observer
+
+    def __getattr__(self, name):
+        return getattr(self._router, name)
+
+    def record_success(self, key: str, latency: float):
+        self._router.record_success(key, latency)
+        self._observer(key, latency, False)
+
+    def record_failure(self, key: str, error: Optional[Exception] = None, latency: Optional[float] = None):
+        self._router.record_failure(key, error, latency)
+        self._observer(key, latency, True)
+
 
 class LLMManager:
     """
@@ -31,248 +330,1120 @@ class LLMManager:
     Supports Anthropic Claude, OpenAI GPT, and Google Gemini with intelligent fallback.
     """
     
-    def __init__(self):
+    def __init__(self, agent_id: Optional[str] = None):
+        self.agent_id = agent_id
         self.providers = {}
         self.provider_priority = []
+        self._api_keys = {}
         
         # Parse priority from env (default: anthropic,gemini,openai)
         priority_str = os.getenv('LLM_PRIORITY', 'anthropic,gemini,openai')
         self.provider_priority = [p.strip() for p in priority_str.split(',')]
         
-        # Initialize Anthropic Claude
-        anthropic_key = os.getenv('ANTHROPIC_API_KEY')
-        if anthropic_key:
-            try:
-                from anthropic import Anthropic
-                self.providers[LLMProvider.ANTHROPIC] = Anthropic(api_key=anthropic_key)
-                logger.info("✓ Anthropic Claude initialized")
-            except ImportError:
-                logger.warning("Anthropic library not installed. Run: pip install anthropic")
-            except Exception as e:
-                logger.error(f"Failed to initialize Anthropic: {e}")
+        # Provider clients are built on first use: agents that never call an LLM never import an SDK
+        self.providers = LazyProviders()
+        for provider_enum, env_key in PROVIDER_KEYS.items():
+            api_key = os.getenv(env_key)
+            if not api_key:
+                continue
+            if not _module_available(PROVIDER_MODULES[provider_enum]):
+                logger.warning(f"{PROVIDER_MODULES[provider_enum]} library not installed. Run: pip install {PROVIDER_PACKAGES[provider_enum]}")
+                continue
+            self._api_keys[provider_enum] = api_key
+            self.providers.register(provider_enum, getattr(self, f'_create_{provider_enum.value}_client'))
+        self._gemini_alpha = None
+        self._gemini_alpha_lock = threading.Lock()
         
-        # Initialize OpenAI GPT
-        openai_key = os.getenv('OPENAI_API_KEY')
-        if openai_key:
-            try:
-                from openai import OpenAI
-                self.providers[LLMProvider.OPENAI] = OpenAI(api_key=openai_key)
-                logger.info("✓ OpenAI GPT initialized")
-            except ImportError:
-                logger.warning("OpenAI library not installed. Run: pip install openai")
-            except Exception as e:
-                logger.error(f"Failed to initialize OpenAI: {e}")
-        
-        # Initialize Google Gemini
-        gemini_key = os.getenv('GEMINI_API_KEY')
-        if gemini_key:
-            try:
-                from google import genai
-                # Initialize both Alpha (for exp models) and V1 (for stable models) clients
-                self.gemini_client_alpha = genai.Client(api_key=gemini_key, http_options={'api_version':'v1alpha'})
-                self.gemini_client_v1 = genai.Client(api_key=gemini_key, http_options={'api_version':'v1beta'})
-                
-                # Set a primary for existence check
-                self.providers[LLMProvider.GEMINI] = self.gemini_client_v1
-                logger.info("✓ Google Gemini initialized (Dual Alpha/V1 clients)")
-            except ImportError:
-                logger.warning("Google GenAI library not installed. Run: pip install google-genai")
-            except Exception as e:
-                logger.error(f"Failed to initialize Gemini: {e}")
+        # Local mock provider (load tests / offline benchmarks), only when listed in LLM_PRIORITY
+        if LLMProvider.MOCK.value in self.provider_priority:
+            self.providers.register(LLMProvider.MOCK, self._create_mock_client)
         
         if not self.providers:
             logger.warning("⚠️  No LLM providers initialized! Agents will use keyword fallback only.")
             
-        # Shared lock file to limit concurrent calls across processes
-        self.lock_file = os.path.join(os.getcwd(), '.llm_call.lock')
-        self.cooldowns = {} # provider -> timestamp of last 429
+        # Cross-process token bucket (per-provider concurrency, RPM and TPM budgets)
+        self.rate_limiter = RateLimiter()
+        self.slot_timeout = float(os.getenv('LLM_SLOT_TIMEOUT', '120'))
+        self.max_output_tokens = 1024
+        
+        # Health-aware routing: EWMA latency/error rate and circuit breakers per provider and model
+        self.router = ProviderRouter()
+        
+        # Call latency by provider/model, slot wait and tokens in/out (get_metrics)
+        self.metrics = MetricsRegistry()
+        self.router.observer = self._observe_call
+        
+        # Models used per provider (Gemini falls back through its list)
+        self.gemini_models = [
+            'gemini-2.0-flash-exp',
+            'gemini-1.5-flash',
+            'gemini-1.5-pro'
+        ]
+        self.models = {
+            LLMProvider.ANTHROPIC: "claude-3-5-sonnet-20241022",
+            LLMProvider.OPENAI: "gpt-4-turbo",
+            LLMProvider.GEMINI: ",".join(self.gemini_models),
+            LLMProvider.MOCK: "mock"
+        }
+        
+        # Token-budgeted prompt packing (replaces fixed character truncation)
+        self.budgeter = PromptBudgeter()
+        self.token_stats = {}
+        self._token_lock = threading.Lock()
+        
+        # Provider-side prompt prefix caching (Anthropic cache_control, Gemini cached contents,
+        # OpenAI automatic prefix caching) and per-agent cache-read accounting
+        self.prompt_cache_enabled = os.getenv('LLM_PROMPT_CACHE', '1') not in ('0', 'false', 'False')
+        min_tokens = os.getenv('LLM_GEMINI_CACHE_MIN_TOKENS')
+        self.gemini_cache_min_tokens = int(min_tokens) if min_tokens else None
+        self.gemini_cache_ttl = int(os.getenv('LLM_GEMINI_CACHE_TTL', '3600'))
+        self._gemini_caches = {} # (model, system hash) -> (cached content name or None, expires_at)
+        self._gemini_cache_lock = threading.Lock()
+        self._gemini_cache_key_locks = {} # one creation in flight per (model, system hash)
+        self._gemini_cache_unreachable = set() # models whose minimum exceeds the prompt budget (warned once)
+        self.prompt_cache_stats = {}
+        
+        # Shared on-disk response cache (content-addressed, LRU + TTL)
+        self.response_cache = ResponseCache()
+        
+        # Record/replay of whole calls (LLM_CASSETTE_MODE)
+        self.cassette = Cassette()
+        
+        # Hedging: race the next provider when the first is slower than its latency percentile
+        # LLM_HEDGE: off (default), interactive (calls passing hedge=True) or all
+        self.hedge_mode = os.getenv('LLM_HEDGE', 'off').lower()
+        self.hedge_percentile = float(os.getenv('LLM_HEDGE_PERCENTILE', '95'))
+        self.hedge_min_delay = float(os.getenv('LLM_HEDGE_MIN_DELAY', '1.0'))
+        self.hedge_default_delay = float(os.getenv('LLM_HEDGE_DEFAULT_DELAY', '8.0'))
+        self.hedge_stats = {'requests': 0, 'fired': 0, 'hedge_won': 0, 'primary_won': 0}
+        self._hedge_lock = threading.Lock()
+        
+        # Async API: a dedicated event loop thread owns one pooled async client per provider
+        self._aio_loop = None
+        self._aio_lock = threading.Lock()
+        self._async_clients = {}
+        # Providers whose clients (SDK import included) were built off the loop
+        self._clients_ready = set()
+        self._clients_ready_lock = threading.Lock()
     
+    def for_agent(self, agent_id: str) -> 'LLMManager':
+        """
+        Per-agent view for processes hosting several agents (agent_host.py): provider clients,
+        rate limiter, router health, caches, cassette and event loop stay shared, while metrics,
+        token, prompt-cache and hedge stats and cassette attribution are this agent's own
+        """
+        view = copy.copy(self)
+        view.agent_id = agent_id
+        view.metrics = MetricsRegistry()
+        view.router = _AgentRouter(self.router, view._observe_call)
+        view.token_stats = {}
+        view.prompt_cache_stats = {}
+        view._token_lock = threading.Lock()
+        view.hedge_stats = {'requests': 0, 'fired': 0, 'hedge_won': 0, 'primary_won': 0}
+        view._hedge_lock = threading.Lock()
+        # Built lazily: go through this manager so every view gets the same loop and clients
+        view._get_loop = self._get_loop
+        view._gemini_client = self._gemini_client
+        return view
+
     def generate_response(
         self, 
         prompt: str, 
         system_context: str = "",
         history: Optional[List[Dict]] = None,
-        provider_override: Optional[str] = None
+        provider_override: Optional[str] = None,
+        use_cache: bool = True,
+        hedge: Optional[bool] = None
     ) -> Optional[str]:
         """
         Generate a response using the first available LLM provider.
+        
+        Identical requests are served from the shared response cache unless use_cache is False.
+        Latency-sensitive callers pass hedge=True to opt into hedged requests (see LLM_HEDGE).
         """
-        # Determine provider order
-        if provider_override and provider_override in [p.value for p in LLMProvider]:
-            priority = [provider_override] + [p for p in self.provider_priority if p != provider_override]
-        else:
-            priority = self.provider_priority
+        with self.metrics.timer('llm_generate_seconds', api='sync'):
+            if self.cassette.enabled:
+                return self._cassette_call(
+                    prompt, system_context, history,
+                    lambda: self._generate_response(prompt, system_context, history, provider_override, use_cache, hedge)
+                )
+            return self._generate_response(prompt, system_context, history, provider_override, use_cache, hedge)
+
+    def _generate_response(self, prompt, system_context, history, provider_override, use_cache, hedge) -> Optional[str]:
+        scope = current_scope()
+        if scope is not None:
+            # A request with a deadline or that can be cancelled: run the call on the LLM loop,
+            # where cancelling the task aborts the HTTP request and releases the slot
+            scope.check()
+            return self._run_cancellable(
+                self._agenerate(prompt, system_context, history, provider_override, use_cache, hedge=self._should_hedge(hedge)),
+                scope
+            )
+        if self._should_hedge(hedge):
+            future = asyncio.run_coroutine_threadsafe(
+                self._agenerate(prompt, system_context, history, provider_override, use_cache, hedge=True),
+                self._get_loop()
+            )
+            return future.result()
         
         # Try each provider in order
-        for provider_name in priority:
+        for provider_name, provider_enum in self._candidate_providers(provider_override):
+            started = None
             try:
-                provider_enum = LLMProvider(provider_name)
-                
-                if provider_enum not in self.providers:
-                    continue
-                
-                # Check cooldown
-                if provider_enum in self.cooldowns:
-                    if time.time() - self.cooldowns[provider_enum] < 30: # 30s cooldown
-                        logger.warning(f"Skipping {provider_name} due to recent rate limit (cooldown active)")
-                        continue
+                packed = self._pack(provider_enum, prompt, system_context, history)
+                cache_key = None
+                if use_cache:
+                    cache_key = self._cache_key(provider_enum, packed)
+                    cached = self.response_cache.get(cache_key)
+                    if cached:
+                        logger.info(f"Response cache hit for {provider_name}")
+                        return cached
                 
-                # Wait for slot (limit aggregate concurrency to avoid burst limits)
-                with self._get_slot_lock():
-                    logger.info(f"Slot acquired. Calling {provider_name}...")
+                # Wait for a slot within this provider's budget (other providers stay available)
+                with self._provider_slot(provider_enum, packed) as lease, self._breaker_probe(provider_name):
+                    logger.info(f"Slot acquired after {lease.waited:.2f}s. Calling {provider_name} ({packed.tokens} prompt tokens)...")
+                    self._record_tokens(provider_name, packed, lease)
+                    started = time.monotonic()
                     
                     if provider_enum == LLMProvider.ANTHROPIC:
-                        result = self._call_anthropic(prompt, system_context, history)
+                        result = self._call_anthropic(packed)
                     elif provider_enum == LLMProvider.OPENAI:
-                        result = self._call_openai(prompt, system_context, history)
+                        result = self._call_openai(packed)
                     elif provider_enum == LLMProvider.GEMINI:
-                        result = self._call_gemini(prompt, system_context, history)
+                        result = self._call_gemini(packed)
+                    elif provider_enum == LLMProvider.MOCK:
+                        result = self.providers[LLMProvider.MOCK].complete(packed.prompt, packed.system)
                     
-                    if result: return result
+                    if result:
+                        self.router.record_success(provider_name, time.monotonic() - started)
+                        lease.release(packed.tokens + self._record_output(provider_name, result))
+                        if cache_key:
+                            self.response_cache.put(cache_key, provider_name, self.models[provider_enum], result)
+                        return result
+                    self.router.record_failure(provider_name, latency=time.monotonic() - started)
                     
+            except (RateLimitTimeout, CircuitOpenError) as e:
+                logger.warning(f"{e}, trying next provider")
+                continue
             except Exception as e:
-                err_str = str(e)
-                if "429" in err_str or "quota" in err_str.lower() or "ResourceExhausted" in err_str:
-                    self.cooldowns[provider_enum] = time.time()
-                logger.warning(f"{provider_name} failed: {err_str[:100]}")
+                self._on_provider_error(provider_enum, e, started)
                 continue
         
         logger.error("All LLM providers failed or excluded")
         return None
 
-    def _get_slot_lock(self):
-        """Context manager for cross-process concurrency control"""
-        class SlotLock:
-            def __init__(self, path):
-                self.path = path
-                self.f = None
-            def __enter__(self):
-                self.f = open(self.path, 'w')
-                if fcntl:
-                    # Unix/Linux locking
-                    fcntl.flock(self.f, fcntl.LOCK_EX)
-                elif msvcrt:
-                    # Windows locking
-                    self.f.seek(0)
-                    try:
-                        msvcrt.locking(self.f.fileno(), msvcrt.LK_LOCK, 1)
-                    except:
-                        pass
+    def generate_response_stream(
+        self,
+        prompt: str,
+        system_context: str = "",
+        history: Optional[List[Dict]] = None,
+        provider_override: Optional[str] = None,
+        use_cache: bool = True,
+        hedge: Optional[bool] = None
+    ) -> Iterator[str]:
+        """
+        Stream a response as incremental text chunks using each SDK's streaming mode.
+        
+        Falls back to the next provider only while nothing has been yielded yet; a provider
+        failing mid-stream ends the stream. Cached responses are yielded as a single chunk,
+        and completed streams are stored in the response cache. When hedging, the race is
+        decided by the first chunk.
+        
+        Inside a request with a deadline or cancel_task (see cancellation.py) the stream is
+        closed, and with it the HTTP response, at the first chunk after cancellation.
+        """
+        chunks = self._generate_response_stream(prompt, system_context, history, provider_override, use_cache, hedge)
+        if self.cassette.enabled:
+            chunks = self._cassette_stream(prompt, system_context, history, chunks)
+        scope = current_scope()
+        if scope is None:
+            yield from chunks
+            return
+        scope.check()
+        try:
+            for chunk in chunks:
+                scope.check()
+                yield chunk
+        finally:
+            chunks.close()
+
+    def _run_cancellable(self, coro, scope):
+        """Wait for a coroutine on the LLM loop until it finishes, the scope is cancelled or its deadline passes"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._get_loop())
+        unregister = scope.on_cancel(future.cancel)
+        try:
+            return future.result(timeout=scope.remaining())
+        except (FutureTimeoutError, FutureCancelledError):
+            future.cancel()
+            logger.info(f"LLM call abandoned: {scope.error()}")
+            raise scope.error() from None
+        finally:
+            unregister()
+
+    def _generate_response_stream(self, prompt, system_context, history, provider_override, use_cache, hedge):
+        args = (prompt, system_context, history, use_cache)
+        candidates = self._candidate_providers(provider_override)
+        
+        if self._should_hedge(hedge):
+            produced = yield from self._hedged_stream(candidates, args)
+            if produced:
+                return
+        
+        for provider_name, provider_enum in candidates:
+            produced = yield from self._stream_attempt(provider_name, provider_enum, *args)
+            if produced:
+                return
+        
+        logger.error("All LLM providers failed or excluded")
+
+    def _stream_attempt(self, provider_name, provider_enum, prompt, system_context, history, use_cache):
+        """Stream from one provider. Returns True once anything was yielded (even if interrupted)."""
+        yielded = False
+        started = None
+        try:
+            packed = self._pack(provider_enum, prompt, system_context, history)
+            cache_key = None
+            if use_cache:
+                cache_key = self._cache_key(provider_enum, packed)
+                cached = self.response_cache.get(cache_key)
+                if cached:
+                    logger.info(f"Response cache hit for {provider_name}")
+                    yield cached
+                    return True
+            
+            with self._provider_slot(provider_enum, packed) as lease, self._breaker_probe(provider_name):
+                logger.info(f"Slot acquired after {lease.waited:.2f}s. Streaming from {provider_name} ({packed.tokens} prompt tokens)...")
+                self._record_tokens(provider_name, packed, lease)
+                started = time.monotonic()
                 
-                # Sleep a tiny bit to avoid split-second overlaps
-                time.sleep(0.5 + random.random()) 
-            def __exit__(self, exc_type, exc_val, exc_tb):
-                if self.f:
-                    if fcntl:
-                        fcntl.flock(self.f, fcntl.LOCK_UN)
-                    elif msvcrt:
-                        try:
-                            self.f.seek(0)
-                            msvcrt.locking(self.f.fileno(), msvcrt.LK_UNLCK, 1)
-                        except:
-                            pass
-                    self.f.close()
-        return SlotLock(self.lock_file)
-    
-    def _call_anthropic(self, prompt: str, system_context: str, history: Optional[List]) -> str:
-        """Call Anthropic Claude API"""
-        client = self.providers[LLMProvider.ANTHROPIC]
+                if provider_enum == LLMProvider.ANTHROPIC:
+                    chunks = self._stream_anthropic(packed)
+                elif provider_enum == LLMProvider.OPENAI:
+                    chunks = self._stream_openai(packed)
+                elif provider_enum == LLMProvider.GEMINI:
+                    chunks = self._stream_gemini(packed)
+                elif provider_enum == LLMProvider.MOCK:
+                    chunks = self.providers[LLMProvider.MOCK].stream(packed.prompt, packed.system)
+                
+                parts = []
+                for chunk in chunks:
+                    if not chunk:
+                        continue
+                    parts.append(chunk)
+                    yielded = True
+                    yield chunk
+                
+                if yielded:
+                    self.router.record_success(provider_name, time.monotonic() - started)
+                    lease.release(packed.tokens + self._record_output(provider_name, "".join(parts)))
+                    if cache_key:
+                        self.response_cache.put(cache_key, provider_name, self.models[provider_enum], "".join(parts))
+                    return True
+                self.router.record_failure(provider_name, latency=time.monotonic() - started)
+                
+        except (RateLimitTimeout, CircuitOpenError) as e:
+            logger.warning(f"{e}, trying next provider")
+        except Exception as e:
+            self._on_provider_error(provider_enum, e, started)
+            if yielded:
+                logger.error(f"{provider_name} stream interrupted after partial output")
+        return yielded
+
+    def _hedged_stream(self, candidates, args):
+        """
+        Stream from the best provider, starting the next one if no chunk arrives within the
+        hedge delay. The first provider to produce a chunk wins; the other is told to stop.
+        Sync SDK streams can only notice cancellation between chunks, so a stalled loser
+        keeps its worker thread (and rate limiter slot) until its own request times out.
         
-        # Build messages with history (TRIMMED)
-        messages = []
-        if history:
-            for msg in history[-5:]:  # Last 5 messages
-                role = "user" if msg.get('fromId') == 'user' else "assistant"
-                content = msg.get('content', '')
-                if len(str(content)) > 1000: content = str(content)[:1000] + "..."
-                messages.append({"role": role, "content": content})
-        
-        trimmed_prompt = prompt if len(prompt) < 2000 else prompt[:2000] + "..."
-        messages.append({"role": "user", "content": trimmed_prompt})
-        
-        response = client.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=1024,
-            system=system_context,
-            messages=messages
-        )
+        Returns True if anything was yielded, False to let the caller fall back.
+        """
+        primary = next(candidates, None)
+        if primary is None:
+            return False
+        self._count_hedge('requests')
         
-        return response.content[0].text
-    
-    def _call_openai(self, prompt: str, system_context: str, history: Optional[List]) -> str:
-        """Call OpenAI GPT API"""
-        client = self.providers[LLMProvider.OPENAI]
+        events = queue.Queue()
+        runners = [self._start_stream_runner(0, primary, args, events)]
+        deadline = time.monotonic() + self._hedge_delay(primary[0])
+        hedged = False
+        ended = set()
+        winner = None
+        try:
+            while winner is None and len(ended) < len(runners):
+                try:
+                    index, kind, payload = events.get(timeout=None if hedged else max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    hedged = True
+                    backup = next(candidates, None)
+                    if backup:
+                        logger.info(f"{primary[0]} slow to respond, hedging with {backup[0]}")
+                        self._count_hedge('fired')
+                        runners.append(self._start_stream_runner(1, backup, args, events))
+                    continue
+                if kind == 'end':
+                    ended.add(index)
+                else:
+                    winner, first_chunk = index, payload
+            
+            if winner is None:
+                return False
+            if hedged:
+                self._count_hedge('hedge_won' if winner == 1 else 'primary_won')
+            # Stop the loser now, not after the winner's whole stream: it holds a slot and spends quota
+            for index, cancelled in enumerate(runners):
+                if index != winner:
+                    cancelled.set()
+            
+            yield first_chunk
+            while True:
+                index, kind, payload = events.get()
+                if index != winner:
+                    continue
+                if kind == 'end':
+                    return True
+                yield payload
+        finally:
+            for cancelled in runners:
+                cancelled.set()
+
+    def _start_stream_runner(self, index, candidate, args, events) -> threading.Event:
+        """Pump one provider's stream into the shared event queue from a worker thread"""
+        cancelled = threading.Event()
+        
+        def run():
+            attempt = self._stream_attempt(candidate[0], candidate[1], *args)
+            try:
+                for chunk in attempt:
+                    if cancelled.is_set():
+                        break
+                    events.put((index, 'chunk', chunk))
+            finally:
+                attempt.close()
+                events.put((index, 'end', None))
+        
+        threading.Thread(target=run, name=f'llm-hedge-{candidate[0]}', daemon=True).start()
+        return cancelled
+
+    async def agenerate_response(
+        self,
+        prompt: str,
+        system_context: str = "",
+        history: Optional[List[Dict]] = None,
+        provider_override: Optional[str] = None,
+        use_cache: bool = True,
+        hedge: Optional[bool] = None
+    ) -> Optional[str]:
+        """
+        Async counterpart of generate_response(). Safe to await from any event loop:
+        the request runs on the manager's LLM loop, where the pooled async clients live.
+        """
+        call = lambda: self._agenerate(prompt, system_context, history, provider_override, use_cache, self._should_hedge(hedge))
+        with self.metrics.timer('llm_generate_seconds', api='async'):
+            if self.cassette.enabled:
+                return await self._on_llm_loop(self._acassette_call(prompt, system_context, history, call))
+            return await self._on_llm_loop(call())
+
+    async def agenerate_many(self, requests: List[Any], max_concurrency: int = 8) -> List[Optional[str]]:
+        """
+        Run many independent prompts concurrently with at most max_concurrency in flight.
+        
+        Each request is either a prompt string or a dict of agenerate_response() keyword
+        arguments. Results keep the order of requests; a failed prompt yields None.
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
         
-        # Build messages with history (TRIMMED)
-        messages = [{"role": "system", "content": system_context}]
+        async def run_one(request):
+            kwargs = {'prompt': request} if isinstance(request, str) else dict(request)
+            async with semaphore:
+                try:
+                    return await self.agenerate_response(**kwargs)
+                except Exception as e:
+                    logger.warning(f"Fan-out request failed: {str(e)[:100]}")
+                    return None
         
-        if history:
-            for msg in history[-5:]:
-                role = "user" if msg.get('fromId') == 'user' else "assistant"
-                content = msg.get('content', '')
-                if len(str(content)) > 1000: content = str(content)[:1000] + "..."
-                messages.append({"role": role, "content": content})
+        return list(await asyncio.gather(*(run_one(r) for r in requests)))
+
+    def generate_many(self, requests: List[Any], max_concurrency: int = 8) -> List[Optional[str]]:
+        """Blocking fan-out for threaded agents (see agenerate_many)"""
+        future = asyncio.run_coroutine_threadsafe(self.agenerate_many(requests, max_concurrency), self._get_loop())
+        return future.result()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the background LLM event loop on first use"""
+        with self._aio_lock:
+            if self._aio_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='llm-aio', daemon=True).start()
+                self._aio_loop = loop
+            return self._aio_loop
+
+    async def _on_llm_loop(self, coro):
+        """Await a coroutine on the LLM loop, hopping threads if called from another loop"""
+        loop = self._get_loop()
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    async def _agenerate(self, prompt, system_context, history, provider_override, use_cache, hedge=False) -> Optional[str]:
+        args = (prompt, system_context, history, use_cache)
+        candidates = self._candidate_providers(provider_override)
         
-        trimmed_prompt = prompt if len(prompt) < 2000 else prompt[:2000] + "..."
-        messages.append({"role": "user", "content": trimmed_prompt})
+        if hedge:
+            result = await self._ahedged(candidates, args)
+            if result:
+                return result
         
-        response = client.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=messages,
-            max_tokens=1024
+        for provider_name, provider_enum in candidates:
+            result = await self._aattempt(provider_name, provider_enum, *args)
+            if result:
+                return result
+        
+        logger.error("All LLM providers failed or excluded")
+        return None
+
+    async def _aattempt(self, provider_name, provider_enum, prompt, system_context, history, use_cache) -> Optional[str]:
+        """One provider attempt on the LLM loop; failures are recorded and reported as None"""
+        started = None
+        try:
+            packed = self._pack(provider_enum, prompt, system_context, history)
+            cache_key = None
+            if use_cache:
+                cache_key = self._cache_key(provider_enum, packed)
+                cached = await self.response_cache.aget(cache_key)
+                if cached:
+                    logger.info(f"Response cache hit for {provider_name}")
+                    return cached
+            
+            await self._aprepare_clients(provider_enum)
+            lease = await self.rate_limiter.aacquire(
+                provider_name,
+                self._estimate_request_tokens(packed),
+                self.slot_timeout
+            )
+            used_tokens = None
+            try:
+                with self._breaker_probe(provider_name):
+                    logger.info(f"Slot acquired after {lease.waited:.2f}s. Calling {provider_name} (async, {packed.tokens} prompt tokens)...")
+                    self._record_tokens(provider_name, packed, lease)
+                    started = time.monotonic()
+                    if provider_enum == LLMProvider.ANTHROPIC:
+                        result = await self._acall_anthropic(packed)
+                    elif provider_enum == LLMProvider.OPENAI:
+                        result = await self._acall_openai(packed)
+                    elif provider_enum == LLMProvider.GEMINI:
+                        result = await self._acall_gemini(packed)
+                    elif provider_enum == LLMProvider.MOCK:
+                        result = await self.providers[LLMProvider.MOCK].acomplete(packed.prompt, packed.system)
+                    if result:
+                        used_tokens = packed.tokens + self._record_output(provider_name, result)
+                        self.router.record_success(provider_name, time.monotonic() - started)
+                    else:
+                        self.router.record_failure(provider_name, latency=time.monotonic() - started)
+            finally:
+                await lease.arelease(used_tokens)
+            
+            if result:
+                if cache_key:
+                    await self.response_cache.aput(cache_key, provider_name, self.models[provider_enum], result)
+                return result
+            
+        except (RateLimitTimeout, CircuitOpenError) as e:
+            logger.warning(f"{e}, trying next provider")
+        except Exception as e:
+            self._on_provider_error(provider_enum, e, started)
+        return None
+
+    async def _ahedged(self, candidates, args) -> Optional[str]:
+        """
+        Call the best provider; if it has not answered within the hedge delay, send the same
+        request to the next provider. The first successful answer wins and the other call is
+        cancelled. Returns None when the raced providers failed, so the caller falls back.
+        """
+        primary = next(candidates, None)
+        if primary is None:
+            return None
+        self._count_hedge('requests')
+        
+        primary_task = asyncio.ensure_future(self._aattempt(*primary, *args))
+        done, _ = await asyncio.wait({primary_task}, timeout=self._hedge_delay(primary[0]))
+        if done:
+            return primary_task.result()
+        
+        backup = next(candidates, None)
+        if backup is None:
+            return await primary_task
+        
+        logger.info(f"{primary[0]} slow to respond, hedging with {backup[0]}")
+        self._count_hedge('fired')
+        backup_task = asyncio.ensure_future(self._aattempt(*backup, *args))
+        pending = {primary_task, backup_task}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.result():
+                        self._count_hedge('hedge_won' if task is backup_task else 'primary_won')
+                        return task.result()
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _cassette_call(self, prompt, system_context, history, call) -> Optional[str]:
+        """Serve from the cassette when replaying, record the live result when recording"""
+        key = Cassette.key(system_context, history, prompt)
+        if self.cassette.replaying:
+            entry = self.cassette.lookup(key)
+            if entry:
+                time.sleep(self.cassette.delay(entry))
+                return entry['r']
+            if not self.cassette.live_on_miss:
+                logger.warning("Cassette miss, no recorded response for this request")
+                return None
+        
+        started = time.monotonic()
+        result = call()
+        if result and self.cassette.recording:
+            self.cassette.record(key, system_context, history, prompt, result, time.monotonic() - started, self.agent_id)
+        return result
+
+    async def _acassette_call(self, prompt, system_context, history, call) -> Optional[str]:
+        """Async variant of _cassette_call (call returns a coroutine)"""
+        key = Cassette.key(system_context, history, prompt)
+        if self.cassette.replaying:
+            entry = self.cassette.lookup(key)
+            if entry:
+                await asyncio.sleep(self.cassette.delay(entry))
+                return entry['r']
+            if not self.cassette.live_on_miss:
+                logger.warning("Cassette miss, no recorded response for this request")
+                return None
+        
+        started = time.monotonic()
+        result = await call()
+        if result and self.cassette.recording:
+            self.cassette.record(key, system_context, history, prompt, result, time.monotonic() - started, self.agent_id)
+        return result
+
+    def _cassette_stream(self, prompt, system_context, history, chunks) -> Iterator[str]:
+        """Streaming variant: replays with the recorded time to first chunk, records ttft and total"""
+        key = Cassette.key(system_context, history, prompt)
+        if self.cassette.replaying:
+            entry = self.cassette.lookup(key)
+            if entry:
+                text = entry['r']
+                time.sleep(self.cassette.first_token_delay(entry))
+                pieces = [text[i:i + 64] for i in range(0, len(text), 64)] or ['']
+                remaining = max(0.0, self.cassette.delay(entry) - self.cassette.first_token_delay(entry))
+                for piece in pieces:
+                    yield piece
+                    time.sleep(remaining / len(pieces))
+                return
+            if not self.cassette.live_on_miss:
+                logger.warning("Cassette miss, no recorded response for this request")
+                return
+        
+        started = time.monotonic()
+        first_token = None
+        parts = []
+        for chunk in chunks:
+            if first_token is None:
+                first_token = time.monotonic() - started
+            parts.append(chunk)
+            yield chunk
+        if parts and self.cassette.recording:
+            self.cassette.record(
+                key, system_context, history, prompt, "".join(parts),
+                time.monotonic() - started, self.agent_id, first_token
+            )
+
+    def get_cassette_stats(self) -> Dict[str, Any]:
+        return self.cassette.get_stats()
+
+    def _should_hedge(self, hedge: Optional[bool]) -> bool:
+        if hedge is False or self.hedge_mode == 'off':
+            return False
+        return self.hedge_mode == 'all' or (hedge is True and self.hedge_mode == 'interactive')
+
+    def _hedge_delay(self, provider_name: str) -> float:
+        """Primary's latency percentile (needs a few samples), floored at the minimum delay"""
+        observed = self.router.latency_percentile(provider_name, self.hedge_percentile, min_samples=5)
+        return max(self.hedge_min_delay, observed if observed is not None else self.hedge_default_delay)
+
+    def _count_hedge(self, name: str):
+        with self._hedge_lock:
+            self.hedge_stats[name] += 1
+
+    def get_hedge_stats(self) -> Dict[str, Any]:
+        """How often hedges fired and which side won"""
+        with self._hedge_lock:
+            stats = dict(self.hedge_stats)
+        stats['mode'] = self.hedge_mode
+        stats['fire_rate'] = round(stats['fired'] / stats['requests'], 4) if stats['requests'] else 0.0
+        stats['win_rate'] = round(stats['hedge_won'] / stats['fired'], 4) if stats['fired'] else 0.0
+        return stats
+
+    async def _aprepare_clients(self, provider_enum: LLMProvider):
+        """
+        Build the clients a provider's async calls use on a worker thread the first time.
+        Everything else on the LLM loop must not block: an SDK import takes a second or
+        more and would stall every in-flight call (and cancellation) meanwhile.
+        """
+        if provider_enum not in self._clients_ready:
+            await asyncio.to_thread(self._prepare_clients, provider_enum)
+
+    def _prepare_clients(self, provider_enum: LLMProvider):
+        with self._clients_ready_lock:
+            if provider_enum in self._clients_ready:
+                return
+            if provider_enum in (LLMProvider.ANTHROPIC, LLMProvider.OPENAI):
+                self._async_client(provider_enum)
+            elif provider_enum == LLMProvider.GEMINI:
+                for model_name in self.gemini_models:
+                    self._gemini_client(model_name)
+            else:
+                self.providers[provider_enum]
+            self._clients_ready.add(provider_enum)
+
+    def _async_client(self, provider_enum: LLMProvider):
+        """Pooled async SDK client for the provider (built once by _prepare_clients, reused by all calls)"""
+        if provider_enum not in self._async_clients:
+            if provider_enum == LLMProvider.ANTHROPIC:
+                from anthropic import AsyncAnthropic
+                self._async_clients[provider_enum] = AsyncAnthropic(api_key=self._api_keys[provider_enum])
+            elif provider_enum == LLMProvider.OPENAI:
+                from openai import AsyncOpenAI
+                self._async_clients[provider_enum] = AsyncOpenAI(api_key=self._api_keys[provider_enum])
+        return self._async_clients[provider_enum]
+
+    def _candidate_providers(self, provider_override: Optional[str] = None):
+        """
+        Yield (name, enum) for configured providers, fastest healthy first.
+        
+        LLM_PRIORITY breaks ties (and is the order until latencies are known); an override
+        goes first while its breaker allows it. Providers with an open circuit are skipped.
+        Listing a provider does not claim its breaker: _breaker_probe() does, right before
+        the request, so a cache hit or a skipped provider never strands a half-open probe.
+        """
+        configured = []
+        for provider_name in self.provider_priority:
+            try:
+                provider_enum = LLMProvider(provider_name)
+            except ValueError:
+                logger.warning(f"Unknown LLM provider in priority list: {provider_name}")
+                continue
+            if provider_enum in self.providers:
+                configured.append(provider_name)
+        
+        ranked = self.router.rank(configured)
+        if provider_override in ranked:
+            ranked = [provider_override] + [p for p in ranked if p != provider_override]
+        for provider_name in configured:
+            if provider_name not in ranked:
+                logger.warning(f"Skipping {provider_name} (circuit open)")
+        
+        for provider_name in ranked:
+            yield provider_name, LLMProvider(provider_name)
+
+    @contextlib.contextmanager
+    def _breaker_probe(self, provider_name: str):
+        """Claim the provider's breaker for one request; a probe left without an outcome is given back"""
+        claim = self.router.claim(provider_name)
+        if claim is None:
+            raise CircuitOpenError(f"Circuit for {provider_name} is open")
+        try:
+            yield
+        finally:
+            self.router.release(provider_name, claim)
+
+    def _pack(self, provider_enum: LLMProvider, prompt: str, system_context: str, history: Optional[List]) -> 'PackedPrompt':
+        return self.budgeter.pack(provider_enum.value, system_context, prompt, history)
+
+    def _cache_key(self, provider_enum: LLMProvider, packed: 'PackedPrompt') -> str:
+        return ResponseCache.make_key(
+            provider_enum.value, self.models[provider_enum], packed.system, packed.messages, packed.prompt
         )
+
+    def _estimate_request_tokens(self, packed: 'PackedPrompt') -> int:
+        """Packed prompt size plus the completion budget"""
+        return packed.tokens + self.max_output_tokens
+
+    def _provider_slot(self, provider_enum: LLMProvider, packed: 'PackedPrompt'):
+        """Rate limiter slot sized for this request"""
+        return self.rate_limiter.slot(provider_enum.value, self._estimate_request_tokens(packed), self.slot_timeout)
+
+    def _record_tokens(self, provider_name: str, packed: 'PackedPrompt', lease=None):
+        if lease is not None:
+            self.metrics.histogram('llm_slot_wait_seconds', provider=provider_name).record(lease.waited)
+        self.metrics.counter('llm_tokens_in', provider=provider_name).inc(packed.tokens)
+        with self._token_lock:
+            stats = self.token_stats.setdefault(provider_name, {
+                'calls': 0, 'prompt_tokens': 0, 'truncated_calls': 0, 'dropped_messages': 0, 'last_call_tokens': 0
+            })
+            stats['calls'] += 1
+            stats['prompt_tokens'] += packed.tokens
+            stats['truncated_calls'] += 1 if packed.truncated else 0
+            stats['dropped_messages'] += packed.dropped_messages
+            stats['last_call_tokens'] = packed.tokens
+        if packed.truncated or packed.dropped_messages:
+            logger.info(f"Prompt budget: truncated {', '.join(packed.truncated) or 'nothing'}, dropped {packed.dropped_messages} history messages")
+
+    def _record_output(self, provider_name: str, text: str) -> int:
+        """Count completion tokens; the count also settles the rate limiter lease's TPM estimate"""
+        # Counted like the prompt, so in and out are comparable across providers (and the mock)
+        tokens = self.budgeter.counter.count(text, provider_name)
+        self.metrics.counter('llm_tokens_out', provider=provider_name).inc(tokens)
+        return tokens
+
+    def _observe_call(self, endpoint: str, latency: Optional[float], failed: bool):
+        """Router observer: provider call latency by provider and model"""
+        provider, _, model = endpoint.partition('/')
+        if not model:
+            if provider == LLMProvider.GEMINI.value:
+                # Gemini reports each model it tries as gemini/<model>
+                return
+            model = next((m for p, m in self.models.items() if p.value == provider), provider)
+        outcome = 'error' if failed else 'ok'
+        self.metrics.counter('llm_calls', provider=provider, model=model, outcome=outcome).inc()
+        if latency is not None:
+            self.metrics.histogram('llm_call_seconds', provider=provider, model=model, outcome=outcome).record(latency)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """LLM latency histograms (end to end, per provider/model call, slot wait) and token counters"""
+        return {'agentId': self.agent_id, **self.metrics.snapshot()}
+
+    def _record_prompt_cache(self, provider_enum: LLMProvider, input_tokens: int, cache_read: int, cache_write: int):
+        with self._token_lock:
+            stats = self.prompt_cache_stats.setdefault(provider_enum.value, {
+                'calls': 0, 'input_tokens': 0, 'cache_read_tokens': 0, 'cache_write_tokens': 0
+            })
+            stats['calls'] += 1
+            stats['input_tokens'] += input_tokens
+            stats['cache_read_tokens'] += cache_read
+            stats['cache_write_tokens'] += cache_write
+
+    def get_prompt_cache_stats(self) -> Dict[str, Any]:
+        """Provider-reported input tokens and the share read from the provider prompt cache"""
+        with self._token_lock:
+            providers = {provider: dict(values) for provider, values in self.prompt_cache_stats.items()}
+        total_input = sum(v['input_tokens'] for v in providers.values())
+        total_read = sum(v['cache_read_tokens'] for v in providers.values())
+        for values in providers.values():
+            values['cache_read_ratio'] = round(values['cache_read_tokens'] / values['input_tokens'], 4) if values['input_tokens'] else 0.0
+        return {
+            'agent_id': self.agent_id,
+            'enabled': self.prompt_cache_enabled,
+            'cache_read_ratio': round(total_read / total_input, 4) if total_input else 0.0,
+            'providers': providers
+        }
+
+    def get_token_stats(self) -> Dict[str, Any]:
+        """Prompt tokens sent per provider (as counted by the budgeter) and budget pressure"""
+        with self._token_lock:
+            stats = {provider: dict(values) for provider, values in self.token_stats.items()}
+        for values in stats.values():
+            values['avg_prompt_tokens'] = round(values['prompt_tokens'] / values['calls'], 1) if values['calls'] else 0
+        return {'tokenizer': self.budgeter.counter.backend, 'providers': stats}
+
+    def _on_provider_error(self, provider_enum: LLMProvider, error: Exception, started: Optional[float] = None):
+        latency = time.monotonic() - started if started is not None else None
+        self.router.record_failure(provider_enum.value, error, latency)
+        logger.warning(f"{provider_enum.value} failed: {str(error)[:100]}")
+
+    def get_routing_state(self) -> Dict[str, Any]:
+        """Routing mode plus per-provider/per-model breaker state, latency and error rates"""
+        return {
+            'adaptive': self.router.adaptive,
+            'priority': list(self.provider_priority),
+            'endpoints': self.router.get_state(),
+            'hedging': self.get_hedge_stats()
+        }
+
+    def get_rate_limit_state(self) -> Dict[str, Dict]:
+        """Current per-provider rate limiter budgets and usage"""
+        return self.rate_limiter.get_state()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Response cache hits, misses, bytes saved and size"""
+        return self.response_cache.get_stats()
+    
+    def _anthropic_request(self, packed: 'PackedPrompt') -> Dict[str, Any]:
+        # Build messages with the budgeted history
+        messages = list(packed.messages)
+        system = packed.system
         
-        return response.choices[0].message.content
+        if self.prompt_cache_enabled:
+            # Cache breakpoints: end of the system prompt and end of the prior conversation,
+            # so repeated system prompts and growing chats are read from the prompt cache.
+            # Prefixes below the model's minimum cacheable size are simply not cached.
+            if system:
+                system = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+            if messages:
+                last = messages[-1]
+                messages[-1] = {
+                    "role": last['role'],
+                    "content": [{"type": "text", "text": last['content'], "cache_control": {"type": "ephemeral"}}]
+                }
+        
+        messages.append({"role": "user", "content": packed.prompt})
+        
+        return {
+            'model': self.models[LLMProvider.ANTHROPIC],
+            'max_tokens': self.max_output_tokens,
+            'system': system,
+            'messages': messages
+        }
     
-    def _call_gemini(self, prompt: str, system_context: str, history: Optional[List]) -> str:
-        """Call Google Gemini API using new google-genai SDK"""
+    def _record_anthropic_usage(self, usage):
+        if usage is None:
+            return
+        cache_read = getattr(usage, 'cache_read_input_tokens', 0) or 0
+        cache_write = getattr(usage, 'cache_creation_input_tokens', 0) or 0
+        self._record_prompt_cache(LLMProvider.ANTHROPIC, (usage.input_tokens or 0) + cache_read + cache_write, cache_read, cache_write)
+    
+    def _call_anthropic(self, packed: 'PackedPrompt') -> str:
+        """Call Anthropic Claude API"""
+        client = self.providers[LLMProvider.ANTHROPIC]
+        response = client.messages.create(**self._anthropic_request(packed))
+        self._record_anthropic_usage(getattr(response, 'usage', None))
+        return response.content[0].text
+    
+    async def _acall_anthropic(self, packed: 'PackedPrompt') -> str:
+        """Call Anthropic Claude API with the pooled async client"""
+        client = self._async_client(LLMProvider.ANTHROPIC)
+        response = await client.messages.create(**self._anthropic_request(packed))
+        self._record_anthropic_usage(getattr(response, 'usage', None))
+        return response.content[0].text
+    
+    def _stream_anthropic(self, packed: 'PackedPrompt') -> Iterator[str]:
+        """Stream Anthropic Claude API text deltas"""
+        client = self.providers[LLMProvider.ANTHROPIC]
+        with client.messages.stream(**self._anthropic_request(packed)) as stream:
+            for text in stream.text_stream:
+                yield text
+            self._record_anthropic_usage(stream.get_final_message().usage)
+    
+    def _openai_request(self, packed: 'PackedPrompt') -> Dict[str, Any]:
+        # Build messages with the budgeted history
+        messages = [{"role": "system", "content": packed.system}]
+        messages.extend(packed.messages)
+        messages.append({"role": "user", "content": packed.prompt})
         
+        return {
+            'model': self.models[LLMProvider.OPENAI],
+            'messages': messages,
+            'max_tokens': self.max_output_tokens
+        }
+    
+    def _record_openai_usage(self, usage):
+        # OpenAI caches prompt prefixes automatically; the stable system prompt goes first
+        if usage is None:
+            return
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cache_read = (getattr(details, 'cached_tokens', 0) or 0) if details else 0
+        self._record_prompt_cache(LLMProvider.OPENAI, usage.prompt_tokens or 0, cache_read, 0)
+    
+    def _call_openai(self, packed: 'PackedPrompt') -> str:
+        """Call OpenAI GPT API"""
+        client = self.providers[LLMProvider.OPENAI]
+        response = client.chat.completions.create(**self._openai_request(packed))
+        self._record_openai_usage(getattr(response, 'usage', None))
+        return response.choices[0].message.content
+    
+    async def _acall_openai(self, packed: 'PackedPrompt') -> str:
+        """Call OpenAI GPT API with the pooled async client"""
+        client = self._async_client(LLMProvider.OPENAI)
+        response = await client.chat.completions.create(**self._openai_request(packed))
+        self._record_openai_usage(getattr(response, 'usage', None))
+        return response.choices[0].message.content
+    
+    def _stream_openai(self, packed: 'PackedPrompt') -> Iterator[str]:
+        """Stream OpenAI GPT API content deltas"""
+        client = self.providers[LLMProvider.OPENAI]
+        stream = client.chat.completions.create(
+            stream=True, stream_options={"include_usage": True}, **self._openai_request(packed)
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if getattr(chunk, 'usage', None):
+                self._record_openai_usage(chunk.usage)
+    
+    def _gemini_contents(self, packed: 'PackedPrompt', include_system: bool = True) -> str:
         # Build conversation with system context
         conversation_parts = []
         
-        # Add system context
-        if system_context:
-            conversation_parts.append(f"System: {system_context}\n")
+        # Add system context (unless it is served from a cached content)
+        if packed.system and include_system:
+            conversation_parts.append(f"System: {packed.system}\n")
         
         # Add history
-        if history:
-            trimmed_history = history[-5:]
-            for msg in trimmed_history:
-                sender = "User" if msg.get('fromId') == 'user' else "Assistant"
-                content = msg.get('content', '')
-                if len(str(content)) > 1000:
-                    content = str(content)[:1000] + "... [truncated]"
-                conversation_parts.append(f"{sender}: {content}\n")
+        for msg in packed.messages:
+            sender = "User" if msg['role'] == 'user' else "Assistant"
+            conversation_parts.append(f"{sender}: {msg['content']}\n")
         
         # Add current prompt
-        conversation_parts.append(f"User: {prompt}\nAssistant:")
+        conversation_parts.append(f"User: {packed.prompt}\nAssistant:")
         
-        full_content = "\n".join(conversation_parts)
+        return "\n".join(conversation_parts)
+    
+    # ============================================
+    # Provider clients (created on first use by LazyProviders)
+    # ============================================
+    
+    def _create_anthropic_client(self):
+        return _import_provider('anthropic').Anthropic(api_key=self._api_keys[LLMProvider.ANTHROPIC])
+    
+    def _create_openai_client(self):
+        return _import_provider('openai').OpenAI(api_key=self._api_keys[LLMProvider.OPENAI])
+    
+    def _create_gemini_client(self):
+        # V1 client for stable models; the alpha client (exp models) is created separately when needed
+        genai = _import_provider('google.genai')
+        return genai.Client(api_key=self._api_keys[LLMProvider.GEMINI], http_options={'api_version': 'v1beta'})
+    
+    def _create_mock_client(self):
+        from mock_llm import MockLLM
+        return MockLLM.from_env()
+    
+    @property
+    def gemini_client_v1(self):
+        return self.providers[LLMProvider.GEMINI]
+    
+    @property
+    def gemini_client_alpha(self):
+        with self._gemini_alpha_lock:
+            if self._gemini_alpha is None:
+                genai = _import_provider('google.genai')
+                self._gemini_alpha = genai.Client(api_key=self._api_keys[LLMProvider.GEMINI], http_options={'api_version': 'v1alpha'})
+            return self._gemini_alpha
+    
+    def get_startup_stats(self) -> Dict[str, Any]:
+        """SDK import and client construction times paid so far by this process"""
+        return {
+            'configured': [p.value for p in self.providers],
+            'created': [p.value for p in self.providers.created()],
+            'import_seconds': dict(IMPORT_TIMES),
+            'client_seconds': {p.value: t for p, t in self.providers.timings.items()}
+        }
+    
+    def _gemini_client(self, model_name: str):
+        # Select correct client based on model type
+        if 'exp' in model_name or '2.0' in model_name:
+            return self.gemini_client_alpha
+        return self.gemini_client_v1
+    
+    def _gemini_request(self, model_name: str, packed: 'PackedPrompt') -> Dict[str, Any]:
+        """generate_content arguments, referencing a cached system prompt when one is available"""
+        cache_name = self._gemini_cached_content(model_name, packed.system)
+        if cache_name:
+            return {
+                'model': model_name,
+                'contents': self._gemini_contents(packed, include_system=False),
+                'config': {'cached_content': cache_name}
+            }
+        return {'model': model_name, 'contents': self._gemini_contents(packed)}
+    
+    def _gemini_cache_min_tokens(self, model_name: str) -> int:
+        """Minimum cacheable system prompt for the model, warning once if the prompt budget can never reach it"""
+        if self.gemini_cache_min_tokens is not None:
+            minimum = self.gemini_cache_min_tokens
+        else:
+            minimum = next(
+                (tokens for family, tokens in GEMINI_CACHE_MIN_TOKENS.items() if model_name.startswith(family)),
+                GEMINI_CACHE_DEFAULT_MIN_TOKENS
+            )
+        budget = self.budgeter.budget_for('gemini')
+        if minimum > budget and model_name not in self._gemini_cache_unreachable:
+            self._gemini_cache_unreachable.add(model_name)
+            logger.warning(
+                f"Gemini prompt caching is off for {model_name}: it needs a {minimum}-token system prompt "
+                f"but the Gemini prompt budget is {budget} (raise LLM_GEMINI_PROMPT_BUDGET)"
+            )
+        return minimum
+    
+    def _gemini_cached_content(self, model_name: str, system: str) -> Optional[str]:
+        """
+        Name of a Gemini cached content holding this system prompt, created on first use.
+        Only prompts above the model's minimum cacheable size qualify; failures are
+        remembered for the TTL so uncacheable models are not retried on every call.
+        Concurrent misses for the same prompt wait for a single caches.create; this
+        blocks, so callers on the LLM loop run it on a worker thread.
+        """
+        if not self.prompt_cache_enabled or not system:
+            return None
+        if self.budgeter.counter.count(system, 'gemini') < self._gemini_cache_min_tokens(model_name):
+            return None
         
-        # Try multiple Gemini models
-        models_to_try = [
-            'gemini-2.0-flash-exp',
-            'gemini-1.5-flash',
-            'gemini-1.5-pro'
-        ]
+        key = (model_name, hashlib.sha256(system.encode('utf-8')).hexdigest())
+        with self._gemini_cache_lock:
+            cached = self._gemini_caches.get(key)
+            if cached and cached[1] > time.time():
+                return cached[0]
+            key_lock = self._gemini_cache_key_locks.setdefault(key, threading.Lock())
         
-        last_error = None
-        for model_name in models_to_try:
+        with key_lock:
+            # Another thread may have created it while this one waited
+            with self._gemini_cache_lock:
+                cached = self._gemini_caches.get(key)
+                if cached and cached[1] > time.time():
+                    return cached[0]
+            
+            name = None
             try:
-                # Select correct client based on model type
-                if 'exp' in model_name or '2.0' in model_name:
-                    client = self.gemini_client_alpha
-                else:
-                    client = self.gemini_client_v1
-
-                response = client.models.generate_content(
+                cache = self._gemini_client(model_name).caches.create(
                     model=model_name,
-                    contents=full_content
+                    config={'system_instruction': system, 'ttl': f"{self.gemini_cache_ttl}s"}
+                )
+                name = cache.name
+                logger.info(f"Created Gemini cached content for {model_name}")
+            except Exception as e:
+                logger.warning(f"Gemini context caching unavailable for {model_name}: {str(e)[:100]}")
+            with self._gemini_cache_lock:
+                # Expire our reference a little before the server does
+                self._gemini_caches[key] = (name, time.time() + self.gemini_cache_ttl * 0.9)
+                self._gemini_cache_key_locks.pop(key, None)
+            return name
+    
+    def _record_gemini_usage(self, usage):
+        if usage is None:
+            return
+        self._record_prompt_cache(
+            LLMProvider.GEMINI,
+            getattr(usage, 'prompt_token_count', 0) or 0,
+            getattr(usage, 'cached_content_token_count', 0) or 0,
+            0
+        )
+    
+    def _gemini_model_candidates(self) -> Iterator[str]:
+        """Gemini models ordered by health, skipping models whose circuit is open"""
+        tried = False
+        for key in self.router.rank([f"gemini/{m}" for m in self.gemini_models]):
+            if self.router.allow(key):
+                tried = True
+                yield key.split('/', 1)[1]
+        if not tried:
+            raise CircuitOpenError("All Gemini models have an open circuit")
+    
+    def _call_gemini(self, packed: 'PackedPrompt') -> str:
+        """Call Google Gemini API using new google-genai SDK"""
+        # Try Gemini models, healthiest first
+        last_error = None
+        for model_name in self._gemini_model_candidates():
+            started = time.monotonic()
+            try:
+                response = self._gemini_client(model_name).models.generate_content(
+                    **self._gemini_request(model_name, packed)
                 )
                 
                 if response and response.text:
+                    self._record_gemini_usage(getattr(response, 'usage_metadata', None))
+                    self.router.record_success(f"gemini/{model_name}", time.monotonic() - started)
                     return response.text.strip()
+                self.router.record_failure(f"gemini/{model_name}", latency=time.monotonic() - started)
             except Exception as e:
+                self.router.record_failure(f"gemini/{model_name}", e, time.monotonic() - started)
                 last_error = e
                 err_str = str(e)
                 if "429" in err_str or "ResourceExhausted" in err_str:
@@ -284,3 +1455,56 @@ class LLMManager:
         
         if last_error: raise last_error
         return None
+    
+    async def _acall_gemini(self, packed: 'PackedPrompt') -> str:
+        """Call Google Gemini through the SDK's async (aio) interface"""
+        last_error = None
+        for model_name in self._gemini_model_candidates():
+            started = time.monotonic()
+            try:
+                # Building the request may create the cached content (a blocking call): keep it off the loop
+                request = await asyncio.to_thread(self._gemini_request, model_name, packed)
+                response = await self._gemini_client(model_name).aio.models.generate_content(**request)
+                if response and response.text:
+                    self._record_gemini_usage(getattr(response, 'usage_metadata', None))
+                    self.router.record_success(f"gemini/{model_name}", time.monotonic() - started)
+                    return response.text.strip()
+                self.router.record_failure(f"gemini/{model_name}", latency=time.monotonic() - started)
+            except Exception as e:
+                self.router.record_failure(f"gemini/{model_name}", e, time.monotonic() - started)
+                last_error = e
+                logger.warning(f"Gemini {model_name} failed (async): {type(e).__name__} - {e}")
+                continue
+        
+        if last_error: raise last_error
+        return None
+    
+    def _stream_gemini(self, packed: 'PackedPrompt') -> Iterator[str]:
+        """Stream Google Gemini chunks, moving to the next model only if nothing was produced"""
+        last_error = None
+        for model_name in self._gemini_model_candidates():
+            produced = False
+            started = time.monotonic()
+            try:
+                usage = None
+                for chunk in self._gemini_client(model_name).models.generate_content_stream(
+                    **self._gemini_request(model_name, packed)
+                ):
+                    usage = getattr(chunk, 'usage_metadata', None) or usage
+                    if chunk and chunk.text:
+                        produced = True
+                        yield chunk.text
+                if produced:
+                    self._record_gemini_usage(usage)
+                    self.router.record_success(f"gemini/{model_name}", time.monotonic() - started)
+                    return
+                self.router.record_failure(f"gemini/{model_name}", latency=time.monotonic() - started)
+            except Exception as e:
+                self.router.record_failure(f"gemini/{model_name}", e, time.monotonic() - started)
+                if produced:
+                    raise
+                last_error = e
+                logger.warning(f"Gemini {model_name} stream failed: {type(e).__name__} - {e}")
+                continue
+        
+        if last_error: raise last_error
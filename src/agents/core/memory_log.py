@@ -0,0 +1,443 @@
+"""
+Append-only segment log behind AgentMemory
+
+Every record_success / record_failure / add_best_practice appends one line to
+the active segment instead of rewriting the whole history, so a write costs
+the same with ten records or a million. Layout of the memory directory:
+- segment-<id>.jsonl: one record per line, "<crc32> <json>", where json is
+  {"op": "success" | "failure" | "practice" | "clear" | "stats", ...}
+- MANIFEST.json: the sealed segments in order with a summary of each (record
+  counts, task types, categories, timestamp range of the successes and
+  failures), the performance stats and
+  clear cutoff as of the end of the sealed segments, and the active segment id.
+  It is replaced atomically (temp file + rename) and is the commit point of
+  every rollover and compaction.
+
+Opening a log reads the manifest and replays only the active segment; sealed
+segments are read when a query needs them (only those whose summary matches)
+and a few are kept in memory. The active segment is sealed once it holds
+AGENT_MEMORY_SEGMENT_RECORDS records.
+
+Recovery: a torn or corrupt line at the end of the active segment (the process
+died mid-write) is truncated away; bad lines elsewhere are skipped with a
+warning; segment files the manifest does not list (left by an interrupted
+compaction) are deleted.
+
+clear_before() only appends a cutoff record. A background compaction then
+drops sealed segments that are entirely older than the cutoff and rewrites
+those that straddle it.
+
+One process writes a given directory at a time (each agent owns its memory).
+
+Configuration (environment):
+- AGENT_MEMORY_SEGMENT_RECORDS: records per segment before it is sealed (default 5000)
+- AGENT_MEMORY_CACHED_SEGMENTS: sealed segments kept loaded (default 4)
+- AGENT_MEMORY_FSYNC: "1" fsyncs every append (default "0": a write survives a
+  process crash, not a power loss)
+"""
+
+import os
+import json
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'MANIFEST.json'
+MANIFEST_VERSION = 1
+KINDS = ('success', 'failure', 'practice')
+# Record field a kind is looked up by
+KEY_FIELDS = {'success': 'task_type', 'failure': 'task_type', 'practice': 'category'}
+# Kinds clear_before() removes (best practices are kept, as before)
+CLEARABLE = ('success', 'failure')
+
+
+def empty_stats() -> Dict[str, Any]:
+    return {
+        'total_tasks': 0,
+        'successful_tasks': 0,
+        'failed_tasks': 0,
+        'average_duration': 0
+    }
+
+
+def apply_stats(stats: Dict[str, Any], kind: str, record: Dict[str, Any]):
+    """Update performance stats for one recorded task (same arithmetic as the old JSON memory)"""
+    if kind == 'success':
+        stats['total_tasks'] += 1
+        stats['successful_tasks'] += 1
+        duration = record.get('duration')
+        if duration:
+            n = stats['successful_tasks']
+            stats['average_duration'] = (stats['average_duration'] * (n - 1) + duration) / n
+    elif kind == 'failure':
+        stats['total_tasks'] += 1
+        stats['failed_tasks'] += 1
+
+
+def encode_line(entry: Dict[str, Any]) -> bytes:
+    payload = json.dumps(entry, separators=(',', ':'), default=str).encode('utf-8')
+    return b'%08x ' % zlib.crc32(payload) + payload + b'\n'
+
+
+def decode_line(line: bytes) -> Optional[Dict[str, Any]]:
+    """Entry of a complete line, or None if it is torn or corrupt"""
+    if len(line) < 10 or not line.endswith(b'\n') or line[8:9] != b' ':
+        return None
+    payload = line[9:-1]
+    try:
+        if int(line[:8], 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+class _Summary:
+    """What a segment holds, so queries can skip segments without reading them"""
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        data = data or {}
+        self.id = data.get('id')
+        self.counts = dict(data.get('counts') or {})
+        self.keys = {kind: set(values) for kind, values in (data.get('keys') or {}).items()}
+        self.first_ts = data.get('first_ts')
+        self.last_ts = data.get('last_ts')
+
+    def add(self, kind: str, record: Dict[str, Any]):
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        self.keys.setdefault(kind, set()).add(str(record.get(KEY_FIELDS[kind])))
+        # Timestamp range of what clear_before() can remove (decides compaction)
+        timestamp = record.get('timestamp') if kind in CLEARABLE else None
+        if timestamp:
+            if self.first_ts is None or timestamp < self.first_ts:
+                self.first_ts = timestamp
+            if self.last_ts is None or timestamp > self.last_ts:
+                self.last_ts = timestamp
+
+    def may_contain(self, kind: str, key: Optional[str]) -> bool:
+        if not self.counts.get(kind):
+            return False
+        return key is None or str(key) in self.keys.get(kind, ())
+
+    @property
+    def records(self) -> int:
+        return sum(self.counts.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'counts': self.counts,
+            'keys': {kind: sorted(values) for kind, values in self.keys.items()},
+            'first_ts': self.first_ts,
+            'last_ts': self.last_ts
+        }
+
+
+class SegmentLog:
+    """Append-only, segmented record log with lazy loading, recovery and compaction"""
+
+    def __init__(self, directory: str, segment_records: Optional[int] = None,
+                 cached_segments: Optional[int] = None, fsync: Optional[bool] = None):
+        self.directory = directory
+        self.segment_records = int(segment_records or os.getenv('AGENT_MEMORY_SEGMENT_RECORDS', '5000'))
+        self.cached_segments = int(cached_segments or os.getenv('AGENT_MEMORY_CACHED_SEGMENTS', '4'))
+        self.fsync = fsync if fsync is not None else os.getenv('AGENT_MEMORY_FSYNC', '0') == '1'
+
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+        self._cache: 'OrderedDict[int, List[Dict[str, Any]]]' = OrderedDict()
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_manifest()
+        self._remove_orphans()
+        self._replay_active()
+        self._file = open(self._segment_path(self._active_id), 'ab')
+        if self._needs_compaction():
+            self.compact_async()
+
+    # ---------------------------------------------------------------- files
+
+    def _segment_path(self, segment_id: int) -> str:
+        return os.path.join(self.directory, f'segment-{segment_id:08d}.jsonl')
+
+    def _load_manifest(self):
+        path = os.path.join(self.directory, MANIFEST)
+        data: Dict[str, Any] = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        self._sealed = [_Summary(summary) for summary in data.get('sealed', [])]
+        self._sealed_stats = data.get('stats') or empty_stats()
+        self._sealed_cutoff = data.get('cutoff')
+        self._active_id = data.get('active', 1)
+        self._next_id = data.get('next_id', self._active_id + 1)
+
+    def _write_manifest(self):
+        data = {
+            'version': MANIFEST_VERSION,
+            'active': self._active_id,
+            'next_id': self._next_id,
+            'stats': self._sealed_stats,
+            'cutoff': self._sealed_cutoff,
+            'sealed': [summary.to_dict() for summary in self._sealed]
+        }
+        path = os.path.join(self.directory, MANIFEST)
+        temp = path + '.tmp'
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, path)
+
+    def _remove_orphans(self):
+        """Delete segment files the manifest does not list (an interrupted compaction's)"""
+        listed = {summary.id for summary in self._sealed} | {self._active_id}
+        for name in os.listdir(self.directory):
+            if not (name.startswith('segment-') and name.endswith('.jsonl')):
+                continue
+            try:
+                segment_id = int(name[len('segment-'):-len('.jsonl')])
+            except ValueError:
+                continue
+            if segment_id not in listed:
+                logger.info(f"Agent memory: removing unlisted segment {name}")
+                os.remove(os.path.join(self.directory, name))
+
+    def _read_segment(self, segment_id: int, repair: bool = False) -> List[Dict[str, Any]]:
+        """Entries of a segment; with repair, a torn or corrupt tail is truncated away"""
+        path = self._segment_path(segment_id)
+        entries = []
+        if not os.path.exists(path):
+            return entries
+        offset = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                entry = decode_line(line)
+                if entry is None:
+                    if repair:
+                        logger.warning(f"Agent memory: truncating damaged tail of {path} at byte {offset}")
+                        f.close()
+                        with open(path, 'r+b') as damaged:
+                            damaged.truncate(offset)
+                        break
+                    logger.warning(f"Agent memory: skipping damaged record in {path} at byte {offset}")
+                else:
+                    entries.append(entry)
+                offset += len(line)
+        return entries
+
+    def _replay_active(self):
+        self._stats = dict(self._sealed_stats)
+        self._cutoff = self._sealed_cutoff
+        self._active: List[Dict[str, Any]] = []
+        self._active_summary = _Summary({'id': self._active_id})
+        for entry in self._read_segment(self._active_id, repair=True):
+            self._apply(entry)
+
+    def _apply(self, entry: Dict[str, Any]):
+        op = entry.get('op')
+        if op in KINDS:
+            record = entry['record']
+            apply_stats(self._stats, op, record)
+            self._active.append(entry)
+            self._active_summary.add(op, record)
+        elif op == 'clear':
+            if self._cutoff is None or entry['cutoff'] > self._cutoff:
+                self._cutoff = entry['cutoff']
+        elif op == 'stats':
+            self._stats = dict(entry['stats'])
+
+    # ---------------------------------------------------------------- writes
+
+    def append(self, op: str, **fields):
+        """Append one entry (O(1): a single line written to the active segment)"""
+        entry = {'op': op, **fields}
+        line = encode_line(entry)
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._apply(entry)
+            if len(self._active) >= self.segment_records:
+                self._roll()
+
+    def _roll(self):
+        """Seal the active segment and start a new one"""
+        self._file.close()
+        self._active_summary.id = self._active_id
+        sealed_id = self._active_id
+        self._sealed.append(self._active_summary)
+        self._cache_put(sealed_id, [entry for entry in self._active])
+        self._sealed_stats = dict(self._stats)
+        self._sealed_cutoff = self._cutoff
+        self._active_id = self._next_id
+        self._next_id += 1
+        self._write_manifest()
+        self._active = []
+        self._active_summary = _Summary({'id': self._active_id})
+        self._file = open(self._segment_path(self._active_id), 'ab')
+        if self._needs_compaction():
+            self.compact_async()
+
+    def clear_before(self, cutoff: str):
+        """Hide successes and failures with a timestamp not after cutoff, and compact them away"""
+        self.append('clear', cutoff=cutoff)
+        self.compact_async()
+
+    # ---------------------------------------------------------------- reads
+
+    def _cache_put(self, segment_id: int, entries: List[Dict[str, Any]]):
+        self._cache[segment_id] = entries
+        self._cache.move_to_end(segment_id)
+        while len(self._cache) > self.cached_segments:
+            self._cache.popitem(last=False)
+
+    def _sealed_entries(self, segment_id: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = self._cache.get(segment_id)
+            if entries is not None:
+                self._cache.move_to_end(segment_id)
+                return entries
+        entries = self._read_segment(segment_id)
+        with self._lock:
+            self._cache_put(segment_id, entries)
+        return entries
+
+    def _visible(self, kind: str, record: Dict[str, Any], cutoff: Optional[str]) -> bool:
+        return not (cutoff and kind in CLEARABLE and record.get('timestamp', '') <= cutoff)
+
+    def scan(self, kind: str, key: Optional[str] = None, newest_first: bool = False) -> Iterator[Dict[str, Any]]:
+        """Records of a kind (optionally only those whose task_type / category is key), reading only segments that may hold them"""
+        field = KEY_FIELDS[kind]
+        with self._lock:
+            sealed = [summary for summary in self._sealed if summary.may_contain(kind, key)]
+            active = list(self._active) if self._active_summary.may_contain(kind, key) else []
+            cutoff = self._cutoff
+
+        def matching(entries):
+            for entry in (reversed(entries) if newest_first else entries):
+                record = entry.get('record')
+                if entry.get('op') != kind or (key is not None and record.get(field) != key):
+                    continue
+                if self._visible(kind, record, cutoff):
+                    yield record
+
+        if newest_first:
+            yield from matching(active)
+            for summary in reversed(sealed):
+                yield from matching(self._sealed_entries(summary.id))
+        else:
+            for summary in sealed:
+                yield from matching(self._sealed_entries(summary.id))
+            yield from matching(active)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+    def get_info(self) -> Dict[str, Any]:
+        """Segment counts and sizes (for diagnostics)"""
+        with self._lock:
+            return {
+                'directory': self.directory,
+                'sealedSegments': len(self._sealed),
+                'sealedRecords': sum(summary.records for summary in self._sealed),
+                'activeRecords': len(self._active),
+                'cachedSegments': len(self._cache),
+                'cutoff': self._cutoff
+            }
+
+    # ---------------------------------------------------------------- compaction
+
+    def _needs_compaction(self) -> bool:
+        cutoff = self._cutoff
+        return bool(cutoff) and any(
+            summary.first_ts is not None and summary.first_ts <= cutoff for summary in self._sealed
+        )
+
+    def compact_async(self):
+        """Run compact() on a background thread (no-op while one is running)"""
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            self._compactor = threading.Thread(target=self._compact_logged, name='agent-memory-compact', daemon=True)
+            self._compactor.start()
+
+    def _compact_logged(self):
+        try:
+            self.compact()
+        except Exception as e:
+            logger.error(f"Agent memory compaction failed in {self.directory}: {e}")
+
+    def compact(self):
+        """
+        Drop cleared records from sealed segments: segments entirely before the
+        cutoff are removed, straddling ones rewritten into new segments. Appends
+        continue meanwhile; the manifest swap is the commit point.
+        """
+        with self._compact_lock:
+            with self._lock:
+                # The clear record may still be in the active segment: it is durable there
+                cutoff = self._cutoff
+                snapshot = list(self._sealed)
+            if not cutoff:
+                return
+
+            replaced: Dict[int, List[_Summary]] = {}
+            for summary in snapshot:
+                if summary.first_ts is None or summary.first_ts > cutoff:
+                    continue
+                if summary.last_ts <= cutoff and all(kind in CLEARABLE for kind in summary.counts):
+                    # Entirely cleared: dropped without reading it
+                    replaced[summary.id] = []
+                    continue
+                kept = [
+                    entry for entry in self._sealed_entries(summary.id)
+                    if entry.get('op') not in CLEARABLE or self._visible(entry['op'], entry['record'], cutoff)
+                ]
+                if not kept:
+                    replaced[summary.id] = []
+                    continue
+                with self._lock:
+                    new_id = self._next_id
+                    self._next_id += 1
+                new_summary = _Summary({'id': new_id})
+                with open(self._segment_path(new_id), 'wb') as f:
+                    for entry in kept:
+                        f.write(encode_line(entry))
+                        if entry.get('op') in KINDS:
+                            new_summary.add(entry['op'], entry['record'])
+                    f.flush()
+                    os.fsync(f.fileno())
+                replaced[summary.id] = [new_summary]
+
+            if not replaced:
+                return
+            with self._lock:
+                sealed = []
+                for summary in self._sealed:
+                    sealed.extend(replaced.get(summary.id, [summary]))
+                self._sealed = sealed
+                self._write_manifest()
+                for old_id in replaced:
+                    self._cache.pop(old_id, None)
+            for old_id in replaced:
+                try:
+                    os.remove(self._segment_path(old_id))
+                except OSError:
+                    pass
+            logger.info(f"Agent memory: compacted {len(replaced)} segment(s) in {self.directory}")
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join(10)
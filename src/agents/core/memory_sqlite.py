@@ -0,0 +1,269 @@
+"""
+SQLite store behind AgentMemory (AGENT_MEMORY_BACKEND=sqlite, the default)
+
+Every agent's history lives in one database shared by all agent processes
+(WAL mode), so lookups are index seeks instead of scans of the whole history,
+and the PM can query what other agents did:
+- records: one row per success, failure and best practice, indexed by
+  (agent_id, kind, task_type) - best practices keep their category in
+  task_type - and (agent_id, timestamp) for clear_before()
+- records_fts: FTS5 index of the descriptions (practice text for best
+  practices), kept in sync by triggers; search() ranks matches with BM25
+- agent_stats: the performance stats of each agent, updated in the same
+  transaction as the record
+
+The full record is stored as JSON, so queries return exactly what was recorded.
+Methods take agent_id=None for this store's agent, another agent's id, or
+ALL_AGENTS; records of other agents carry their 'agent_id'.
+
+Configuration (environment):
+- AGENT_MEMORY_DB: database file (default ./.agent_memory.db)
+"""
+
+import os
+import re
+import json
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from memory_log import KINDS, CLEARABLE, empty_stats, apply_stats
+
+logger = logging.getLogger(__name__)
+
+ALL_AGENTS = '*'
+STAT_FIELDS = ('total_tasks', 'successful_tasks', 'failed_tasks', 'average_duration')
+
+
+def _indexed_fields(kind: str, record: Dict[str, Any]) -> Tuple[Optional[str], str]:
+    """(task_type column, full-text) of a record"""
+    if kind == 'practice':
+        return record.get('category'), ' '.join(filter(None, [record.get('practice'), record.get('context')]))
+    return record.get('task_type'), record.get('description') or ''
+
+
+def fts_query(text: str) -> Optional[str]:
+    """FTS5 query matching any word of text (as a prefix, like the old substring match)"""
+    words = re.findall(r'\w+', (text or '').lower())
+    if not words:
+        return None
+    return ' OR '.join(f'"{word}"*' for word in dict.fromkeys(words))
+
+
+class SqliteMemoryStore:
+    """Indexed, shared storage of agent memories"""
+
+    def __init__(self, agent_id: str, db_path: Optional[str] = None):
+        self.agent_id = agent_id
+        self.db_path = db_path or os.getenv('AGENT_MEMORY_DB', os.path.join(os.getcwd(), '.agent_memory.db'))
+        self._local = threading.local()
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS records ('
+                ' id INTEGER PRIMARY KEY,'
+                ' agent_id TEXT NOT NULL,'
+                ' kind TEXT NOT NULL,'
+                ' task_type TEXT,'
+                ' timestamp TEXT NOT NULL,'
+                ' description TEXT NOT NULL,'
+                ' data TEXT NOT NULL)'
+            )
+            # The rowid ends every index entry, so "ORDER BY id" follows the index without sorting
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_records_agent_type ON records(agent_id, kind, task_type)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_records_type ON records(kind, task_type)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_records_agent_time ON records(agent_id, timestamp)')
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5("
+                " description, content='records', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+            )
+            conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS records_ai AFTER INSERT ON records BEGIN'
+                ' INSERT INTO records_fts(rowid, description) VALUES (new.id, new.description); END'
+            )
+            conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS records_ad AFTER DELETE ON records BEGIN'
+                " INSERT INTO records_fts(records_fts, rowid, description) VALUES ('delete', old.id, old.description); END"
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS agent_stats ('
+                ' agent_id TEXT PRIMARY KEY,'
+                ' total_tasks INTEGER NOT NULL,'
+                ' successful_tasks INTEGER NOT NULL,'
+                ' failed_tasks INTEGER NOT NULL,'
+                ' average_duration REAL NOT NULL)'
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _agent_filter(self, agent_id: Optional[str], column: str = 'agent_id') -> Tuple[str, List[Any]]:
+        if agent_id == ALL_AGENTS:
+            return '', []
+        return f' AND {column} = ?', [agent_id or self.agent_id]
+
+    def _record(self, agent_id: str, data: str) -> Dict[str, Any]:
+        record = json.loads(data)
+        if agent_id != self.agent_id:
+            record['agent_id'] = agent_id
+        return record
+
+    # ---------------------------------------------------------------- writes
+
+    def _read_stats(self, conn, agent_id: str) -> Optional[Dict[str, Any]]:
+        row = conn.execute(
+            f"SELECT {', '.join(STAT_FIELDS)} FROM agent_stats WHERE agent_id = ?", (agent_id,)
+        ).fetchone()
+        return dict(zip(STAT_FIELDS, row)) if row else None
+
+    def _write_stats(self, conn, stats: Dict[str, Any]):
+        conn.execute(
+            f"INSERT OR REPLACE INTO agent_stats (agent_id, {', '.join(STAT_FIELDS)}) VALUES (?, ?, ?, ?, ?)",
+            (self.agent_id, *[stats.get(field, 0) for field in STAT_FIELDS])
+        )
+
+    def _insert(self, conn, kind: str, record: Dict[str, Any]):
+        task_type, text = _indexed_fields(kind, record)
+        conn.execute(
+            'INSERT INTO records (agent_id, kind, task_type, timestamp, description, data) VALUES (?, ?, ?, ?, ?, ?)',
+            (self.agent_id, kind, task_type, record.get('timestamp') or '', text, json.dumps(record, default=str))
+        )
+
+    def append(self, op: str, **fields):
+        """Store a record (op success / failure / practice), a clear cutoff or absolute stats"""
+        try:
+            conn = self._conn()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if op in KINDS:
+                    self._insert(conn, op, fields['record'])
+                    if op in CLEARABLE:
+                        stats = self._read_stats(conn, self.agent_id) or empty_stats()
+                        apply_stats(stats, op, fields['record'])
+                        self._write_stats(conn, stats)
+                elif op == 'clear':
+                    conn.execute(
+                        f"DELETE FROM records WHERE agent_id = ? AND kind IN ({', '.join('?' * len(CLEARABLE))}) AND timestamp <= ?",
+                        (self.agent_id, *CLEARABLE, fields['cutoff'])
+                    )
+                elif op == 'stats':
+                    self._write_stats(conn, fields['stats'])
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            logger.error(f"Agent memory write failed ({self.db_path}): {e}")
+
+    def clear_before(self, cutoff: str):
+        """Delete this agent's successes and failures with a timestamp not after cutoff"""
+        self.append('clear', cutoff=cutoff)
+
+    def import_history(self, entries: Iterable[Tuple[str, Dict[str, Any]]], stats: Optional[Dict[str, Any]] = None):
+        """Bulk insert (kind, record) pairs in one transaction; stats are recomputed unless given"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            computed = empty_stats()
+            for kind, record in entries:
+                self._insert(conn, kind, record)
+                apply_stats(computed, kind, record)
+            self._write_stats(conn, stats or computed)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def is_empty(self) -> bool:
+        conn = self._conn()
+        return (
+            conn.execute('SELECT 1 FROM records WHERE agent_id = ? LIMIT 1', (self.agent_id,)).fetchone() is None
+            and self._read_stats(conn, self.agent_id) is None
+        )
+
+    # ---------------------------------------------------------------- reads
+
+    def scan(self, kind: str, key: Optional[str] = None, newest_first: bool = False,
+             agent_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Records of a kind in recording order (optionally only task_type / category key)"""
+        where, params = self._agent_filter(agent_id)
+        if key is not None:
+            where += ' AND task_type = ?'
+            params.append(key)
+        order = 'DESC' if newest_first else 'ASC'
+        try:
+            rows = self._conn().execute(
+                f'SELECT agent_id, data FROM records WHERE kind = ?{where} ORDER BY id {order}', (kind, *params)
+            )
+            for row_agent, data in rows:
+                yield self._record(row_agent, data)
+        except sqlite3.Error as e:
+            logger.error(f"Agent memory read failed ({self.db_path}): {e}")
+
+    def search(self, kind: str, text: str, key: Optional[str] = None, agent_id: Optional[str] = None,
+               limit: int = 10) -> List[Dict[str, Any]]:
+        """Records whose description matches words of text, best BM25 rank first (oldest first on ties)"""
+        query = fts_query(text)
+        if query is None:
+            return []
+        where, params = self._agent_filter(agent_id, 'r.agent_id')
+        if key is not None:
+            where += ' AND r.task_type = ?'
+            params.append(key)
+        try:
+            rows = self._conn().execute(
+                'SELECT r.agent_id, r.data, bm25(records_fts) AS rank FROM records_fts'
+                ' JOIN records r ON r.id = records_fts.rowid'
+                f' WHERE records_fts MATCH ? AND r.kind = ?{where} ORDER BY rank, r.id LIMIT ?',
+                (query, kind, *params, limit)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Agent memory search failed ({self.db_path}): {e}")
+            return []
+        results = []
+        for row_agent, data, rank in rows:
+            record = self._record(row_agent, data)
+            record['score'] = round(-rank, 4)
+            results.append(record)
+        return results
+
+    def get_stats(self, agent_id: Optional[str] = None) -> Dict[str, Any]:
+        conn = self._conn()
+        if agent_id != ALL_AGENTS:
+            return self._read_stats(conn, agent_id or self.agent_id) or empty_stats()
+        row = conn.execute(
+            'SELECT COALESCE(SUM(total_tasks), 0), COALESCE(SUM(successful_tasks), 0), COALESCE(SUM(failed_tasks), 0),'
+            ' COALESCE(SUM(average_duration * successful_tasks) / NULLIF(SUM(successful_tasks), 0), 0) FROM agent_stats'
+        ).fetchone()
+        return dict(zip(STAT_FIELDS, row))
+
+    def get_agents(self) -> List[str]:
+        """Agents with anything recorded"""
+        return [row[0] for row in self._conn().execute('SELECT agent_id FROM agent_stats ORDER BY agent_id')]
+
+    def get_info(self) -> Dict[str, Any]:
+        counts = dict(self._conn().execute(
+            'SELECT kind, COUNT(*) FROM records WHERE agent_id = ? GROUP BY kind', (self.agent_id,)
+        ).fetchall())
+        return {'database': self.db_path, 'records': counts}
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
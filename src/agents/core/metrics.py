@@ -0,0 +1,162 @@
+"""
+Low-overhead metrics for Python agents: counters and latency histograms
+
+Histograms use HDR-style log-linear buckets (16 sub-buckets per power of two,
+microsecond resolution), so recording is a few integer operations and a dict
+increment, memory stays bounded however many samples arrive, and every
+reported percentile is within ~3% of the true value.
+
+Metrics are named and labelled, e.g. histogram('tool_call_seconds',
+tool='project_get', outcome='ok'). snapshot() returns plain dicts (latencies
+in milliseconds) that PythonBaseAgent.get_metrics sends over the bridge in
+answer to a get_metrics message.
+"""
+
+import time
+import threading
+import contextlib
+from typing import Any, Dict, Optional, Tuple
+
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def _bucket_index(value: int) -> int:
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return SUB_BUCKETS * (shift + 1) + (value >> shift) - SUB_BUCKETS
+
+
+def _bucket_value(index: int) -> float:
+    """Midpoint of a bucket (in recorded units)"""
+    if index < 2 * SUB_BUCKETS:
+        return float(index)
+    shift = index // SUB_BUCKETS - 1
+    mantissa = index % SUB_BUCKETS + SUB_BUCKETS
+    return ((mantissa << shift) + ((mantissa + 1) << shift) - 1) / 2.0
+
+
+class Histogram:
+    """Latency histogram; record() takes seconds, snapshots report milliseconds"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def record(self, seconds: float):
+        seconds = max(0.0, seconds)
+        index = _bucket_index(int(seconds * 1_000_000))
+        with self._lock:
+            self._buckets[index] = self._buckets.get(index, 0) + 1
+            self.count += 1
+            self.total += seconds
+            if self.min is None or seconds < self.min:
+                self.min = seconds
+            if self.max is None or seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Seconds at the given percentile (None before the first sample)"""
+        with self._lock:
+            return self._percentile(pct, sorted(self._buckets.items()), self.count)
+
+    @staticmethod
+    def _percentile(pct: float, buckets, count: int) -> Optional[float]:
+        if not count:
+            return None
+        rank = max(1, int(round(pct / 100.0 * count)))
+        seen = 0
+        for index, bucket_count in buckets:
+            seen += bucket_count
+            if seen >= rank:
+                return _bucket_value(index) / 1_000_000
+        return _bucket_value(buckets[-1][0]) / 1_000_000
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            buckets = sorted(self._buckets.items())
+            count, total, low, high = self.count, self.total, self.min, self.max
+        ms = lambda seconds: round(seconds * 1000, 3) if seconds is not None else None
+        snapshot = {
+            'count': count,
+            'sum_ms': ms(total),
+            'mean_ms': ms(total / count) if count else None,
+            'min_ms': ms(low),
+            'max_ms': ms(high),
+        }
+        for pct in PERCENTILES:
+            value = self._percentile(pct, buckets, count)
+            # Bucket midpoints can fall outside the exact extremes
+            if value is not None:
+                value = min(max(value, low), high)
+            snapshot[f"p{str(pct).replace('.', '')}_ms"] = ms(value)
+        return snapshot
+
+
+class Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+
+class MetricsRegistry:
+    """Named, labelled counters and histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple, Counter] = {}
+        self._histograms: Dict[Tuple, Histogram] = {}
+        self.started_at = time.time()
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> Tuple:
+        return (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+    def _get(self, store: Dict[Tuple, Any], factory, name: str, labels: Dict[str, Any]):
+        key = self._key(name, labels)
+        metric = store.get(key)
+        if metric is None:
+            with self._lock:
+                metric = store.setdefault(key, factory())
+        return metric
+
+    def counter(self, name: str, **labels) -> Counter:
+        return self._get(self._counters, Counter, name, labels)
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        return self._get(self._histograms, Histogram, name, labels)
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels):
+        """Record the duration of the block (also when it raises)"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.histogram(name, **labels).record(time.monotonic() - started)
+
+    @staticmethod
+    def _label_string(labels: Tuple) -> str:
+        return ','.join(f'{k}={v}' for k, v in labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """{'counters': {name: {labels: value}}, 'histograms': {name: {labels: summary}}}"""
+        with self._lock:
+            counters = list(self._counters.items())
+            histograms = list(self._histograms.items())
+        snapshot = {'counters': {}, 'histograms': {}}
+        for (name, labels), counter in sorted(counters, key=lambda item: item[0]):
+            snapshot['counters'].setdefault(name, {})[self._label_string(labels)] = counter.value
+        for (name, labels), histogram in sorted(histograms, key=lambda item: item[0]):
+            snapshot['histograms'].setdefault(name, {})[self._label_string(labels)] = histogram.snapshot()
+        return snapshot
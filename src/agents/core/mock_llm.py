@@ -0,0 +1,295 @@
+"""
+Deterministic local mock LLM provider
+
+Lets the whole swarm run (PM decomposition, delegations, agent completions,
+chat streaming) without network access or quota, so load tests and benchmarks
+measure our own code. Enable it by putting "mock" in LLM_PRIORITY.
+
+Behaviour is reproducible: every request draws its latency and failures from
+a random generator seeded with LLM_MOCK_SEED and the request content, so the
+same prompt gets the same outcome regardless of how calls interleave.
+
+Configuration (environment):
+- LLM_MOCK_LATENCY: latency distribution in milliseconds, one of
+  "fixed:200", "uniform:100,500", "normal:300,50", "lognormal:400,0.5"
+  (lognormal takes the median and sigma; default "lognormal:400,0.5")
+- LLM_MOCK_SERVER_CONCURRENCY: requests served at once, extra ones queue (0 = unlimited).
+  Client-side limits still apply through LLM_MOCK_MAX_CONCURRENCY/_RPM/_TPM
+- LLM_MOCK_SERVER_RPS: accepted requests per second, extra ones get a 429 (0 = unlimited)
+- LLM_MOCK_ERROR_RATE: probability of a simulated 500 error (default 0)
+- LLM_MOCK_429_RATE: probability of a simulated 429 rate limit (default 0)
+- LLM_MOCK_SCRIPT: JSON file with scripted responses (see below)
+- LLM_MOCK_SEED: seed for latency and failure draws (default 0)
+
+Script format:
+    {
+      "rules": [
+        {"match": "suggested_agents", "response": {"stack": "Node"}, "latency": "fixed:50"},
+        {"match": "(?i)decompose", "response": [{"type": "backend", "desc": "Task {{n}}"}]},
+        {"match": "boom", "error": "429"}
+      ],
+      "default": {"text": "Echo: {{prompt}}"}
+    }
+Rules are tried in order; "match" is a regular expression searched in the
+system context and prompt. Responses may be strings or JSON values and can use
+the placeholders {{n}} (call number), {{prompt}}, {{system}} and {{provider}}.
+Built-in rules cover the PM analysis/decomposition and chat JSON formats.
+"""
+
+import os
+import re
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LATENCY = 'lognormal:400,0.5'
+
+# Responses shaped like what the agents parse, so the orchestration path runs end to end
+BUILTIN_RULES = [
+    {
+        'match': r'"suggested_agents"',
+        'response': {
+            'stack': 'Mock stack (Node.js, React)',
+            'complexity': 'Medium - mock analysis',
+            'security': 'No issues found by mock provider',
+            'recommendations': ['Add tests', 'Add CI', 'Document the API'],
+            'suggested_agents': ['frontend', 'backend', 'qa']
+        }
+    },
+    {
+        'match': r'JSON array',
+        'response': [
+            {'type': 'design', 'desc': 'Mock design subtask {{n}}', 'priority': 'high', 'dependencies': []},
+            {'type': 'backend', 'desc': 'Mock backend subtask {{n}}', 'priority': 'high', 'dependencies': []},
+            {'type': 'frontend', 'desc': 'Mock frontend subtask {{n}}', 'priority': 'medium', 'dependencies': []},
+            {'type': 'qa', 'desc': 'Mock qa subtask {{n}}', 'priority': 'low', 'dependencies': []}
+        ]
+    }
+]
+DEFAULT_RESPONSE = {'text': 'Mock response #{{n}}: {{prompt}}', 'options': []}
+
+
+class MockRateLimitError(Exception):
+    """Simulated provider rate limit (HTTP 429)"""
+
+
+class MockProviderError(Exception):
+    """Simulated provider failure (HTTP 500)"""
+
+
+class LatencyModel:
+    """Latency distribution parsed from a "kind:params" spec (milliseconds)"""
+
+    def __init__(self, spec: str = DEFAULT_LATENCY):
+        self.spec = spec
+        kind, _, params = spec.partition(':')
+        self.kind = kind.strip().lower()
+        self.params = [float(p) for p in params.split(',') if p.strip()]
+        if self.kind not in ('fixed', 'uniform', 'normal', 'lognormal'):
+            raise ValueError(f"Unknown mock latency distribution: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        """Latency in seconds"""
+        p = self.params
+        if self.kind == 'fixed':
+            ms = p[0]
+        elif self.kind == 'uniform':
+            ms = rng.uniform(p[0], p[1])
+        elif self.kind == 'normal':
+            ms = rng.gauss(p[0], p[1])
+        else:
+            ms = rng.lognormvariate(math.log(p[0]), p[1])
+        return max(0.0, ms) / 1000.0
+
+
+class MockLLM:
+    """In-process fake LLM endpoint with configurable latency, capacity and failures"""
+
+    def __init__(
+        self,
+        latency: str = DEFAULT_LATENCY,
+        max_concurrency: int = 0,
+        max_rps: float = 0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        script: Optional[Dict[str, Any]] = None,
+        seed: int = 0,
+        chunk_size: int = 24
+    ):
+        self.latency = LatencyModel(latency)
+        self.max_concurrency = int(max_concurrency)
+        self.max_rps = float(max_rps)
+        self.error_rate = float(error_rate)
+        self.rate_limit_rate = float(rate_limit_rate)
+        self.seed = seed
+        self.chunk_size = chunk_size
+        script = script or {}
+        self.rules = [dict(rule, pattern=re.compile(rule['match'])) for rule in script.get('rules', []) + BUILTIN_RULES]
+        self.default_response = script.get('default', DEFAULT_RESPONSE)
+
+        self._lock = threading.Lock()
+        self._capacity = threading.Condition(self._lock)
+        self._in_flight = 0
+        self._rps_tokens = self.max_rps
+        self._rps_updated = time.monotonic()
+        self.stats = {'requests': 0, 'completed': 0, 'errors': 0, 'rate_limited': 0, 'queued': 0}
+
+    @classmethod
+    def from_env(cls) -> 'MockLLM':
+        script = None
+        script_path = os.getenv('LLM_MOCK_SCRIPT')
+        if script_path:
+            with open(script_path, 'r', encoding='utf-8') as f:
+                script = json.load(f)
+        return cls(
+            latency=os.getenv('LLM_MOCK_LATENCY', DEFAULT_LATENCY),
+            max_concurrency=int(os.getenv('LLM_MOCK_SERVER_CONCURRENCY', '0')),
+            max_rps=float(os.getenv('LLM_MOCK_SERVER_RPS', '0')),
+            error_rate=float(os.getenv('LLM_MOCK_ERROR_RATE', '0')),
+            rate_limit_rate=float(os.getenv('LLM_MOCK_429_RATE', '0')),
+            script=script,
+            seed=int(os.getenv('LLM_MOCK_SEED', '0'))
+        )
+
+    def _plan(self, prompt: str, system: str):
+        """Pick the rule, latency and injected failure for a request"""
+        with self._lock:
+            self.stats['requests'] += 1
+            n = self.stats['requests']
+        digest = hashlib.sha256(f"{self.seed}\x00{system}\x00{prompt}".encode('utf-8')).hexdigest()
+        rng = random.Random(int(digest[:16], 16))
+
+        text = f"{system}\n{prompt}"
+        rule = next((r for r in self.rules if r['pattern'].search(text)), None)
+        latency = LatencyModel(rule['latency']).sample(rng) if rule and rule.get('latency') else self.latency.sample(rng)
+
+        error = rule.get('error') if rule else None
+        roll = rng.random()
+        if error is None and roll < self.rate_limit_rate:
+            error = '429'
+        elif error is None and roll < self.rate_limit_rate + self.error_rate:
+            error = '500'
+
+        response = rule.get('response') if rule and 'response' in rule else self.default_response
+        return n, latency, error, response
+
+    def _admit(self):
+        """Apply the requests-per-second cap (over-limit requests are rejected like a real 429)"""
+        if self.max_rps <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._rps_tokens = min(self.max_rps, self._rps_tokens + (now - self._rps_updated) * self.max_rps)
+            self._rps_updated = now
+            if self._rps_tokens < 1:
+                self.stats['rate_limited'] += 1
+                raise MockRateLimitError("429 Too Many Requests (mock throughput cap)")
+            self._rps_tokens -= 1
+
+    def _try_enter(self) -> bool:
+        with self._lock:
+            if self.max_concurrency > 0 and self._in_flight >= self.max_concurrency:
+                return False
+            self._in_flight += 1
+            return True
+
+    def _enter(self):
+        with self._capacity:
+            if self.max_concurrency > 0 and self._in_flight >= self.max_concurrency:
+                self.stats['queued'] += 1
+                while self._in_flight >= self.max_concurrency:
+                    self._capacity.wait()
+            self._in_flight += 1
+
+    def _exit(self):
+        with self._capacity:
+            self._in_flight -= 1
+            self._capacity.notify()
+
+    def _finish(self, n: int, error: Optional[str], response: Any, prompt: str, system: str, provider: str) -> str:
+        with self._lock:
+            if error:
+                self.stats['errors' if error != '429' else 'rate_limited'] += 1
+            else:
+                self.stats['completed'] += 1
+        if error == '429':
+            raise MockRateLimitError("429 Too Many Requests (mock injected)")
+        if error:
+            raise MockProviderError(f"{error} Internal Server Error (mock injected)")
+        return self.render(response, n=n, prompt=prompt, system=system, provider=provider)
+
+    @staticmethod
+    def render(response: Any, **values) -> str:
+        """Fill {{placeholders}}; JSON responses get JSON-escaped values"""
+        is_json = not isinstance(response, str)
+        text = json.dumps(response, ensure_ascii=False) if is_json else response
+        for name, value in values.items():
+            value = str(value)
+            if name in ('prompt', 'system'):
+                value = ' '.join(value.split())[:200]
+            if is_json:
+                value = json.dumps(value, ensure_ascii=False)[1:-1]
+            text = text.replace('{{' + name + '}}', value)
+        return text
+
+    def complete(self, prompt: str, system: str = "", provider: str = "mock") -> str:
+        """Blocking completion"""
+        n, latency, error, response = self._plan(prompt, system)
+        self._admit()
+        self._enter()
+        try:
+            time.sleep(latency)
+        finally:
+            self._exit()
+        return self._finish(n, error, response, prompt, system, provider)
+
+    async def acomplete(self, prompt: str, system: str = "", provider: str = "mock") -> str:
+        """Completion that waits on the event loop instead of blocking a thread"""
+        n, latency, error, response = self._plan(prompt, system)
+        self._admit()
+        if not self._try_enter():
+            with self._lock:
+                self.stats['queued'] += 1
+            while not self._try_enter():
+                await asyncio.sleep(0.005)
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            self._exit()
+        return self._finish(n, error, response, prompt, system, provider)
+
+    def stream(self, prompt: str, system: str = "", provider: str = "mock") -> Iterator[str]:
+        """Streamed completion: a third of the latency before the first chunk, the rest spread over chunks"""
+        n, latency, error, response = self._plan(prompt, system)
+        self._admit()
+        self._enter()
+        try:
+            time.sleep(latency / 3)
+            text = self._finish(n, error, response, prompt, system, provider)
+            chunks = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)] or ['']
+            for chunk in chunks:
+                yield chunk
+                time.sleep(latency * 2 / 3 / len(chunks))
+        finally:
+            self._exit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['in_flight'] = self._in_flight
+        stats.update({
+            'latency': self.latency.spec,
+            'max_concurrency': self.max_concurrency,
+            'max_rps': self.max_rps,
+            'error_rate': self.error_rate,
+            'rate_limit_rate': self.rate_limit_rate
+        })
+        return stats
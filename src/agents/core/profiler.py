@@ -0,0 +1,355 @@
+"""
+On-demand profiling of a live agent process (the profile bridge message)
+
+CPU (profile: "cpu"):
+- engine "sample" (default): a background thread reads every thread's Python
+  stack (sys._current_frames) each interval for the window and returns them
+  collapsed ("thread;file:func;...;file:func count" lines, the input of
+  flamegraph.pl and speedscope) plus the functions most often on top. Cheap
+  enough for production and it sees requests that were already running.
+  Threads parked in a wait (idle workers, the stdin reader) are skipped
+  unless includeIdle is set.
+- engine "cprofile": exact call counts and times. cProfile only traces the
+  thread that enables it, so PythonBaseAgent runs each request handler that
+  starts during the window under its own profiler (see profiled()) and the
+  results are merged; handlers still running when the window closes are left out.
+
+Memory (profile: "memory", tracemalloc):
+- action "window" (default): trace allocations for duration seconds and
+  return the allocation sites that grew the most
+- actions "start" / "snapshot" / "stop": keep tracing across requests and
+  compare each snapshot to the baseline taken at start, for leaks that build
+  up over minutes or hours. Tracing slows allocation down while it is on.
+
+Profiles are process-wide: under agent_host.py they cover every hosted agent.
+One CPU profile runs at a time per process.
+
+Configuration (environment):
+- AGENT_PROFILE_MAX_SECONDS: longest window a request may ask for (default 300)
+"""
+
+import os
+import sys
+import time
+import pstats
+import cProfile
+import functools
+import inspect
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+DEFAULT_DURATION = 10.0
+DEFAULT_INTERVAL = 0.01
+DEFAULT_LIMIT = 30
+DEFAULT_FRAMES = 1
+# Distinct collapsed stacks returned (the rarest are dropped beyond this)
+MAX_STACKS = 5000
+
+# Top Python frames of threads that are blocked waiting, not working
+IDLE_FRAMES = {
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'),
+    ('selectors.py', 'select'),
+    ('bridge_framing.py', 'read_messages'),
+    ('bridge_framing.py', '_read_exact'),
+}
+
+TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+class ProfilerBusy(Exception):
+    """Another CPU profile is already running in this process"""
+
+
+_cpu_lock = threading.Lock()
+# Open cprofile window, picked up by profiled() handlers
+_window: Optional['_CProfileWindow'] = None
+
+_trace_lock = threading.Lock()
+# Baseline of a start/snapshot/stop tracemalloc session
+_baseline: Optional[tracemalloc.Snapshot] = None
+_started_tracing = False
+
+_labels: Dict[Any, str] = {}
+
+
+def _max_duration() -> float:
+    return float(os.getenv('AGENT_PROFILE_MAX_SECONDS', '300'))
+
+
+def _duration(request: Dict[str, Any]) -> float:
+    duration = float(request.get('duration') or DEFAULT_DURATION)
+    return min(max(duration, 0.1), _max_duration())
+
+
+def _label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        label = f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+        _labels[code] = label
+    return label
+
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+def _acquire_cpu():
+    if not _cpu_lock.acquire(blocking=False):
+        raise ProfilerBusy("A CPU profile is already running in this process")
+
+
+def sample_stacks(duration: float = DEFAULT_DURATION, interval: float = DEFAULT_INTERVAL,
+                  limit: int = DEFAULT_LIMIT, include_idle: bool = False) -> Dict[str, Any]:
+    """Sample every thread's stack for duration seconds; collapsed stacks and the hottest functions"""
+    _acquire_cpu()
+    try:
+        own = threading.get_ident()
+        stacks: Counter = Counter()
+        leaves: Counter = Counter()
+        ticks = samples = 0
+        started = time.monotonic()
+        deadline = started + duration
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (not include_idle and _is_idle(frame)):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_label(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                stacks[';'.join([names.get(ident, str(ident))] + stack)] += 1
+                leaves[stack[-1]] += 1
+                samples += 1
+            ticks += 1
+            time.sleep(interval)
+        elapsed = time.monotonic() - started
+    finally:
+        _cpu_lock.release()
+
+    return {
+        'profile': 'cpu',
+        'engine': 'sample',
+        'durationSeconds': round(elapsed, 3),
+        'intervalSeconds': interval,
+        'ticks': ticks,
+        'samples': samples,
+        'top': [
+            {'function': function, 'samples': count, 'percent': round(100.0 * count / samples, 1)}
+            for function, count in leaves.most_common(limit)
+        ],
+        'folded': [f"{stack} {count}" for stack, count in stacks.most_common(MAX_STACKS)],
+        'truncated': len(stacks) > MAX_STACKS
+    }
+
+
+class _CProfileWindow:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats: Optional[pstats.Stats] = None
+        self.requests = 0
+        self.closed = False
+
+    def add(self, profile: cProfile.Profile):
+        with self._lock:
+            if self.closed:
+                return
+            if self.stats is None:
+                self.stats = pstats.Stats(profile)
+            else:
+                self.stats.add(profile)
+            self.requests += 1
+
+
+def profiled(handler):
+    """Wrap a (sync) request handler so it runs under cProfile while a cprofile window is open"""
+    if inspect.iscoroutinefunction(handler):
+        return handler
+
+    @functools.wraps(handler)
+    def run(*args):
+        window = _window
+        if window is None:
+            return handler(*args)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler owns this thread
+            return handler(*args)
+        try:
+            return handler(*args)
+        finally:
+            profile.disable()
+            window.add(profile)
+    return run
+
+
+def cprofile_window(duration: float = DEFAULT_DURATION, limit: int = DEFAULT_LIMIT,
+                    sort: str = 'cumulative') -> Dict[str, Any]:
+    """Profile the request handlers that run during the next duration seconds"""
+    global _window
+    _acquire_cpu()
+    try:
+        window = _CProfileWindow()
+        _window = window
+        started = time.monotonic()
+        try:
+            time.sleep(duration)
+        finally:
+            _window = None
+            with window._lock:
+                window.closed = True
+        elapsed = time.monotonic() - started
+    finally:
+        _cpu_lock.release()
+
+    functions = []
+    if window.stats is not None:
+        window.stats.sort_stats(sort)
+        for function in window.stats.fcn_list[:limit]:
+            primitive_calls, calls, total, cumulative, _ = window.stats.stats[function]
+            filename, line, name = function
+            functions.append({
+                'function': f"{os.path.basename(filename)}:{line}({name})",
+                'calls': calls,
+                'primitiveCalls': primitive_calls,
+                'totalMs': round(total * 1000, 3),
+                'cumulativeMs': round(cumulative * 1000, 3)
+            })
+    return {
+        'profile': 'cpu',
+        'engine': 'cprofile',
+        'durationSeconds': round(elapsed, 3),
+        'requests': window.requests,
+        'sort': sort,
+        'functions': functions
+    }
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(TRACE_FILTERS)
+
+
+def _top_allocators(snapshot: tracemalloc.Snapshot, baseline: Optional[tracemalloc.Snapshot],
+                    limit: int) -> List[Dict[str, Any]]:
+    group_by = 'traceback' if tracemalloc.get_traceback_limit() > 1 else 'lineno'
+    if baseline is not None:
+        stats = snapshot.compare_to(baseline, group_by)
+    else:
+        stats = snapshot.statistics(group_by)
+    rows = []
+    for stat in stats[:limit]:
+        row = {
+            'location': ' <- '.join(f"{frame.filename}:{frame.lineno}" for frame in reversed(stat.traceback)),
+            'sizeKb': round(stat.size / 1024, 1),
+            'count': stat.count
+        }
+        if baseline is not None:
+            row['sizeDiffKb'] = round(stat.size_diff / 1024, 1)
+            row['countDiff'] = stat.count_diff
+        rows.append(row)
+    return rows
+
+
+def _tracing_state() -> Dict[str, Any]:
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        'tracing': tracemalloc.is_tracing(),
+        'session': _baseline is not None,
+        'tracedKb': round(current / 1024, 1),
+        'peakKb': round(peak / 1024, 1),
+        'overheadKb': round(tracemalloc.get_tracemalloc_memory() / 1024, 1),
+        'frames': tracemalloc.get_traceback_limit() if tracemalloc.is_tracing() else None
+    }
+
+
+def _start_tracing(frames: int) -> bool:
+    """Start tracemalloc unless it is on already; True if this call started it"""
+    global _started_tracing
+    if tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(frames)
+    _started_tracing = True
+    return True
+
+
+def _stop_tracing():
+    global _started_tracing
+    # Leave tracemalloc alone if something else (PYTHONTRACEMALLOC, a debugger) turned it on
+    if _started_tracing:
+        tracemalloc.stop()
+        _started_tracing = False
+
+
+def trace_allocations(action: str = 'window', duration: float = DEFAULT_DURATION,
+                      limit: int = DEFAULT_LIMIT, frames: int = DEFAULT_FRAMES) -> Dict[str, Any]:
+    """tracemalloc window, or one step of a start / snapshot / stop session"""
+    global _baseline
+    frames = max(1, int(frames))
+
+    if action == 'window':
+        with _trace_lock:
+            started = _start_tracing(frames)
+            baseline = _snapshot()
+        time.sleep(duration)
+        with _trace_lock:
+            snapshot = _snapshot()
+            state = _tracing_state()
+            if started and _baseline is None:
+                _stop_tracing()
+                state['tracing'] = False
+        return {'profile': 'memory', 'action': action, 'durationSeconds': duration, **state,
+                'top': _top_allocators(snapshot, baseline, limit)}
+
+    with _trace_lock:
+        if action == 'start':
+            _start_tracing(frames)
+            _baseline = _snapshot()
+            return {'profile': 'memory', 'action': action, **_tracing_state()}
+
+        if action not in ('snapshot', 'stop'):
+            raise ValueError(f"Unknown memory profile action: {action}")
+        if _baseline is None:
+            raise ValueError(f"No tracemalloc session to {action}: send action 'start' first")
+        snapshot = _snapshot()
+        result = {'profile': 'memory', 'action': action, **_tracing_state(),
+                  'top': _top_allocators(snapshot, _baseline, limit)}
+        if action == 'stop':
+            _baseline = None
+            _stop_tracing()
+            result['tracing'] = tracemalloc.is_tracing()
+            result['session'] = False
+        return result
+
+
+def run(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the profile a profile bridge message asks for (blocks for its window)"""
+    kind = request.get('profile') or 'cpu'
+    limit = int(request.get('limit') or DEFAULT_LIMIT)
+
+    if kind == 'cpu':
+        engine = request.get('engine') or 'sample'
+        if engine == 'sample':
+            interval = max(0.001, float(request.get('interval') or DEFAULT_INTERVAL))
+            return sample_stacks(_duration(request), interval, limit, bool(request.get('includeIdle')))
+        if engine == 'cprofile':
+            return cprofile_window(_duration(request), limit, request.get('sort') or 'cumulative')
+        raise ValueError(f"Unknown CPU profile engine: {engine}")
+
+    if kind == 'memory':
+        action = request.get('action') or 'window'
+        duration = _duration(request) if action == 'window' else 0.0
+        return trace_allocations(action, duration, limit, int(request.get('frames') or DEFAULT_FRAMES))
+
+    raise ValueError(f"Unknown profile: {kind}")
@@ -0,0 +1,238 @@
+"""
+Adaptive LLM provider routing
+
+Tracks per-endpoint health for providers ("anthropic") and individual models
+("gemini/gemini-1.5-flash"): an EWMA of latency and error rate, a rolling
+window of latencies for percentiles, and rate-limit signals. Each endpoint has
+a circuit breaker:
+
+- closed: requests flow; consecutive failures (or a rate limit) open it
+- open: skipped until its open timeout elapses
+- half_open: a single probe request is let through; success closes the
+  breaker, failure re-opens it with a doubled timeout (capped)
+
+rank() orders healthy endpoints fastest first, using the configured priority
+as tie-break so endpoints without history keep the static order.
+
+Configuration (environment):
+- LLM_ROUTING: "adaptive" (default) or "static" to keep LLM_PRIORITY order
+- LLM_EWMA_ALPHA: weight of the newest observation (default 0.3)
+- LLM_BREAKER_FAILURES: consecutive failures that open a breaker (default 3)
+- LLM_BREAKER_OPEN_SECONDS: initial open period (default 30)
+- LLM_BREAKER_MAX_OPEN_SECONDS: cap for the backed-off open period (default 300)
+"""
+
+import os
+import time
+import logging
+import itertools
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Error rate multiplies the latency score: a 50% failing endpoint looks 3x slower
+ERROR_PENALTY = 4.0
+LATENCY_WINDOW = 100
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when every endpoint a call could use has an open breaker"""
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    err_str = str(error)
+    return "429" in err_str or "quota" in err_str.lower() or "ResourceExhausted" in err_str or "rate limit" in err_str.lower()
+
+
+class EndpointHealth:
+    """Rolling health statistics and breaker state for one provider or model"""
+
+    def __init__(self, open_seconds: float):
+        self.ewma_latency: Optional[float] = None
+        self.ewma_error_rate = 0.0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.open_seconds = open_seconds
+        self.probe_started_at: Optional[float] = None
+        self.probe_claim: Optional[int] = None
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+        return ordered[index]
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            'state': self.state,
+            'ewma_latency': round(self.ewma_latency, 3) if self.ewma_latency is not None else None,
+            'p50_latency': round(p50, 3) if p50 is not None else None,
+            'p95_latency': round(p95, 3) if p95 is not None else None,
+            'error_rate': round(self.ewma_error_rate, 3),
+            'requests': self.requests,
+            'failures': self.failures,
+            'rate_limited': self.rate_limited,
+            'consecutive_failures': self.consecutive_failures,
+            'open_remaining': round(max(0.0, self.opened_at + self.open_seconds - now), 1) if self.state == OPEN else 0.0
+        }
+
+
+class ProviderRouter:
+    """Thread-safe health tracker and circuit breakers for LLM endpoints"""
+
+    def __init__(
+        self,
+        adaptive: Optional[bool] = None,
+        alpha: Optional[float] = None,
+        failure_threshold: Optional[int] = None,
+        open_seconds: Optional[float] = None,
+        max_open_seconds: Optional[float] = None
+    ):
+        self.adaptive = adaptive if adaptive is not None else os.getenv('LLM_ROUTING', 'adaptive') != 'static'
+        self.alpha = float(alpha if alpha is not None else os.getenv('LLM_EWMA_ALPHA', '0.3'))
+        self.failure_threshold = int(failure_threshold if failure_threshold is not None else os.getenv('LLM_BREAKER_FAILURES', '3'))
+        self.open_seconds = float(open_seconds if open_seconds is not None else os.getenv('LLM_BREAKER_OPEN_SECONDS', '30'))
+        self.max_open_seconds = float(max_open_seconds if max_open_seconds is not None else os.getenv('LLM_BREAKER_MAX_OPEN_SECONDS', '300'))
+        self._endpoints: Dict[str, EndpointHealth] = {}
+        self._lock = threading.Lock()
+        self._claims = itertools.count(1)
+        # Optional observer(key, latency, failed) told about every recorded call (LLMManager metrics)
+        self.observer = None
+
+    def _health(self, key: str) -> EndpointHealth:
+        health = self._endpoints.get(key)
+        if health is None:
+            health = self._endpoints[key] = EndpointHealth(self.open_seconds)
+        return health
+
+    def _available(self, health: EndpointHealth, now: float) -> bool:
+        if health.state == CLOSED:
+            return True
+        if health.state == OPEN:
+            return now - health.opened_at >= health.open_seconds
+        # Half-open: one probe at a time; a probe that never reported back is replaced
+        return health.probe_started_at is None or now - health.probe_started_at >= health.open_seconds
+
+    def rank(self, keys: List[str]) -> List[str]:
+        """Endpoints whose breaker lets a request through, best first (input order breaks ties)"""
+        now = time.time()
+        with self._lock:
+            available = [k for k in keys if self._available(self._health(k), now)]
+            if not self.adaptive:
+                return available
+            return sorted(available, key=lambda k: self._score(self._health(k)))
+
+    @staticmethod
+    def _score(health: EndpointHealth) -> float:
+        # Unobserved endpoints score 0 so they get tried (and measured) in priority order
+        if health.ewma_latency is None:
+            return 0.0
+        return health.ewma_latency * (1.0 + ERROR_PENALTY * health.ewma_error_rate)
+
+    def claim(self, key: str) -> Optional[int]:
+        """
+        Claim permission to call the endpoint right before calling it, or None if its breaker
+        refuses. An expired open breaker moves to half-open and this call becomes its probe;
+        a probe that ends without record_success/record_failure must be given back with release().
+        """
+        now = time.time()
+        with self._lock:
+            health = self._health(key)
+            if not self._available(health, now):
+                return None
+            claim = next(self._claims)
+            if health.state != CLOSED:
+                health.state = HALF_OPEN
+                health.probe_started_at = now
+                health.probe_claim = claim
+                logger.info(f"Circuit for {key} half-open, probing")
+            return claim
+
+    def allow(self, key: str) -> bool:
+        """claim() for callers that always report the outcome"""
+        return self.claim(key) is not None
+
+    def release(self, key: str, claim: int):
+        """Give back a half-open probe that never reported an outcome (cancelled or abandoned call)"""
+        with self._lock:
+            health = self._endpoints.get(key)
+            if health is not None and health.state == HALF_OPEN and health.probe_claim == claim:
+                health.probe_started_at = None
+                health.probe_claim = None
+
+    def record_success(self, key: str, latency: float):
+        with self._lock:
+            health = self._health(key)
+            self._observe(health, latency, failed=False)
+            health.consecutive_failures = 0
+            if health.state != CLOSED:
+                logger.info(f"Circuit for {key} closed after successful probe")
+            health.state = CLOSED
+            health.open_seconds = self.open_seconds
+            health.probe_started_at = None
+        if self.observer is not None:
+            self.observer(key, latency, False)
+
+    def record_failure(self, key: str, error: Optional[Exception] = None, latency: Optional[float] = None):
+        rate_limited = error is not None and is_rate_limit_error(error)
+        now = time.time()
+        with self._lock:
+            health = self._health(key)
+            self._observe(health, latency, failed=True)
+            health.consecutive_failures += 1
+            if rate_limited:
+                health.rate_limited += 1
+
+            if health.state == HALF_OPEN:
+                health.open_seconds = min(self.max_open_seconds, health.open_seconds * 2)
+                self._open(key, health, now)
+            elif health.state == CLOSED and (rate_limited or health.consecutive_failures >= self.failure_threshold):
+                self._open(key, health, now)
+        if self.observer is not None:
+            self.observer(key, latency, True)
+
+    def _observe(self, health: EndpointHealth, latency: Optional[float], failed: bool):
+        health.requests += 1
+        if failed:
+            health.failures += 1
+        health.ewma_error_rate += self.alpha * ((1.0 if failed else 0.0) - health.ewma_error_rate)
+        # Failed calls still inform latency: a provider that stalls then errors is slow
+        if latency is not None:
+            health.latencies.append(latency)
+            if health.ewma_latency is None:
+                health.ewma_latency = latency
+            else:
+                health.ewma_latency += self.alpha * (latency - health.ewma_latency)
+
+    def _open(self, key: str, health: EndpointHealth, now: float):
+        health.state = OPEN
+        health.opened_at = now
+        health.probe_started_at = None
+        logger.warning(f"Circuit for {key} opened for {health.open_seconds:.0f}s")
+
+    def latency_percentile(self, key: str, pct: float, min_samples: int = 1) -> Optional[float]:
+        """Latency percentile over the rolling window, or None with fewer than min_samples"""
+        with self._lock:
+            health = self._endpoints.get(key)
+            if health is None or len(health.latencies) < min_samples:
+                return None
+            return health.percentile(pct)
+
+    def get_state(self) -> Dict[str, Dict[str, Any]]:
+        """Per-endpoint breaker state, latency EWMA/percentiles and error rates"""
+        now = time.time()
+        with self._lock:
+            return {key: health.to_dict(now) for key, health in self._endpoints.items()}
@@ -0,0 +1,357 @@
+"""
+Cross-process LLM rate limiter
+
+A token-bucket limiter shared by every agent process through a small SQLite
+database. Each provider has its own budget:
+
+- max_concurrency: simultaneous in-flight calls across all processes
+- rpm: requests per minute
+- tpm: tokens per minute (prompt + completion estimate)
+
+A value of 0 disables that particular limit. Budgets come from DEFAULT_LIMITS
+and can be overridden per provider through the environment, e.g.
+LLM_ANTHROPIC_MAX_CONCURRENCY=8, LLM_GEMINI_RPM=60, LLM_OPENAI_TPM=90000.
+"""
+
+import os
+import time
+import asyncio
+import uuid
+import random
+import sqlite3
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMITS = {
+    'anthropic': {'max_concurrency': 4, 'rpm': 50, 'tpm': 40000},
+    'openai': {'max_concurrency': 8, 'rpm': 500, 'tpm': 30000},
+    'gemini': {'max_concurrency': 4, 'rpm': 15, 'tpm': 1000000},
+    # The mock provider enforces its own capacity (LLM_MOCK_SERVER_CONCURRENCY / LLM_MOCK_SERVER_RPS)
+    'mock': {'max_concurrency': 0, 'rpm': 0, 'tpm': 0},
+}
+FALLBACK_LIMITS = {'max_concurrency': 4, 'rpm': 60, 'tpm': 0}
+
+# Leases older than this are considered abandoned and reclaimed. Leases of a process that
+# is no longer running are reclaimed as soon as a caller finds the provider at capacity.
+LEASE_TTL_SECONDS = 600
+
+
+def pid_alive(pid: int) -> bool:
+    """Whether a process with this id is running on this host"""
+    if pid == os.getpid():
+        return True
+    if os.name == 'nt':
+        # os.kill(pid, 0) would terminate the process on Windows: ask for its exit code instead
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return kernel32.GetLastError() == 5  # ERROR_ACCESS_DENIED: exists, not ours
+        try:
+            code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+            return code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # EPERM: running under another user
+        return True
+    return True
+
+
+def estimate_tokens(*texts) -> int:
+    """Cheap token estimate (~4 characters per token)"""
+    return max(1, sum(len(str(t)) for t in texts if t) // 4)
+
+
+class RateLimitTimeout(TimeoutError):
+    """Raised when no slot could be acquired before the timeout"""
+
+
+class ProviderLimits:
+    """Budget for a single provider"""
+
+    def __init__(self, max_concurrency: int = 0, rpm: int = 0, tpm: int = 0):
+        self.max_concurrency = int(max_concurrency)
+        self.rpm = int(rpm)
+        self.tpm = int(tpm)
+
+    @classmethod
+    def from_env(cls, provider: str) -> 'ProviderLimits':
+        defaults = DEFAULT_LIMITS.get(provider, FALLBACK_LIMITS)
+        prefix = f"LLM_{provider.upper()}_"
+        values = {}
+        for field in ('max_concurrency', 'rpm', 'tpm'):
+            raw = os.getenv(prefix + field.upper())
+            try:
+                values[field] = int(raw) if raw not in (None, '') else defaults[field]
+            except ValueError:
+                logger.warning(f"Invalid {prefix + field.upper()}={raw!r}, using default")
+                values[field] = defaults[field]
+        return cls(**values)
+
+    def to_dict(self) -> Dict[str, int]:
+        return {'max_concurrency': self.max_concurrency, 'rpm': self.rpm, 'tpm': self.tpm}
+
+
+class Lease:
+    """A granted slot. Release it (or use the limiter's context manager) when the call ends."""
+
+    def __init__(self, limiter: 'RateLimiter', provider: str, lease_id: str, tokens: int, waited: float):
+        self.limiter = limiter
+        self.provider = provider
+        self.lease_id = lease_id
+        self.tokens = tokens
+        self.waited = waited
+        self.released = False
+
+    def release(self, actual_tokens: Optional[int] = None):
+        if not self.released:
+            self.released = True
+            self.limiter.release(self, actual_tokens)
+
+    async def arelease(self, actual_tokens: Optional[int] = None):
+        """release() for callers on an event loop (the store update runs on a worker thread)"""
+        if not self.released:
+            self.released = True
+            await asyncio.to_thread(self.limiter.release, self, actual_tokens)
+
+
+class RateLimiter:
+    """
+    SQLite-backed token bucket shared by all processes using the same database file.
+
+    Buckets refill continuously (rpm/60 requests and tpm/60 tokens per second).
+    Concurrency is tracked as lease rows so a crashed process cannot hold a slot forever.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, limits: Optional[Dict[str, ProviderLimits]] = None):
+        self.db_path = db_path or os.getenv('LLM_RATE_LIMIT_DB', os.path.join(os.getcwd(), '.llm_rate_limit.db'))
+        self._limits = dict(limits or {})
+        self._local = threading.local()
+        self._disabled = False
+        try:
+            self._init_schema()
+        except sqlite3.Error as e:
+            # Never block LLM access because the limiter store is unavailable
+            logger.error(f"Rate limiter disabled, cannot open {self.db_path}: {e}")
+            self._disabled = True
+
+    def limits_for(self, provider: str) -> ProviderLimits:
+        if provider not in self._limits:
+            self._limits[provider] = ProviderLimits.from_env(provider)
+        return self._limits[provider]
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS buckets ('
+            ' provider TEXT PRIMARY KEY,'
+            ' request_tokens REAL NOT NULL,'
+            ' token_tokens REAL NOT NULL,'
+            ' updated_at REAL NOT NULL)'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS leases ('
+            ' lease_id TEXT PRIMARY KEY,'
+            ' provider TEXT NOT NULL,'
+            ' pid INTEGER NOT NULL,'
+            ' tokens INTEGER NOT NULL,'
+            ' expires_at REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_leases_provider ON leases(provider)')
+
+    def try_acquire(self, provider: str, tokens: int = 1) -> Tuple[Optional[Lease], float]:
+        """
+        Attempt to take a slot without blocking.
+
+        Returns:
+            (lease, 0) on success, or (None, seconds_until_worth_retrying)
+        """
+        if self._disabled:
+            return Lease(self, provider, '', tokens, 0.0), 0.0
+
+        limits = self.limits_for(provider)
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM leases WHERE expires_at < ?', (now,))
+
+            if limits.max_concurrency > 0:
+                (in_flight,) = conn.execute(
+                    'SELECT COUNT(*) FROM leases WHERE provider = ?', (provider,)
+                ).fetchone()
+                if in_flight >= limits.max_concurrency:
+                    in_flight -= self._reclaim_dead_leases(conn, provider)
+                if in_flight >= limits.max_concurrency:
+                    conn.execute('COMMIT')
+                    return None, 0.1
+
+            row = conn.execute(
+                'SELECT request_tokens, token_tokens, updated_at FROM buckets WHERE provider = ?',
+                (provider,)
+            ).fetchone()
+            if row is None:
+                request_tokens, token_tokens = float(limits.rpm), float(limits.tpm)
+            else:
+                elapsed = max(0.0, now - row[2])
+                request_tokens = min(float(limits.rpm), row[0] + elapsed * limits.rpm / 60.0)
+                token_tokens = min(float(limits.tpm), row[1] + elapsed * limits.tpm / 60.0)
+
+            # A single request larger than the whole minute budget only waits for a full bucket
+            needed_tokens = min(tokens, limits.tpm) if limits.tpm > 0 else 0
+            wait = 0.0
+            if limits.rpm > 0 and request_tokens < 1:
+                wait = max(wait, (1 - request_tokens) * 60.0 / limits.rpm)
+            if limits.tpm > 0 and token_tokens < needed_tokens:
+                wait = max(wait, (needed_tokens - token_tokens) * 60.0 / limits.tpm)
+
+            if wait > 0:
+                self._store_bucket(conn, provider, request_tokens, token_tokens, now)
+                conn.execute('COMMIT')
+                return None, wait
+
+            if limits.rpm > 0:
+                request_tokens -= 1
+            if limits.tpm > 0:
+                token_tokens -= needed_tokens
+            self._store_bucket(conn, provider, request_tokens, token_tokens, now)
+
+            lease_id = uuid.uuid4().hex
+            conn.execute(
+                'INSERT INTO leases (lease_id, provider, pid, tokens, expires_at) VALUES (?, ?, ?, ?, ?)',
+                (lease_id, provider, os.getpid(), tokens, now + LEASE_TTL_SECONDS)
+            )
+            conn.execute('COMMIT')
+            return Lease(self, provider, lease_id, tokens, 0.0), 0.0
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def _reclaim_dead_leases(conn, provider: str) -> int:
+        """Delete the provider's leases held by processes that have exited (crashed agents)"""
+        dead = [
+            pid for (pid,) in conn.execute('SELECT DISTINCT pid FROM leases WHERE provider = ?', (provider,))
+            if not pid_alive(pid)
+        ]
+        reclaimed = 0
+        for pid in dead:
+            reclaimed += conn.execute('DELETE FROM leases WHERE provider = ? AND pid = ?', (provider, pid)).rowcount
+        if reclaimed:
+            logger.warning(f"Reclaimed {reclaimed} {provider} rate limiter lease(s) of exited processes {dead}")
+        return reclaimed
+
+    @staticmethod
+    def _store_bucket(conn, provider, request_tokens, token_tokens, now):
+        conn.execute(
+            'INSERT INTO buckets (provider, request_tokens, token_tokens, updated_at) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(provider) DO UPDATE SET request_tokens = excluded.request_tokens, '
+            'token_tokens = excluded.token_tokens, updated_at = excluded.updated_at',
+            (provider, request_tokens, token_tokens, now)
+        )
+
+    def acquire(self, provider: str, tokens: int = 1, timeout: Optional[float] = 300) -> Lease:
+        """Block until a slot is available for the provider"""
+        start = time.monotonic()
+        while True:
+            try:
+                lease, wait = self.try_acquire(provider, tokens)
+            except sqlite3.Error as e:
+                logger.warning(f"Rate limiter store error ({e}), proceeding without limit")
+                return Lease(self, provider, '', tokens, time.monotonic() - start)
+            if lease:
+                lease.waited = time.monotonic() - start
+                return lease
+            if timeout is not None and time.monotonic() - start + wait > timeout:
+                raise RateLimitTimeout(f"No {provider} slot available within {timeout}s")
+            # Short jittered polls keep waiters from stampeding the database
+            time.sleep(min(wait, 1.0) * (0.8 + 0.4 * random.random()))
+
+    async def aacquire(self, provider: str, tokens: int = 1, timeout: Optional[float] = 300) -> Lease:
+        """
+        Async variant of acquire(). Each attempt runs on a worker thread (BEGIN IMMEDIATE can
+        wait up to 30 s on a busy database) and waiting uses asyncio.sleep, so the loop never blocks.
+        """
+        start = time.monotonic()
+        while True:
+            try:
+                lease, wait = await asyncio.to_thread(self.try_acquire, provider, tokens)
+            except sqlite3.Error as e:
+                logger.warning(f"Rate limiter store error ({e}), proceeding without limit")
+                return Lease(self, provider, '', tokens, time.monotonic() - start)
+            if lease:
+                lease.waited = time.monotonic() - start
+                return lease
+            if timeout is not None and time.monotonic() - start + wait > timeout:
+                raise RateLimitTimeout(f"No {provider} slot available within {timeout}s")
+            await asyncio.sleep(min(wait, 1.0) * (0.8 + 0.4 * random.random()))
+
+    def release(self, lease: Lease, actual_tokens: Optional[int] = None):
+        """Free the concurrency slot and reconcile the token estimate with actual usage"""
+        if self._disabled or not lease.lease_id:
+            return
+        limits = self.limits_for(lease.provider)
+        try:
+            conn = self._conn()
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM leases WHERE lease_id = ?', (lease.lease_id,))
+            if limits.tpm > 0 and actual_tokens is not None and actual_tokens != lease.tokens:
+                conn.execute(
+                    'UPDATE buckets SET token_tokens = MIN(?, token_tokens + ?) WHERE provider = ?',
+                    (float(limits.tpm), float(lease.tokens - actual_tokens), lease.provider)
+                )
+            conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to release rate limiter lease: {e}")
+            conn = getattr(self._local, 'conn', None)
+            if conn is not None and conn.in_transaction:
+                conn.execute('ROLLBACK')
+
+    def slot(self, provider: str, tokens: int = 1, timeout: Optional[float] = 300):
+        """Context manager wrapping acquire/release"""
+        limiter = self
+
+        class _Slot:
+            def __enter__(self):
+                self.lease = limiter.acquire(provider, tokens, timeout)
+                return self.lease
+
+            def __exit__(self, exc_type, exc_val, exc_tb):
+                self.lease.release()
+
+        return _Slot()
+
+    def get_state(self) -> Dict[str, Dict]:
+        """Snapshot of budgets, bucket levels and in-flight calls per provider"""
+        state = {}
+        for provider, limits in self._limits.items():
+            state[provider] = {'limits': limits.to_dict()}
+        if self._disabled:
+            return state
+        try:
+            conn = self._conn()
+            for provider, count in conn.execute('SELECT provider, COUNT(*) FROM leases GROUP BY provider'):
+                state.setdefault(provider, {})['in_flight'] = count
+            for provider, req, tok, _ in conn.execute('SELECT * FROM buckets'):
+                state.setdefault(provider, {}).update({'request_tokens': round(req, 2), 'token_tokens': round(tok, 2)})
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read rate limiter state: {e}")
+        return state
@@ -0,0 +1,224 @@
+"""
+Persistent LLM response cache
+
+Content-addressed cache shared by all agent processes through SQLite (WAL mode).
+Entries are keyed by a hash of provider, model, system context, trimmed history
+and prompt, expire after a TTL and are evicted least-recently-used once the
+entry or byte bounds are exceeded.
+
+Configuration (environment):
+- LLM_CACHE_ENABLED: "0" disables the cache (default "1")
+- LLM_CACHE_PATH: database file (default ./.llm_response_cache.db)
+- LLM_CACHE_TTL: seconds an entry stays valid (default 86400)
+- LLM_CACHE_MAX_ENTRIES: entry bound (default 5000)
+- LLM_CACHE_MAX_BYTES: total response size bound (default 64 MB)
+"""
+
+import os
+import json
+import asyncio
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Optional, List, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+STAT_NAMES = ('hits', 'misses', 'bytes_saved', 'stores', 'evictions', 'expirations')
+
+
+class ResponseCache:
+    """SQLite-backed LRU + TTL cache for LLM completions"""
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.db_path = db_path or os.getenv('LLM_CACHE_PATH', os.path.join(os.getcwd(), '.llm_response_cache.db'))
+        self.ttl = float(ttl if ttl is not None else os.getenv('LLM_CACHE_TTL', '86400'))
+        self.max_entries = int(max_entries if max_entries is not None else os.getenv('LLM_CACHE_MAX_ENTRIES', '5000'))
+        self.max_bytes = int(max_bytes if max_bytes is not None else os.getenv('LLM_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+        self.enabled = enabled if enabled is not None else os.getenv('LLM_CACHE_ENABLED', '1') not in ('0', 'false', 'False')
+
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.process_stats = {name: 0 for name in STAT_NAMES}
+
+        if self.enabled:
+            try:
+                self._init_schema()
+            except sqlite3.Error as e:
+                logger.error(f"Response cache disabled, cannot open {self.db_path}: {e}")
+                self.enabled = False
+
+    @staticmethod
+    def make_key(provider: str, model: str, system_context: str, history: List[Dict[str, Any]], prompt: str) -> str:
+        """Stable content hash of everything that determines the completion"""
+        payload = json.dumps(
+            [provider, model, system_context or '', history or [], prompt or ''],
+            ensure_ascii=False, separators=(',', ':'), sort_keys=True
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' key TEXT PRIMARY KEY,'
+            ' provider TEXT NOT NULL,'
+            ' model TEXT NOT NULL,'
+            ' response TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' created_at REAL NOT NULL,'
+            ' last_access REAL NOT NULL,'
+            ' hits INTEGER NOT NULL DEFAULT 0)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access)')
+        # Expiry on every put() deletes by age: keep that a range seek rather than a table scan
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_created_at ON entries(created_at)')
+        conn.execute('CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        conn.executemany('INSERT OR IGNORE INTO stats (name, value) VALUES (?, 0)', [(n,) for n in STAT_NAMES])
+
+    def _rollback(self):
+        """End a failed transaction so later BEGINs on this thread's connection still work"""
+        conn = getattr(self._local, 'conn', None)
+        try:
+            if conn is not None and conn.in_transaction:
+                conn.execute('ROLLBACK')
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache rollback failed: {e}")
+
+    def _bump(self, conn, **deltas):
+        for name, delta in deltas.items():
+            if delta:
+                conn.execute('UPDATE stats SET value = value + ? WHERE name = ?', (delta, name))
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                self.process_stats[name] += delta
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response, or None on miss/expiry"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT response, size, created_at FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self._bump(conn, misses=1)
+                conn.execute('COMMIT')
+                return None
+            response, size, created_at = row
+            if now - created_at > self.ttl:
+                conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self._bump(conn, misses=1, expirations=1)
+                conn.execute('COMMIT')
+                return None
+            conn.execute('UPDATE entries SET last_access = ?, hits = hits + 1 WHERE key = ?', (now, key))
+            self._bump(conn, hits=1, bytes_saved=size)
+            conn.execute('COMMIT')
+            return response
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache read failed: {e}")
+            self._rollback()
+            return None
+
+    def put(self, key: str, provider: str, model: str, response: str):
+        """Store a response and evict least-recently-used entries beyond the bounds"""
+        if not self.enabled or not response:
+            return
+        size = len(response.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (key, provider, model, response, size, created_at, last_access, hits) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, 0)',
+                (key, provider, model, response, size, now, now)
+            )
+            expired = conn.execute('DELETE FROM entries WHERE created_at < ?', (now - self.ttl,)).rowcount
+            evicted = self._evict(conn)
+            self._bump(conn, stores=1, evictions=evicted, expirations=expired)
+            conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache write failed: {e}")
+            self._rollback()
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get() for callers on an event loop: the lookup (a write transaction) runs on a worker thread"""
+        if not self.enabled:
+            return None
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, provider: str, model: str, response: str):
+        """put() for callers on an event loop"""
+        if not self.enabled or not response:
+            return
+        await asyncio.to_thread(self.put, key, provider, model, response)
+
+    def _evict(self, conn) -> int:
+        count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return 0
+        victims = []
+        for key, size in conn.execute('SELECT key, size FROM entries ORDER BY last_access ASC'):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany('DELETE FROM entries WHERE key = ?', victims)
+        return len(victims)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Shared (all processes) and per-process hit/miss/bytes-saved counters plus current size"""
+        with self._stats_lock:
+            process = dict(self.process_stats)
+        stats = {'enabled': self.enabled, 'process': process}
+        if not self.enabled:
+            return stats
+        try:
+            conn = self._conn()
+            shared = dict(conn.execute('SELECT name, value FROM stats').fetchall())
+            lookups = shared.get('hits', 0) + shared.get('misses', 0)
+            shared['hit_rate'] = round(shared.get('hits', 0) / lookups, 4) if lookups else 0.0
+            count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+            stats.update({
+                'shared': shared,
+                'entries': count,
+                'bytes': total,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl
+            })
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read response cache stats: {e}")
+        return stats
+
+    def clear(self):
+        """Drop every cached entry (stats are kept)"""
+        if not self.enabled:
+            return
+        try:
+            self._conn().execute('DELETE FROM entries')
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to clear response cache: {e}")
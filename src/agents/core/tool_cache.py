@@ -0,0 +1,191 @@
+"""
+Per-agent cache for read-only MCP tool results
+
+Skills and handleChatMessage fetch the same project and files over the bridge
+again and again. Results of the read-only project tools are kept in memory for
+a short TTL (bounded LRU) and served without a bridge round trip:
+- project_get (keyed by projectId)
+- project_read_file (keyed by filePath)
+- project_list_files (keyed by dirPath)
+
+Writes invalidate what they touch, both when they are sent and when they
+complete (a read answered in between must not repopulate stale data):
+- project_update drops project_get for that projectId
+- project_write_file drops project_read_file for the file and the
+  project_list_files of every directory above it
+Node pushes the same invalidations as cache_invalidate messages when another
+agent (or the REST API) writes, see BaseAgent.js broadcastToolCacheInvalidation.
+
+Configuration (environment):
+- TOOL_CACHE_ENABLED: "0" disables the cache (default "1")
+- TOOL_CACHE_MAX_ENTRIES: entries per agent (default 256)
+- TOOL_CACHE_TTL_PROJECT_GET / _PROJECT_READ_FILE / _PROJECT_LIST_FILES:
+  seconds an entry stays valid (defaults 15 / 60 / 30)
+"""
+
+import os
+import copy
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Cached tool -> argument that identifies the resource
+READ_TOOLS = {
+    'project_get': 'projectId',
+    'project_read_file': 'filePath',
+    'project_list_files': 'dirPath',
+}
+DEFAULT_TTLS = {
+    # Includes the latest tasks, which change without a project_update
+    'project_get': 15.0,
+    'project_read_file': 60.0,
+    'project_list_files': 30.0,
+}
+WRITE_TOOLS = ('project_update', 'project_write_file')
+STAT_NAMES = ('hits', 'misses', 'stores', 'invalidations', 'evictions', 'expirations')
+
+MISS = object()
+
+
+def _normalize_path(path: Any) -> str:
+    return os.path.normpath(str(path or '.')).replace('\\', '/')
+
+
+def _resource(tool_name: str, value: Any) -> str:
+    return _normalize_path(value) if tool_name != 'project_get' else str(value)
+
+
+def _parents(file_path: str):
+    """Directories a project_list_files call could have listed the file (or a new folder for it) in"""
+    parent = os.path.dirname(file_path)
+    while True:
+        yield parent or '.'
+        if not parent or os.path.dirname(parent) == parent:
+            return
+        parent = os.path.dirname(parent)
+
+
+class ToolResultCache:
+    """Thread-safe TTL + LRU cache of tool results, keyed by tool name and resource"""
+
+    def __init__(self, max_entries: Optional[int] = None, ttls: Optional[Dict[str, float]] = None, enabled: Optional[bool] = None):
+        self.max_entries = int(max_entries if max_entries is not None else os.getenv('TOOL_CACHE_MAX_ENTRIES', '256'))
+        self.enabled = enabled if enabled is not None else os.getenv('TOOL_CACHE_ENABLED', '1') not in ('0', 'false', 'False')
+        self.ttls = {
+            tool: float(os.getenv(f'TOOL_CACHE_TTL_{tool.upper()}', str(default)))
+            for tool, default in DEFAULT_TTLS.items()
+        }
+        self.ttls.update(ttls or {})
+
+        self._lock = threading.Lock()
+        # (tool, resource, extra args) -> (expires_at, result)
+        self._entries: 'OrderedDict[Tuple[str, str, str], Tuple[float, Any]]' = OrderedDict()
+        # Bumped by every invalidation: results of reads sent before it are not stored
+        self._generation = 0
+        self.stats = {name: 0 for name in STAT_NAMES}
+
+    def _key(self, tool_name: str, args: Optional[Dict[str, Any]]) -> Optional[Tuple[str, str, str]]:
+        field = READ_TOOLS.get(tool_name)
+        if field is None or not self.enabled or self.ttls.get(tool_name, 0) <= 0:
+            return None
+        args = args or {}
+        extra = {k: v for k, v in args.items() if k != field}
+        try:
+            extra_key = json.dumps(extra, sort_keys=True, separators=(',', ':')) if extra else ''
+        except (TypeError, ValueError):
+            return None
+        return tool_name, _resource(tool_name, args.get(field)), extra_key
+
+    def get(self, tool_name: str, args: Optional[Dict[str, Any]] = None) -> Any:
+        """Cached result (a copy the caller may modify) or MISS"""
+        key = self._key(tool_name, args)
+        if key is None:
+            return MISS
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return MISS
+            expires_at, result = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return MISS
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+        return copy.deepcopy(result)
+
+    def begin(self, tool_name: str, args: Optional[Dict[str, Any]] = None) -> Optional[Tuple[Tuple[str, str, str], int]]:
+        """
+        Call before sending a tool call. Writes invalidate what they touch; reads
+        get a token to pass to store() with the response (None if not cacheable).
+        """
+        if tool_name in WRITE_TOOLS:
+            self.invalidate(tool_name, args)
+            return None
+        key = self._key(tool_name, args)
+        if key is None:
+            return None
+        with self._lock:
+            return key, self._generation
+
+    def complete(self, tool_name: str, args: Optional[Dict[str, Any]], token, result: Any):
+        """Call with the response of a call started with begin()"""
+        if tool_name in WRITE_TOOLS:
+            self.invalidate(tool_name, args)
+        elif token is not None:
+            self.store(token, result)
+
+    def store(self, token: Tuple[Tuple[str, str, str], int], result: Any):
+        key, generation = token
+        # Failed reads (missing file, unknown project) are not cached
+        if not isinstance(result, dict) or not result.get('success'):
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttls[key[0]], copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            self.stats['stores'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def invalidate(self, tool_name: str, args: Optional[Dict[str, Any]] = None):
+        """Drop the entries a write (project_update / project_write_file) makes stale"""
+        args = args or {}
+        if tool_name == 'project_update':
+            stale = lambda key: key[0] == 'project_get' and key[1] == str(args.get('projectId'))
+        elif tool_name == 'project_write_file':
+            file_path = _normalize_path(args.get('filePath'))
+            parents = set(_parents(file_path))
+            stale = lambda key: (
+                (key[0] == 'project_read_file' and key[1] == file_path)
+                or (key[0] == 'project_list_files' and key[1] in parents)
+            )
+        else:
+            logger.warning(f"Tool cache: no invalidation rule for {tool_name}, clearing")
+            self.clear()
+            return
+
+        with self._lock:
+            self._generation += 1
+            for key in [key for key in self._entries if stale(key)]:
+                del self._entries[key]
+                self.stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, 'entries': len(self._entries), 'enabled': self.enabled}
@@ -0,0 +1,328 @@
+"""
+Bounded, prioritized worker pools for bridge message dispatch
+
+Replaces the thread-per-message dispatch of PythonBaseAgent. Work is queued
+per message type ("chat", "task", "message") and each type has its own
+concurrency limit, so a burst of background tasks cannot starve interactive
+chat. When capacity frees up the best queued item among the types that still
+have room runs next, ordered by:
+
+1. class: chat before background work (tasks and agent messages)
+2. AgentProtocol priority: urgent > high > medium > low
+3. arrival order
+
+The queue is bounded. When it is full a new item is rejected, unless it
+outranks the worst queued item, in which case that item is evicted instead.
+Either way the rejected item's on_reject callback runs so the caller can tell
+the Node bridge to route the work elsewhere.
+
+PriorityWorkerPool runs items on a fixed set of threads; AsyncWorkerPool runs
+coroutines on an event loop (used by AsyncPythonBaseAgent) with the same
+ordering and backpressure.
+
+Configuration (environment):
+- AGENT_CHAT_WORKERS: concurrent chat handlers (default 4, 64 for async agents)
+- AGENT_TASK_WORKERS: concurrent execute_task handlers (default 2, 32 for async agents)
+- AGENT_MESSAGE_WORKERS: concurrent handle_message handlers (default 2, 32 for async agents)
+- AGENT_MAX_QUEUE: queued (not yet running) items across all types (default 64)
+"""
+
+import os
+import heapq
+import asyncio
+import logging
+import itertools
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CHAT = 'chat'
+TASK = 'task'
+MESSAGE = 'message'
+
+# Lower ranks run first
+CLASS_RANK = {CHAT: 0, TASK: 1, MESSAGE: 1}
+PRIORITY_RANK = {'urgent': 0, 'high': 1, 'medium': 2, 'low': 3}
+DEFAULT_PRIORITY = 'medium'
+
+DEFAULT_WORKERS = {CHAT: 4, TASK: 2, MESSAGE: 2}
+# Waiting coroutines cost a few KB instead of a thread stack each
+ASYNC_DEFAULT_WORKERS = {CHAT: 64, TASK: 32, MESSAGE: 32}
+DEFAULT_MAX_QUEUE = 64
+
+
+def priority_rank(priority: Optional[str]) -> int:
+    return PRIORITY_RANK.get(str(priority or DEFAULT_PRIORITY).lower(), PRIORITY_RANK[DEFAULT_PRIORITY])
+
+
+def resolve_limits(defaults: Dict[str, int], workers: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """Per-type concurrency: explicit values, then AGENT_<TYPE>_WORKERS, then defaults"""
+    limits = dict(defaults)
+    for kind in limits:
+        env_value = os.getenv(f'AGENT_{kind.upper()}_WORKERS')
+        if env_value:
+            limits[kind] = int(env_value)
+    limits.update(workers or {})
+    return {kind: max(1, limit) for kind, limit in limits.items()}
+
+
+class WorkItem:
+    __slots__ = ('key', 'kind', 'priority', 'fn', 'args', 'on_reject')
+
+    def __init__(self, key, kind, priority, fn, args, on_reject):
+        self.key = key
+        self.kind = kind
+        self.priority = priority
+        self.fn = fn
+        self.args = args
+        self.on_reject = on_reject
+
+    def __lt__(self, other: 'WorkItem') -> bool:
+        return self.key < other.key
+
+
+class PriorityWorkQueue:
+    """Per-type priority queues and running counts (callers provide the locking)"""
+
+    def __init__(self, limits: Dict[str, int], max_queue: Optional[int] = None):
+        self.limits = limits
+        self.max_queue = int(max_queue if max_queue is not None else os.getenv('AGENT_MAX_QUEUE', DEFAULT_MAX_QUEUE))
+        self._queues: Dict[str, List[WorkItem]] = {kind: [] for kind in limits}
+        self._running: Dict[str, int] = {kind: 0 for kind in limits}
+        self._seq = itertools.count()
+        self._version = itertools.count(1)
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'evicted': 0, 'max_depth': 0}
+
+    def depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def make_item(self, kind, priority, fn, args, on_reject) -> WorkItem:
+        if kind not in self._queues:
+            raise ValueError(f"Unknown work type: {kind}")
+        return WorkItem(
+            (CLASS_RANK.get(kind, 1), priority_rank(priority), next(self._seq)),
+            kind, priority or DEFAULT_PRIORITY, fn, args, on_reject
+        )
+
+    def push(self, item: WorkItem) -> Optional[WorkItem]:
+        """Queue the item; returns the item that lost its place (the new one or an evicted one)"""
+        self.stats['submitted'] += 1
+        rejected = None
+        if self.depth() >= self.max_queue:
+            worst = self._worst_queued()
+            if worst is not None and item.key < worst.key:
+                self._queues[worst.kind].remove(worst)
+                heapq.heapify(self._queues[worst.kind])
+                self.stats['evicted'] += 1
+                rejected = worst
+            else:
+                self.stats['rejected'] += 1
+                return item
+        heapq.heappush(self._queues[item.kind], item)
+        self.stats['max_depth'] = max(self.stats['max_depth'], self.depth())
+        return rejected
+
+    def _worst_queued(self) -> Optional[WorkItem]:
+        items = [item for q in self._queues.values() for item in q]
+        return max(items) if items else None
+
+    def pop_next(self) -> Optional[WorkItem]:
+        """Best queued item among types below their concurrency limit, marked running"""
+        best = None
+        for kind, q in self._queues.items():
+            if q and self._running[kind] < self.limits[kind] and (best is None or q[0].key < best.key):
+                best = q[0]
+        if best is not None:
+            heapq.heappop(self._queues[best.kind])
+            self._running[best.kind] += 1
+        return best
+
+    def done(self, item: WorkItem, failed: bool = False):
+        self._running[item.kind] -= 1
+        self.stats['failed' if failed else 'completed'] += 1
+
+    def state(self) -> Dict[str, Any]:
+        # Callbacks may run outside the lock, so the version lets listeners drop out-of-order snapshots
+        return {
+            'version': next(self._version),
+            'queueDepth': self.depth(),
+            'maxQueue': self.max_queue,
+            'queued': {kind: len(q) for kind, q in self._queues.items()},
+            'running': dict(self._running),
+            'limits': dict(self.limits)
+        }
+
+
+class _PoolBase:
+    def __init__(self, limits, max_queue, on_depth_change):
+        self._work = PriorityWorkQueue(limits, max_queue)
+        self.limits = self._work.limits
+        self.max_queue = self._work.max_queue
+        self.on_depth_change = on_depth_change
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return self._work.stats
+
+    def _reject(self, item: WorkItem, state: Dict[str, Any]):
+        logger.warning(f"Work queue full ({self.max_queue}), rejecting {item.priority} {item.kind}")
+        if item.on_reject:
+            try:
+                item.on_reject(state)
+            except Exception as e:
+                logger.error(f"Backpressure callback failed: {str(e)}")
+
+    def _notify_depth(self, state: Dict[str, Any]):
+        if self.on_depth_change:
+            try:
+                self.on_depth_change(state)
+            except Exception as e:
+                logger.error(f"Queue depth callback failed: {str(e)}")
+
+
+class PriorityWorkerPool(_PoolBase):
+    """Fixed set of worker threads draining per-type priority queues"""
+
+    def __init__(
+        self,
+        workers: Optional[Dict[str, int]] = None,
+        max_queue: Optional[int] = None,
+        on_depth_change: Optional[Callable[[Dict[str, Any]], None]] = None,
+        name: str = 'agent'
+    ):
+        super().__init__(resolve_limits(DEFAULT_WORKERS, workers), max_queue, on_depth_change)
+        self._cond = threading.Condition()
+        self._stopped = False
+
+        # A worker can only ever run one item, so more threads than the summed limits would idle
+        self._threads = []
+        for i in range(sum(self.limits.values())):
+            thread = threading.Thread(target=self._worker, name=f'{name}-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(
+        self,
+        kind: str,
+        fn: Callable,
+        *args,
+        priority: Optional[str] = None,
+        on_reject: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> bool:
+        """Queue fn(*args); returns False (after calling on_reject) when the queue is full"""
+        item = self._work.make_item(kind, priority, fn, args, on_reject)
+        with self._cond:
+            rejected = self._work.push(item)
+            if rejected is not item:
+                self._cond.notify_all()
+            state = self._work.state()
+
+        if rejected is not None:
+            self._reject(rejected, state)
+        self._notify_depth(state)
+        return rejected is not item
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                item = self._work.pop_next()
+                while item is None and not self._stopped:
+                    self._cond.wait()
+                    item = self._work.pop_next()
+                if item is None:
+                    return
+                state = self._work.state()
+            self._notify_depth(state)
+
+            failed = False
+            try:
+                item.fn(*item.args)
+            except Exception as e:
+                failed = True
+                logger.error(f"Unhandled error in {item.kind} worker: {str(e)}")
+            finally:
+                with self._cond:
+                    self._work.done(item, failed)
+                    # Freed capacity may unblock a queued item of this type
+                    self._cond.notify_all()
+                    state = self._work.state()
+                self._notify_depth(state)
+
+    def get_state(self) -> Dict[str, Any]:
+        with self._cond:
+            state = self._work.state()
+            state['stats'] = dict(self.stats)
+        return state
+
+    def shutdown(self, wait: bool = False):
+        """Stop the workers once the queues are drained"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+class AsyncWorkerPool(_PoolBase):
+    """Runs coroutine functions as event loop tasks with the same limits and ordering.
+
+    Must be used from the loop's thread only; no locking is needed there.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[Dict[str, int]] = None,
+        max_queue: Optional[int] = None,
+        on_depth_change: Optional[Callable[[Dict[str, Any]], None]] = None,
+        defaults: Optional[Dict[str, int]] = None
+    ):
+        super().__init__(resolve_limits(defaults or ASYNC_DEFAULT_WORKERS, workers), max_queue, on_depth_change)
+        self._tasks = set()
+
+    def submit(
+        self,
+        kind: str,
+        coro_fn: Callable,
+        *args,
+        priority: Optional[str] = None,
+        on_reject: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> bool:
+        """Schedule coro_fn(*args); returns False (after calling on_reject) when the queue is full"""
+        item = self._work.make_item(kind, priority, coro_fn, args, on_reject)
+        rejected = self._work.push(item)
+        if rejected is not None:
+            self._reject(rejected, self._work.state())
+        self._start_ready()
+        return rejected is not item
+
+    def _start_ready(self):
+        item = self._work.pop_next()
+        while item is not None:
+            task = asyncio.get_running_loop().create_task(self._run(item))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            item = self._work.pop_next()
+        self._notify_depth(self._work.state())
+
+    async def _run(self, item: WorkItem):
+        failed = False
+        try:
+            await item.fn(*item.args)
+        except Exception as e:
+            failed = True
+            logger.error(f"Unhandled error in {item.kind} task: {str(e)}")
+        finally:
+            self._work.done(item, failed)
+            self._start_ready()
+
+    def get_state(self) -> Dict[str, Any]:
+        state = self._work.state()
+        state['stats'] = dict(self.stats)
+        return state
+
+    async def drain(self):
+        """Wait for every running and queued item to finish"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
@@ -364,7 +364,7 @@ export class DesignAgent extends BaseAgent {
     /**
      * Handle chat messages with design context
      */
-    async handleChatMessage(message, conversationHistory = [], taskContext = null, projectId = null) {
+    async handleChatMessage(message, conversationHistory = [], taskContext = null, projectId = null, onPartial = null) {
         logger.info(`${this.name}: Processing chat message about design`);
 
         const lowerMessage = message.toLowerCase();
@@ -405,7 +405,8 @@ export class DesignAgent extends BaseAgent {
             `[DESIGN CONTEXT: You are a UI/UX expert. Respond to this message staying in character and focusing on design value.] ${message}`,
             conversationHistory,
             taskContext,
-            projectId
+            projectId,
+            onPartial
         );
     }
 }
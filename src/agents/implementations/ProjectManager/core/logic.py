@@ -7,6 +7,56 @@ from typing import Optional, Dict, List
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../core')))
 from base_agent import PythonBaseAgent
 
+# Tokens of key file content included in the repository analysis prompt
+KEY_FILES_TOKEN_BUDGET = int(os.getenv('PM_KEY_FILES_TOKEN_BUDGET', '4000'))
+
+# Static instructions are sent as the system context so providers can cache them as a prompt prefix
+REPO_ANALYSIS_SYSTEM = """You are a Technical Project Architect. Analyze repositories to define the perfect agent swarm. Return JSON ONLY.
+
+Provide a professional analysis in JSON format ONLY:
+{
+  "stack": "Tech stack description",
+  "complexity": "Low/Medium/High with brief reason",
+  "security": "Initial security observation",
+  "recommendations": ["list", "of", "3-5", "technical", "recommendations"],
+  "suggested_agents": ["list", "of", "agent_ids", "needed"]
+}
+
+Available specialized agents (mapped by ID):
+- frontend: Frontend Engineer (React/Vue/JS)
+- backend: Backend Engineer (Node/Python/Go)
+- db: Database Architect (SQL/NoSQL/Prisma)
+- designer: UI/UX DesignAgent
+- qa: QA & Testing Agent
+- devops: DevOps & Cloud Agent
+- security: Security Audit Agent
+- seomarketing: SEO & Marketing Agent
+- contentwriter: Documentation & Content Agent
+"""
+
+DECOMPOSITION_SYSTEM = """You are a technical project manager. Decompose features into clear, actionable subtasks.
+
+Create a list of subtasks with:
+- type: (frontend, backend, design, qa, etc.)
+- description: Brief action (e.g., 'Implement User Auth API')
+- priority: (high, medium, low)
+- dependencies: Which subtasks must complete first
+
+CRITICAL- **English/ASCII Protocol**: ALWAYS use English and plain ASCII characters for technical IDs, file names, and task descriptions. NO special characters or Portuguese names for code assets.
+- **Concatenation**: Keep file names and task IDs short and professional (camelCase/PascalCase).
+- **Project CRM Management**: You are now in a CRM-style system. Projects (Company X, App Y) are long-lived entities.
+  - Use `/api/projects` (GET, POST, PATCH) to manage these high-level projects.
+  - When creating tasks, ALWAYS associate them with the relevant `projectId` if one exists.
+  - You can query tasks by `projectId` using `/api/tasks?projectId=XYZ`.
+  - Maintain the project the status and roadmap as a central command center.
+If a subtask involves creating a file, use brief PascalCase (e.g., UserProfile.jsx) or camelCase.
+4. Keep descriptions concise and technical.
+5. NO LONG SENTENCES as descriptions.
+
+Return as JSON array with format:
+[{"type": "...", "desc": "...", "priority": "...", "dependencies": []}]
+"""
+
 
 class ProjectManager(PythonBaseAgent):
     """
@@ -131,20 +181,27 @@ class ProjectManager(PythonBaseAgent):
         try:
             # Note: project_list_files currently lists one level. 
             # We use it on the root to see top-level structure.
-            files_res = self.call_mcp_tool(None, "project_list_files", {"dirPath": path_to_scan})
-            file_list = files_res.get('files', []) if files_res else []
-            
             # 2. Read key entry files (package.json, requirements.txt, etc.)
+            # The listing and all reads go to the bridge as one batch and run concurrently
             key_files = ['package.json', 'requirements.txt', 'README.md', 'prisma/schema.prisma', 'docker-compose.yml']
-            context_data = {}
+            results = self.call_mcp_tools(
+                [(None, "project_list_files", {"dirPath": path_to_scan})] +
+                [(None, "project_read_file", {"filePath": os.path.join(path_to_scan, kf)}) for kf in key_files],
+                return_exceptions=True
+            )
+            files_res = results[0]
+            if isinstance(files_res, Exception):
+                raise files_res
+            file_list = files_res.get('files', []) if files_res else []
             
-            for kf in key_files:
-                try:
-                    read_res = self.call_mcp_tool(None, "project_read_file", {"filePath": os.path.join(path_to_scan, kf)})
-                    if read_res and read_res.get('content'):
-                        context_data[kf] = read_res['content']
-                except:
-                    pass
+            context_data = {}
+            for kf, read_res in zip(key_files, results[1:]):
+                if isinstance(read_res, dict) and read_res.get('content'):
+                    context_data[kf] = read_res['content']
+
+            # Share a token budget between the key files instead of cutting each at a fixed length
+            if self.llm_manager:
+                context_data = self.llm_manager.budgeter.fit_documents(context_data, KEY_FILES_TOKEN_BUDGET)
 
             # 3. Use LLM to analyze and suggest agents
             prompt = f"""
@@ -152,32 +209,12 @@ Analyze this project structure and key file contents:
 
 Project Path: {path_to_scan}
 Files: {json.dumps(file_list[:100])} # First 100 files
-Context: {json.dumps({k: v[:2000] for k, v in context_data.items()})}
-
-Provide a professional analysis in JSON format ONLY:
-{{
-  "stack": "Tech stack description",
-  "complexity": "Low/Medium/High with brief reason",
-  "security": "Initial security observation",
-  "recommendations": ["list", "of", "3-5", "technical", "recommendations"],
-  "suggested_agents": ["list", "of", "agent_ids", "needed"]
-}}
-
-Available specialized agents (mapped by ID):
-- frontend: Frontend Engineer (React/Vue/JS)
-- backend: Backend Engineer (Node/Python/Go)
-- db: Database Architect (SQL/NoSQL/Prisma)
-- designer: UI/UX DesignAgent
-- qa: QA & Testing Agent
-- devops: DevOps & Cloud Agent
-- security: Security Audit Agent
-- seomarketing: SEO & Marketing Agent
-- contentwriter: Documentation & Content Agent
+Context: {json.dumps(context_data)}
 """
             
             response = self.llm_manager.generate_response(
                 prompt=prompt,
-                system_context="You are a Technical Project Architect. Analyze repositories to define the perfect agent swarm. Return JSON ONLY."
+                system_context=REPO_ANALYSIS_SYSTEM
             )
 
             if not response:
@@ -254,6 +291,10 @@ Available specialized agents (mapped by ID):
         if past_approach:
             self.log(f"✅ Found similar past implementation: {past_approach.get('description')}")
         
+        team_experience = self.recall_team_experience(f"{title} {description}")
+        for record in team_experience:
+            self.log(f"👥 {record.get('agent_id', self.agent_id)} did similar work: {record.get('description')}")
+        
         # Step 2: Analyze and decompose the feature
         self.log("🔍 Analyzing feature requirements...")
         subtasks = self.intelligent_decomposition(title, description)
@@ -334,32 +375,12 @@ Decompose this feature into specific, actionable subtasks:
 
 Feature: {title}
 Description: {description}
-
-Create a list of subtasks with:
-- type: (frontend, backend, design, qa, etc.)
-- description: Brief action (e.g., 'Implement User Auth API')
-- priority: (high, medium, low)
-- dependencies: Which subtasks must complete first
-
-CRITICAL- **English/ASCII Protocol**: ALWAYS use English and plain ASCII characters for technical IDs, file names, and task descriptions. NO special characters or Portuguese names for code assets.
-- **Concatenation**: Keep file names and task IDs short and professional (camelCase/PascalCase).
-- **Project CRM Management**: You are now in a CRM-style system. Projects (Company X, App Y) are long-lived entities.
-  - Use `/api/projects` (GET, POST, PATCH) to manage these high-level projects.
-  - When creating tasks, ALWAYS associate them with the relevant `projectId` if one exists.
-  - You can query tasks by `projectId` using `/api/tasks?projectId=XYZ`.
-  - Maintain the project the status and roadmap as a central command center.
-If a subtask involves creating a file, use brief PascalCase (e.g., UserProfile.jsx) or camelCase.
-4. Keep descriptions concise and technical.
-5. NO LONG SENTENCES as descriptions.
-
-Return as JSON array with format:
-[{{"type": "...", "desc": "...", "priority": "...", "dependencies": []}}]
 """
             
             try:
                 response = self.llm_manager.generate_response(
                     prompt=prompt,
-                    system_context="You are a technical project manager. Decompose features into clear, actionable subtasks."
+                    system_context=DECOMPOSITION_SYSTEM
                 )
                 
                 # Try to parse JSON from response
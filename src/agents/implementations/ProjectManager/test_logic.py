@@ -25,6 +25,7 @@ def mock_call(mcp, tool, args):
     return {}
 
 pm.call_mcp_tool = mock_call
+pm.call_mcp_tools = lambda calls, **kwargs: [mock_call(*call) for call in calls]
 pm.llm_manager = None # Use fallback or mock
 
 res = pm.execute_task(test_task)
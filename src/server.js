@@ -10,7 +10,7 @@ import multer from 'multer';
 import logger from './utils/logger.js';
 import AgentRegistry from './agents/core/AgentRegistry.js';
 import MCPManager from './agents/core/MCPManager.js';
-import BaseAgent from './agents/core/BaseAgent.js';
+import BaseAgent, { broadcastToolCacheInvalidation } from './agents/core/BaseAgent.js';
 import { AnalysisOrchestrator } from './agents/analysis/orchestrator.js';
 
 // Database & Messaging
@@ -171,6 +171,7 @@ app.patch('/api/projects/:id/business-model', async (req, res) => {
         });
 
         io.emit('project:updated', project);
+        await broadcastToolCacheInvalidation('project_update', { projectId: project.id });
         res.json({ success: true, project });
     } catch (error) {
         logger.error('Error updating business model:', error);
@@ -315,6 +316,7 @@ app.patch('/api/projects/:id', async (req, res) => {
 
         logger.info(`Project updated: ${project.id} - ${project.name}`);
         io.emit('project:updated', project);
+        await broadcastToolCacheInvalidation('project_update', { projectId: project.id });
 
         // If agents were assigned, trigger them to analyze the project
         if (assignedAgents) {
@@ -652,6 +654,7 @@ app.delete('/api/projects/:id', async (req, res) => {
 
         logger.info(`Project deleted: ${id}`);
         io.emit('project:deleted', id);
+        await broadcastToolCacheInvalidation('project_update', { projectId: id });
         res.json({ success: true });
     } catch (error) {
         logger.error('Error deleting project:', error);
@@ -994,6 +997,7 @@ app.patch('/api/projects/:id', async (req, res) => {
         });
 
         io.emit('project:updated', project);
+        await broadcastToolCacheInvalidation('project_update', { projectId: project.id });
         res.json({ success: true, project });
     } catch (error) {
         logger.error('Error updating project:', error);
@@ -1954,6 +1958,51 @@ app.get('/api/agents/:id', (req, res) => {
         res.status(500).json({ success: false, error: error.message });
     }
 });
+
+/**
+ * GET /api/agents/:id/metrics
+ * Latency histograms and counters of the agent's Python process
+ */
+app.get('/api/agents/:id/metrics', async (req, res) => {
+    try {
+        const agent = AgentRegistry.getAgent(req.params.id);
+
+        if (!agent) {
+            return res.status(404).json({ success: false, error: 'Agent not found' });
+        }
+
+        res.json({
+            success: true,
+            metrics: await agent.getMetrics()
+        });
+    } catch (error) {
+        logger.error('Error fetching agent metrics:', error);
+        res.status(500).json({ success: false, error: error.message });
+    }
+});
+
+/**
+ * POST /api/agents/:id/profile
+ * Profile the agent's running Python process (CPU stacks or tracemalloc allocations)
+ * Body: { profile: 'cpu' | 'memory', engine, action, duration, interval, limit, frames }
+ */
+app.post('/api/agents/:id/profile', async (req, res) => {
+    try {
+        const agent = AgentRegistry.getAgent(req.params.id);
+
+        if (!agent) {
+            return res.status(404).json({ success: false, error: 'Agent not found' });
+        }
+
+        res.json({
+            success: true,
+            profile: await agent.profile(req.body || {})
+        });
+    } catch (error) {
+        logger.error('Error profiling agent:', error);
+        res.status(500).json({ success: false, error: error.message });
+    }
+});
 /**
  * GET /api/projects/:id/files/:path
  * Read file content
@@ -3281,10 +3330,35 @@ app.put('/api/projects/:id/files/:path(*)', async (req, res) => {
  * DELETE /api/tasks/:id
  * Delete a task
  */
+/**
+ * POST /api/tasks/:id/cancel
+ * Stop a task an agent is executing (its Python side aborts pending tool and LLM calls)
+ */
+app.post('/api/tasks/:id/cancel', async (req, res) => {
+    try {
+        const { id } = req.params;
+        const reason = req.body?.reason || 'cancelled via API';
+        const agents = AgentRegistry.getAllAgents().filter(agent => typeof agent.cancelTask === 'function' && agent.cancelTask(id, reason));
+
+        logger.info(`Task cancel requested: ${id} (${agents.length} running)`);
+        res.json({ success: true, cancelled: agents.map(agent => agent.id) });
+    } catch (error) {
+        logger.error('Error cancelling task:', error);
+        res.status(500).json({ success: false, error: error.message });
+    }
+});
+
 app.delete('/api/tasks/:id', async (req, res) => {
     try {
         const { id } = req.params;
 
+        // Nothing should keep working on a deleted task
+        for (const agent of AgentRegistry.getAllAgents()) {
+            if (typeof agent.cancelTask === 'function') {
+                agent.cancelTask(id, 'task deleted');
+            }
+        }
+
         await prisma.task.delete({
             where: { id }
         });
@@ -3516,12 +3590,20 @@ io.on('connection', (socket) => {
                     take: 10
                 });
 
-                // 3. Get response from agent
+                // 3. Get response from agent (partial text is streamed as it is generated)
                 const agentResponse = await agent.handleChatMessage(
                     message,
                     history,
                     data.taskId,
-                    projectId
+                    projectId,
+                    (delta) => socket.emit('chat:partial', {
+                        agent: {
+                            id: agent.id,
+                            name: agent.name,
+                            emoji: agent.emoji
+                        },
+                        delta
+                    })
                 );
 
                 const responseText = agentResponse.response || agentResponse.result || agentResponse.message;